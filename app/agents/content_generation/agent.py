@@ -6,14 +6,10 @@
 """
 
 import json
-import httpx
-import uuid
 from typing import Dict, Any, Optional
-from urllib.parse import urlencode, urlparse
 
-from app.core.config import get_settings
 from app.core.logger import app_logger
-from app.utils.vivo_auth import gen_sign_headers
+from app.services.llm.bluelm_client import bluelm_client
 from app.prompts.content_generation_prompts import ContentGenerationPrompts
 from app.models.content_generation_models import (
     ContentGenerationResponse,
@@ -21,78 +17,23 @@ from app.models.content_generation_models import (
     ContentGenerationDataConverter
 )
 
-settings = get_settings()
-
 
 class ContentGenerationAgent:
     """文案生成Agent - 智能生成二手交易平台文案"""
     
-    def __init__(self):
-        # 蓝心大模型API配置
-        self.app_id = settings.lanxin_app_id
-        self.app_key = settings.lanxin_app_key
-        self.base_url = settings.lanxin_api_base_url
-        self.text_model = settings.lanxin_text_model
-        
-        self.client = httpx.AsyncClient(timeout=30.0)
-    
-    def _get_auth_headers(self, method: str, uri: str, query_params: Dict[str, str]) -> Dict[str, str]:
-        """获取鉴权头部"""
-        auth_headers = gen_sign_headers(
-            app_id=self.app_id,
-            app_key=self.app_key,
-            method=method,
-            uri=uri,
-            query=query_params
-        )
-        auth_headers["Content-Type"] = "application/json"
-        return auth_headers
-    
     async def _call_lanxin_api(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
         """调用蓝心大模型API"""
         try:
-            # 生成请求ID和会话ID
-            request_id = str(uuid.uuid4())
-            session_id = str(uuid.uuid4())
-            
-            # 构造请求参数
-            url_params = {"requestId": request_id}
-            
-            # 构造请求体
-            request_body = {
-                "model": self.text_model,
-                "sessionId": session_id,
-                "systemPrompt": system_prompt,
-                "prompt": user_prompt,
-                "extra": {
+            return await bluelm_client.complete(
+                system_prompt=system_prompt,
+                prompt=user_prompt,
+                extra={
                     "temperature": 0.3,  # 适中的温度保证创意和稳定性平衡
                     "top_p": 0.8,
                     "max_new_tokens": 800
                 }
-            }
-            
-            # 获取鉴权头部
-            parsed_url = urlparse(self.base_url)
-            uri = parsed_url.path
-            headers = self._get_auth_headers("POST", uri, url_params)
-            
-            # 发送请求
-            url = f"{self.base_url}?{urlencode(url_params)}"
-            response = await self.client.post(
-                url,
-                headers=headers,
-                json=request_body
             )
             
-            response.raise_for_status()
-            result = response.json()
-            
-            # 检查响应状态
-            if result.get("code") != 0:
-                raise Exception(f"API调用失败: {result.get('msg', '未知错误')}")
-            
-            return result["data"]
-            
         except Exception as e:
             app_logger.error(f"蓝心大模型API调用失败: {e}")
             raise
@@ -211,9 +152,8 @@ class ContentGenerationAgent:
             )
     
     async def close(self):
-        """关闭HTTP客户端"""
-        if self.client:
-            await self.client.aclose()
+        """关闭Agent相关资源（蓝心网关连接池为进程共享，由应用生命周期统一关闭）"""
+        pass
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
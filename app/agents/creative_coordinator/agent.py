@@ -6,7 +6,7 @@
 """
 
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, Awaitable
 from concurrent.futures import ThreadPoolExecutor
 
 from app.core.logger import app_logger
@@ -37,13 +37,15 @@ class CreativeCoordinatorAgent:
     async def generate_complete_solution(
         self,
         analysis_result: Dict[str, Any],
-        enable_parallel: bool = True
+        enable_parallel: bool = True,
+        on_chunk: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> CoordinatorResponse:
         """生成完整的创意改造解决方案
         
         Args:
             analysis_result: 物品分析结果，包含category、condition、description等信息
             enable_parallel: 是否启用并行处理，默认True
+            on_chunk: 改造方案生成的增量文本回调
             
         Returns:
             结构化的协调器响应对象
@@ -67,7 +69,7 @@ class CreativeCoordinatorAgent:
             if enable_parallel:
                 # 并行执行改造步骤生成和视频搜索
                 app_logger.info("启用并行处理模式")
-                renovation_task = self._renovation_agent.generate_from_analysis(analysis_result)
+                renovation_task = self._renovation_agent.generate_from_analysis(analysis_result, on_chunk=on_chunk)
                 video_search_task = self._bilibili_agent.search_from_analysis(
                     analysis_result, 
                     max_videos=25  # 默认搜索25个视频
@@ -102,7 +104,7 @@ class CreativeCoordinatorAgent:
                 
                 # 1. 生成改造步骤
                 app_logger.info("步骤1: 生成创意改造步骤")
-                renovation_result = await self._renovation_agent.generate_from_analysis(analysis_result)
+                renovation_result = await self._renovation_agent.generate_from_analysis(analysis_result, on_chunk=on_chunk)
                 
                 # 2. 搜索相关视频
                 app_logger.info("步骤2: 搜索相关DIY视频")
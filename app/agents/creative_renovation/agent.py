@@ -5,111 +5,86 @@
 基于蓝心大模型分析，为用户提供可行的改造方案和逐步操作指南
 """
 
-import json
 import httpx
-import uuid
 import asyncio
-from typing import Dict, Any, Optional
-from urllib.parse import urlencode, urlparse
+from typing import Dict, Any, Optional, Callable, Awaitable
 
-from app.core.config import settings
 from app.core.logger import app_logger
 from app.services.renovation_summary_service import RenovationSummaryService
-from app.utils.vivo_auth import gen_sign_headers
+from app.services.llm.bluelm_client import bluelm_client
+from app.services.llm.gateway_scheduler import GatewayOverloadedError
+from app.services.llm.resilience import CircuitOpenError, TimeBudgetExceededError, remaining_budget
 from app.prompts.creative_renovation_prompts import CreativeRenovationPrompts
+from app.utils.json_stream import extract_json
 
 
 class CreativeRenovationAgent:
     """创意改造步骤Agent - 智能改造方案生成"""
     
-    def __init__(self):
-        # 蓝心大模型API配置
-        self.app_id = settings.lanxin_app_id
-        self.app_key = settings.lanxin_app_key
-        self.base_url = settings.lanxin_api_base_url
-        self.text_model = settings.lanxin_text_model
+    async def _call_lanxin_api(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_retries: int = 2,
+        on_chunk: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """调用蓝心大模型API，支持重试机制
         
-        # 创建HTTP客户端，设置更长的默认超时和连接配置
-        self.client = httpx.AsyncClient(
-            timeout=httpx.Timeout(connect=15.0, read=60.0, write=30.0, pool=10.0),
-            limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
-            follow_redirects=True
-        )
-    
-    def _get_auth_headers(self, method: str, uri: str, query_params: Dict[str, str]) -> Dict[str, str]:
-        """获取鉴权头部"""
-        auth_headers = gen_sign_headers(
-            app_id=self.app_id,
-            app_key=self.app_key,
-            method=method,
-            uri=uri,
-            query=query_params
-        )
-        auth_headers["Content-Type"] = "application/json"
-        return auth_headers
-    
-    async def _call_lanxin_api(self, system_prompt: str, user_prompt: str, max_retries: int = 2) -> Dict[str, Any]:
-        """调用蓝心大模型API，支持重试机制"""
+        Args:
+            on_chunk: 增量文本回调，指定后使用流式接口并逐块转发生成内容；
+                已经转发过部分内容后失败时，重试改用阻塞调用，不再转发，避免客户端拼接出重复内容
+        """
         last_error = None
+        forwarded = False
+        extra = {
+            "temperature": 0.3,  # 适中的温度，确保创意性和稳定性平衡
+            "top_p": 0.8,
+            "max_new_tokens": 3500  # 增加token限制以支持详细步骤
+        }
         
         for attempt in range(max_retries + 1):
             try:
                 if attempt > 0:
+                    # 剩余时间预算不足以等待重试时直接放弃
+                    budget = remaining_budget()
+                    if budget is not None and budget <= 2 * attempt:
+                        app_logger.warning("剩余时间预算不足，放弃重试")
+                        break
                     app_logger.info(f"API调用重试 {attempt}/{max_retries}")
                     # 重试前等待一段时间
                     await asyncio.sleep(2 * attempt)
                 
-                # 生成请求ID和会话ID
-                request_id = str(uuid.uuid4())
-                session_id = str(uuid.uuid4())
-                
                 app_logger.info(f"蓝心API调用开始 - 尝试 {attempt + 1}/{max_retries + 1}")
                 
-                # 构造请求参数
-                url_params = {"requestId": request_id}
-                
-                # 构造请求体
-                request_body = {
-                    "model": self.text_model,
-                    "sessionId": session_id,
-                    "systemPrompt": system_prompt,
-                    "prompt": user_prompt,
-                    "extra": {
-                        "temperature": 0.3,  # 适中的温度，确保创意性和稳定性平衡
-                        "top_p": 0.8,
-                        "max_new_tokens": 3500  # 增加token限制以支持详细步骤
-                    }
-                }
-                
-                # 获取鉴权头部
-                parsed_url = urlparse(self.base_url)
-                uri = parsed_url.path
-                headers = self._get_auth_headers("POST", uri, url_params)
-                
-                # 发送请求，设置更长的超时时间
-                url = f"{self.base_url}?{urlencode(url_params)}"
-                
-                # 使用更长的超时时间：连接超时15秒，读取超时60秒
-                timeout = httpx.Timeout(connect=15.0, read=60.0, write=30.0, pool=10.0)
-                
-                response = await self.client.post(
-                    url,
-                    headers=headers,
-                    json=request_body,
-                    timeout=timeout
-                )
-                
-                # 检查HTTP状态码
-                response.raise_for_status()
-                result = response.json()
-                
-                # 检查响应状态
-                if result.get("code") != 0:
-                    error_msg = result.get('msg', '未知错误')
-                    raise Exception(f"API返回错误: {error_msg}")
+                # 使用generation超时档位：连接超时15秒，读取超时60秒
+                if on_chunk is not None and not forwarded:
+                    chunks = []
+                    async for chunk in bluelm_client.stream_complete(
+                        system_prompt=system_prompt,
+                        prompt=user_prompt,
+                        extra=extra,
+                        timeout_profile="generation"
+                    ):
+                        chunks.append(chunk)
+                        forwarded = True
+                        await on_chunk(chunk)
+                    data = {"content": "".join(chunks)}
+                else:
+                    data = await bluelm_client.complete(
+                        system_prompt=system_prompt,
+                        prompt=user_prompt,
+                        extra=extra,
+                        timeout_profile="generation"
+                    )
                 
                 app_logger.info(f"蓝心大模型API调用成功 - 尝试 {attempt + 1}")
-                return result["data"]
+                return data
+                
+            except (GatewayOverloadedError, CircuitOpenError, TimeBudgetExceededError) as e:
+                last_error = f"网关不可用: {e}"
+                app_logger.warning(f"尝试 {attempt + 1} 网关不可用: {e}")
+                # 网关满载、熔断或时间预算用完，重试只会加剧拥塞
+                break
                 
             except httpx.TimeoutException as e:
                 last_error = f"API调用超时: {e}"
@@ -147,44 +122,13 @@ class CreativeRenovationAgent:
     
     def _parse_renovation_response(self, content: str) -> Optional[Dict[str, Any]]:
         """解析改造方案响应"""
-        try:
-            # 尝试直接解析JSON
-            try:
-                renovation_plan = json.loads(content)
-                app_logger.info("改造方案解析成功 - 直接JSON解析")
-                return renovation_plan
-            except json.JSONDecodeError:
-                pass
-            
-            # 尝试从代码块中提取JSON
-            if "```json" in content:
-                start_marker = "```json"
-                end_marker = "```"
-                start_index = content.find(start_marker)
-                if start_index != -1:
-                    start_index += len(start_marker)
-                    end_index = content.find(end_marker, start_index)
-                    if end_index != -1:
-                        json_str = content[start_index:end_index].strip()
-                        renovation_plan = json.loads(json_str)
-                        app_logger.info("改造方案解析成功 - 代码块JSON解析")
-                        return renovation_plan
-            
-            # 尝试查找花括号内容
-            first_brace = content.find('{')
-            last_brace = content.rfind('}')
-            if first_brace != -1 and last_brace != -1 and first_brace < last_brace:
-                json_str = content[first_brace:last_brace + 1]
-                renovation_plan = json.loads(json_str)
-                app_logger.info("改造方案解析成功 - 花括号内容解析")
-                return renovation_plan
-            
-            app_logger.warning("无法解析改造方案为有效JSON格式")
-            return None
-            
-        except Exception as e:
-            app_logger.error(f"解析改造方案失败: {e}")
-            return None
+        renovation_plan = extract_json(content)
+        if isinstance(renovation_plan, dict):
+            app_logger.info("改造方案解析成功")
+            return renovation_plan
+        
+        app_logger.warning("无法解析改造方案为有效JSON格式")
+        return None
     
     def _validate_renovation_plan(self, plan: Dict[str, Any]) -> bool:
         """验证改造方案格式"""
@@ -220,11 +164,16 @@ class CreativeRenovationAgent:
         
         return True
     
-    async def generate_from_analysis(self, analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_from_analysis(
+        self,
+        analysis_result: Dict[str, Any],
+        on_chunk: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
         """从分析结果生成创意改造步骤
         
         Args:
             analysis_result: 物品分析结果，包含category、condition、description等信息
+            on_chunk: 增量文本回调，用于实时转发大模型生成内容
             
         Returns:
             包含详细改造步骤的字典
@@ -241,7 +190,7 @@ class CreativeRenovationAgent:
                 }
             
             # 生成改造步骤
-            renovation_result = await self._generate_renovation_steps(analysis_result)
+            renovation_result = await self._generate_renovation_steps(analysis_result, on_chunk=on_chunk)
             
             if not renovation_result.get("success"):
                 # 使用备用改造方案
@@ -274,7 +223,11 @@ class CreativeRenovationAgent:
                 "source": "analysis_result"
             }
     
-    async def _generate_renovation_steps(self, analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+    async def _generate_renovation_steps(
+        self,
+        analysis_result: Dict[str, Any],
+        on_chunk: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
         """生成改造步骤"""
         try:
             # 构建提示词
@@ -284,7 +237,7 @@ class CreativeRenovationAgent:
             app_logger.info("调用蓝心大模型进行创意改造步骤生成")
             
             # 调用API
-            response_data = await self._call_lanxin_api(system_prompt, user_prompt)
+            response_data = await self._call_lanxin_api(system_prompt, user_prompt, on_chunk=on_chunk)
             content = response_data.get("content", "")
             
             # 解析改造方案
@@ -336,11 +289,8 @@ class CreativeRenovationAgent:
         return RenovationSummaryService.generate_summary_text(overview)
     
     async def close(self):
-        """关闭Agent相关资源"""
-        try:
-            await self.client.aclose()
-        except Exception as e:
-            app_logger.warning(f"关闭Agent资源时出现警告: {e}")
+        """关闭Agent相关资源（蓝心网关连接池为进程共享，由应用生命周期统一关闭）"""
+        pass
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
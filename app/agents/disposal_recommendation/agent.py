@@ -5,16 +5,13 @@
 为用户提供创意改造、回收捐赠、二手交易三大路径的推荐度和理由标签
 """
 
-import json
-import httpx
-import uuid
 from typing import Dict, Any, Optional
-from urllib.parse import urlencode, urlparse
 
-from app.core.config import settings
 from app.core.logger import app_logger
-from app.utils.vivo_auth import gen_sign_headers
+from app.services.llm.bluelm_client import bluelm_client
+from app.services.llm.gateway_scheduler import GatewayPriority
 from app.prompts.disposal_recommendation_prompts import DisposalRecommendationPrompts
+from app.utils.json_stream import extract_json
 from app.models.disposal_recommendation_models import (
     DisposalRecommendationResponse,
     DisposalRecommendationDataConverter
@@ -24,116 +21,40 @@ from app.models.disposal_recommendation_models import (
 class DisposalRecommendationAgent:
     """三大处置路径推荐Agent - 智能处置方案分析"""
     
-    def __init__(self):
-        # 蓝心大模型API配置
-        self.app_id = settings.lanxin_app_id
-        self.app_key = settings.lanxin_app_key
-        self.base_url = settings.lanxin_api_base_url
-        self.text_model = settings.lanxin_text_model
-        
-        self.client = httpx.AsyncClient(timeout=30.0)
-    
-    def _get_auth_headers(self, method: str, uri: str, query_params: Dict[str, str]) -> Dict[str, str]:
-        """获取鉴权头部"""
-        auth_headers = gen_sign_headers(
-            app_id=self.app_id,
-            app_key=self.app_key,
-            method=method,
-            uri=uri,
-            query=query_params
-        )
-        auth_headers["Content-Type"] = "application/json"
-        return auth_headers
-    
     async def _call_lanxin_api(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
         """调用蓝心大模型API"""
         try:
-            # 生成请求ID和会话ID
-            request_id = str(uuid.uuid4())
-            session_id = str(uuid.uuid4())
-            
-            # 构造请求参数
-            url_params = {"requestId": request_id}
-            
-            # 构造请求体
-            request_body = {
-                "model": self.text_model,
-                "sessionId": session_id,
-                "systemPrompt": system_prompt,
-                "prompt": user_prompt,
-                "extra": {
+            return await bluelm_client.complete(
+                system_prompt=system_prompt,
+                prompt=user_prompt,
+                extra={
                     "temperature": 0.2,  # 较低的温度确保更稳定的输出
                     "top_p": 0.8,
                     "max_new_tokens": 2000
-                }
-            }
-            
-            # 获取鉴权头部
-            parsed_url = urlparse(self.base_url)
-            uri = parsed_url.path
-            headers = self._get_auth_headers("POST", uri, url_params)
-            
-            # 发送请求
-            url = f"{self.base_url}?{urlencode(url_params)}"
-            response = await self.client.post(
-                url,
-                headers=headers,
-                json=request_body
+                },
+                cache_namespace="disposal_recommendation",
+                priority=GatewayPriority.INTERACTIVE,
+                cache_validator=self._is_valid_response
             )
             
-            response.raise_for_status()
-            result = response.json()
-            
-            # 检查响应状态
-            if result.get("code") != 0:
-                raise Exception(f"API调用失败: {result.get('msg', '未知错误')}")
-            
-            return result["data"]
-            
         except Exception as e:
             app_logger.error(f"蓝心大模型API调用失败: {e}")
             raise
     
     def _parse_recommendation_response(self, content: str) -> Optional[Dict[str, Any]]:
         """解析推荐结果响应"""
-        try:
-            # 尝试直接解析JSON
-            try:
-                recommendation_result = json.loads(content)
-                app_logger.info("推荐结果解析成功 - 直接JSON解析")
-                return recommendation_result
-            except json.JSONDecodeError:
-                pass
-            
-            # 尝试从代码块中提取JSON
-            if "```json" in content:
-                start_marker = "```json"
-                end_marker = "```"
-                start_index = content.find(start_marker)
-                if start_index != -1:
-                    start_index += len(start_marker)
-                    end_index = content.find(end_marker, start_index)
-                    if end_index != -1:
-                        json_str = content[start_index:end_index].strip()
-                        recommendation_result = json.loads(json_str)
-                        app_logger.info("推荐结果解析成功 - 代码块JSON解析")
-                        return recommendation_result
-            
-            # 尝试查找花括号内容
-            first_brace = content.find('{')
-            last_brace = content.rfind('}')
-            if first_brace != -1 and last_brace != -1 and first_brace < last_brace:
-                json_str = content[first_brace:last_brace + 1]
-                recommendation_result = json.loads(json_str)
-                app_logger.info("推荐结果解析成功 - 花括号内容解析")
-                return recommendation_result
-            
-            app_logger.warning("无法解析推荐结果为有效JSON格式")
-            return None
-            
-        except Exception as e:
-            app_logger.error(f"解析推荐结果失败: {e}")
-            return None
+        recommendation_result = extract_json(content)
+        if isinstance(recommendation_result, dict):
+            app_logger.info("推荐结果解析成功")
+            return recommendation_result
+        
+        app_logger.warning("无法解析推荐结果为有效JSON格式")
+        return None
+    
+    def _is_valid_response(self, data: Dict[str, Any]) -> bool:
+        """网关响应可以解析为完整的推荐结果（用于补全缓存写入前的校验）"""
+        recommendations = self._parse_recommendation_response(data.get("content", ""))
+        return bool(recommendations) and self._validate_recommendation_result(recommendations)
     
     def _validate_recommendation_result(self, result: Dict[str, Any]) -> bool:
         """验证推荐结果格式"""
@@ -256,11 +177,8 @@ class DisposalRecommendationAgent:
             }
     
     async def close(self):
-        """关闭Agent相关资源"""
-        try:
-            await self.client.aclose()
-        except Exception as e:
-            app_logger.warning(f"关闭Agent资源时出现警告: {e}")
+        """关闭Agent相关资源（蓝心网关连接池为进程共享，由应用生命周期统一关闭）"""
+        pass
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
@@ -0,0 +1,23 @@
+"""
+合并调用Agent模块
+
+把分析完成后的多个小任务合并为一次LLM调用
+"""
+
+from .agent import (
+    FusedTasksAgent,
+    fused_results_scope,
+    get_fused_result,
+    RECYCLING_TYPE_TASK,
+    BILIBILI_KEYWORDS_TASK,
+    SECONDHAND_KEYWORDS_TASK
+)
+
+__all__ = [
+    "FusedTasksAgent",
+    "fused_results_scope",
+    "get_fused_result",
+    "RECYCLING_TYPE_TASK",
+    "BILIBILI_KEYWORDS_TASK",
+    "SECONDHAND_KEYWORDS_TASK"
+]
@@ -0,0 +1,163 @@
+"""
+合并调用Agent
+
+分析完成后，回收类型判断、B站搜索关键词提取、二手平台搜索关键词提取
+都是输入相同、输出很短的小任务。本Agent把它们合并为一次蓝心大模型调用，
+再把返回的JSON按任务拆分成各Agent原有的中间结果格式。
+
+拆分结果通过上下文变量下发给各子Agent：子Agent取到有效结果时跳过自己的调用，
+取不到（未启用、调用失败或该段不合法）时按原逻辑单独调用，行为与合并前一致。
+"""
+
+import copy
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, Optional
+
+from app.core.logger import app_logger
+from app.services.llm.bluelm_client import bluelm_client, has_json_content
+from app.prompts.fused_tasks_prompts import FusedTasksPrompts
+from app.utils.json_stream import extract_json
+
+
+# 任务名称
+RECYCLING_TYPE_TASK = "recycling_type"
+BILIBILI_KEYWORDS_TASK = "bilibili_keywords"
+SECONDHAND_KEYWORDS_TASK = "secondhand_keywords"
+
+# 当前请求的合并调用结果，由ProcessingMasterAgent在协调器阶段设置
+fused_task_results: ContextVar[Optional[Dict[str, Any]]] = ContextVar("fused_task_results", default=None)
+
+
+@contextmanager
+def fused_results_scope(results: Optional[Dict[str, Any]]) -> Iterator[None]:
+    """在当前上下文中设置合并调用结果，只能在普通协程中使用"""
+    token = fused_task_results.set(results)
+    try:
+        yield
+    finally:
+        fused_task_results.reset(token)
+
+
+def get_fused_result(task: str) -> Optional[Any]:
+    """获取当前上下文中某个任务的合并调用结果，没有时返回None"""
+    results = fused_task_results.get()
+    if not results or results.get(task) is None:
+        return None
+    # 各子Agent可能修改结果，返回副本
+    return copy.deepcopy(results[task])
+
+
+class FusedTasksAgent:
+    """合并调用Agent - 一次调用完成分析后的多个小任务"""
+
+    async def _call_lanxin_api(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """调用蓝心大模型API"""
+        try:
+            return await bluelm_client.complete(
+                system_prompt=system_prompt,
+                prompt=user_prompt,
+                extra={
+                    "temperature": 0.1,
+                    "top_p": 0.7,
+                    "max_new_tokens": 800
+                },
+                timeout_profile="classification",
+                cache_namespace="fused_tasks",
+                cache_validator=has_json_content
+            )
+
+        except Exception as e:
+            app_logger.error(f"蓝心大模型API调用失败: {e}")
+            raise
+
+    @staticmethod
+    def _clean_keywords(value: Any) -> list:
+        """清洗关键词列表，去掉空值和非字符串"""
+        if not isinstance(value, list):
+            return []
+        return [item.strip() for item in value if isinstance(item, str) and item.strip()]
+
+    def _split_recycling_type(self, data: Dict[str, Any]) -> Optional[str]:
+        """拆分回收类型"""
+        recycling_type = data.get("recycling_type")
+        if recycling_type in FusedTasksPrompts.RECYCLING_TYPES:
+            return recycling_type
+        return None
+
+    def _split_bilibili_keywords(self, data: Dict[str, Any], content: str) -> Optional[Dict[str, Any]]:
+        """拆分B站搜索关键词，格式与BilibiliSearchAgent的Function Calling结果一致"""
+        section = data.get("bilibili_search")
+        if not isinstance(section, dict):
+            return None
+        keywords = self._clean_keywords(section.get("keywords"))
+        if not keywords:
+            return None
+        return {
+            "success": True,
+            "keywords": keywords,
+            "search_intent": section.get("search_intent", "") or "",
+            "source": "fused_call",
+            "raw_response": content
+        }
+
+    def _split_secondhand_keywords(self, data: Dict[str, Any], content: str) -> Optional[Dict[str, Any]]:
+        """拆分二手平台搜索关键词，格式与SecondhandSearchAgent的Function Calling结果一致"""
+        section = data.get("secondhand_search")
+        if not isinstance(section, dict):
+            return None
+        keywords = self._clean_keywords(section.get("keywords"))
+        if not keywords:
+            return None
+
+        suggestions = section.get("platform_suggestions")
+        suggestions = suggestions if isinstance(suggestions, dict) else {}
+        platform_suggestions = {
+            platform: self._clean_keywords(suggestions.get(platform)) or list(keywords)
+            for platform in ("xianyu", "aihuishou")
+        }
+        return {
+            "success": True,
+            "keywords": keywords,
+            "search_intent": section.get("search_intent", "") or "",
+            "platform_suggestions": platform_suggestions,
+            "source": "fused_call",
+            "raw_response": content
+        }
+
+    async def run(self, analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+        """执行合并调用
+
+        Args:
+            analysis_result: 物品分析结果
+
+        Returns:
+            Dict[str, Any]: 按任务名称拆分的结果，只包含解析成功的任务；调用失败时返回空字典
+        """
+        try:
+            app_logger.info("开始合并调用：回收类型、B站关键词、二手平台关键词")
+
+            system_prompt = FusedTasksPrompts.get_system_prompt()
+            user_prompt = FusedTasksPrompts.get_user_prompt(analysis_result)
+
+            ai_response = await self._call_lanxin_api(system_prompt, user_prompt)
+            content = ai_response.get("content", "")
+
+            data = extract_json(content)
+            if not isinstance(data, dict):
+                app_logger.warning("合并调用响应无法解析，各Agent将单独调用")
+                return {}
+
+            results = {
+                RECYCLING_TYPE_TASK: self._split_recycling_type(data),
+                BILIBILI_KEYWORDS_TASK: self._split_bilibili_keywords(data, content),
+                SECONDHAND_KEYWORDS_TASK: self._split_secondhand_keywords(data, content)
+            }
+            results = {task: result for task, result in results.items() if result is not None}
+
+            app_logger.info(f"合并调用完成，有效任务: {list(results.keys())}")
+            return results
+
+        except Exception as e:
+            app_logger.error(f"合并调用失败，各Agent将单独调用: {e}")
+            return {}
@@ -4,8 +4,9 @@
 集成分析服务和四大处理Agent，为用户提供完整的闲置物品处置解决方案
 """
 
-from .agent import ProcessingMasterAgent
+from .agent import ProcessingMasterAgent, processing_master_agent
 
 __all__ = [
-    "ProcessingMasterAgent"
+    "ProcessingMasterAgent",
+    "processing_master_agent"
 ] 
\ No newline at end of file
@@ -7,31 +7,44 @@
 
 import asyncio
 import time
-from typing import Dict, Any, Optional, Callable, AsyncGenerator
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncGenerator, Tuple
 from pathlib import Path
 
+from app.core.config import settings
 from app.core.logger import app_logger
+from app.services.llm.resilience import TimeBudgetExceededError, deadline_scope
 from app.services.llm.lanxin_service import LanxinService
+from app.services.solution_cache import build_item_fingerprint, solution_cache
 from app.utils.analysis_merger import AnalysisMerger
+from app.utils.payload_size import estimate_json_size
+from app.utils.stage_graph import Stage, StageGraph, StageOutcome, StageStatus
 
 # 导入四大Agent
 from app.agents.disposal_recommendation.agent import DisposalRecommendationAgent
 from app.agents.creative_coordinator.agent import CreativeCoordinatorAgent
 from app.agents.recycling_coordinator.agent import RecyclingCoordinatorAgent
 from app.agents.secondhand_coordinator.agent import SecondhandTradingAgent
+from app.agents.fused_tasks.agent import FusedTasksAgent, fused_results_scope
 
 from app.models.processing_master_models import (
     ProcessingMasterRequest,
     ProcessingMasterResponse,
     ProcessingMasterDataConverter,
     ProcessingStep,
-    ProcessingStepStatus
+    ProcessingStepStatus,
+    DisposalSolution,
+    CreativeSolution,
+    RecyclingSolution,
+    SecondhandSolution
 )
 
 
 class ProcessingMasterAgent:
     """总处理协调器Agent - 统一协调所有处理流程"""
     
+    # 这些分析字段全部闭合后即可提前启动合并调用，无需等待description等长字段
+    EARLY_START_FIELDS = ("category", "sub_category", "condition", "keywords")
+    
     def __init__(self):
         # 分析服务
         self._lanxin_service = None
@@ -42,6 +55,9 @@ class ProcessingMasterAgent:
         self._recycling_agent = None
         self._secondhand_agent = None
         
+        # 合并调用Agent
+        self._fused_agent = None
+        
         self._is_initialized = False
     
     async def _ensure_initialized(self):
@@ -54,10 +70,18 @@ class ProcessingMasterAgent:
             self._creative_agent = CreativeCoordinatorAgent()
             self._recycling_agent = RecyclingCoordinatorAgent()
             self._secondhand_agent = SecondhandTradingAgent()
+            self._fused_agent = FusedTasksAgent()
             
             self._is_initialized = True
             app_logger.info("总处理协调器Agent初始化完成")
     
+    async def initialize(self):
+        """在应用启动时创建子Agent，之后各连接共享同一实例
+        
+        Agent本身不保存请求状态，每个请求的状态都在process_complete_solution的局部变量中
+        """
+        await self._ensure_initialized()
+    
     async def process_complete_solution(
         self,
         request: ProcessingMasterRequest,
@@ -73,6 +97,10 @@ class ProcessingMasterAgent:
             ProcessingStep: 处理步骤和结果
         """
         start_time = time.time()
+        # 本次处理的截止时间，下发给各Agent的蓝心网关调用和外部HTTP调用
+        deadline = time.monotonic() + self._time_budget(request)
+        # 分析阶段提前启动的合并调用
+        early_fused_task: Optional[asyncio.Task] = None
         
         try:
             await self._ensure_initialized()
@@ -89,18 +117,20 @@ class ProcessingMasterAgent:
                 metadata=None,
                 timestamp=time.time()
             )
-            yield step.copy(deep=True)
+            yield step.snapshot()
             
             validation_result = self._validate_request(request)
             if not validation_result["valid"]:
                 step.status = ProcessingStepStatus.FAILED
                 step.error = validation_result["error"]
-                yield step.copy(deep=True)
+                step.timestamp = time.time()
+                yield step.snapshot()
                 return
             
             step.status = ProcessingStepStatus.COMPLETED
             step.result = {"validation": "passed"}
-            yield step.copy(deep=True)
+            step.timestamp = time.time()
+            yield step.snapshot()
             
             # 步骤2: 内容分析
             step = ProcessingStep(
@@ -113,13 +143,39 @@ class ProcessingMasterAgent:
                 metadata=None,
                 timestamp=time.time()
             )
-            yield step.copy(deep=True)
+            yield step.snapshot()
             
-            analysis_result = await self._analyze_content(request)
+            # 分析输出流式解析：字段一闭合就推送给进度回调，关键字段齐全后提前启动合并调用
+            analysis_step = step
+            early_fields: Dict[str, Any] = {}
+            
+            async def _on_analysis_field(name: str, value: Any) -> None:
+                nonlocal early_fused_task
+                early_fields[name] = value
+                if progress_callback is not None:
+                    self._forward_partial_field(analysis_step, name, value, progress_callback)
+                if (
+                    early_fused_task is None
+                    and settings.llm_fused_tasks_enabled
+                    and all(field in early_fields for field in self.EARLY_START_FIELDS)
+                ):
+                    app_logger.info("分析关键字段已就绪，提前启动合并调用")
+                    early_fused_task = asyncio.create_task(self._run_fused_tasks(dict(early_fields)))
+            
+            on_field = _on_analysis_field if settings.analysis_streaming_enabled else None
+            try:
+                analysis_result = await self._within_budget(
+                    deadline, lambda: self._analyze_content(request, on_field=on_field)
+                )
+            except TimeBudgetExceededError as e:
+                analysis_result = {"success": False, "error": str(e)}
             if not analysis_result.get("success"):
+                if early_fused_task is not None:
+                    early_fused_task.cancel()
                 step.status = ProcessingStepStatus.FAILED
                 step.error = analysis_result.get("error", "分析失败")
-                yield step.copy(deep=True)
+                step.timestamp = time.time()
+                yield step.snapshot()
                 return
             
             step.status = ProcessingStepStatus.COMPLETED
@@ -128,7 +184,8 @@ class ProcessingMasterAgent:
                 "analysis_source": analysis_result.get("_merge_metadata", {}).get("source", "unknown"),
                 "has_conflicts": analysis_result.get("_merge_metadata", {}).get("has_conflicts", False)
             }
-            yield step.copy(deep=True)
+            step.timestamp = time.time()
+            yield step.snapshot()
             
             # 步骤3: 处置路径推荐
             step = ProcessingStep(
@@ -141,190 +198,150 @@ class ProcessingMasterAgent:
                 metadata=None,
                 timestamp=time.time()
             )
-            yield step.copy(deep=True)
+            yield step.snapshot()
             
             # 确保Agent已初始化
             await self._ensure_initialized()
             
-            disposal_result = await self._disposal_agent.recommend_from_analysis(analysis_result)
-            step.status = ProcessingStepStatus.COMPLETED if disposal_result.success else ProcessingStepStatus.FAILED
-            step.result = disposal_result.to_dict()
-            if disposal_result.success and disposal_result.recommendations:
-                highest_rec = disposal_result.recommendations.get_highest_recommendation()
-                step.metadata = {
-                    "highest_recommendation": highest_rec[0],
-                    "highest_score": highest_rec[1].recommendation_score
-                }
-            yield step.copy(deep=True)
-            
-            # 步骤4-6: 并行调用三大协调器Agent
-            if disposal_result.success:
-                # 获取用户位置（如果有）
-                user_location = request.user_location
-                if user_location:
-                    location_str = f"{user_location['lon']},{user_location['lat']}"
-                else:
-                    location_str = None
-                
-                # 创建三个并行任务
-                creative_step = ProcessingStep(
-                    step_name="creative_coordination",
-                    step_title="正在调用创意改造Agent",
-                    description="生成改造方案和搜索相关DIY视频教程",
-                    status=ProcessingStepStatus.RUNNING,
-                    result=None,
-                    error=None,
-                    metadata=None,
-                    timestamp=time.time()
-                )
-                
-                recycling_step = ProcessingStep(
-                    step_name="recycling_coordination", 
-                    step_title="正在调用回收捐赠Agent",
-                    description=f"推荐附近回收点和回收平台{f'（用户位置: {user_location}）' if user_location else ''}",
-                    status=ProcessingStepStatus.RUNNING,
-                    result=None,
-                    error=None,
-                    metadata=None,
-                    timestamp=time.time()
-                )
-                
-                secondhand_step = ProcessingStep(
-                    step_name="secondhand_coordination",
-                    step_title="正在调用二手交易Agent", 
-                    description="搜索二手平台价格和生成交易文案",
-                    status=ProcessingStepStatus.RUNNING,
-                    result=None,
-                    error=None,
-                    metadata=None,
-                    timestamp=time.time()
-                )
-                
-                # 返回开始状态
-                yield creative_step.copy(deep=True)
-                yield recycling_step.copy(deep=True)
-                yield secondhand_step.copy(deep=True)
-                
-                # 并行执行三个Agent
-                tasks = []
-                
-                # 创意改造任务
-                tasks.append(self._creative_agent.generate_complete_solution(analysis_result))
-                
-                # 回收捐赠任务（如果有位置信息）
-                if location_str:
-                    tasks.append(self._recycling_agent.coordinate_recycling_donation(
-                        analysis_result=analysis_result,
-                        user_location=location_str
-                    ))
-                else:
-                    tasks.append(self._create_no_location_result())
-                
-                # 二手交易任务
-                tasks.append(self._secondhand_agent.coordinate_trading(analysis_result))
-                
-                # 等待所有任务完成
-                creative_result, recycling_result, secondhand_result = await asyncio.gather(
-                    *tasks, return_exceptions=True
+            # 获取用户位置（如果有）
+            user_location = request.user_location
+            
+            # 三大协调器步骤
+            creative_step, recycling_step, secondhand_step = self._create_coordinator_steps(user_location)
+            coordinator_steps = [creative_step, recycling_step, secondhand_step]
+            
+            # 整体方案缓存：同类物品直接返回缓存的方案，不再调用蓝心大模型、B站和二手平台
+            fingerprint = build_item_fingerprint(analysis_result)
+            if fingerprint and solution_cache.should_wait(fingerprint):
+                # 同一批量中的同款物品方案正在计算时先等待其写入缓存，最多等待剩余预算的一部分
+                description = step.description
+                step.description = "同款物品的方案正在计算，等待其结果"
+                yield step.snapshot()
+                await solution_cache.wait_inflight(
+                    fingerprint,
+                    timeout=max(0.0, deadline - time.monotonic()) * settings.solution_cache_inflight_wait_ratio
                 )
-                
-                # 处理创意改造结果
-                if isinstance(creative_result, Exception):
-                    creative_step.status = ProcessingStepStatus.FAILED
-                    creative_step.error = str(creative_result)
-                    creative_step.result = None
-                else:
-                    creative_step.status = ProcessingStepStatus.COMPLETED
-                    creative_step.result = creative_result.to_dict()
-                    if hasattr(creative_result, 'renovation_plan') and creative_result.renovation_plan:
-                        creative_step.metadata = {
-                            "project_title": getattr(creative_result.renovation_plan.summary, 'title', 'Unknown'),
-                            "difficulty": getattr(creative_result.renovation_plan.summary, 'difficulty', 'Unknown'),
-                            "video_count": len(getattr(creative_result, 'videos', []))
-                        }
-                yield creative_step.copy(deep=True)
-                
-                # 处理回收捐赠结果
-                if isinstance(recycling_result, Exception):
-                    recycling_step.status = ProcessingStepStatus.FAILED
-                    recycling_step.error = str(recycling_result)
-                    recycling_step.result = None
-                else:
-                    recycling_step.status = ProcessingStepStatus.COMPLETED
-                    recycling_step.result = recycling_result.to_dict() if hasattr(recycling_result, 'to_dict') else recycling_result
-                    if hasattr(recycling_result, 'has_location_recommendations') and callable(getattr(recycling_result, 'has_location_recommendations')) and recycling_result.has_location_recommendations():
-                        recycling_step.metadata = {
-                            "location_count": len(getattr(recycling_result.location_recommendation, 'locations', [])),
-                            "recycling_type": getattr(recycling_result, 'get_recycling_type', lambda: 'Unknown')()
-                        }
-                yield recycling_step.copy(deep=True)
-                
-                # 处理二手交易结果
-                if isinstance(secondhand_result, Exception):
-                    secondhand_step.status = ProcessingStepStatus.FAILED
-                    secondhand_step.error = str(secondhand_result)
-                    secondhand_step.result = None
-                else:
-                    secondhand_step.status = ProcessingStepStatus.COMPLETED
-                    secondhand_step.result = secondhand_result.to_dict()
-                    secondhand_step.metadata = {
-                        "total_products": getattr(secondhand_result, 'get_total_products', lambda: 0)(),
-                        "has_content": getattr(secondhand_result, 'has_content_results', lambda: False)()
-                    }
-                yield secondhand_step.copy(deep=True)
-                
-                # 步骤7: 结果整合
-                step = ProcessingStep(
-                    step_name="result_integration",
-                    step_title="结果整合",
-                    description="整合所有Agent的处理结果",
-                    status=ProcessingStepStatus.RUNNING,
-                    result=None,
-                    error=None,
-                    metadata=None,
-                    timestamp=time.time()
+                step.description = description
+            cached_item = await solution_cache.get_item(fingerprint) if fingerprint else None
+            if cached_item is not None:
+                app_logger.info("命中整体方案缓存，跳过处置推荐与三大协调器")
+                if early_fused_task is not None and not early_fused_task.done():
+                    early_fused_task.cancel()
+                async for cached_step in self._serve_cached_solution(
+                    request, analysis_result, fingerprint, cached_item, step, coordinator_steps, start_time, deadline
+                ):
+                    yield cached_step
+                return
+            
+            # 登记本次计算，同款物品的后续请求等待本次结果写入缓存
+            owns_fingerprint = bool(fingerprint) and solution_cache.begin(fingerprint)
+            try:
+                # 步骤3-6按阶段依赖图执行，任务在截止时间上下文中创建
+                speculative = settings.processing_speculative_fanout
+                graph = self._build_stage_graph(
+                    request, analysis_result, early_fused_task, creative_step, progress_callback, speculative, deadline
                 )
-                yield step.copy(deep=True)
-                
-                # 整合最终结果（使用新的数据模型）
-                processing_time = time.time() - start_time
+                with deadline_scope(deadline):
+                    graph.start()
                 
                 try:
-                    final_response = ProcessingMasterDataConverter.create_response(
-                        success=True,
-                        analysis_result=analysis_result.copy(),  # 使用副本避免修改原始数据
-                        disposal_recommendation=disposal_result if disposal_result.success else None,
-                        creative_coordination=creative_result if not isinstance(creative_result, Exception) else None,
-                        recycling_coordination=recycling_result if not isinstance(recycling_result, Exception) else None,
-                        secondhand_coordination=secondhand_result if not isinstance(secondhand_result, Exception) else None,
-                        processing_time_seconds=processing_time
-                    )
+                    # 投机启动时三大协调器已与处置推荐同时运行
+                    if speculative:
+                        for coordinator_step in coordinator_steps:
+                            yield coordinator_step.snapshot()
+                    
+                    disposal_outcome = await graph.wait("disposal_recommendation")
+                    disposal_timed_out = disposal_outcome.status == StageStatus.TIMED_OUT
+                    if disposal_outcome.result is None and not disposal_timed_out:
+                        raise disposal_outcome.exception or Exception(disposal_outcome.error)
+                    disposal_result = disposal_outcome.result
+                    
+                    if disposal_timed_out:
+                        # 超出时间预算：协调器同时被取消，继续整合部分结果
+                        step.status = ProcessingStepStatus.FAILED
+                        step.error = disposal_outcome.error
+                    else:
+                        step.status = ProcessingStepStatus.COMPLETED if disposal_result.success else ProcessingStepStatus.FAILED
+                        step.result = disposal_result.to_dict()
+                        if disposal_result.success and disposal_result.recommendations:
+                            highest_rec = disposal_result.recommendations.get_highest_recommendation()
+                            step.metadata = {
+                                "highest_recommendation": highest_rec[0],
+                                "highest_score": highest_rec[1].recommendation_score
+                            }
+                    step.timestamp = time.time()
+                    yield step.snapshot()
                     
-                    final_dict = final_response.to_dict()
-                    app_logger.info(f"最终结果数据大小: {len(str(final_dict))} 字符")
-                    app_logger.debug(f"最终结果结构: {list(final_dict.keys())}")
+                    if not disposal_timed_out and not disposal_result.success:
+                        # 处置推荐失败，已投机启动的协调器被取消
+                        if speculative:
+                            for coordinator_step in coordinator_steps:
+                                coordinator_step.status = ProcessingStepStatus.FAILED
+                                coordinator_step.error = "处置路径推荐失败，已取消"
+                                coordinator_step.timestamp = time.time()
+                                yield coordinator_step.snapshot()
+                        return
                     
-                    step.status = ProcessingStepStatus.COMPLETED
-                    step.result = final_dict
-                    step.metadata = {
-                        "total_processing_time": processing_time,
-                        "successful_agents": len(final_response.get_successful_solutions()),
-                        "primary_recommendation": final_response.get_primary_recommendation(),
-                        "result_size": len(str(final_dict))
-                    }
+                    if not speculative:
+                        for coordinator_step in coordinator_steps:
+                            yield coordinator_step.snapshot()
                     
-                except Exception as e:
-                    app_logger.error(f"创建最终响应失败: {e}")
-                    step.status = ProcessingStepStatus.FAILED
-                    step.error = f"结果整合失败: {str(e)}"
-                    step.result = None
+                    # 三大协调器按完成顺序逐个产出，快的结果不必等待慢的
+                    coordinator_results: Dict[str, Any] = {}
+                    steps_by_name = {coordinator_step.step_name: coordinator_step for coordinator_step in coordinator_steps}
+                    async for outcome in graph.as_completed(list(steps_by_name)):
+                        coordinator_step = steps_by_name[outcome.name]
+                        coordinator_result = self._outcome_value(outcome)
+                        coordinator_results[outcome.name] = coordinator_result
+                        self._apply_coordinator_result(coordinator_step, coordinator_result)
+                        yield coordinator_step.snapshot()
+                finally:
+                    await graph.aclose()
                 
-                yield step.copy(deep=True)
+                timed_out_sections = [
+                    name for name in graph.timed_out_stages
+                    if name == "disposal_recommendation" or name in coordinator_results
+                ]
+                creative_result = coordinator_results["creative_coordination"]
+                recycling_result = coordinator_results["recycling_coordination"]
+                secondhand_result = coordinator_results["secondhand_coordination"]
                 
-                app_logger.info(f"完整解决方案处理完成，总耗时: {processing_time:.2f}秒")
+                # 成功的方案写入整体方案缓存
+                if fingerprint:
+                    await self._store_solution(
+                        request, fingerprint, step, disposal_result, coordinator_steps, coordinator_results
+                    )
+            finally:
+                if owns_fingerprint:
+                    solution_cache.finish(fingerprint)
+            
+            # 步骤7: 结果整合
+            step = self._create_integration_step()
+            yield step.snapshot()
+            
+            # 整合最终结果（使用新的数据模型）
+            processing_time = self._integrate(
+                step,
+                lambda processing_time: ProcessingMasterDataConverter.create_response(
+                    success=True,
+                    analysis_result=analysis_result.copy(),  # 使用副本避免修改原始数据
+                    disposal_recommendation=disposal_result if disposal_result and disposal_result.success else None,
+                    creative_coordination=creative_result if not isinstance(creative_result, Exception) else None,
+                    recycling_coordination=recycling_result if not isinstance(recycling_result, Exception) else None,
+                    secondhand_coordination=secondhand_result if not isinstance(secondhand_result, Exception) else None,
+                    processing_time_seconds=processing_time,
+                    timed_out_sections=timed_out_sections
+                ),
+                start_time
+            )
+            yield step.snapshot()
+            
+            app_logger.info(f"完整解决方案处理完成，总耗时: {processing_time:.2f}秒")
             
         except Exception as e:
             app_logger.error(f"处理完整解决方案失败: {e}")
+            if early_fused_task is not None and not early_fused_task.done():
+                early_fused_task.cancel()
             error_step = ProcessingStep(
                 step_name="system_error",
                 step_title="系统错误",
@@ -335,10 +352,490 @@ class ProcessingMasterAgent:
                 metadata=None,
                 timestamp=time.time()
             )
-            yield error_step.copy(deep=True)
+            yield error_step.snapshot()
+    
+    @staticmethod
+    def _create_coordinator_steps(
+        user_location: Optional[Dict[str, float]]
+    ) -> Tuple[ProcessingStep, ProcessingStep, ProcessingStep]:
+        """创建三大协调器步骤（创意改造、回收捐赠、二手交易）"""
+        creative_step = ProcessingStep(
+            step_name="creative_coordination",
+            step_title="正在调用创意改造Agent",
+            description="生成改造方案和搜索相关DIY视频教程",
+            status=ProcessingStepStatus.RUNNING,
+            result=None,
+            error=None,
+            metadata=None,
+            timestamp=time.time()
+        )
+        
+        recycling_step = ProcessingStep(
+            step_name="recycling_coordination", 
+            step_title="正在调用回收捐赠Agent",
+            description=f"推荐附近回收点和回收平台{f'（用户位置: {user_location}）' if user_location else ''}",
+            status=ProcessingStepStatus.RUNNING,
+            result=None,
+            error=None,
+            metadata=None,
+            timestamp=time.time()
+        )
+        
+        secondhand_step = ProcessingStep(
+            step_name="secondhand_coordination",
+            step_title="正在调用二手交易Agent", 
+            description="搜索二手平台价格和生成交易文案",
+            status=ProcessingStepStatus.RUNNING,
+            result=None,
+            error=None,
+            metadata=None,
+            timestamp=time.time()
+        )
+        return creative_step, recycling_step, secondhand_step
+    
+    @staticmethod
+    def _create_integration_step() -> ProcessingStep:
+        """创建结果整合步骤"""
+        return ProcessingStep(
+            step_name="result_integration",
+            step_title="结果整合",
+            description="整合所有Agent的处理结果",
+            status=ProcessingStepStatus.RUNNING,
+            result=None,
+            error=None,
+            metadata=None,
+            timestamp=time.time()
+        )
+    
+    def _integrate(
+        self,
+        step: ProcessingStep,
+        build_response: Callable[[float], ProcessingMasterResponse],
+        start_time: float
+    ) -> float:
+        """整合最终结果并写入结果整合步骤，返回总耗时"""
+        processing_time = time.time() - start_time
+        
+        try:
+            final_response = build_response(processing_time)
+            
+            final_dict = final_response.to_dict()
+            result_size = estimate_json_size(final_dict)
+            app_logger.info(f"最终结果数据大小: 约{result_size} 字符")
+            app_logger.debug(f"最终结果结构: {list(final_dict.keys())}")
+            
+            step.status = ProcessingStepStatus.COMPLETED
+            step.result = final_dict
+            step.metadata = {
+                "total_processing_time": processing_time,
+                "successful_agents": len(final_response.get_successful_solutions()),
+                "primary_recommendation": final_response.get_primary_recommendation(),
+                "timed_out_sections": final_response.timed_out_sections or [],
+                "cache_hit": final_response.processing_metadata.cache_hit,
+                "result_size": result_size
+            }
+            
+        except Exception as e:
+            app_logger.error(f"创建最终响应失败: {e}")
+            step.status = ProcessingStepStatus.FAILED
+            step.error = f"结果整合失败: {str(e)}"
+            step.result = None
+        
+        step.timestamp = time.time()
+        return processing_time
+    
+    @staticmethod
+    def _succeeded(result: Any) -> bool:
+        """协调器结果是否成功（异常、无位置信息等字典结果视为不成功）"""
+        return not isinstance(result, Exception) and hasattr(result, "to_dict") and bool(getattr(result, "success", False))
+    
+    @staticmethod
+    def _cache_section(step: ProcessingStep, solution: Any) -> Dict[str, Any]:
+        """缓存条目：步骤结果、步骤元数据和整合用的方案"""
+        return {
+            "result": step.result,
+            "metadata": step.metadata,
+            "solution": solution.dict() if solution is not None else None
+        }
+    
+    async def _store_solution(
+        self,
+        request: ProcessingMasterRequest,
+        fingerprint: str,
+        disposal_step: ProcessingStep,
+        disposal_result: Any,
+        coordinator_steps: List[ProcessingStep],
+        coordinator_results: Dict[str, Any]
+    ) -> None:
+        """把成功的方案写入整体方案缓存，有环节失败或超时时不缓存对应部分"""
+        try:
+            converter = ProcessingMasterDataConverter
+            steps = {coordinator_step.step_name: coordinator_step for coordinator_step in coordinator_steps}
+            creative_result = coordinator_results.get("creative_coordination")
+            secondhand_result = coordinator_results.get("secondhand_coordination")
+            
+            if all(self._succeeded(result) for result in (disposal_result, creative_result, secondhand_result)):
+                await solution_cache.set_item(fingerprint, {
+                    "disposal_recommendation": self._cache_section(
+                        disposal_step, converter.to_disposal_solution(disposal_result)
+                    ),
+                    "creative_coordination": self._cache_section(
+                        steps["creative_coordination"], converter.to_creative_solution(creative_result)
+                    ),
+                    "secondhand_coordination": self._cache_section(
+                        steps["secondhand_coordination"], converter.to_secondhand_solution(secondhand_result)
+                    )
+                })
+            
+            recycling_result = coordinator_results.get("recycling_coordination")
+            tile = solution_cache.geo_tile(request.user_location)
+            if tile and self._succeeded(recycling_result):
+                await solution_cache.set_location(fingerprint, tile, self._cache_section(
+                    steps["recycling_coordination"], converter.to_recycling_solution(recycling_result)
+                ))
+        except Exception as e:
+            app_logger.warning(f"写入整体方案缓存失败: {e}")
+    
+    @staticmethod
+    def _apply_cached_section(step: ProcessingStep, section: Dict[str, Any], analysis_result: Dict[str, Any]) -> None:
+        """把缓存的方案写入步骤，结果中内嵌的分析结果替换为本次的分析结果"""
+        result = section.get("result")
+        if isinstance(result, dict) and "analysis_result" in result:
+            result = {**result, "analysis_result": analysis_result}
+        step.status = ProcessingStepStatus.COMPLETED
+        step.result = result
+        step.error = None
+        step.metadata = {**(section.get("metadata") or {}), "cache_hit": True}
+        step.timestamp = time.time()
+    
+    async def _resolve_recycling(
+        self,
+        request: ProcessingMasterRequest,
+        analysis_result: Dict[str, Any],
+        fingerprint: str,
+        recycling_step: ProcessingStep,
+        deadline: float
+    ) -> Optional[RecyclingSolution]:
+        """物品方案命中缓存时单独处理回收方案：优先取所在地理网格的缓存，未命中时只调用回收协调器"""
+        user_location = request.user_location
+        tile = solution_cache.geo_tile(user_location)
+        section = await solution_cache.get_location(fingerprint, tile) if tile else None
+        if section is not None:
+            self._apply_cached_section(recycling_step, section, analysis_result)
+            solution = section.get("solution")
+            return RecyclingSolution(**solution) if solution else None
+        
+        if not user_location:
+            result: Any = await self._create_no_location_result()
+        else:
+            location_str = f"{user_location['lon']},{user_location['lat']}"
+            try:
+                result = await self._within_budget(
+                    deadline,
+                    lambda: self._recycling_agent.coordinate_recycling_donation(
+                        analysis_result=analysis_result,
+                        user_location=location_str
+                    )
+                )
+            except Exception as e:
+                app_logger.error(f"回收协调失败: {e}")
+                result = e
+        
+        self._apply_coordinator_result(recycling_step, result)
+        if not self._succeeded(result):
+            return None
+        solution = ProcessingMasterDataConverter.to_recycling_solution(result)
+        if tile:
+            await solution_cache.set_location(fingerprint, tile, self._cache_section(recycling_step, solution))
+        return solution
+    
+    async def _serve_cached_solution(
+        self,
+        request: ProcessingMasterRequest,
+        analysis_result: Dict[str, Any],
+        fingerprint: str,
+        cached_item: Dict[str, Any],
+        disposal_step: ProcessingStep,
+        coordinator_steps: List[ProcessingStep],
+        start_time: float,
+        deadline: float
+    ) -> AsyncGenerator[ProcessingStep, None]:
+        """整体方案缓存命中：逐个产出缓存的步骤，回收方案按位置单独处理后整合"""
+        creative_step, recycling_step, secondhand_step = coordinator_steps
+        
+        for cached_step in (disposal_step, creative_step, secondhand_step):
+            self._apply_cached_section(cached_step, cached_item[cached_step.step_name], analysis_result)
+            yield cached_step.snapshot()
+        
+        yield recycling_step.snapshot()
+        recycling_solution = await self._resolve_recycling(
+            request, analysis_result, fingerprint, recycling_step, deadline
+        )
+        yield recycling_step.snapshot()
+        
+        step = self._create_integration_step()
+        yield step.snapshot()
+        
+        def _solution(model: Any, name: str) -> Any:
+            data = cached_item[name].get("solution")
+            return model(**data) if data else None
+        
+        processing_time = self._integrate(
+            step,
+            lambda processing_time: ProcessingMasterDataConverter.assemble_response(
+                success=True,
+                analysis_result=analysis_result.copy(),
+                disposal_solution=_solution(DisposalSolution, "disposal_recommendation"),
+                creative_solution=_solution(CreativeSolution, "creative_coordination"),
+                recycling_solution=recycling_solution,
+                secondhand_solution=_solution(SecondhandSolution, "secondhand_coordination"),
+                processing_time_seconds=processing_time,
+                cache_hit=True
+            ),
+            start_time
+        )
+        yield step.snapshot()
+        
+        app_logger.info(f"整体方案缓存命中，总耗时: {processing_time:.2f}秒")
+    
+    @staticmethod
+    def _time_budget(request: ProcessingMasterRequest) -> float:
+        """本次请求的时间预算（秒），请求指定的预算不超过服务端配置的上限"""
+        if request.time_budget_seconds:
+            return min(request.time_budget_seconds, settings.processing_time_budget)
+        return settings.processing_time_budget
+    
+    async def _within_budget(self, deadline: float, start: Callable[[], Awaitable[Any]]) -> Any:
+        """在请求时间预算内执行阶段
+        
+        截止时间通过上下文变量传给蓝心网关客户端和外部HTTP服务，阶段内创建的子任务会继承该上下文，
+        调用据此收紧超时并在预算用完时直接失败；到期仍未完成时取消阶段并抛出TimeBudgetExceededError。
+        start必须在此处调用以便子任务继承上下文
+        """
+        with deadline_scope(deadline):
+            try:
+                return await asyncio.wait_for(start(), timeout=max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise TimeBudgetExceededError("超出请求时间预算")
+    
+    async def _with_fused_results(
+        self,
+        fused_results: Optional[Dict[str, Any]],
+        start: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """把合并调用的拆分结果通过上下文变量下发给子Agent后执行"""
+        with fused_results_scope(fused_results):
+            return await start()
+    
+    async def _run_fused_tasks(self, analysis_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """执行合并调用，未启用时返回None，各子Agent按原逻辑单独调用"""
+        if not settings.llm_fused_tasks_enabled:
+            return None
+        return await self._fused_agent.run(analysis_result)
+    
+    async def _run_fused_stage(
+        self,
+        analysis_result: Dict[str, Any],
+        early_task: Optional[asyncio.Task]
+    ) -> Optional[Dict[str, Any]]:
+        """合并调用阶段：优先使用分析阶段提前启动的任务，失败时返回None不阻塞下游"""
+        try:
+            if early_task is not None:
+                return await early_task
+            return await self._run_fused_tasks(analysis_result)
+        except Exception as e:
+            app_logger.warning(f"合并调用阶段失败，各Agent将单独调用: {e}")
+            return None
+    
+    def _build_stage_graph(
+        self,
+        request: ProcessingMasterRequest,
+        analysis_result: Dict[str, Any],
+        early_fused_task: Optional[asyncio.Task],
+        creative_step: ProcessingStep,
+        progress_callback: Optional[Callable[[ProcessingStep], None]],
+        speculative: bool,
+        deadline: Optional[float] = None
+    ) -> StageGraph:
+        """构建分析之后的阶段依赖图
+        
+        analysis ─┬─> disposal_recommendation
+                  └─> fused_tasks ─┬─> creative_coordination
+                                   ├─> recycling_coordination
+                                   └─> secondhand_coordination
+        
+        三大协调器只读取分析结果（及合并调用结果），不依赖处置推荐。
+        speculative为True时与处置推荐同时启动、处置推荐失败时取消；否则等处置推荐成功后再启动。
+        到达截止时间仍未结束的阶段被取消并记为超时
+        """
+        user_location = request.user_location
+        location_str = f"{user_location['lon']},{user_location['lat']}" if user_location else None
+        
+        # 创意改造（有进度回调时流式转发改造方案的生成内容）
+        creative_on_chunk = None
+        if progress_callback is not None:
+            creative_on_chunk = self._make_partial_forwarder(creative_step, progress_callback)
+        
+        def _run_recycling(inputs: Dict[str, Any]) -> Awaitable[Any]:
+            if not location_str:
+                return self._create_no_location_result()
+            return self._with_fused_results(
+                inputs["fused_tasks"],
+                lambda: self._recycling_agent.coordinate_recycling_donation(
+                    analysis_result=inputs["analysis"],
+                    user_location=location_str
+                )
+            )
+        
+        coordinator_depends = ("analysis", "fused_tasks")
+        coordinator_guards: tuple = ()
+        if speculative:
+            coordinator_guards = ("disposal_recommendation",)
+        else:
+            coordinator_depends += ("disposal_recommendation",)
+        
+        stages = [
+            Stage(
+                name="disposal_recommendation",
+                run=lambda inputs: self._disposal_agent.recommend_from_analysis(inputs["analysis"]),
+                depends_on=("analysis",),
+                succeeded=lambda result: result.success
+            ),
+            Stage(
+                name="fused_tasks",
+                run=lambda inputs: self._run_fused_stage(inputs["analysis"], early_fused_task),
+                depends_on=("analysis",)
+            ),
+            Stage(
+                name="creative_coordination",
+                run=lambda inputs: self._with_fused_results(
+                    inputs["fused_tasks"],
+                    lambda: self._creative_agent.generate_complete_solution(
+                        inputs["analysis"], on_chunk=creative_on_chunk
+                    )
+                ),
+                depends_on=coordinator_depends,
+                cancel_on_failure=coordinator_guards
+            ),
+            Stage(
+                name="recycling_coordination",
+                run=_run_recycling,
+                depends_on=coordinator_depends,
+                cancel_on_failure=coordinator_guards
+            ),
+            Stage(
+                name="secondhand_coordination",
+                run=lambda inputs: self._with_fused_results(
+                    inputs["fused_tasks"],
+                    lambda: self._secondhand_agent.coordinate_trading(inputs["analysis"])
+                ),
+                depends_on=coordinator_depends,
+                cancel_on_failure=coordinator_guards
+            )
+        ]
+        return StageGraph(stages, inputs={"analysis": analysis_result}, deadline=deadline)
+    
+    @staticmethod
+    def _apply_coordinator_result(step: ProcessingStep, result: Any) -> None:
+        """把协调器结果写入对应步骤"""
+        step.timestamp = time.time()
+        if isinstance(result, Exception):
+            step.status = ProcessingStepStatus.FAILED
+            step.error = str(result)
+            step.result = None
+            return
+        
+        step.status = ProcessingStepStatus.COMPLETED
+        if step.step_name == "creative_coordination":
+            # 处理创意改造结果
+            step.result = result.to_dict()
+            if hasattr(result, 'renovation_plan') and result.renovation_plan:
+                step.metadata = {
+                    "project_title": getattr(result.renovation_plan.summary, 'title', 'Unknown'),
+                    "difficulty": getattr(result.renovation_plan.summary, 'difficulty', 'Unknown'),
+                    "video_count": len(getattr(result, 'videos', []))
+                }
+        elif step.step_name == "recycling_coordination":
+            # 处理回收捐赠结果
+            step.result = result.to_dict() if hasattr(result, 'to_dict') else result
+            if hasattr(result, 'has_location_recommendations') and callable(getattr(result, 'has_location_recommendations')) and result.has_location_recommendations():
+                step.metadata = {
+                    "location_count": len(getattr(result.location_recommendation, 'locations', [])),
+                    "recycling_type": getattr(result, 'get_recycling_type', lambda: 'Unknown')()
+                }
+        else:
+            # 处理二手交易结果
+            step.result = result.to_dict()
+            step.metadata = {
+                "total_products": getattr(result, 'get_total_products', lambda: 0)(),
+                "has_content": getattr(result, 'has_content_results', lambda: False)()
+            }
+    
+    @staticmethod
+    def _outcome_value(outcome: StageOutcome) -> Any:
+        """阶段结果转换为结果对象，未成功时转换为异常（与gather(return_exceptions=True)一致）"""
+        if outcome.ok:
+            return outcome.result
+        if outcome.status == StageStatus.TIMED_OUT:
+            return TimeBudgetExceededError(outcome.error)
+        return outcome.exception or Exception(outcome.error)
+    
+    def _make_partial_forwarder(
+        self,
+        step: ProcessingStep,
+        progress_callback: Callable[[ProcessingStep], None]
+    ) -> Callable[[str], Awaitable[None]]:
+        """创建增量文本回调，把大模型的部分输出作为运行中步骤交给进度回调"""
+        async def _forward(chunk: str) -> None:
+            try:
+                progress_callback(ProcessingStep(
+                    step_name=step.step_name,
+                    step_title=step.step_title,
+                    description=step.description,
+                    status=ProcessingStepStatus.RUNNING,
+                    result=None,
+                    error=None,
+                    metadata={"partial_output": chunk},
+                    timestamp=time.time()
+                ))
+            except Exception as e:
+                app_logger.debug(f"转发部分输出失败: {e}")
+        
+        return _forward
     
-    async def _analyze_content(self, request: ProcessingMasterRequest) -> Dict[str, Any]:
-        """分析内容（图片/文字/图片+文字）"""
+    def _forward_partial_field(
+        self,
+        step: ProcessingStep,
+        name: str,
+        value: Any,
+        progress_callback: Callable[[ProcessingStep], None]
+    ) -> None:
+        """把分析阶段提前闭合的字段作为运行中步骤交给进度回调"""
+        try:
+            progress_callback(ProcessingStep(
+                step_name=step.step_name,
+                step_title=step.step_title,
+                description=step.description,
+                status=ProcessingStepStatus.RUNNING,
+                result=None,
+                error=None,
+                metadata={"partial_field": {"name": name, "value": value}},
+                timestamp=time.time()
+            ))
+        except Exception as e:
+            app_logger.debug(f"转发分析字段失败: {e}")
+    
+    async def _analyze_content(
+        self,
+        request: ProcessingMasterRequest,
+        on_field: Optional[Callable[[str, Any], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """分析内容（图片/文字/图片+文字）
+        
+        Args:
+            request: 处理请求
+            on_field: 分析字段回调，仅用于单一来源输入；图片+文字需合并两路结果，不提前回调
+        """
         try:
             has_image = bool(request.image_url)
             has_text = bool(request.text_description)
@@ -375,7 +872,7 @@ class ProcessingMasterAgent:
             elif has_image:
                 # 纯图片
                 app_logger.info("检测到纯图片输入")
-                result = await self._lanxin_service.analyze_image(request.image_url)
+                result = await self._lanxin_service.analyze_image(request.image_url, on_field=on_field)
                 result["success"] = True
                 result["_merge_metadata"] = {"source": "image_only"}
                 return result
@@ -383,7 +880,7 @@ class ProcessingMasterAgent:
             elif has_text:
                 # 纯文字
                 app_logger.info("检测到纯文字输入")
-                result = await self._lanxin_service.analyze_text(request.text_description)
+                result = await self._lanxin_service.analyze_text(request.text_description, on_field=on_field)
                 result["success"] = True
                 result["_merge_metadata"] = {"source": "text_only"}
                 return result
@@ -465,7 +962,8 @@ class ProcessingMasterAgent:
             "disposal_agent": self._disposal_agent is not None,
             "creative_agent": self._creative_agent is not None,
             "recycling_agent": self._recycling_agent is not None,
-            "secondhand_agent": self._secondhand_agent is not None
+            "secondhand_agent": self._secondhand_agent is not None,
+            "fused_agent": self._fused_agent is not None
         }
     
     async def close(self):
@@ -491,6 +989,7 @@ class ProcessingMasterAgent:
             self._creative_agent = None
             self._recycling_agent = None
             self._secondhand_agent = None
+            self._fused_agent = None
             self._is_initialized = False
             
             app_logger.info("总处理协调器Agent资源清理完成")
@@ -505,4 +1004,8 @@ class ProcessingMasterAgent:
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """异步上下文管理器出口"""
-        await self.close() 
\ No newline at end of file
+        await self.close()
+
+
+# 全局总处理协调器Agent，由应用生命周期初始化和关闭
+processing_master_agent = ProcessingMasterAgent()
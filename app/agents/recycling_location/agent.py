@@ -5,24 +5,19 @@
 基于蓝心大模型分析物品类型，调用高德地图API搜索附近回收设施
 """
 
-import json
-import httpx
-import uuid
 from typing import Dict, Any, Optional, List
-from urllib.parse import urlencode, urlparse
 
-from app.core.config import get_settings
 from app.core.logger import app_logger
-from app.utils.vivo_auth import gen_sign_headers
+from app.services.llm.bluelm_client import bluelm_client
 from app.prompts.recycling_location_prompts import RecyclingLocationPrompts
+from app.utils.json_stream import extract_json
+from app.agents.fused_tasks.agent import get_fused_result, RECYCLING_TYPE_TASK
 from app.models.recycling_location_models import (
     RecyclingLocationResponse,
     RecyclingLocationDataConverter
 )
 from app.services.amap_service import amap_service
 
-settings = get_settings()
-
 
 class RecyclingLocationAgent:
     """回收地点推荐Agent - 智能回收类型分析与地点推荐"""
@@ -35,128 +30,42 @@ class RecyclingLocationAgent:
         "纸箱回收": "纸箱回收"
     }
     
-    def __init__(self):
-        # 蓝心大模型API配置
-        self.app_id = settings.lanxin_app_id
-        self.app_key = settings.lanxin_app_key
-        self.base_url = settings.lanxin_api_base_url
-        self.text_model = settings.lanxin_text_model
-        
-        self.client = httpx.AsyncClient(timeout=30.0)
-    
-    def _get_auth_headers(self, method: str, uri: str, query_params: Dict[str, str]) -> Dict[str, str]:
-        """获取鉴权头部"""
-        auth_headers = gen_sign_headers(
-            app_id=self.app_id,
-            app_key=self.app_key,
-            method=method,
-            uri=uri,
-            query=query_params
-        )
-        auth_headers["Content-Type"] = "application/json"
-        return auth_headers
-    
     async def _call_lanxin_api(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
         """调用蓝心大模型API"""
         try:
-            # 生成请求ID和会话ID
-            request_id = str(uuid.uuid4())
-            session_id = str(uuid.uuid4())
-            
-            # 构造请求参数
-            url_params = {"requestId": request_id}
-            
-            # 构造请求体
-            request_body = {
-                "model": self.text_model,
-                "sessionId": session_id,
-                "systemPrompt": system_prompt,
-                "prompt": user_prompt,
-                "extra": {
+            return await bluelm_client.complete(
+                system_prompt=system_prompt,
+                prompt=user_prompt,
+                extra={
                     "temperature": 0.1,  # 非常低的温度确保分类结果稳定
                     "top_p": 0.7,
                     "max_new_tokens": 500
-                }
-            }
-            
-            # 获取鉴权头部
-            parsed_url = urlparse(self.base_url)
-            uri = parsed_url.path
-            headers = self._get_auth_headers("POST", uri, url_params)
-            
-            # 发送请求
-            url = f"{self.base_url}?{urlencode(url_params)}"
-            response = await self.client.post(
-                url,
-                headers=headers,
-                json=request_body
+                },
+                timeout_profile="classification",
+                cache_namespace="recycling_type",
+                cache_validator=lambda data: self._parse_recycling_type_response(data.get("content", "")) is not None
             )
             
-            response.raise_for_status()
-            result = response.json()
-            
-            # 检查响应状态
-            if result.get("code") != 0:
-                raise Exception(f"API调用失败: {result.get('msg', '未知错误')}")
-            
-            return result["data"]
-            
         except Exception as e:
             app_logger.error(f"蓝心大模型API调用失败: {e}")
             raise
     
     def _parse_recycling_type_response(self, content: str) -> Optional[str]:
         """解析回收类型分析响应"""
-        try:
-            # 尝试直接解析JSON
-            try:
-                result = json.loads(content)
-                recycling_type = result.get("recycling_type")
-                if recycling_type in self.RECYCLING_TYPES:
-                    app_logger.info(f"回收类型解析成功: {recycling_type}")
-                    return recycling_type
-            except json.JSONDecodeError:
-                pass
-            
-            # 尝试从代码块中提取JSON
-            if "```json" in content:
-                start_marker = "```json"
-                end_marker = "```"
-                start_index = content.find(start_marker)
-                if start_index != -1:
-                    start_index += len(start_marker)
-                    end_index = content.find(end_marker, start_index)
-                    if end_index != -1:
-                        json_str = content[start_index:end_index].strip()
-                        result = json.loads(json_str)
-                        recycling_type = result.get("recycling_type")
-                        if recycling_type in self.RECYCLING_TYPES:
-                            app_logger.info(f"回收类型解析成功 - 代码块解析: {recycling_type}")
-                            return recycling_type
-            
-            # 尝试查找花括号内容
-            first_brace = content.find('{')
-            last_brace = content.rfind('}')
-            if first_brace != -1 and last_brace != -1 and first_brace < last_brace:
-                json_str = content[first_brace:last_brace + 1]
-                result = json.loads(json_str)
-                recycling_type = result.get("recycling_type")
-                if recycling_type in self.RECYCLING_TYPES:
-                    app_logger.info(f"回收类型解析成功 - 花括号内容解析: {recycling_type}")
-                    return recycling_type
-            
-            # 尝试从文本中直接匹配回收类型
-            for recycling_type in self.RECYCLING_TYPES.keys():
-                if recycling_type in content:
-                    app_logger.info(f"回收类型解析成功 - 文本匹配: {recycling_type}")
-                    return recycling_type
-            
-            app_logger.warning("无法解析回收类型，响应内容中未找到有效的回收类型")
-            return None
-            
-        except Exception as e:
-            app_logger.error(f"解析回收类型失败: {e}")
-            return None
+        result = extract_json(content)
+        recycling_type = result.get("recycling_type") if isinstance(result, dict) else None
+        if isinstance(recycling_type, str) and recycling_type in self.RECYCLING_TYPES:
+            app_logger.info(f"回收类型解析成功: {recycling_type}")
+            return recycling_type
+        
+        # 尝试从文本中直接匹配回收类型
+        for recycling_type in self.RECYCLING_TYPES.keys():
+            if recycling_type in content:
+                app_logger.info(f"回收类型解析成功 - 文本匹配: {recycling_type}")
+                return recycling_type
+        
+        app_logger.warning("无法解析回收类型，响应内容中未找到有效的回收类型")
+        return None
     
     def _get_fallback_recycling_type(self, analysis_result: Dict[str, Any]) -> str:
         """根据分析结果获取备用回收类型判断"""
@@ -206,6 +115,12 @@ class RecyclingLocationAgent:
         Returns:
             tuple[str, str]: (回收类型, 来源) - 来源可以是 'ai' 或 'fallback'
         """
+        # 合并调用已给出有效结果时直接使用
+        fused_type = get_fused_result(RECYCLING_TYPE_TASK)
+        if fused_type in self.RECYCLING_TYPES:
+            app_logger.info(f"使用合并调用的回收类型: {fused_type}")
+            return fused_type, "ai"
+        
         try:
             app_logger.info("开始AI回收类型分析")
             
@@ -322,9 +237,8 @@ class RecyclingLocationAgent:
             )
     
     async def close(self):
-        """关闭HTTP客户端"""
-        if self.client:
-            await self.client.aclose()
+        """关闭Agent相关资源（蓝心网关连接池为进程共享，由应用生命周期统一关闭）"""
+        pass
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
@@ -6,18 +6,15 @@
 """
 
 import json
-import httpx
-import uuid
 import asyncio
 from typing import Dict, Any, List, Optional
-from urllib.parse import urlencode, urlparse
 
-from app.core.config import settings
 from app.core.logger import app_logger
 from app.services.xianyu_service import search_xianyu_products
 from app.services.aihuishou_service import search_aihuishou_products
-from app.utils.vivo_auth import gen_sign_headers
+from app.services.llm.bluelm_client import bluelm_client
 from app.prompts.secondhand_search_prompts import SecondhandSearchPrompts
+from app.agents.fused_tasks.agent import get_fused_result, SECONDHAND_KEYWORDS_TASK
 from app.models.secondhand_search_models import (
     SecondhandSearchKeywords,
     SecondhandSearchResult,
@@ -28,71 +25,21 @@ from app.models.secondhand_search_models import (
 class SecondhandSearchAgent:
     """二手平台搜索Agent - 基于分析结果的智能商品搜索"""
     
-    def __init__(self):
-        # 蓝心大模型API配置
-        self.app_id = settings.lanxin_app_id
-        self.app_key = settings.lanxin_app_key
-        self.base_url = settings.lanxin_api_base_url
-        self.text_model = settings.lanxin_text_model
-        
-        self.client = httpx.AsyncClient(timeout=30.0)
-    
-    def _get_auth_headers(self, method: str, uri: str, query_params: Dict[str, str]) -> Dict[str, str]:
-        """获取鉴权头部"""
-        auth_headers = gen_sign_headers(
-            app_id=self.app_id,
-            app_key=self.app_key,
-            method=method,
-            uri=uri,
-            query=query_params
-        )
-        auth_headers["Content-Type"] = "application/json"
-        return auth_headers
-    
     async def _call_function_calling_api(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
         """调用蓝心大模型Function Calling API"""
         try:
-            # 生成请求ID和会话ID
-            request_id = str(uuid.uuid4())
-            session_id = str(uuid.uuid4())
-            
-            # 构造请求参数
-            url_params = {"requestId": request_id}
-            
-            # 构造请求体
-            request_body = {
-                "model": self.text_model,
-                "sessionId": session_id,
-                "messages": messages,
-                "extra": {
+            return await bluelm_client.chat(
+                messages=messages,
+                extra={
                     "temperature": 0.1,
                     "top_p": 0.7,
                     "max_new_tokens": 500
-                }
-            }
-            
-            # 获取鉴权头部
-            parsed_url = urlparse(self.base_url)
-            uri = parsed_url.path
-            headers = self._get_auth_headers("POST", uri, url_params)
-            
-            # 发送请求
-            url = f"{self.base_url}?{urlencode(url_params)}"
-            response = await self.client.post(
-                url,
-                headers=headers,
-                json=request_body
+                },
+                timeout_profile="classification",
+                cache_namespace="keyword_extraction",
+                cache_validator=lambda data: self._parse_function_call_response(data.get("content", "")) is not None
             )
             
-            response.raise_for_status()
-            result = response.json()
-            
-            # 检查响应状态
-            if result.get("code") != 0:
-                raise Exception(f"API调用失败: {result.get('msg', '未知错误')}")
-            
-            return result["data"]
-            
         except Exception as e:
             app_logger.error(f"Function Calling API调用失败: {e}")
             raise
@@ -121,6 +68,12 @@ class SecondhandSearchAgent:
         analysis_result: Dict[str, Any]
     ) -> Dict[str, Any]:
         """使用Function Calling提取搜索关键词"""
+        # 合并调用已给出有效结果时直接使用
+        fused_result = get_fused_result(SECONDHAND_KEYWORDS_TASK)
+        if fused_result:
+            app_logger.info(f"使用合并调用提取的关键词: {fused_result['keywords']}")
+            return fused_result
+        
         try:
             # 构建消息
             system_prompt = SecondhandSearchPrompts.get_system_prompt()
@@ -435,11 +388,8 @@ class SecondhandSearchAgent:
         )
     
     async def close(self):
-        """关闭Agent相关资源"""
-        try:
-            await self.client.aclose()
-        except Exception as e:
-            app_logger.warning(f"关闭Agent资源时出现警告: {e}")
+        """关闭Agent相关资源（蓝心网关连接池为进程共享，由应用生命周期统一关闭）"""
+        pass
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
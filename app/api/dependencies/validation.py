@@ -5,7 +5,7 @@
 """
 
 import uuid
-from typing import Dict
+from typing import Dict, List
 
 from fastapi import HTTPException, status
 
@@ -189,7 +189,9 @@ def validate_processing_master_request(request_data: dict) -> ProcessingMasterRe
             text_description=text_description,
             user_location=user_location,
             enable_parallel=request_data.get('enable_parallel', True),
-            max_results_per_platform=request_data.get('max_results_per_platform', 10)
+            max_results_per_platform=request_data.get('max_results_per_platform', 10),
+            time_budget_seconds=request_data.get('time_budget_seconds'),
+            wire_format=request_data.get('wire_format') or 'full'
         )
         app_logger.debug("WebSocket处理请求验证通过")
         return request
@@ -198,4 +200,42 @@ def validate_processing_master_request(request_data: dict) -> ProcessingMasterRe
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"请求参数格式错误: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+def validate_batch_request(request_data: dict, max_items: int) -> List[ProcessingMasterRequest]:
+    """验证批量处理请求数据，逐件按WebSocket处理请求验证"""
+    items = request_data.get('items') if isinstance(request_data, dict) else None
+    
+    if not isinstance(items, list) or not items:
+        app_logger.warning("批量请求验证失败: items为空或不是列表")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="items必须是非空列表"
+        )
+    
+    if len(items) > max_items:
+        app_logger.warning(f"批量请求验证失败: 物品过多 - 数量: {len(items)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次批量处理最多{max_items}件物品"
+        )
+    
+    requests = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"第{index + 1}件物品格式错误"
+            )
+        try:
+            requests.append(validate_processing_master_request(item))
+        except HTTPException as e:
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=f"第{index + 1}件物品: {e.detail}"
+            )
+    
+    app_logger.debug(f"批量处理请求验证通过: {len(requests)}件物品")
+    return requests
+
@@ -1,21 +1,384 @@
 """
-WebSocket任务处理API路由
+任务处理API路由
 
-提供WebSocket实时处理端点，支持物品处置任务的实时进度推送
+提供WebSocket实时处理端点，支持物品处置任务的实时进度推送；
+无法使用WebSocket的客户端可通过SSE接收进度，或使用REST接口创建任务并轮询状态
 """
 
+import asyncio
 import json
+import uuid
 from datetime import datetime
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, Union
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from celery_app import celery_app
+from app.core.config import settings
 from app.core.logger import app_logger
 from app.models.processing_master_models import ProcessingMasterRequest
-from app.agents.processing_master.agent import ProcessingMasterAgent
-from app.api.dependencies.validation import validate_processing_master_request
+from app.agents.processing_master.agent import processing_master_agent
+from app.models.task import TaskCreate, TaskResponse, TaskStatus
+from app.api.dependencies.database import get_database
+from app.api.dependencies.validation import (
+    validate_batch_request, validate_processing_master_request, validate_task_create_data, validate_task_id
+)
+from app.services.task_service import TaskService, enqueue_processing_task
+from app.services.step_events import step_event_log, encode_message, prepend_field
+from app.services.batch_processing import record_batch
+from app.services.serialization import msgpack_available, to_msgpack
+from app.services.admission import AdmissionRejectedError, AdmissionTicket, admission_controller
+from app.services.sse import (
+    accepts_gzip, encode_stream, format_event, format_retry, parse_last_event_id, with_heartbeat
+)
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 
+@router.post("", response_model=TaskResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_task(
+    task_data: TaskCreate = Depends(validate_task_create_data),
+    db: AsyncSession = Depends(get_database)
+):
+    """创建处理任务（轮询模式）
+    
+    创建任务记录并提交完整处理流程后立即返回任务ID，客户端通过 GET /tasks/{task_id} 查询进度和结果
+    """
+    task_id = await TaskService(db).create_task(task_data)
+    await enqueue_processing_task(task_id, task_data)
+    return TaskResponse(task_id=str(task_id))
+
+
+@router.get("/{task_id}", response_model=TaskStatus)
+async def get_task_status(
+    task_id: uuid.UUID = Depends(validate_task_id),
+    db: AsyncSession = Depends(get_database)
+):
+    """查询任务状态、步骤进度和最终结果"""
+    task_status = await TaskService(db).get_task_status(task_id)
+    if task_status is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="任务不存在")
+    return task_status
+
+
+# 进行中的会话：进程内执行时为后台任务（同时保留引用避免被垃圾回收），celery模式为worker任务ID
+_running_sessions: Dict[str, Union[asyncio.Task, str]] = {}
+
+
+def _track_session(session_id: str, task: asyncio.Task) -> None:
+    """登记进程内执行的会话，结束后自动移除"""
+    _running_sessions[session_id] = task
+    task.add_done_callback(lambda _: _running_sessions.pop(session_id, None))
+
+
+async def _start_session(request: ProcessingMasterRequest, ticket: Optional[AdmissionTicket] = None) -> str:
+    """启动一次处理并返回会话ID，处理与WebSocket连接解耦，连接断开后继续进行
+    
+    celery模式分发到worker执行，否则在当前进程后台执行，结束后归还准入名额
+    """
+    session_id = step_event_log.new_channel()
+    if settings.processing_execution_mode == "celery":
+        result = await asyncio.to_thread(
+            celery_app.send_task,
+            "app.tasks.process_item_task",
+            args=[session_id, request.dict()]
+        )
+        _running_sessions[session_id] = result.id
+        app_logger.info(f"处理任务已分发到worker: {session_id}")
+    else:
+        # 使用应用生命周期内共享的总处理协调器Agent处理请求（Agent无请求状态，可并发复用）
+        agent = ticket.measure(processing_master_agent) if ticket is not None else processing_master_agent
+        task = asyncio.create_task(step_event_log.record(session_id, agent, request), name=f"session:{session_id}")
+        if ticket is not None:
+            # 任务在开始执行前被取消时协程内的finally不会运行，名额在任务结束回调中归还
+            task.add_done_callback(lambda _: ticket.release())
+        _track_session(session_id, task)
+    return session_id
+
+
+async def _admit(on_position: Callable[[int, float], Awaitable[None]]) -> Optional[AdmissionTicket]:
+    """申请处理名额：进程内执行且启用准入控制时排队等待，否则直接放行（celery模式由worker并发数限制）
+    
+    Raises:
+        AdmissionRejectedError: 队列已满、预计等待过长或排队超时
+    """
+    if not _admission_enabled():
+        return None
+    return await admission_controller.acquire(on_position)
+
+
+def _admission_enabled() -> bool:
+    """是否对处理请求做准入控制（仅进程内执行时）"""
+    return settings.processing_execution_mode != "celery" and settings.admission_enabled
+
+
+def _queued_message(position: int, estimated_wait: float) -> Dict[str, Any]:
+    """排队位置消息"""
+    return {
+        "type": "queued",
+        "position": position,
+        "estimated_wait_seconds": round(estimated_wait, 1),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def _rejected_message(error: AdmissionRejectedError) -> Dict[str, Any]:
+    """拒绝消息，带建议的重试间隔"""
+    return {
+        "type": "rejected",
+        "error": str(error),
+        "retry_after": error.retry_after,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+async def _admit_while_connected(websocket: WebSocket) -> Optional[AdmissionTicket]:
+    """排队等待处理名额并推送排队位置，客户端在排队期间断开时放弃排队
+    
+    Raises:
+        AdmissionRejectedError: 未被接纳
+        WebSocketDisconnect: 排队期间连接断开
+    """
+    acquire_task = asyncio.create_task(_admit(
+        lambda position, wait: _send_message(websocket, encode_message(_queued_message(position, wait)))
+    ))
+    try:
+        while True:
+            receive_task = asyncio.create_task(websocket.receive())
+            done, _ = await asyncio.wait({acquire_task, receive_task}, return_when=asyncio.FIRST_COMPLETED)
+            if acquire_task in done:
+                receive_task.cancel()
+                return acquire_task.result()
+            # 排队期间客户端的其他消息忽略，断开时放弃排队
+            if receive_task.result().get("type") == "websocket.disconnect":
+                raise WebSocketDisconnect()
+    finally:
+        if not acquire_task.done():
+            acquire_task.cancel()
+
+
+async def _cancel_session(session_id: str) -> None:
+    """取消进行中的会话"""
+    running = _running_sessions.pop(session_id, None)
+    if isinstance(running, asyncio.Task):
+        running.cancel()
+    elif running is not None:
+        await asyncio.to_thread(celery_app.control.revoke, running, terminate=True)
+    app_logger.info(f"会话已取消: {session_id}")
+
+
+async def _accept(websocket: WebSocket) -> bool:
+    """接受连接并协商帧格式：连接参数encoding=msgpack时服务端消息使用MessagePack二进制帧
+    
+    客户端请求仍以JSON文本发送；服务端未安装msgpack时返回错误并关闭连接
+    """
+    await websocket.accept()
+    if websocket.query_params.get("encoding") == "msgpack":
+        if not msgpack_available():
+            await websocket.send_text(encode_message({"type": "error", "error": "服务器不支持MessagePack帧"}))
+            await websocket.close()
+            return False
+        websocket.state.msgpack_frames = True
+    return True
+
+
+async def _send_message(websocket: WebSocket, message: str) -> None:
+    """发送一条已编码的消息，按连接协商的帧格式发送文本帧或MessagePack二进制帧"""
+    if getattr(getattr(websocket, "state", None), "msgpack_frames", False):
+        await websocket.send_bytes(to_msgpack(message))
+    else:
+        await websocket.send_text(message)
+
+
+async def _relay_session(websocket: WebSocket, session_id: str, after: int = 0) -> None:
+    """把会话日志中seq大于after的消息和后续消息原样转发给客户端"""
+    try:
+        async for message in step_event_log.read(session_id, after):
+            await _send_message(websocket, message)
+    except TimeoutError as e:
+        app_logger.error(f"等待处理进度超时 {session_id}: {e}")
+        await _send_message(websocket, encode_message({
+            "type": "error",
+            "error": f"处理失败: {str(e)}",
+            "timestamp": datetime.now().isoformat()
+        }))
+
+
+async def _resume_session(websocket: WebSocket, request_json: dict) -> None:
+    """断线重连：补发resume_from之后的消息并继续转发"""
+    session_id = str(request_json["session_id"])
+    try:
+        resume_from = int(request_json.get("resume_from", 0))
+    except (TypeError, ValueError):
+        resume_from = 0
+    if not await step_event_log.exists(session_id):
+        await _send_message(websocket, encode_message({
+            "type": "error",
+            "error": "会话不存在或已过期"
+        }))
+        return
+    app_logger.info(f"WebSocket续传会话: {session_id}，resume_from={resume_from}")
+    await _relay_session(websocket, session_id, resume_from)
+
+
+class _MultiplexConnection:
+    """v2协议的一条WebSocket连接，同时承载多个以request_id区分的处理请求
+    
+    每个请求在后台转发各自会话的消息，消息开头加上request_id；
+    多个转发任务共用一把发送锁，保证每条消息完整写出
+    """
+
+    def __init__(self, websocket: WebSocket, max_inflight: int):
+        self.websocket = websocket
+        self.max_inflight = max(1, max_inflight)
+        # request_id -> (会话ID（排队中为None）, 后台任务)
+        self._inflight: Dict[str, Tuple[Optional[str], asyncio.Task]] = {}
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, message: str) -> None:
+        async with self._send_lock:
+            await _send_message(self.websocket, message)
+
+    async def send_error(self, request_id: Optional[str], error: str) -> None:
+        message = {"type": "error", "error": error, "timestamp": datetime.now().isoformat()}
+        if request_id is not None:
+            message = {"request_id": request_id, **message}
+        await self.send(encode_message(message))
+
+    def _spawn(self, request_id: str, session_id: Optional[str], run: Callable[[], Awaitable[None]]) -> None:
+        """后台执行请求，结束后释放该request_id占用的名额"""
+        task = asyncio.create_task(self._guard(request_id, run), name=f"request:{request_id}")
+        self._inflight[request_id] = (session_id, task)
+
+        def _release(_):
+            current = self._inflight.get(request_id)
+            if current is not None and current[1] is task:
+                del self._inflight[request_id]
+
+        task.add_done_callback(_release)
+
+    async def _guard(self, request_id: str, run: Callable[[], Awaitable[None]]) -> None:
+        try:
+            await run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 连接断开等发送失败由主循环处理，这里只记录
+            app_logger.warning(f"处理请求消息失败 {request_id}: {e}")
+
+    async def _run(self, request_id: str, request: ProcessingMasterRequest) -> None:
+        """排队等待处理名额（期间推送排队位置），然后启动处理并转发消息"""
+        try:
+            ticket = await _admit(lambda position, wait: self.send(
+                encode_message({"request_id": request_id, **_queued_message(position, wait)})
+            ))
+        except AdmissionRejectedError as e:
+            app_logger.warning(f"v2连接请求未被接纳 {request_id}: {e}")
+            await self.send(encode_message({"request_id": request_id, **_rejected_message(e)}))
+            return
+
+        session_id = await _start_session(request, ticket)
+        self._inflight[request_id] = (session_id, asyncio.current_task())
+        await self.send(encode_message({"type": "accepted", "request_id": request_id, "session_id": session_id}))
+        app_logger.info(f"v2连接开始处理请求: {request_id} -> {session_id}")
+        await self._relay(request_id, session_id, 0)
+
+    async def _relay(self, request_id: str, session_id: str, after: int) -> None:
+        try:
+            async for message in step_event_log.read(session_id, after):
+                await self.send(prepend_field(message, "request_id", request_id))
+        except TimeoutError as e:
+            app_logger.error(f"等待处理进度超时 {session_id}: {e}")
+            await self.send_error(request_id, f"处理失败: {str(e)}")
+
+    def _check_admission(self, request_id: str) -> Optional[str]:
+        """检查request_id可否占用新名额，不可时返回错误信息"""
+        if request_id in self._inflight:
+            return "request_id正在处理中"
+        if len(self._inflight) >= self.max_inflight:
+            return f"同时进行的请求数已达上限{self.max_inflight}"
+        return None
+
+    async def handle(self, payload: Any) -> None:
+        """处理一条客户端消息"""
+        if not isinstance(payload, dict):
+            await self.send_error(None, "消息必须是JSON对象")
+            return
+        request_id = payload.get("request_id")
+        if not isinstance(request_id, (str, int)) or isinstance(request_id, bool) or str(request_id) == "":
+            await self.send_error(None, "缺少request_id")
+            return
+        request_id = str(request_id)
+        action = payload.get("action", "process")
+
+        if action == "process":
+            await self._process(request_id, payload)
+        elif action == "resume":
+            await self._resume(request_id, payload)
+        elif action == "cancel":
+            await self._cancel(request_id)
+        else:
+            await self.send_error(request_id, f"不支持的action: {action}")
+
+    async def _process(self, request_id: str, payload: dict) -> None:
+        error = self._check_admission(request_id)
+        if error:
+            await self.send_error(request_id, error)
+            return
+        request_fields = {key: value for key, value in payload.items() if key not in ("action", "request_id")}
+        try:
+            request = validate_processing_master_request(request_fields)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            await self.send_error(request_id, f"请求参数验证失败: {detail}")
+            return
+
+        self._spawn(request_id, None, lambda: self._run(request_id, request))
+
+    async def _resume(self, request_id: str, payload: dict) -> None:
+        error = self._check_admission(request_id)
+        if error:
+            await self.send_error(request_id, error)
+            return
+        session_id = str(payload.get("session_id") or "")
+        try:
+            resume_from = int(payload.get("resume_from", 0))
+        except (TypeError, ValueError):
+            resume_from = 0
+        if not session_id or not await step_event_log.exists(session_id):
+            await self.send_error(request_id, "会话不存在或已过期")
+            return
+        await self.send(encode_message({"type": "accepted", "request_id": request_id, "session_id": session_id}))
+        self._spawn(request_id, session_id, lambda: self._relay(request_id, session_id, resume_from))
+        app_logger.info(f"v2连接续传会话: {request_id} -> {session_id}，resume_from={resume_from}")
+
+    async def _cancel(self, request_id: str) -> None:
+        entry = self._inflight.pop(request_id, None)
+        if entry is None:
+            await self.send_error(request_id, "请求不存在或已结束")
+            return
+        session_id, task = entry
+        task.cancel()
+        # 仍在排队时只需停止排队
+        if session_id is not None:
+            await _cancel_session(session_id)
+        await self.send(encode_message({
+            "type": "cancelled",
+            "request_id": request_id,
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat()
+        }))
+
+    async def close(self) -> None:
+        """连接断开时停止转发，处理本身继续进行，之后可在新连接上续传"""
+        tasks = [task for _, task in self._inflight.values()]
+        self._inflight.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
 @router.websocket("/ws/process")
 async def websocket_process(websocket: WebSocket):
     """
@@ -27,7 +390,35 @@ async def websocket_process(websocket: WebSocket):
     {
         "image_url": "图片URL或路径（可选）",
         "text_description": "文字描述（可选）", 
-        "user_location": {"lat": 纬度, "lon": 经度}（可选）
+        "user_location": {"lat": 纬度, "lon": 经度}（可选）,
+        "time_budget_seconds": 时间预算秒数（可选，超时返回部分结果）
+    }
+    
+    服务端先返回会话ID，之后的每条消息都带递增的seq：
+    {
+        "type": "session",
+        "session_id": "会话ID"
+    }
+    
+    同时运行的处理数已满时先排队，排队位置变化时推送（排队期间断开即放弃排队）：
+    {
+        "type": "queued",
+        "position": 排队位置（从1开始）,
+        "estimated_wait_seconds": 预计等待秒数
+    }
+    
+    队列已满或预计等待过长时直接拒绝并关闭连接，客户端应在retry_after秒后重试：
+    {
+        "type": "rejected",
+        "error": "服务繁忙，请稍后重试",
+        "retry_after": 建议重试间隔（秒）
+    }
+    
+    连接断开后处理继续进行，重连后发送以下请求即可补发seq大于resume_from的消息并继续接收后续消息
+    （会话结束后保留STEP_EVENT_TTL秒）：
+    {
+        "session_id": "会话ID",
+        "resume_from": 最后收到的seq
     }
     
     响应格式：
@@ -42,8 +433,26 @@ async def websocket_process(websocket: WebSocket):
         "metadata": {...},        // 元数据
         "timestamp": "时间戳"
     }
+    
+    生成较长内容的步骤（如创意改造方案）在运行期间还会推送增量输出：
+    {
+        "type": "partial_output",
+        "step": "步骤名称",
+        "delta": "新生成的文本片段",
+        "timestamp": "时间戳"
+    }
+    
+    内容分析步骤的字段一生成完就单独推送，无需等待整个分析结果：
+    {
+        "type": "partial_field",
+        "step": "content_analysis",
+        "field": "字段名（如category）",
+        "value": "字段值",
+        "timestamp": "时间戳"
+    }
     """
-    await websocket.accept()
+    if not await _accept(websocket):
+        return
     app_logger.info("WebSocket连接已建立")
     
     try:
@@ -52,18 +461,23 @@ async def websocket_process(websocket: WebSocket):
         try:
             request_json = json.loads(request_data)
         except json.JSONDecodeError as e:
-            await websocket.send_text(json.dumps({
+            await _send_message(websocket, encode_message({
                 "type": "error",
                 "error": f"JSON格式错误: {str(e)}"
             }))
             await websocket.close()
             return
         
+        # 断线重连：续传已有会话
+        if isinstance(request_json, dict) and request_json.get("session_id"):
+            await _resume_session(websocket, request_json)
+            return
+        
         # 验证请求格式
         try:
             request = validate_processing_master_request(request_json)
         except Exception as e:
-            await websocket.send_text(json.dumps({
+            await _send_message(websocket, encode_message({
                 "type": "error", 
                 "error": f"请求参数验证失败: {str(e)}"
             }))
@@ -73,70 +487,24 @@ async def websocket_process(websocket: WebSocket):
         app_logger.info(f"开始WebSocket处理请求: {request.text_description[:50] if request.text_description else 'image_only'}...")
         app_logger.debug(f"请求详情 - image_url存在: {bool(request.image_url)}, text_description: {request.text_description}, user_location: {request.user_location}")
         
-        # 使用总处理协调器Agent处理请求
-        async with ProcessingMasterAgent() as agent:
-            try:
-                step_count = 0
-                async for step in agent.process_complete_solution(request):
-                    step_count += 1
-                    app_logger.debug(f"收到第{step_count}个步骤: {step.step_name} - {step.status.value}")
-                    
-                    # 发送步骤更新
-                    step_data = {
-                        "type": "step_update",
-                        "step": step.step_name,
-                        "title": step.step_title,
-                        "status": step.status.value,
-                        "description": step.description,
-                        "timestamp": datetime.fromtimestamp(step.timestamp).isoformat() if step.timestamp else datetime.now().isoformat()
-                    }
-                    
-                    # 添加结果数据（如果有）
-                    if step.result is not None:
-                        step_data["result"] = step.result  # type: ignore
-                        # 特别记录最终结果
-                        if step.step_name == "result_integration":
-                            app_logger.info(f"最终结果步骤: 状态={step.status.value}, 结果大小={len(str(step.result))}")
-                    else:
-                        # 记录空结果的情况
-                        if step.step_name == "result_integration":
-                            app_logger.warning(f"最终结果步骤结果为空: 状态={step.status.value}, 错误={step.error}")
-                    
-                    # 添加错误信息（如果有） 
-                    if step.error:
-                        step_data["error"] = step.error
-                    
-                    # 添加元数据（如果有）
-                    if step.metadata:
-                        step_data["metadata"] = step.metadata  # type: ignore
-                    
-                    await websocket.send_text(json.dumps(step_data, ensure_ascii=False))
-                    app_logger.debug(f"发送步骤更新: {step.step_name} - {step.status.value}")
-                
-                app_logger.info(f"处理完成，总共处理了{step_count}个步骤")
-                
-                # 发送完成信号
-                await websocket.send_text(json.dumps({
-                    "type": "process_complete",
-                    "message": "处理完成",
-                    "timestamp": datetime.now().isoformat()
-                }))
-                app_logger.info("WebSocket处理完成")
-                
-            except Exception as e:
-                app_logger.error(f"处理过程中发生错误: {e}")
-                await websocket.send_text(json.dumps({
-                    "type": "error",
-                    "error": f"处理失败: {str(e)}",
-                    "timestamp": datetime.now().isoformat()
-                }))
-    
+        try:
+            ticket = await _admit_while_connected(websocket)
+        except AdmissionRejectedError as e:
+            app_logger.warning(f"处理请求未被接纳: {e}")
+            await _send_message(websocket, encode_message(_rejected_message(e)))
+            return
+        
+        session_id = await _start_session(request, ticket)
+        await _send_message(websocket, encode_message({"type": "session", "session_id": session_id}))
+        await _relay_session(websocket, session_id)
+        app_logger.info("WebSocket处理完成")
+
     except WebSocketDisconnect:
         app_logger.info("WebSocket连接已断开")
     except Exception as e:
         app_logger.error(f"WebSocket处理异常: {e}")
         try:
-            await websocket.send_text(json.dumps({
+            await _send_message(websocket, encode_message({
                 "type": "error",
                 "error": f"服务器错误: {str(e)}",
                 "timestamp": datetime.now().isoformat()
@@ -148,3 +516,276 @@ async def websocket_process(websocket: WebSocket):
             await websocket.close()
         except:
             pass
+
+
+@router.websocket("/ws/batch")
+async def websocket_batch(websocket: WebSocket):
+    """
+    WebSocket批量处理端点
+    
+    一次提交多件物品，在同一个会话中处理并逐件推送进度。
+    内容相同的物品只处理一次，同款物品共享整体方案缓存，同时处理的物品数受BATCH_MAX_CONCURRENCY限制。
+    
+    请求格式：
+    {
+        "items": [处理请求, ...]   // 每件物品的格式与/ws/process相同，最多BATCH_MAX_ITEMS件
+    }
+    
+    服务端先返回会话ID，然后依次推送：
+    {"type": "batch_start", "total_items": 物品数, "unique_items": 去重后物品数}
+    各物品的消息（格式与/ws/process相同），items字段为共享该消息的物品序号列表（从0开始）
+    {"type": "batch_complete", "total_items": 物品数, "unique_items": 去重后物品数}
+    
+    断线续传方式与/ws/process相同
+    """
+    if not await _accept(websocket):
+        return
+    app_logger.info("批量处理WebSocket连接已建立")
+    
+    try:
+        request_data = await websocket.receive_text()
+        try:
+            request_json = json.loads(request_data)
+        except json.JSONDecodeError as e:
+            await _send_message(websocket, encode_message({
+                "type": "error",
+                "error": f"JSON格式错误: {str(e)}"
+            }))
+            return
+        
+        # 断线重连：续传已有会话
+        if isinstance(request_json, dict) and request_json.get("session_id"):
+            await _resume_session(websocket, request_json)
+            return
+        
+        try:
+            requests = validate_batch_request(request_json, settings.batch_max_items)
+        except HTTPException as e:
+            await _send_message(websocket, encode_message({
+                "type": "error",
+                "error": f"请求参数验证失败: {e.detail}"
+            }))
+            return
+        
+        # 批量处理在当前进程后台执行，与连接解耦
+        session_id = step_event_log.new_channel()
+        _track_session(session_id, asyncio.create_task(
+            record_batch(step_event_log, session_id, processing_master_agent, requests, settings.batch_max_concurrency),
+            name=f"batch:{session_id}"
+        ))
+        
+        await _send_message(websocket, encode_message({"type": "session", "session_id": session_id}))
+        await _relay_session(websocket, session_id)
+        app_logger.info("批量处理WebSocket处理完成")
+    
+    except WebSocketDisconnect:
+        app_logger.info("批量处理WebSocket连接已断开")
+    except Exception as e:
+        app_logger.error(f"批量处理WebSocket异常: {e}")
+        try:
+            await _send_message(websocket, encode_message({
+                "type": "error",
+                "error": f"服务器错误: {str(e)}",
+                "timestamp": datetime.now().isoformat()
+            }))
+        except Exception:
+            pass  # 连接可能已断开
+    finally:
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+
+
+@router.websocket("/ws/v2")
+async def websocket_multiplex(websocket: WebSocket):
+    """
+    WebSocket多路复用处理端点（v2协议）
+    
+    一条连接同时进行多个处理请求，每条消息用客户端指定的request_id区分；
+    同一连接同时进行的请求数不超过WEBSOCKET_MAX_INFLIGHT。
+    
+    客户端消息：
+    {"action": "process", "request_id": "请求ID", ...处理请求字段（与/ws/process相同）}
+    {"action": "cancel", "request_id": "请求ID"}
+    {"action": "resume", "request_id": "请求ID", "session_id": "会话ID", "resume_from": 最后收到的seq}
+    
+    服务端消息：
+    {"type": "queued", "request_id": "请求ID", "position": 排队位置, "estimated_wait_seconds": 预计等待秒数}
+    {"type": "rejected", "request_id": "请求ID", "error": "错误信息", "retry_after": 建议重试间隔（秒）}
+    {"type": "accepted", "request_id": "请求ID", "session_id": "会话ID"}
+    各请求的消息（格式与/ws/process相同），开头带request_id，以process_complete或error结束
+    {"type": "cancelled", "request_id": "请求ID", "session_id": "会话ID"}
+    {"type": "error", "request_id": "请求ID", "error": "错误信息"}   // 无法识别请求时不带request_id
+    
+    连接断开后进行中的处理继续执行，可在新连接上用resume续传
+    """
+    if not await _accept(websocket):
+        return
+    app_logger.info("v2 WebSocket连接已建立")
+    connection = _MultiplexConnection(websocket, settings.websocket_max_inflight)
+    
+    try:
+        while True:
+            request_data = await websocket.receive_text()
+            try:
+                payload = json.loads(request_data)
+            except json.JSONDecodeError as e:
+                await connection.send_error(None, f"JSON格式错误: {str(e)}")
+                continue
+            await connection.handle(payload)
+    
+    except WebSocketDisconnect:
+        app_logger.info("v2 WebSocket连接已断开")
+    except Exception as e:
+        app_logger.error(f"v2 WebSocket异常: {e}")
+        try:
+            await connection.send_error(None, f"服务器错误: {str(e)}")
+        except Exception:
+            pass  # 连接可能已断开
+    finally:
+        await connection.close()
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+
+def _sse_response(events: AsyncIterator[str], accept_encoding: Optional[str]) -> StreamingResponse:
+    """SSE响应：空闲时发送心跳，客户端支持时gzip流式压缩，并禁止代理缓存和缓冲"""
+    compress = settings.sse_compression_enabled and accepts_gzip(accept_encoding)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    body = encode_stream(with_heartbeat(events, settings.sse_heartbeat_interval), compress)
+    return StreamingResponse(body, media_type="text/event-stream", headers=headers)
+
+
+async def _session_events(session_id: str, after: int = 0) -> AsyncIterator[str]:
+    """会话日志中seq大于after的消息和后续消息，逐条编码为以seq为id的SSE事件"""
+    try:
+        async for seq, message in step_event_log.read_events(session_id, after):
+            yield format_event(message, event_id=seq)
+    except TimeoutError as e:
+        app_logger.error(f"等待处理进度超时 {session_id}: {e}")
+        yield format_event(encode_message({
+            "type": "error",
+            "error": f"处理失败: {str(e)}",
+            "timestamp": datetime.now().isoformat()
+        }))
+
+
+async def _started_session_events(session_id: str) -> AsyncIterator[str]:
+    """已启动会话的SSE事件流：重连间隔、会话ID，然后是会话消息"""
+    yield format_retry()
+    yield format_event(encode_message({"type": "session", "session_id": session_id}))
+    async for event in _session_events(session_id):
+        yield event
+
+
+async def _queued_session_events(request: ProcessingMasterRequest) -> AsyncIterator[str]:
+    """需要排队的请求：推送排队位置，接纳后启动处理；客户端断开时放弃排队"""
+    yield format_retry()
+    positions: asyncio.Queue = asyncio.Queue()
+
+    async def _on_position(position: int, wait: float) -> None:
+        positions.put_nowait(_queued_message(position, wait))
+
+    acquire_task = asyncio.create_task(_admit(_on_position))
+    position_task: Optional[asyncio.Future] = None
+    session_id: Optional[str] = None
+    try:
+        while not acquire_task.done():
+            position_task = asyncio.ensure_future(positions.get())
+            await asyncio.wait({acquire_task, position_task}, return_when=asyncio.FIRST_COMPLETED)
+            if position_task.done():
+                yield format_event(encode_message(position_task.result()))
+            else:
+                position_task.cancel()
+            position_task = None
+        try:
+            ticket = acquire_task.result()
+        except AdmissionRejectedError as e:
+            app_logger.warning(f"SSE处理请求未被接纳: {e}")
+            yield format_event(encode_message(_rejected_message(e)))
+            return
+
+        session_id = await _start_session(request, ticket)
+        app_logger.info(f"SSE排队结束，开始处理: {session_id}")
+        yield format_event(encode_message({"type": "session", "session_id": session_id}))
+        async for event in _session_events(session_id):
+            yield event
+    finally:
+        if position_task is not None:
+            position_task.cancel()
+        if not acquire_task.done():
+            acquire_task.cancel()
+        elif session_id is None and not acquire_task.cancelled() and acquire_task.exception() is None:
+            # 名额已分配但处理尚未启动（如排队位置与名额同时到达时客户端断开），归还名额
+            ticket = acquire_task.result()
+            if ticket is not None:
+                ticket.release()
+
+
+@router.post("/stream")
+async def stream_process(
+    payload: Dict[str, Any] = Body(...),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    SSE实时处理端点（text/event-stream）
+    
+    请求体与/ws/process的处理请求相同。适用于无法使用WebSocket的客户端，经HTTP/1.1代理和CDN也可正常推送：
+    每个事件的data为一条JSON消息（格式与/ws/process相同），会话消息的id为其seq；
+    空闲时发送注释行心跳；请求头Accept-Encoding包含gzip时响应流式压缩。
+    
+    第一个事件为 {"type": "session", "session_id": "会话ID"}（需要排队时先推送queued事件，
+    排队超时推送rejected事件）；断线后通过 GET /tasks/stream/{session_id} 续传。
+    处理名额已满且无法排队时返回503，Retry-After头为建议的重试间隔（秒）。
+    """
+    request = validate_processing_master_request(payload)
+    if _admission_enabled():
+        try:
+            ticket = admission_controller.try_acquire()
+        except AdmissionRejectedError as e:
+            app_logger.warning(f"SSE处理请求未被接纳: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        if ticket is None:
+            return _sse_response(_queued_session_events(request), accept_encoding)
+    else:
+        ticket = None
+
+    session_id = await _start_session(request, ticket)
+    app_logger.info(f"SSE处理会话已启动: {session_id}")
+    return _sse_response(_started_session_events(session_id), accept_encoding)
+
+
+@router.get("/stream/{session_id}")
+async def stream_session(
+    session_id: str,
+    resume_from: Optional[int] = Query(None, ge=0, description="最后收到的seq（未带Last-Event-ID请求头时使用）"),
+    last_event_id: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    SSE续传端点
+    
+    从Last-Event-ID请求头（浏览器EventSource重连时自动携带）或resume_from参数之后补发会话消息并继续推送，
+    会话结束后关闭响应；会话不存在或已过期时返回404
+    """
+    if not await step_event_log.exists(session_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="会话不存在或已过期")
+    after = parse_last_event_id(last_event_id) if last_event_id is not None else (resume_from or 0)
+    app_logger.info(f"SSE续传会话: {session_id}，after={after}")
+
+    async def _events() -> AsyncIterator[str]:
+        yield format_retry()
+        async for event in _session_events(session_id, after):
+            yield event
+
+    return _sse_response(_events(), accept_encoding)
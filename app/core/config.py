@@ -57,6 +57,59 @@ class Settings(BaseSettings):
     lanxin_app_key: str = Field(env="LANXIN_APP_KEY")
     lanxin_api_base_url: str = Field(default="https://api-ai.vivo.com.cn/vivogpt/completions", env="LANXIN_API_BASE_URL")
     lanxin_text_model: str = Field(default="vivo-BlueLM-TB-Pro", env="LANXIN_TEXT_MODEL")
+    lanxin_vision_model: str = Field(default="BlueLM-Vision-prd", env="LANXIN_VISION_MODEL")
+    lanxin_stream_url: str = Field(default="https://api-ai.vivo.com.cn/vivogpt/completions/stream", env="LANXIN_STREAM_URL")
+    lanxin_stream_enabled: bool = Field(default=True, env="LANXIN_STREAM_ENABLED")
+    
+    # 蓝心网关连接池配置
+    lanxin_http2: bool = Field(default=True, env="LANXIN_HTTP2")
+    lanxin_max_connections: int = Field(default=100, env="LANXIN_MAX_CONNECTIONS")
+    lanxin_max_keepalive_connections: int = Field(default=20, env="LANXIN_MAX_KEEPALIVE_CONNECTIONS")
+    lanxin_keepalive_expiry: float = Field(default=60.0, env="LANXIN_KEEPALIVE_EXPIRY")
+    lanxin_warmup_connections: int = Field(default=2, env="LANXIN_WARMUP_CONNECTIONS")
+    
+    # 蓝心网关调度配置（AIMD自适应并发窗口）
+    llm_gateway_initial_concurrency: int = Field(default=8, env="LLM_GATEWAY_INITIAL_CONCURRENCY")
+    llm_gateway_min_concurrency: int = Field(default=2, env="LLM_GATEWAY_MIN_CONCURRENCY")
+    llm_gateway_max_concurrency: int = Field(default=64, env="LLM_GATEWAY_MAX_CONCURRENCY")
+    llm_gateway_backoff_ratio: float = Field(default=0.5, env="LLM_GATEWAY_BACKOFF_RATIO")
+    llm_gateway_queue_timeout: float = Field(default=30.0, env="LLM_GATEWAY_QUEUE_TIMEOUT")
+    
+    # 蓝心网关弹性配置（对冲请求与熔断）
+    llm_hedging_enabled: bool = Field(default=True, env="LLM_HEDGING_ENABLED")
+    llm_hedge_percentile: float = Field(default=95.0, env="LLM_HEDGE_PERCENTILE")
+    llm_hedge_min_samples: int = Field(default=20, env="LLM_HEDGE_MIN_SAMPLES")
+    llm_circuit_failure_threshold: int = Field(default=5, env="LLM_CIRCUIT_FAILURE_THRESHOLD")
+    llm_circuit_recovery_timeout: float = Field(default=30.0, env="LLM_CIRCUIT_RECOVERY_TIMEOUT")
+    
+    # 蓝心补全结果缓存配置
+    llm_cache_enabled: bool = Field(default=True, env="LLM_CACHE_ENABLED")
+    llm_cache_max_entries: int = Field(default=2048, env="LLM_CACHE_MAX_ENTRIES")
+    llm_cache_default_ttl: int = Field(default=3600, env="LLM_CACHE_DEFAULT_TTL")
+    llm_cache_redis_enabled: bool = Field(default=False, env="LLM_CACHE_REDIS_ENABLED")
+    
+    # 图片分析结果缓存配置
+    image_cache_enabled: bool = Field(default=True, env="IMAGE_CACHE_ENABLED")
+    image_cache_max_entries: int = Field(default=512, env="IMAGE_CACHE_MAX_ENTRIES")
+    image_cache_ttl: int = Field(default=86400, env="IMAGE_CACHE_TTL")
+    image_cache_dhash_threshold: int = Field(default=6, env="IMAGE_CACHE_DHASH_THRESHOLD")
+    image_cache_redis_enabled: bool = Field(default=False, env="IMAGE_CACHE_REDIS_ENABLED")
+    
+    # 整体方案缓存配置（按物品指纹缓存处置/改造/二手方案，回收方案另按地理网格缓存）
+    solution_cache_enabled: bool = Field(default=True, env="SOLUTION_CACHE_ENABLED")
+    solution_cache_max_entries: int = Field(default=1024, env="SOLUTION_CACHE_MAX_ENTRIES")
+    solution_cache_ttl: int = Field(default=21600, env="SOLUTION_CACHE_TTL")  # 物品方案有效期（秒）
+    solution_cache_location_ttl: int = Field(default=86400, env="SOLUTION_CACHE_LOCATION_TTL")  # 回收方案有效期（秒）
+    solution_cache_geo_tile: float = Field(default=0.05, env="SOLUTION_CACHE_GEO_TILE")  # 地理网格边长（度，约5公里）
+    solution_cache_redis_enabled: bool = Field(default=False, env="SOLUTION_CACHE_REDIS_ENABLED")
+    solution_cache_inflight_wait_ratio: float = Field(default=0.25, env="SOLUTION_CACHE_INFLIGHT_WAIT_RATIO")  # 批量中同款物品等待先到方案的时间上限（占剩余时间预算的比例）
+    
+    # 图片预处理配置（视觉模型上传前缩放与重新编码）
+    image_preprocess_enabled: bool = Field(default=True, env="IMAGE_PREPROCESS_ENABLED")
+    image_max_edge: int = Field(default=1280, env="IMAGE_MAX_EDGE")  # 最长边上限（像素）
+    image_quality: int = Field(default=85, env="IMAGE_QUALITY")
+    image_output_format: str = Field(default="JPEG", env="IMAGE_OUTPUT_FORMAT")  # JPEG或WEBP
+    image_preprocess_workers: int = Field(default=2, env="IMAGE_PREPROCESS_WORKERS")
     
     # 高德地图API配置
     amap_api_key: str = Field(env="AMAP_API_KEY")
@@ -76,6 +129,33 @@ class Settings(BaseSettings):
     crawler_timeout: int = Field(default=30, env="CRAWLER_TIMEOUT")
     crawler_max_retries: int = Field(default=3, env="CRAWLER_MAX_RETRIES")
     
+    # 处理流程配置
+    processing_time_budget: float = Field(default=120.0, env="PROCESSING_TIME_BUDGET")  # 单次完整处理的时间预算（秒）
+    processing_speculative_fanout: bool = Field(default=True, env="PROCESSING_SPECULATIVE_FANOUT")  # 协调器与处置推荐同时启动
+    analysis_streaming_enabled: bool = Field(default=True, env="ANALYSIS_STREAMING_ENABLED")  # 分析结果流式输出，关键字段闭合后提前启动下游
+    llm_fused_tasks_enabled: bool = Field(default=True, env="LLM_FUSED_TASKS_ENABLED")  # 回收类型与搜索关键词合并为一次调用
+    processing_execution_mode: str = Field(default="local", env="PROCESSING_EXECUTION_MODE")  # local: API进程内执行；celery: 分发到Celery worker执行
+    processing_relay_idle_timeout: float = Field(default=180.0, env="PROCESSING_RELAY_IDLE_TIMEOUT")  # 转发worker进度时连续无消息的最长等待（秒）
+    step_event_ttl: int = Field(default=600, env="STEP_EVENT_TTL")  # 处理结束后事件日志保留时间（秒），期间可断线续传
+    step_event_redis_enabled: bool = Field(default=False, env="STEP_EVENT_REDIS_ENABLED")  # 事件日志写入Redis（多实例续传；celery模式始终使用Redis）
+    batch_max_items: int = Field(default=50, env="BATCH_MAX_ITEMS")  # 批量处理单次最多物品数
+    batch_max_concurrency: int = Field(default=4, env="BATCH_MAX_CONCURRENCY")  # 批量处理同时处理的物品数上限
+    message_serializer: str = Field(default="auto", env="MESSAGE_SERIALIZER")  # 消息序列化：auto（有orjson时使用）|orjson|json
+    websocket_max_inflight: int = Field(default=4, env="WEBSOCKET_MAX_INFLIGHT")  # v2多路复用连接同时进行的请求数上限
+    sse_heartbeat_interval: float = Field(default=15.0, env="SSE_HEARTBEAT_INTERVAL")  # SSE连接空闲时发送心跳的间隔（秒），需小于代理的空闲超时
+    sse_compression_enabled: bool = Field(default=True, env="SSE_COMPRESSION_ENABLED")  # 客户端支持时SSE响应使用gzip流式压缩
+    task_progress_ttl: int = Field(default=3600, env="TASK_PROGRESS_TTL")  # 轮询模式任务进度在Redis中的有效期（秒）
+    task_progress_flush_interval: float = Field(default=1.0, env="TASK_PROGRESS_FLUSH_INTERVAL")  # 同一步骤重复更新合并写入的最短间隔（秒），进入新步骤时立即写入
+    
+    # 处理准入控制（进程内执行时限制同时运行的处理流程数，上限按实测阶段耗时自适应）
+    admission_enabled: bool = Field(default=True, env="ADMISSION_ENABLED")
+    admission_initial_concurrency: int = Field(default=8, env="ADMISSION_INITIAL_CONCURRENCY")
+    admission_min_concurrency: int = Field(default=2, env="ADMISSION_MIN_CONCURRENCY")
+    admission_max_concurrency: int = Field(default=32, env="ADMISSION_MAX_CONCURRENCY")
+    admission_max_queue: int = Field(default=32, env="ADMISSION_MAX_QUEUE")  # 等待队列长度上限
+    admission_max_wait: float = Field(default=60.0, env="ADMISSION_MAX_WAIT")  # 最长排队时间（秒），预计等待更久时直接拒绝
+    admission_latency_tolerance: float = Field(default=2.0, env="ADMISSION_LATENCY_TOLERANCE")  # 阶段耗时超过基线的倍数视为过载
+    
     # 日志配置
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     log_file: str = Field(default=str(BASE_DIR / "logs" / "app.log"), env="LOG_FILE")
@@ -83,6 +83,7 @@ from .content_generation_models import (
 
 from .processing_master_models import (
     ProcessingStep,
+    ProcessingStepEvent,
     ProcessingStepStatus,
     ProcessingMasterRequest,
     ProcessingMasterResponse,
@@ -166,6 +167,7 @@ __all__ = [
     
     # 总处理协调器相关模型
     "ProcessingStep",
+    "ProcessingStepEvent",
     "ProcessingStepStatus",
     "ProcessingMasterRequest",
     "ProcessingMasterResponse",
@@ -8,6 +8,8 @@ from typing import Dict, Any, Optional
 
 from pydantic import BaseModel, Field, validator
 
+from app.utils.json_stream import extract_json
+
 
 class ContentGenerationResult(BaseModel):
     """文案生成结果"""
@@ -108,50 +110,16 @@ class ContentGenerationDataConverter:
     @staticmethod
     def parse_ai_response(content: str) -> Optional[ContentGenerationResult]:
         """解析AI响应内容"""
-        import json
+        result = extract_json(content)
+        if not isinstance(result, dict):
+            return None
+        
+        title = str(result.get("title", "")).strip()
+        description = str(result.get("description", "")).strip()
+        if not title or not description:
+            return None
         
         try:
-            # 尝试直接解析JSON
-            try:
-                result = json.loads(content)
-                title = result.get("title", "").strip()
-                description = result.get("description", "").strip()
-                
-                if title and description:
-                    return ContentGenerationResult(title=title, description=description)
-            except json.JSONDecodeError:
-                pass
-            
-            # 尝试从代码块中提取JSON
-            if "```json" in content:
-                start_marker = "```json"
-                end_marker = "```"
-                start_index = content.find(start_marker)
-                if start_index != -1:
-                    start_index += len(start_marker)
-                    end_index = content.find(end_marker, start_index)
-                    if end_index != -1:
-                        json_str = content[start_index:end_index].strip()
-                        result = json.loads(json_str)
-                        title = result.get("title", "").strip()
-                        description = result.get("description", "").strip()
-                        
-                        if title and description:
-                            return ContentGenerationResult(title=title, description=description)
-            
-            # 尝试查找花括号内容
-            first_brace = content.find('{')
-            last_brace = content.rfind('}')
-            if first_brace != -1 and last_brace != -1 and first_brace < last_brace:
-                json_str = content[first_brace:last_brace + 1]
-                result = json.loads(json_str)
-                title = result.get("title", "").strip()
-                description = result.get("description", "").strip()
-                
-                if title and description:
-                    return ContentGenerationResult(title=title, description=description)
-            
+            return ContentGenerationResult(title=title, description=description)
+        except ValueError:
             return None
-            
-        except Exception:
-            return None 
\ No newline at end of file
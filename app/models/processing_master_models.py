@@ -5,7 +5,7 @@
 整合四大Agent的响应，去除重复字段
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Literal
 from enum import Enum
 from pydantic import BaseModel, Field
 
@@ -34,6 +34,21 @@ class ProcessingStep(BaseModel):
     error: Optional[str] = Field(None, description="错误信息")
     metadata: Optional[Dict[str, Any]] = Field(None, description="步骤元数据")
     timestamp: Optional[float] = Field(None, description="时间戳")
+    
+    def snapshot(self) -> "ProcessingStepEvent":
+        """生成当前状态的只读快照
+        
+        Agent在yield之后会继续更新同一个步骤对象，推送出去的是快照。快照只复制字段引用，
+        不深拷贝result和metadata：这两个字段只会被整体替换、不会原地修改，消费方也应按只读使用
+        """
+        return ProcessingStepEvent.construct(_fields_set=set(self.__fields_set__), **self.__dict__)
+
+
+class ProcessingStepEvent(ProcessingStep):
+    """推送给消费方的步骤事件（不可修改）"""
+    
+    class Config:
+        frozen = True
 
 
 class ProcessingMasterRequest(BaseModel):
@@ -45,6 +60,12 @@ class ProcessingMasterRequest(BaseModel):
     # 处理选项
     enable_parallel: bool = Field(default=True, description="是否启用并行处理")
     max_results_per_platform: int = Field(default=10, description="每个平台最大返回结果数")
+    time_budget_seconds: Optional[float] = Field(
+        None, gt=0, description="请求时间预算（秒），超出后未完成的环节被取消并返回部分结果；不超过服务端配置的上限"
+    )
+    wire_format: Literal["full", "compact"] = Field(
+        default="full", description="消息格式：full为完整格式，compact省去重复发送的标题、描述和结果内容"
+    )
     
     class Config:
         schema_extra = {
@@ -53,7 +74,8 @@ class ProcessingMasterRequest(BaseModel):
                 "text_description": "一台使用两年的iPhone 12，黑色，功能正常",
                 "user_location": {"lat": 39.906823, "lon": 116.447303},
                 "enable_parallel": True,
-                "max_results_per_platform": 10
+                "max_results_per_platform": 10,
+                "time_budget_seconds": 60
             }
         }
 
@@ -79,6 +101,7 @@ class ProcessingMetadata(BaseModel):
     processing_time_seconds: float = Field(..., description="总处理时间（秒）")
     agents_executed: ProcessingAgentSummary = Field(..., description="Agent执行情况")
     analysis_metadata: Optional[ProcessingAnalysisMetadata] = Field(None, description="分析元数据")
+    cache_hit: bool = Field(default=False, description="是否命中整体方案缓存")
 
 
 class DisposalSolution(BaseModel):
@@ -134,6 +157,10 @@ class ProcessingMasterResponse(BaseModel):
     # 处理元数据和摘要
     processing_metadata: ProcessingMetadata = Field(..., description="处理元数据")
     
+    # 超时信息：超出请求时间预算时只返回已完成的部分结果
+    partial: bool = Field(default=False, description="是否为部分结果")
+    timed_out_sections: Optional[List[str]] = Field(None, description="超时未完成的环节")
+    
     # 错误信息
     error: Optional[str] = Field(None, description="全局错误信息")
     
@@ -165,6 +192,64 @@ class ProcessingMasterResponse(BaseModel):
 class ProcessingMasterDataConverter:
     """总处理协调器数据转换器"""
     
+    @staticmethod
+    def to_disposal_solution(disposal_recommendation: DisposalRecommendationResponse) -> DisposalSolution:
+        """转换处置推荐（去除重复的analysis_result）"""
+        disposal_data = disposal_recommendation.to_dict()
+        disposal_data.pop("analysis_result", None)  # 移除重复字段
+        return DisposalSolution(
+            success=disposal_data.get("success", False),
+            recommendations=disposal_data.get("recommendations"),
+            recommendation_source=disposal_data.get("recommendation_source"),
+            error=disposal_data.get("error")
+        )
+    
+    @staticmethod
+    def to_creative_solution(creative_coordination: CoordinatorResponse) -> CreativeSolution:
+        """转换创意改造（去除重复的analysis_result）"""
+        creative_data = creative_coordination.to_dict()
+        creative_data.pop("analysis_result", None)  # 移除重复字段
+        return CreativeSolution(
+            success=creative_data.get("success", False),
+            renovation_plan=creative_data.get("renovation_plan"),
+            videos=creative_data.get("videos"),
+            keywords=creative_data.get("keywords"),  # 搜索关键字
+            search_intent=creative_data.get("search_intent"),  # 搜索意图
+            error=creative_data.get("error")
+        )
+    
+    @staticmethod
+    def to_recycling_solution(recycling_coordination: RecyclingCoordinatorResponse) -> RecyclingSolution:
+        """转换回收方案（去除重复的analysis_result）"""
+        recycling_data = recycling_coordination.to_dict()
+        # 移除嵌套的analysis_result
+        if "location_recommendation" in recycling_data:
+            recycling_data["location_recommendation"].pop("analysis_result", None)
+        return RecyclingSolution(
+            success=recycling_data.get("success", False),
+            processing_summary=recycling_data.get("processing_summary"),
+            location_recommendation=recycling_data.get("location_recommendation"),
+            platform_recommendation=recycling_data.get("platform_recommendation"),
+            error=recycling_data.get("error")
+        )
+    
+    @staticmethod
+    def to_secondhand_solution(secondhand_coordination: SecondhandTradingResponse) -> SecondhandSolution:
+        """转换二手交易（去除重复的analysis_result）"""
+        secondhand_data = secondhand_coordination.to_dict()
+        # 移除嵌套的analysis_result
+        if "search_result" in secondhand_data:
+            secondhand_data["search_result"].pop("analysis_result", None)
+        if "content_result" in secondhand_data:
+            secondhand_data["content_result"].pop("analysis_result", None)
+        return SecondhandSolution(
+            success=secondhand_data.get("success", False),
+            search_result=secondhand_data.get("search_result"),
+            content_result=secondhand_data.get("content_result"),
+            processing_metadata=secondhand_data.get("processing_metadata"),
+            error=secondhand_data.get("error")
+        )
+    
     @staticmethod
     def create_response(
         success: bool,
@@ -174,9 +259,43 @@ class ProcessingMasterDataConverter:
         recycling_coordination: Optional[RecyclingCoordinatorResponse] = None,
         secondhand_coordination: Optional[SecondhandTradingResponse] = None,
         processing_time_seconds: float = 0.0,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        timed_out_sections: Optional[List[str]] = None
     ) -> ProcessingMasterResponse:
-        """创建统一的总处理协调器响应对象（去除重复字段）"""
+        """创建统一的总处理协调器响应对象（去除重复字段）
+        
+        timed_out_sections中的环节（disposal_recommendation、creative_coordination、
+        recycling_coordination、secondhand_coordination）超出请求时间预算，
+        对应方案标记为失败并注明超时，响应标记为部分结果
+        """
+        converter = ProcessingMasterDataConverter
+        return converter.assemble_response(
+            success=success,
+            analysis_result=analysis_result,
+            disposal_solution=converter.to_disposal_solution(disposal_recommendation) if disposal_recommendation else None,
+            creative_solution=converter.to_creative_solution(creative_coordination) if creative_coordination else None,
+            recycling_solution=converter.to_recycling_solution(recycling_coordination) if recycling_coordination else None,
+            secondhand_solution=converter.to_secondhand_solution(secondhand_coordination) if secondhand_coordination else None,
+            processing_time_seconds=processing_time_seconds,
+            error=error,
+            timed_out_sections=timed_out_sections
+        )
+    
+    @staticmethod
+    def assemble_response(
+        success: bool,
+        analysis_result: Dict[str, Any],
+        disposal_solution: Optional[DisposalSolution] = None,
+        creative_solution: Optional[CreativeSolution] = None,
+        recycling_solution: Optional[RecyclingSolution] = None,
+        secondhand_solution: Optional[SecondhandSolution] = None,
+        processing_time_seconds: float = 0.0,
+        error: Optional[str] = None,
+        timed_out_sections: Optional[List[str]] = None,
+        cache_hit: bool = False
+    ) -> ProcessingMasterResponse:
+        """由已转换的各方案组装响应对象（整体方案缓存命中时直接使用缓存的方案）"""
+        timed_out_sections = list(timed_out_sections or [])
         
         # 提取分析元数据（不修改原始数据）
         analysis_metadata = None
@@ -191,63 +310,16 @@ class ProcessingMasterDataConverter:
             analysis_result = analysis_result.copy()
             analysis_result.pop("_merge_metadata", None)
         
-        # 转换处置推荐（去除重复的analysis_result）
-        disposal_solution = None
-        if disposal_recommendation:
-            disposal_data = disposal_recommendation.to_dict()
-            disposal_data.pop("analysis_result", None)  # 移除重复字段
-            disposal_solution = DisposalSolution(
-                success=disposal_data.get("success", False),
-                recommendations=disposal_data.get("recommendations"),
-                recommendation_source=disposal_data.get("recommendation_source"),
-                error=disposal_data.get("error")
-            )
-        
-        # 转换创意改造（去除重复的analysis_result）
-        creative_solution = None
-        if creative_coordination:
-            creative_data = creative_coordination.to_dict()
-            creative_data.pop("analysis_result", None)  # 移除重复字段
-            creative_solution = CreativeSolution(
-                success=creative_data.get("success", False),
-                renovation_plan=creative_data.get("renovation_plan"),
-                videos=creative_data.get("videos"),
-                keywords=creative_data.get("keywords"),  # 搜索关键字
-                search_intent=creative_data.get("search_intent"),  # 搜索意图
-                error=creative_data.get("error")
-            )
-        
-        # 转换回收方案（去除重复的analysis_result）
-        recycling_solution = None
-        if recycling_coordination:
-            recycling_data = recycling_coordination.to_dict()
-            # 移除嵌套的analysis_result
-            if "location_recommendation" in recycling_data:
-                recycling_data["location_recommendation"].pop("analysis_result", None)
-            recycling_solution = RecyclingSolution(
-                success=recycling_data.get("success", False),
-                processing_summary=recycling_data.get("processing_summary"),
-                location_recommendation=recycling_data.get("location_recommendation"),
-                platform_recommendation=recycling_data.get("platform_recommendation"),
-                error=recycling_data.get("error")
-            )
-        
-        # 转换二手交易（去除重复的analysis_result）
-        secondhand_solution = None
-        if secondhand_coordination:
-            secondhand_data = secondhand_coordination.to_dict()
-            # 移除嵌套的analysis_result
-            if "search_result" in secondhand_data:
-                secondhand_data["search_result"].pop("analysis_result", None)
-            if "content_result" in secondhand_data:
-                secondhand_data["content_result"].pop("analysis_result", None)
-            secondhand_solution = SecondhandSolution(
-                success=secondhand_data.get("success", False),
-                search_result=secondhand_data.get("search_result"),
-                content_result=secondhand_data.get("content_result"),
-                processing_metadata=secondhand_data.get("processing_metadata"),
-                error=secondhand_data.get("error")
-            )
+        # 超时环节：方案标记为失败并注明超时
+        timeout_error = "超出请求时间预算，未完成"
+        if "disposal_recommendation" in timed_out_sections and disposal_solution is None:
+            disposal_solution = DisposalSolution(success=False, error=timeout_error)
+        if "creative_coordination" in timed_out_sections and creative_solution is None:
+            creative_solution = CreativeSolution(success=False, error=timeout_error)
+        if "recycling_coordination" in timed_out_sections and recycling_solution is None:
+            recycling_solution = RecyclingSolution(success=False, error=timeout_error)
+        if "secondhand_coordination" in timed_out_sections and secondhand_solution is None:
+            secondhand_solution = SecondhandSolution(success=False, error=timeout_error)
         
         # 创建Agent执行摘要
         agents_executed = ProcessingAgentSummary(
@@ -265,7 +337,8 @@ class ProcessingMasterDataConverter:
         processing_metadata = ProcessingMetadata(
             processing_time_seconds=processing_time_seconds,
             agents_executed=agents_executed,
-            analysis_metadata=analysis_metadata
+            analysis_metadata=analysis_metadata,
+            cache_hit=cache_hit
         )
         
         # 创建响应对象
@@ -277,6 +350,8 @@ class ProcessingMasterDataConverter:
             recycling_solution=recycling_solution,
             secondhand_solution=secondhand_solution,
             processing_metadata=processing_metadata,
+            partial=bool(timed_out_sections),
+            timed_out_sections=timed_out_sections or None,
             error=error
         )
     
@@ -286,7 +361,8 @@ class ProcessingMasterDataConverter:
         text_description: Optional[str] = None,
         user_location: Optional[Dict[str, float]] = None,
         enable_parallel: bool = True,
-        max_results_per_platform: int = 10
+        max_results_per_platform: int = 10,
+        time_budget_seconds: Optional[float] = None
     ) -> ProcessingMasterRequest:
         """创建总处理协调器请求对象"""
         return ProcessingMasterRequest(
@@ -294,5 +370,6 @@ class ProcessingMasterDataConverter:
             text_description=text_description,
             user_location=user_location,
             enable_parallel=enable_parallel,
-            max_results_per_platform=max_results_per_platform
+            max_results_per_platform=max_results_per_platform,
+            time_budget_seconds=time_budget_seconds
         ) 
\ No newline at end of file
@@ -15,6 +15,9 @@ from .secondhand_search_prompts import SecondhandSearchPrompts
 # 文案生成提示词
 from .content_generation_prompts import ContentGenerationPrompts
 
+# 合并调用提示词
+from .fused_tasks_prompts import FusedTasksPrompts
+
 __all__ = [
     "BilibiliSearchPrompts",
     "CreativeRenovationPrompts", 
@@ -22,5 +25,6 @@ __all__ = [
     "LLMPrompts",
     "RecyclingLocationPrompts",
     "SecondhandSearchPrompts",
-    "ContentGenerationPrompts"
+    "ContentGenerationPrompts",
+    "FusedTasksPrompts"
 ] 
\ No newline at end of file
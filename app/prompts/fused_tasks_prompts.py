@@ -0,0 +1,75 @@
+"""
+合并调用提示词模块
+
+把分析完成后的几个小任务（回收类型判断、B站搜索关键词、二手平台搜索关键词）
+合并到一次LLM调用中，要求模型按任务分段返回一个JSON
+"""
+
+import json
+from typing import Dict, Any, List
+
+
+class FusedTasksPrompts:
+    """合并调用提示词管理类"""
+
+    # 回收类型固定为四种，与RecyclingLocationAgent保持一致
+    RECYCLING_TYPES: List[str] = ["家电回收", "电脑回收", "旧衣回收", "纸箱回收"]
+
+    # 系统提示词
+    SYSTEM_PROMPT = """你是一个闲置物品处置助手，需要根据同一份物品分析结果一次完成以下三个任务：
+
+任务一：回收类型判断（recycling_type）
+回收类型固定为以下四种，只能选择其中一种：
+- 家电回收：电视、冰箱、洗衣机、空调、微波炉、电饭煲、电风扇、吹风机等家用电器
+- 电脑回收：台式电脑、笔记本电脑、显示器、键盘、鼠标、打印机、平板电脑、手机等电子设备
+- 旧衣回收：服装、鞋子、包包、帽子、床单、窗帘等纺织品
+- 纸箱回收：纸箱、快递盒、包装盒、书本、报纸、杂志等纸制品
+信息不明确时选择最可能的分类
+
+任务二：B站DIY教程搜索关键词（bilibili_search）
+- 提取3-5个适合在B站搜索DIY改造、废物利用教程的关键词
+- 包含物品类型、材料特征和"DIY"、"改造"、"手工"等词汇
+- 用一句话说明搜索意图
+
+任务三：二手平台搜索关键词（secondhand_search）
+- 提取1个最精准的核心关键词，不超过8个字符，优先"品牌+型号"，其次"品牌+类型"、"型号"、"通用类型"
+- 不包含成色、颜色、容量等描述
+- 分别给出闲鱼（个人闲置交易）和爱回收（专业回收估价）的平台关键词建议
+- 用一句话说明搜索意图
+
+请严格按照JSON格式返回结果，不要输出其他内容。"""
+
+    # 用户提示词模板
+    USER_PROMPT_TEMPLATE = """请根据以下物品分析结果完成三个任务：
+
+物品分析结果：
+{analysis_result}
+
+请严格按照以下JSON格式返回：
+{{
+    "recycling_type": "家电回收/电脑回收/旧衣回收/纸箱回收之一",
+    "bilibili_search": {{
+        "keywords": ["关键词1", "关键词2", "关键词3"],
+        "search_intent": "搜索意图说明"
+    }},
+    "secondhand_search": {{
+        "keywords": ["核心关键词"],
+        "search_intent": "搜索意图说明",
+        "platform_suggestions": {{
+            "xianyu": ["闲鱼专用词"],
+            "aihuishou": ["爱回收专用词"]
+        }}
+    }}
+}}"""
+
+    @classmethod
+    def get_system_prompt(cls) -> str:
+        """获取系统提示词"""
+        return cls.SYSTEM_PROMPT
+
+    @classmethod
+    def get_user_prompt(cls, analysis_result: Dict[str, Any]) -> str:
+        """获取用户提示词（不包含以下划线开头的内部字段）"""
+        visible = {key: value for key, value in analysis_result.items() if not key.startswith("_")}
+        analysis_json = json.dumps(visible, ensure_ascii=False, indent=2)
+        return cls.USER_PROMPT_TEMPLATE.format(analysis_result=analysis_json)
@@ -21,6 +21,7 @@ class LLMPrompts:
     "category": "物品大类",
     "sub_category": "物品细分类",
     "brand": "品牌（如果能推断）",
+    "model": "型号（如果能识别，否则为空字符串）",
     "condition": "物品状态",
     "material": "主要材质",
     "color": "主要颜色",
@@ -37,6 +38,7 @@ class LLMPrompts:
     "category": "物品大类",
     "sub_category": "物品细分类", 
     "brand": "品牌（如果能识别）",
+    "model": "型号（如果能识别，否则为空字符串）",
     "condition": "物品状态（全新/九成新/八成新/七成新/有磨损/损坏）",
     "material": "主要材质",
     "color": "主要颜色",
@@ -0,0 +1,352 @@
+"""
+处理准入控制
+
+限制每个进程同时运行的完整处理流程数，突发流量时让已接纳的会话保持正常速度，而不是所有会话一起变慢：
+- 并发上限由实测阶段耗时推导：每个会话结束时，把各阶段耗时与该阶段的基线（近期耗时的低分位数）比较，
+  明显变慢说明下游（蓝心网关、外部平台）已饱和，上限成倍缩小；否则缓慢增大（AIMD）。
+  只统计实际运行完成的阶段，失败、超时取消和命中缓存的阶段不参与
+- 超出上限的请求进入有界等待队列，排队位置变化时通知客户端，预计等待时间按实测会话耗时估算
+- 队列已满或预计等待超过上限时立即拒绝，并给出建议的重试时间
+- 并发上限、队列深度、各阶段耗时等指标供 /health/metrics 查看
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import app_logger
+from app.models.processing_master_models import ProcessingMasterRequest, ProcessingStep, ProcessingStepStatus
+
+
+class AdmissionRejectedError(Exception):
+    """处理请求未被接纳（队列已满或等待超时）"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class StageLatency:
+    """单个阶段的耗时统计：指数加权平均与基线"""
+
+    def __init__(self, alpha: float = 0.2, window: int = 50, baseline_quantile: float = 0.2):
+        self.alpha = alpha
+        self.baseline_quantile = baseline_quantile
+        self.ewma: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.count = 0
+        self._recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        """记录一次耗时；基线取最近window次耗时的低分位数
+
+        个别异常快的样本不会把基线拉到接近0，环境整体变化时基线随窗口滚动跟上
+        """
+        self.count += 1
+        self.ewma = seconds if self.ewma is None else self.ewma + self.alpha * (seconds - self.ewma)
+        self._recent.append(seconds)
+        ordered = sorted(self._recent)
+        self.baseline = ordered[int(self.baseline_quantile * (len(ordered) - 1))]
+
+
+class AdmissionTicket:
+    """一个已接纳的处理会话，记录各阶段耗时，结束时归还名额"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self.admitted_at = time.monotonic()
+        self.stage_seconds: Dict[str, float] = {}
+        self._started: Dict[str, float] = {}
+        self._released = False
+
+    def observe(self, step: ProcessingStep) -> None:
+        """根据步骤的开始和结束时间记录阶段耗时
+
+        只记录实际运行完成的阶段：失败、超出时间预算被取消或命中缓存的阶段耗时反映不了下游的处理速度
+        """
+        if step.timestamp is None:
+            return
+        if step.status == ProcessingStepStatus.RUNNING:
+            self._started.setdefault(step.step_name, step.timestamp)
+            return
+        started = self._started.pop(step.step_name, None)
+        if started is None or step.status != ProcessingStepStatus.COMPLETED or (step.metadata or {}).get("cache_hit"):
+            return
+        self.stage_seconds[step.step_name] = max(0.0, step.timestamp - started)
+
+    def measure(self, agent: Any) -> "_MeasuredAgent":
+        """包装总处理协调器Agent，产出步骤时记录阶段耗时"""
+        return _MeasuredAgent(agent, self)
+
+    def release(self) -> None:
+        """归还名额（可重复调用）"""
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self)
+
+
+class _MeasuredAgent:
+    """记录阶段耗时的Agent包装"""
+
+    def __init__(self, agent: Any, ticket: AdmissionTicket):
+        self._agent = agent
+        self._ticket = ticket
+
+    async def process_complete_solution(
+        self,
+        request: ProcessingMasterRequest,
+        progress_callback: Optional[Callable[[ProcessingStep], None]] = None
+    ) -> AsyncIterator[ProcessingStep]:
+        async for step in self._agent.process_complete_solution(request, progress_callback=progress_callback):
+            self._ticket.observe(step)
+            yield step
+
+
+class AdmissionController:
+    """处理准入控制器"""
+
+    def __init__(
+        self,
+        initial_limit: float,
+        min_limit: float,
+        max_limit: float,
+        max_queue: int,
+        max_wait: float,
+        latency_tolerance: float = 2.0,
+        backoff_ratio: float = 0.5,
+        decrease_cooldown: float = 5.0,
+        default_service_time: float = 30.0
+    ):
+        """
+        Args:
+            initial_limit: 初始并发上限
+            min_limit: 并发上限下限
+            max_limit: 并发上限上限
+            max_queue: 等待队列长度上限
+            max_wait: 最长排队时间（秒），预计等待超过该值时直接拒绝
+            latency_tolerance: 会话阶段耗时超过基线的倍数，超过视为过载
+            backoff_ratio: 过载时并发上限的缩小比例
+            decrease_cooldown: 两次缩小之间的最短间隔（秒），避免同一波慢会话把上限压到底
+            default_service_time: 尚无实测数据时假定的会话耗时（秒）
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.decrease_cooldown = decrease_cooldown
+        self._last_decrease = 0.0
+
+        self._inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._changed = asyncio.Event()
+        self.service_time = StageLatency()
+        self._default_service_time = default_service_time
+        self.stages: Dict[str, StageLatency] = {}
+
+        self.admitted = 0
+        self.queued = 0
+        self.queued_admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.overloads = 0
+        self.max_queue_depth = 0
+        self._total_wait = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """当前允许同时运行的会话数"""
+        return max(1, int(self.limit))
+
+    @property
+    def inflight(self) -> int:
+        """运行中的会话数"""
+        return self._inflight
+
+    @property
+    def queue_depth(self) -> int:
+        """排队中的会话数"""
+        return sum(1 for future in self._waiters if not future.done())
+
+    def estimated_wait(self, position: int) -> float:
+        """排在第position位时的预计等待时间（秒）：按实测会话耗时和并发上限估算吞吐量"""
+        service_time = self.service_time.ewma or self._default_service_time
+        return service_time * position / self.capacity
+
+    def retry_after(self) -> int:
+        """建议客户端的重试间隔（秒）"""
+        return max(1, math.ceil(self.estimated_wait(self.queue_depth + 1)))
+
+    def _notify(self) -> None:
+        """唤醒等待中的请求重新计算排队位置"""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _position(self, future: asyncio.Future) -> int:
+        position = 0
+        for waiter in self._waiters:
+            if waiter.done():
+                continue
+            position += 1
+            if waiter is future:
+                break
+        return position
+
+    def _dispatch(self) -> None:
+        """按先后顺序唤醒排队的请求，直到占满并发上限"""
+        while self._waiters and self._inflight < self.capacity:
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self._inflight += 1
+            future.set_result(None)
+        self._notify()
+
+    def try_acquire(self) -> Optional[AdmissionTicket]:
+        """不排队地申请名额：有空闲名额时返回凭证，需要排队时返回None
+
+        Raises:
+            AdmissionRejectedError: 队列已满或预计等待过长
+        """
+        if self._inflight < self.capacity and not self.queue_depth:
+            self._inflight += 1
+            self.admitted += 1
+            return AdmissionTicket(self)
+
+        position = self.queue_depth + 1
+        if position > self.max_queue or self.estimated_wait(position) > self.max_wait:
+            self.rejected += 1
+            raise AdmissionRejectedError("服务繁忙，请稍后重试", retry_after=self.retry_after())
+        return None
+
+    async def acquire(
+        self,
+        on_position: Optional[Callable[[int, float], Awaitable[None]]] = None
+    ) -> AdmissionTicket:
+        """申请运行一个处理会话，名额已满时排队等待
+
+        Args:
+            on_position: 排队位置变化时的回调，参数为排队位置（从1开始）和预计等待秒数
+
+        Raises:
+            AdmissionRejectedError: 队列已满、预计等待过长或排队超时
+        """
+        ticket = self.try_acquire()
+        if ticket is not None:
+            return ticket
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        started = time.monotonic()
+        deadline = started + self.max_wait
+
+        try:
+            notified_position = None
+            while not future.done():
+                position = self._position(future)
+                if on_position is not None and position != notified_position:
+                    notified_position = position
+                    await on_position(position, self.estimated_wait(position))
+                    continue
+                changed = self._changed
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                await asyncio.wait_for(changed.wait(), timeout=remaining)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # 名额已分配但调用方放弃（如连接断开），归还名额
+                self._inflight -= 1
+                self._dispatch()
+            else:
+                future.cancel()
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+                self._notify()
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise AdmissionRejectedError(
+                    f"排队超过{self.max_wait:.0f}秒，请稍后重试", retry_after=self.retry_after()
+                ) from None
+            raise
+
+        self.admitted += 1
+        self.queued_admitted += 1
+        self._total_wait += time.monotonic() - started
+        return AdmissionTicket(self)
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        """会话结束：记录耗时、按阶段耗时调整并发上限并唤醒排队的请求"""
+        self._inflight -= 1
+        self.service_time.observe(time.monotonic() - ticket.admitted_at)
+        self._adjust_limit(ticket.stage_seconds)
+        self._dispatch()
+
+    def _adjust_limit(self, stage_seconds: Dict[str, float]) -> None:
+        """阶段耗时总和与基线总和之比超过容忍倍数时缩小上限，否则缓慢增大"""
+        observed = 0.0
+        baseline = 0.0
+        for name, seconds in stage_seconds.items():
+            stats = self.stages.setdefault(name, StageLatency())
+            if stats.baseline is not None:
+                observed += seconds
+                baseline += stats.baseline
+            stats.observe(seconds)
+        if baseline <= 0:
+            return
+
+        if observed / baseline > self.latency_tolerance:
+            now = time.monotonic()
+            if now - self._last_decrease < self.decrease_cooldown:
+                return
+            self._last_decrease = now
+            self.overloads += 1
+            previous = self.limit
+            self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+            app_logger.warning(
+                f"处理阶段耗时为基线的{observed / baseline:.1f}倍，并发上限 {previous:.1f} -> {self.limit:.1f}"
+            )
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取准入控制指标"""
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "inflight": self._inflight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "overloads": self.overloads,
+            "avg_queue_wait_ms": round(self._total_wait / self.queued_admitted * 1000, 2) if self.queued_admitted else 0.0,
+            "service_time_seconds": round(self.service_time.ewma, 2) if self.service_time.ewma else None,
+            "stage_latency_seconds": {
+                name: {"avg": round(stats.ewma, 3), "baseline": round(stats.baseline, 3)}
+                for name, stats in self.stages.items()
+                if stats.ewma is not None
+            }
+        }
+
+
+# 全局准入控制器（进程内执行处理时使用）
+admission_controller = AdmissionController(
+    initial_limit=settings.admission_initial_concurrency,
+    min_limit=settings.admission_min_concurrency,
+    max_limit=settings.admission_max_concurrency,
+    max_queue=settings.admission_max_queue,
+    max_wait=settings.admission_max_wait,
+    latency_tolerance=settings.admission_latency_tolerance
+)
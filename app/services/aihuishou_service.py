@@ -11,6 +11,8 @@ import aiohttp
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from app.core.logger import app_logger
+from app.services.llm.resilience import StopWhenBudgetExhausted, budget_timeout
+from app.utils.singleflight import SingleFlight
 from app.models.aihuishou_models import (
     AihuishouSearchRequest,
     AihuishouSearchResponse,
@@ -20,6 +22,10 @@ from app.models.aihuishou_models import (
 )
 
 
+# 爱回收搜索请求合并组（进程内共享）
+aihuishou_search_flight = SingleFlight("aihuishou_search")
+
+
 class AihuishouService:
     """爱回收搜索服务类"""
     
@@ -53,7 +59,8 @@ class AihuishouService:
         }
     
     @retry(
-        stop=stop_after_attempt(3),
+        # 剩余时间预算不足以等待下一次重试时提前停止
+        stop=stop_after_attempt(3) | StopWhenBudgetExhausted(min_wait=2),
         wait=wait_exponential(multiplier=1, min=2, max=8),
         reraise=True
     )
@@ -62,7 +69,7 @@ class AihuishouService:
         request_body = search_request.to_request_body()
         
         async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=self.timeout)
+            timeout=aiohttp.ClientTimeout(total=budget_timeout(self.timeout))
         ) as session:
             try:
                 app_logger.info(f"发起爱回收API请求: {search_request.keyword}")
@@ -129,6 +136,20 @@ class AihuishouService:
         if page_index < 0:
             raise ValueError("page_index参数应大于等于0")
         
+        # 相同参数的并发搜索合并为一次请求
+        return await aihuishou_search_flight.do(
+            (keyword.strip(), city_id, page_size, page_index),
+            lambda: self._search_products(keyword, city_id, page_size, page_index)
+        )
+    
+    async def _search_products(
+        self,
+        keyword: str,
+        city_id: int,
+        page_size: int,
+        page_index: int
+    ) -> AihuishouSearchResponse:
+        """执行爱回收产品搜索（参数已校验）"""
         # 构建搜索请求
         search_request = AihuishouSearchRequest(
             keyword=keyword.strip(),
@@ -11,6 +11,7 @@ from tenacity import retry, stop_after_attempt, wait_exponential
 
 from app.core.config import get_settings
 from app.core.logger import app_logger
+from app.services.llm.resilience import StopWhenBudgetExhausted, budget_timeout
 from app.models.amap_models import (
     AmapSearchRequest,
     AmapSearchResponse,
@@ -33,14 +34,15 @@ class AmapService:
         self.max_retries = settings.amap_max_retries
     
     @retry(
-        stop=stop_after_attempt(3),
+        # 剩余时间预算不足以等待下一次重试时提前停止
+        stop=stop_after_attempt(3) | StopWhenBudgetExhausted(min_wait=4),
         wait=wait_exponential(multiplier=1, min=4, max=10),
         reraise=True
     )
     async def _make_request(self, params: dict) -> dict:
         """发起HTTP请求到高德地图API"""
         async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=self.timeout)
+            timeout=aiohttp.ClientTimeout(total=budget_timeout(self.timeout))
         ) as session:
             try:
                 async with session.get(self.base_url, params=params) as response:
@@ -0,0 +1,89 @@
+"""
+批量物品处理
+
+一次提交多件物品（如搬家清理时的20-50件），在同一个会话中处理并逐件推送进度：
+- 内容完全相同的物品只处理一次，消息的items字段列出共享该结果的全部序号
+- 分析后指纹相同的同款物品由整体方案缓存合并，后到的物品等待先到的方案写入缓存后直接命中
+  （等待范围限于本次批量，不影响其他会话）
+- 同类物品的关键词提取和二手平台搜索经由大模型结果缓存与请求合并（singleflight）共享
+- 同时处理的物品数不超过并发上限，避免一次批量占满网关并发
+
+所有消息写入会话事件日志，批量处理同样支持断线续传
+"""
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from app.core.logger import app_logger
+from app.models.processing_master_models import ProcessingMasterRequest
+from app.services.solution_cache import solution_scope_context
+from app.services.step_events import StepEventLog, encode_message, prepend_field, stream_pipeline
+
+
+def build_request_key(request: ProcessingMasterRequest) -> str:
+    """请求内容的哈希，内容完全相同的物品得到相同的键"""
+    canonical = json.dumps(request.dict(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def group_requests(requests: List[ProcessingMasterRequest]) -> List[Tuple[ProcessingMasterRequest, List[int]]]:
+    """按内容合并重复物品，返回 (请求, 共享该请求的物品序号列表)，保持首次出现的顺序"""
+    groups: Dict[str, Tuple[ProcessingMasterRequest, List[int]]] = {}
+    for index, request in enumerate(requests):
+        key = build_request_key(request)
+        if key in groups:
+            groups[key][1].append(index)
+        else:
+            groups[key] = (request, [index])
+    return list(groups.values())
+
+
+async def record_batch(
+    log: StepEventLog,
+    channel: str,
+    agent: Any,
+    requests: List[ProcessingMasterRequest],
+    max_concurrency: int
+) -> Dict[str, Any]:
+    """批量处理物品并把消息写入会话日志，全部结束后写入结束标记
+
+    Args:
+        log: 步骤事件日志
+        channel: 会话ID
+        agent: 总处理协调器Agent
+        requests: 物品请求列表
+        max_concurrency: 同时处理的物品数上限
+
+    Returns:
+        Dict[str, Any]: 物品总数与实际处理数
+    """
+    groups = group_requests(requests)
+    summary = {"total_items": len(requests), "unique_items": len(groups)}
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    # 多个物品并发写入同一会话，串行追加保证序号与写入顺序一致
+    append_lock = asyncio.Lock()
+
+    async def _append(message: str) -> None:
+        async with append_lock:
+            await log.append(channel, message)
+
+    async def _process(request: ProcessingMasterRequest, indexes: List[int]) -> None:
+        async with semaphore:
+            with solution_scope_context(channel):
+                await stream_pipeline(agent, request, lambda message: _append(prepend_field(message, "items", indexes)))
+
+    try:
+        app_logger.info(f"开始批量处理: {summary['total_items']}件物品，去重后{summary['unique_items']}件")
+        await _append(encode_message({"type": "batch_start", **summary, "timestamp": datetime.now().isoformat()}))
+        await asyncio.gather(*(_process(request, indexes) for request, indexes in groups))
+        await _append(encode_message({"type": "batch_complete", **summary, "timestamp": datetime.now().isoformat()}))
+        app_logger.info(f"批量处理完成: {channel}")
+        return summary
+    finally:
+        try:
+            await log.end(channel)
+        except Exception as e:
+            app_logger.error(f"写入会话结束标记失败 {channel}: {e}")
@@ -0,0 +1,155 @@
+"""
+紧凑消息格式
+
+完整处理流程中同一份数据会多次发送：分析结果内嵌在处置推荐、创意改造、回收和二手交易的结果中，
+结果整合步骤又重复发送各协调器已经推送过的方案和商品列表。请求指定 wire_format=compact 时：
+- 步骤更新只在标题、描述变化时发送，客户端按步骤名沿用上一条消息的值
+- 带结果的步骤更新附带result_id，结果中已经发送过的较大对象/列表替换为引用
+  {"$ref": "<result_id>#<JSON指针>"}，引用目标为本条或之前消息的结果中原样发送的位置；
+  目标去掉下划线开头的内部字段后相同时，引用附带 "$omit": [字段名]
+
+客户端按result_id保存收到的结果，遇到$ref时解析JSON指针（目标中可能还有引用，需递归解析）
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _escape_pointer(token: str) -> str:
+    """JSON指针（RFC 6901）转义"""
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+class CompactEncoder:
+    """一次处理流程的紧凑编码器，记录已发送的步骤和结果对象"""
+
+    def __init__(self, min_size: int = 256):
+        """
+        Args:
+            min_size: 对象/列表编码后达到该长度（约数）才参与去重，小对象直接发送更省
+        """
+        self.min_size = min_size
+        # 内容摘要 -> 引用
+        self._sent: Dict[str, Dict[str, Any]] = {}
+        # 步骤名 -> 上次发送的标题和描述
+        self._headers: Dict[str, Tuple[Any, Any]] = {}
+        self._result_ids: Dict[str, int] = {}
+        # 替换为引用的内容长度（约数）
+        self.saved_chars = 0
+
+    def encode_step(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """压缩一条步骤更新消息（不修改传入的消息）"""
+        message = dict(message)
+        step_name = message.get("step")
+
+        header = (message.get("title"), message.get("description"))
+        if self._headers.get(step_name) == header:
+            message.pop("title", None)
+            message.pop("description", None)
+        else:
+            self._headers[step_name] = header
+
+        result = message.get("result")
+        if isinstance(result, (dict, list)):
+            result_id = self._next_result_id(step_name)
+            message["result_id"] = result_id
+            message["result"] = self._compact(result, f"{result_id}#", {})
+        return message
+
+    def _next_result_id(self, step_name: str) -> str:
+        """步骤的结果ID，同一步骤多次带结果时追加序号"""
+        count = self._result_ids.get(step_name, 0) + 1
+        self._result_ids[step_name] = count
+        return step_name if count == 1 else f"{step_name}~{count}"
+
+    def _compact(self, node: Any, pointer: str, memo: Dict[int, Tuple[str, int]]) -> Any:
+        """自顶向下替换已发送的对象，未发送的对象登记其位置后继续处理子节点"""
+        if not isinstance(node, (dict, list)):
+            return node
+
+        digest, size = self._digest(node, memo)
+        if size >= self.min_size:
+            ref = self._sent.get(digest)
+            if ref is not None:
+                self.saved_chars += size
+                return dict(ref)
+            self._register(node, digest, pointer, memo)
+
+        if isinstance(node, dict):
+            return {
+                key: self._compact(value, f"{pointer}/{_escape_pointer(str(key))}", memo)
+                for key, value in node.items()
+            }
+        return [self._compact(value, f"{pointer}/{index}", memo) for index, value in enumerate(node)]
+
+    def _register(self, node: Any, digest: str, pointer: str, memo: Dict[int, Tuple[str, int]]) -> None:
+        """登记对象的引用位置；带内部字段的对象同时登记去掉内部字段后的内容"""
+        self._sent[digest] = {"$ref": pointer}
+        if not isinstance(node, dict):
+            return
+        private_keys = [key for key in node if isinstance(key, str) and key.startswith("_")]
+        if private_keys:
+            public_keys = [key for key in node if key not in private_keys]
+            public_digest, _ = self._dict_digest(node, public_keys, memo)
+            self._sent.setdefault(public_digest, {"$ref": pointer, "$omit": private_keys})
+
+    def _digest(self, node: Any, memo: Dict[int, Tuple[str, int]]) -> Tuple[str, int]:
+        """自底向上计算内容摘要和编码长度（约数），每个对象只计算一次"""
+        cached = memo.get(id(node))
+        if cached is not None:
+            return cached
+
+        if isinstance(node, dict):
+            result = self._dict_digest(node, list(node), memo)
+        elif isinstance(node, list):
+            hasher = hashlib.blake2b(b"[", digest_size=16)
+            size = 2
+            for value in node:
+                child_digest, child_size = self._digest(value, memo)
+                hasher.update(child_digest.encode())
+                size += child_size + 1
+            result = (hasher.hexdigest(), size)
+        else:
+            encoded = json.dumps(node, ensure_ascii=False, default=str)
+            result = (hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest(), len(encoded))
+
+        memo[id(node)] = result
+        return result
+
+    def _dict_digest(self, node: Dict[Any, Any], keys: List[Any], memo: Dict[int, Tuple[str, int]]) -> Tuple[str, int]:
+        """按键排序计算对象（或其部分字段）的摘要，字段顺序不影响结果"""
+        hasher = hashlib.blake2b(b"{", digest_size=16)
+        size = 2
+        for key in sorted(keys, key=str):
+            child_digest, child_size = self._digest(node[key], memo)
+            encoded_key = json.dumps(str(key), ensure_ascii=False)
+            hasher.update(encoded_key.encode())
+            hasher.update(child_digest.encode())
+            size += len(encoded_key) + child_size + 2
+        return hasher.hexdigest(), size
+
+
+def resolve_refs(results: Dict[str, Any], node: Any) -> Any:
+    """把引用展开为原始内容（客户端解析方式的参考实现，也用于测试）
+
+    Args:
+        results: result_id -> 收到的（紧凑）结果
+        node: 待展开的结果
+    """
+    if isinstance(node, list):
+        return [resolve_refs(results, value) for value in node]
+    if not isinstance(node, dict):
+        return node
+    if "$ref" in node:
+        result_id, _, pointer = node["$ref"].partition("#")
+        target: Any = results[result_id]
+        for token in pointer.split("/")[1:]:
+            token = token.replace("~1", "/").replace("~0", "~")
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        target = resolve_refs(results, target)
+        omit: Optional[List[str]] = node.get("$omit")
+        if omit:
+            target = {key: value for key, value in target.items() if key not in omit}
+        return target
+    return {key: resolve_refs(results, value) for key, value in node.items()}
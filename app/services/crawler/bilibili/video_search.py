@@ -13,6 +13,11 @@ from bilibili_api.search import SearchObjectType, OrderVideo
 from loguru import logger
 
 from app.utils.image_proxy import image_proxy
+from app.utils.singleflight import SingleFlight
+
+
+# B站视频搜索请求合并组（进程内共享）
+bilibili_search_flight = SingleFlight("bilibili_search")
 
 
 @dataclass
@@ -198,6 +203,20 @@ class BilibiliVideoSearchService:
         # 限制page_size
         page_size = min(page_size, 50)
         
+        # 相同参数的并发搜索合并为一次请求
+        return await bilibili_search_flight.do(
+            (keyword.strip(), page, page_size, order),
+            lambda: self._search_videos(keyword, page, page_size, order)
+        )
+    
+    async def _search_videos(
+        self,
+        keyword: str,
+        page: int,
+        page_size: int,
+        order: OrderVideo
+    ) -> Dict[str, Any]:
+        """执行哔哩哔哩视频搜索（参数已校验）"""
         try:
             logger.info(f"开始搜索B站视频: keyword={keyword}, page={page}, page_size={page_size}")
             
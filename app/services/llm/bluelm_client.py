@@ -0,0 +1,551 @@
+"""
+蓝心大模型网关客户端
+
+进程级共享的VIVO BlueLM网关客户端，统一管理连接池、鉴权签名和超时配置，
+LanxinService与所有Agent都通过该客户端访问 api-ai.vivo.com.cn
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Dict, Any, Optional, List, AsyncIterator, Callable
+from urllib.parse import urlencode, urlparse
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import app_logger
+from app.services.llm.completion_cache import completion_cache, build_completion_cache_key
+from app.services.llm.gateway_scheduler import gateway_scheduler, current_priority, GatewayPriority, GatewayOverloadedError
+from app.services.llm.resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    TimeBudgetExceededError,
+    hedged_call,
+    remaining_budget
+)
+from app.utils.json_stream import extract_json
+from app.utils.singleflight import SingleFlight
+from app.utils.vivo_auth import gen_sign_headers
+
+
+# 按调用类型划分的超时配置
+TIMEOUT_PROFILES: Dict[str, httpx.Timeout] = {
+    "default": httpx.Timeout(connect=10.0, read=30.0, write=30.0, pool=10.0),
+    "classification": httpx.Timeout(connect=10.0, read=20.0, write=20.0, pool=10.0),
+    "generation": httpx.Timeout(connect=15.0, read=60.0, write=30.0, pool=10.0),
+    "vision": httpx.Timeout(connect=15.0, read=60.0, write=60.0, pool=10.0),
+}
+
+
+# 内容相同的并发补全请求合并为一次网关调用
+completion_flight = SingleFlight("bluelm_completion")
+
+# 网关熔断器与各超时档位的延迟统计（进程内共享）
+circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.llm_circuit_failure_threshold,
+    recovery_timeout=settings.llm_circuit_recovery_timeout
+)
+latency_tracker = LatencyTracker()
+
+
+class BlueLMAPIError(Exception):
+    """蓝心网关返回业务错误（code != 0）"""
+
+
+def parse_stream_event(event: Optional[str], data: str) -> Optional[str]:
+    """解析流式响应中的一个SSE事件，返回增量文本
+
+    Args:
+        event: SSE事件名（event:行），普通文本块为None
+        data: SSE数据（data:行）
+
+    Returns:
+        增量文本，非文本事件返回None
+
+    Raises:
+        BlueLMAPIError: 网关返回错误或内容审核拦截
+    """
+    if event in ("error", "antispam"):
+        raise BlueLMAPIError(f"流式调用失败: {event} {data}")
+    if event == "close" or not data or data == "[DONE]":
+        return None
+
+    try:
+        payload = json.loads(data)
+    except json.JSONDecodeError:
+        return data
+
+    if not isinstance(payload, dict):
+        return None
+    if payload.get("code") not in (None, 0):
+        raise BlueLMAPIError(f"流式调用失败: {payload.get('msg', '未知错误')}")
+
+    chunk = payload.get("message")
+    if chunk is None:
+        chunk = payload.get("content")
+    if chunk is None and isinstance(payload.get("data"), dict):
+        chunk = payload["data"].get("content")
+    return chunk or None
+
+
+# 补全缓存写入前的结果校验：参数为网关响应的data字段，返回False时不写入缓存
+CacheValidator = Callable[[Dict[str, Any]], bool]
+
+
+def has_content(data: Dict[str, Any]) -> bool:
+    """响应包含非空文本（默认校验）"""
+    content = data.get("content") if isinstance(data, dict) else None
+    return isinstance(content, str) and bool(content.strip())
+
+
+def has_json_content(data: Dict[str, Any]) -> bool:
+    """响应文本可以解析为JSON对象（截断或格式错误的输出不缓存）"""
+    return has_content(data) and isinstance(extract_json(data["content"]), dict)
+
+
+def _is_http2_available() -> bool:
+    """检查是否安装了HTTP/2依赖（h2）"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class BlueLMClient:
+    """蓝心大模型网关客户端 - 共享连接池"""
+
+    def __init__(self):
+        self.app_id = settings.lanxin_app_id
+        self.app_key = settings.lanxin_app_key
+        self.base_url = settings.lanxin_api_base_url
+        self.text_model = settings.lanxin_text_model
+        self.vision_model = settings.lanxin_vision_model
+        self.uri = urlparse(self.base_url).path
+        self.stream_url = settings.lanxin_stream_url
+        self.stream_uri = urlparse(self.stream_url).path
+
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self.hedged_requests = 0
+
+    def _create_http_client(self) -> httpx.AsyncClient:
+        """创建带keep-alive连接池的HTTP客户端"""
+        use_http2 = settings.lanxin_http2 and _is_http2_available()
+        if settings.lanxin_http2 and not use_http2:
+            app_logger.warning("未安装h2依赖，蓝心网关客户端回退到HTTP/1.1")
+
+        return httpx.AsyncClient(
+            http2=use_http2,
+            timeout=TIMEOUT_PROFILES["default"],
+            limits=httpx.Limits(
+                max_connections=settings.lanxin_max_connections,
+                max_keepalive_connections=settings.lanxin_max_keepalive_connections,
+                keepalive_expiry=settings.lanxin_keepalive_expiry
+            )
+        )
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """获取共享HTTP客户端（关闭后自动重建）"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = self._create_http_client()
+        return self._http_client
+
+    def get_auth_headers(self, method: str, uri: str, query_params: Dict[str, str]) -> Dict[str, str]:
+        """获取鉴权头部"""
+        auth_headers = gen_sign_headers(
+            app_id=self.app_id,
+            app_key=self.app_key,
+            method=method,
+            uri=uri,
+            query=query_params
+        )
+        auth_headers["Content-Type"] = "application/json"
+        return auth_headers
+
+    def _budgeted_timeout(self, timeout_profile: str, budget: Optional[float]) -> httpx.Timeout:
+        """按剩余时间预算收紧超时档位"""
+        timeout = TIMEOUT_PROFILES.get(timeout_profile, TIMEOUT_PROFILES["default"])
+        if budget is None:
+            return timeout
+        return httpx.Timeout(
+            connect=min(timeout.connect, budget),
+            read=min(timeout.read, budget),
+            write=min(timeout.write, budget),
+            pool=min(timeout.pool, budget)
+        )
+
+    def _check_budget(self) -> Optional[float]:
+        """检查剩余时间预算，已用完时抛出TimeBudgetExceededError"""
+        budget = remaining_budget()
+        if budget is not None and budget <= 0:
+            raise TimeBudgetExceededError("请求时间预算已用完，跳过蓝心网关调用")
+        return budget
+
+    def _hedge_delay(self, timeout_profile: str) -> Optional[float]:
+        """对冲延迟：该档位的历史p95，样本不足或网关已在排队时不对冲"""
+        if not settings.llm_hedging_enabled or gateway_scheduler.queue_depth > 0:
+            return None
+        return latency_tracker.percentile(
+            timeout_profile, settings.llm_hedge_percentile, min_samples=settings.llm_hedge_min_samples
+        )
+
+    def _on_hedge(self) -> None:
+        self.hedged_requests += 1
+
+    async def _send(
+        self,
+        request_body: Dict[str, Any],
+        timeout_profile: str,
+        timeout: httpx.Timeout,
+        request_id: Optional[str],
+        priority: Optional[GatewayPriority]
+    ) -> Dict[str, Any]:
+        """发送一次网关请求（经网关调度器限流排队）并记录耗时"""
+        url_params = {"requestId": request_id or str(uuid.uuid4())}
+        headers = self.get_auth_headers("POST", self.uri, url_params)
+
+        async with gateway_scheduler.slot(priority):
+            started = time.monotonic()
+            response = await self.http_client.post(
+                f"{self.base_url}?{urlencode(url_params)}",
+                headers=headers,
+                json=request_body,
+                timeout=timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            latency_tracker.record(timeout_profile, time.monotonic() - started)
+
+        if result.get("code") != 0:
+            raise BlueLMAPIError(f"API调用失败: {result.get('msg', '未知错误')}")
+
+        return result["data"]
+
+    async def post(
+        self,
+        request_body: Dict[str, Any],
+        timeout_profile: str = "default",
+        request_id: Optional[str] = None,
+        priority: Optional[GatewayPriority] = None
+    ) -> Dict[str, Any]:
+        """向蓝心网关发送请求
+
+        依次经过熔断检查、时间预算检查；主请求超过该档位p95仍未返回时发送对冲请求
+
+        Args:
+            request_body: 请求体
+            timeout_profile: 超时配置档位，见TIMEOUT_PROFILES
+            request_id: 请求ID，为空时自动生成
+            priority: 调度优先级，为空时使用当前上下文的优先级
+
+        Returns:
+            网关响应中的data字段
+        """
+        circuit_breaker.before_call()
+        try:
+            budget = self._check_budget()
+            timeout = self._budgeted_timeout(timeout_profile, budget)
+            attempt_ids = iter([request_id])
+
+            async def _attempt() -> Dict[str, Any]:
+                # 对冲请求使用新的requestId
+                return await self._send(
+                    request_body, timeout_profile, timeout, next(attempt_ids, None), priority
+                )
+
+            hedge_delay = self._hedge_delay(timeout_profile)
+            if hedge_delay is not None:
+                call = hedged_call(_attempt, hedge_delay, on_hedge=self._on_hedge)
+            else:
+                call = _attempt()
+
+            if budget is None:
+                data = await call
+            else:
+                try:
+                    data = await asyncio.wait_for(call, timeout=budget)
+                except asyncio.TimeoutError:
+                    raise TimeBudgetExceededError(f"蓝心网关调用超出剩余时间预算({budget:.1f}秒)") from None
+        except BaseException as e:
+            circuit_breaker.record_failure(e)
+            raise
+
+        circuit_breaker.record_success()
+        return data
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断、对冲与延迟统计"""
+        return {
+            "circuit_breaker": circuit_breaker.get_stats(),
+            "hedged_requests": self.hedged_requests,
+            "latency": latency_tracker.get_stats()
+        }
+
+    @staticmethod
+    def _is_cacheable(data: Dict[str, Any], validator: CacheValidator) -> bool:
+        try:
+            return bool(validator(data))
+        except Exception as e:
+            app_logger.warning(f"补全缓存校验异常: {e}")
+            return False
+
+    async def _post_cached(
+        self,
+        request_body: Dict[str, Any],
+        timeout_profile: str,
+        cache_namespace: Optional[str],
+        request_id: Optional[str] = None,
+        priority: Optional[GatewayPriority] = None,
+        cache_validator: Optional[CacheValidator] = None
+    ) -> Dict[str, Any]:
+        """带补全缓存和请求合并的请求
+
+        cache_namespace为空时不使用缓存；内容相同的并发请求只向网关发送一次，
+        合并后的请求按所有调用方中的最高优先级排队，各调用方按自己的剩余时间预算等待；
+        响应通过cache_validator（默认has_content）校验后才写入缓存，格式错误或截断的输出不会被长期复用
+        """
+        if cache_namespace is not None:
+            cached = await completion_cache.get(cache_namespace, request_body)
+            if cached is not None:
+                app_logger.debug(f"蓝心补全缓存命中: {cache_namespace}")
+                return cached
+
+        async def _fetch() -> Dict[str, Any]:
+            data = await self.post(
+                request_body, timeout_profile=timeout_profile, request_id=request_id, priority=priority
+            )
+            if cache_namespace is not None:
+                if self._is_cacheable(data, cache_validator or has_content):
+                    await completion_cache.set(cache_namespace, request_body, data)
+                else:
+                    app_logger.warning(f"蓝心响应未通过校验，不写入补全缓存: {cache_namespace}")
+            return data
+
+        # 显式指定的优先级放入上下文，合并时据此提升共享请求的优先级
+        token = current_priority.set(priority) if priority is not None else None
+        try:
+            return await completion_flight.do(build_completion_cache_key(request_body), _fetch)
+        finally:
+            if token is not None:
+                current_priority.reset(token)
+
+    async def complete(
+        self,
+        system_prompt: str,
+        prompt: str,
+        extra: Dict[str, Any],
+        model: Optional[str] = None,
+        timeout_profile: str = "default",
+        cache_namespace: Optional[str] = None,
+        priority: Optional[GatewayPriority] = None,
+        cache_validator: Optional[CacheValidator] = None
+    ) -> Dict[str, Any]:
+        """单轮文本补全（systemPrompt + prompt）
+
+        Args:
+            cache_namespace: 补全缓存场景名，指定后相同输入直接复用缓存结果
+            priority: 调度优先级，为空时使用当前上下文的优先级
+            cache_validator: 写入缓存前的结果校验，通常与调用方的解析逻辑一致
+        """
+        request_body = {
+            "model": model or self.text_model,
+            "sessionId": str(uuid.uuid4()),
+            "systemPrompt": system_prompt,
+            "prompt": prompt,
+            "extra": extra
+        }
+        return await self._post_cached(
+            request_body, timeout_profile, cache_namespace, priority=priority, cache_validator=cache_validator
+        )
+
+    async def chat(
+        self,
+        messages: List[Dict[str, Any]],
+        extra: Dict[str, Any],
+        model: Optional[str] = None,
+        timeout_profile: str = "default",
+        cache_namespace: Optional[str] = None,
+        priority: Optional[GatewayPriority] = None,
+        cache_validator: Optional[CacheValidator] = None
+    ) -> Dict[str, Any]:
+        """多消息补全（messages格式，用于Function Calling和视觉模型）"""
+        request_id = str(uuid.uuid4())
+        request_body = {
+            "model": model or self.text_model,
+            "sessionId": str(uuid.uuid4()),
+            "requestId": request_id,
+            "messages": messages,
+            "extra": extra
+        }
+        return await self._post_cached(
+            request_body, timeout_profile, cache_namespace, request_id=request_id, priority=priority,
+            cache_validator=cache_validator
+        )
+
+    async def _stream(
+        self,
+        request_body: Dict[str, Any],
+        timeout_profile: str,
+        request_id: Optional[str] = None,
+        priority: Optional[GatewayPriority] = None
+    ) -> AsyncIterator[str]:
+        """以SSE方式调用流式接口，逐块产出增量文本
+
+        流式接口不可用或在产出第一块之前失败时回退到阻塞调用，一次性产出完整内容；
+        已经产出部分内容后失败则直接抛出异常，由调用方决定是否重试
+        """
+        if not settings.lanxin_stream_enabled:
+            data = await self.post(request_body, timeout_profile=timeout_profile, request_id=request_id, priority=priority)
+            yield data.get("content", "")
+            return
+
+        circuit_breaker.before_call()
+        try:
+            budget = self._check_budget()
+        except TimeBudgetExceededError as e:
+            circuit_breaker.record_failure(e)
+            raise
+
+        url_params = {"requestId": request_id or str(uuid.uuid4())}
+        headers = self.get_auth_headers("POST", self.stream_uri, url_params)
+        timeout = self._budgeted_timeout(timeout_profile, budget)
+
+        has_output = False
+        try:
+            async with gateway_scheduler.slot(priority), self.http_client.stream(
+                "POST",
+                f"{self.stream_url}?{urlencode(url_params)}",
+                headers=headers,
+                json=request_body,
+                timeout=timeout
+            ) as response:
+                response.raise_for_status()
+                event = None
+                async for line in response.aiter_lines():
+                    line = line.strip()
+                    if not line:
+                        event = None
+                        continue
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                        if event == "close":
+                            break
+                        continue
+                    if not line.startswith("data:"):
+                        continue
+
+                    chunk = parse_stream_event(event, line[len("data:"):].strip())
+                    if chunk:
+                        has_output = True
+                        yield chunk
+        except GatewayOverloadedError as e:
+            # 排队超时说明网关已满载，回退到阻塞调用只会再次排队
+            circuit_breaker.record_failure(e)
+            raise
+        except Exception as e:
+            circuit_breaker.record_failure(e)
+            if has_output:
+                raise
+            app_logger.warning(f"蓝心流式调用失败，回退到阻塞调用: {e}")
+            data = await self.post(request_body, timeout_profile=timeout_profile, request_id=request_id, priority=priority)
+            yield data.get("content", "")
+        except BaseException as e:
+            circuit_breaker.record_failure(e)
+            raise
+        else:
+            circuit_breaker.record_success()
+
+    async def stream_complete(
+        self,
+        system_prompt: str,
+        prompt: str,
+        extra: Dict[str, Any],
+        model: Optional[str] = None,
+        timeout_profile: str = "generation",
+        priority: Optional[GatewayPriority] = None,
+        cache_namespace: Optional[str] = None,
+        cache_validator: Optional[CacheValidator] = None
+    ) -> AsyncIterator[str]:
+        """单轮文本补全的流式版本，异步产出增量文本块
+
+        指定cache_namespace时与complete共用补全缓存：命中时整段内容作为一块产出，
+        未命中时流式输出结束后把完整内容校验后写入缓存
+        """
+        request_body = {
+            "model": model or self.text_model,
+            "sessionId": str(uuid.uuid4()),
+            "systemPrompt": system_prompt,
+            "prompt": prompt,
+            "extra": extra
+        }
+        if cache_namespace is not None:
+            cached = await completion_cache.get(cache_namespace, request_body)
+            if cached is not None:
+                app_logger.debug(f"蓝心补全缓存命中: {cache_namespace}")
+                yield cached.get("content", "")
+                return
+
+        chunks: List[str] = []
+        async for chunk in self._stream(request_body, timeout_profile, priority=priority):
+            chunks.append(chunk)
+            yield chunk
+
+        if cache_namespace is not None:
+            data = {"content": "".join(chunks)}
+            if self._is_cacheable(data, cache_validator or has_content):
+                await completion_cache.set(cache_namespace, request_body, data)
+            else:
+                app_logger.warning(f"蓝心响应未通过校验，不写入补全缓存: {cache_namespace}")
+
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, Any]],
+        extra: Dict[str, Any],
+        model: Optional[str] = None,
+        timeout_profile: str = "generation",
+        priority: Optional[GatewayPriority] = None
+    ) -> AsyncIterator[str]:
+        """多消息补全的流式版本，异步产出增量文本块"""
+        request_id = str(uuid.uuid4())
+        request_body = {
+            "model": model or self.text_model,
+            "sessionId": str(uuid.uuid4()),
+            "requestId": request_id,
+            "messages": messages,
+            "extra": extra
+        }
+        async for chunk in self._stream(request_body, timeout_profile, request_id=request_id, priority=priority):
+            yield chunk
+
+    async def warm_up(self) -> None:
+        """预热连接池，在启动时提前完成TCP/TLS握手"""
+        connection_count = max(settings.lanxin_warmup_connections, 0)
+        if connection_count == 0:
+            return
+
+        async def _open_connection():
+            await self.http_client.head(self.base_url, timeout=TIMEOUT_PROFILES["classification"])
+
+        results = await asyncio.gather(
+            *[_open_connection() for _ in range(connection_count)],
+            return_exceptions=True
+        )
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            app_logger.warning(f"蓝心网关连接预热部分失败: {failed[0]}")
+        else:
+            app_logger.info(f"蓝心网关连接预热完成，预建连接数: {connection_count}")
+
+    async def close(self) -> None:
+        """关闭共享连接池"""
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._http_client = None
+        await completion_cache.close()
+
+
+# 全局客户端实例
+bluelm_client = BlueLMClient()
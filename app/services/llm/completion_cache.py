@@ -0,0 +1,95 @@
+"""
+蓝心大模型补全结果缓存
+
+按 (model, systemPrompt, prompt/messages, extra) 的内容哈希缓存补全结果，
+低温度的固定模板调用命中后可直接跳过网关往返
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.utils.cache import LRUCache, RedisCacheTier, TieredCache
+
+
+# 各调用场景的缓存有效期（秒），未列出的场景使用 llm_cache_default_ttl
+COMPLETION_CACHE_TTLS: Dict[str, int] = {
+    "text_analysis": 6 * 3600,
+    "disposal_recommendation": 6 * 3600,
+    "recycling_type": 24 * 3600,
+    "keyword_extraction": 24 * 3600,
+}
+
+
+def build_completion_cache_key(request_body: Dict[str, Any]) -> str:
+    """根据请求体中影响输出的字段计算内容哈希
+
+    sessionId、requestId等每次请求都变化的字段不参与计算
+    """
+    payload = {
+        "model": request_body.get("model"),
+        "systemPrompt": request_body.get("systemPrompt"),
+        "prompt": request_body.get("prompt"),
+        "messages": request_body.get("messages"),
+        "extra": request_body.get("extra"),
+    }
+    serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """补全结果缓存"""
+
+    def __init__(self):
+        self.enabled = settings.llm_cache_enabled
+        remote = RedisCacheTier(settings.redis_url, key_prefix="llm:completion") if settings.llm_cache_redis_enabled else None
+        self._cache = TieredCache(
+            local=LRUCache(max_entries=settings.llm_cache_max_entries, default_ttl=settings.llm_cache_default_ttl),
+            remote=remote
+        )
+        self._namespace_stats: Dict[str, Dict[str, int]] = {}
+
+    def get_ttl(self, namespace: str) -> int:
+        """获取场景对应的缓存有效期"""
+        return COMPLETION_CACHE_TTLS.get(namespace, settings.llm_cache_default_ttl)
+
+    def _record(self, namespace: str, is_hit: bool) -> None:
+        stats = self._namespace_stats.setdefault(namespace, {"hits": 0, "misses": 0})
+        stats["hits" if is_hit else "misses"] += 1
+
+    async def get(self, namespace: str, request_body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """读取缓存的网关data字段"""
+        if not self.enabled:
+            return None
+
+        value = await self._cache.get(f"{namespace}:{build_completion_cache_key(request_body)}")
+        self._record(namespace, value is not None)
+        return dict(value) if value is not None else None
+
+    async def set(self, namespace: str, request_body: Dict[str, Any], data: Dict[str, Any]) -> None:
+        """写入网关data字段"""
+        if not self.enabled:
+            return
+
+        await self._cache.set(
+            f"{namespace}:{build_completion_cache_key(request_body)}",
+            data,
+            ttl=self.get_ttl(namespace)
+        )
+
+    async def close(self) -> None:
+        """关闭缓存连接"""
+        await self._cache.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        return {
+            "enabled": self.enabled,
+            "namespaces": {name: dict(stats) for name, stats in self._namespace_stats.items()},
+            **self._cache.get_stats()
+        }
+
+
+# 全局缓存实例
+completion_cache = CompletionCache()
@@ -0,0 +1,290 @@
+"""
+蓝心网关调度器
+
+对所有发往蓝心网关的请求做并发控制：
+- AIMD自适应并发窗口：请求成功时窗口缓慢增大，出现超时/限流/5xx时成倍缩小
+- 优先级队列：窗口占满时按优先级排队，交互式分析与处置推荐优先于后台/预生成任务
+- 队列深度、等待时间等指标，供 /health/metrics 查看
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import app_logger
+from app.utils.singleflight import CallerContext, register_caller_context
+
+
+class GatewayPriority(IntEnum):
+    """网关请求优先级（数值越小越优先）"""
+    INTERACTIVE = 0  # 用户正在等待的分析与处置推荐
+    NORMAL = 1       # 协调器子任务
+    BACKGROUND = 2   # 后台任务与预生成
+
+
+# 当前上下文的默认优先级，后台任务等场景可整体设置而无需逐层传参
+current_priority: ContextVar[GatewayPriority] = ContextVar("gateway_priority", default=GatewayPriority.NORMAL)
+
+
+class SharedPriority:
+    """请求合并共享执行的优先级：取所有调用方中最高的，已在排队的请求随之提升"""
+
+    def __init__(self):
+        self.value: Optional[GatewayPriority] = None
+        self._queued: List[Tuple["GatewayScheduler", asyncio.Future]] = []
+
+    def raise_to(self, priority: GatewayPriority) -> None:
+        """有更高优先级的调用方加入时提升优先级"""
+        if self.value is not None and priority >= self.value:
+            return
+        self.value = priority
+        self._queued = [(scheduler, future) for scheduler, future in self._queued if not future.done()]
+        for scheduler, future in self._queued:
+            scheduler._requeue(future, priority)
+
+    def track(self, scheduler: "GatewayScheduler", future: asyncio.Future) -> None:
+        """登记共享执行中正在排队的请求"""
+        self._queued.append((scheduler, future))
+
+
+# 当前上下文所属的请求合并共享执行（不在共享执行中时为None）
+shared_priority: ContextVar[Optional[SharedPriority]] = ContextVar("shared_gateway_priority", default=None)
+
+
+def effective_priority(priority: Optional[GatewayPriority] = None) -> GatewayPriority:
+    """请求实际使用的优先级：显式指定或当前上下文的优先级，在共享执行中取所有调用方的最高优先级"""
+    priority = current_priority.get() if priority is None else priority
+    shared = shared_priority.get()
+    if shared is not None and shared.value is not None:
+        priority = min(priority, shared.value)
+    return priority
+
+
+class _PriorityCallerContext(CallerContext):
+    """请求合并时共享执行按所有调用方中的最高优先级排队，而不是首个调用方的优先级"""
+
+    def enter_shared(self) -> SharedPriority:
+        shared = SharedPriority()
+        shared_priority.set(shared)
+        return shared
+
+    def join(self, shared: SharedPriority) -> None:
+        shared.raise_to(effective_priority())
+
+
+register_caller_context(_PriorityCallerContext())
+
+
+class GatewayOverloadedError(Exception):
+    """网关请求在队列中等待超时"""
+
+
+# 视为网关过载的HTTP状态码
+OVERLOAD_STATUS_CODES = {429, 502, 503, 504}
+
+
+def is_overload_signal(error: BaseException) -> bool:
+    """判断异常是否表示网关过载"""
+    if isinstance(error, httpx.TimeoutException):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in OVERLOAD_STATUS_CODES
+    return False
+
+
+class AIMDLimiter:
+    """加性增、乘性减的并发窗口"""
+
+    def __init__(
+        self,
+        initial_limit: float,
+        min_limit: float,
+        max_limit: float,
+        backoff_ratio: float = 0.5,
+        decrease_cooldown: float = 1.0
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.decrease_cooldown = decrease_cooldown
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._last_decrease = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """当前允许的并发数"""
+        return max(1, int(self.limit))
+
+    def on_success(self) -> None:
+        """成功：每个完整窗口的成功请求使窗口加1"""
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_overload(self) -> None:
+        """过载：窗口成倍缩小，冷却期内只缩小一次，避免同一波失败把窗口压到底"""
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        previous = self.limit
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        app_logger.warning(f"蓝心网关过载，并发窗口 {previous:.1f} -> {self.limit:.1f}")
+
+
+class GatewayScheduler:
+    """蓝心网关调度器"""
+
+    def __init__(self, limiter: AIMDLimiter, queue_timeout: float):
+        self.limiter = limiter
+        self.queue_timeout = queue_timeout
+
+        self._inflight = 0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+        self.completed = 0
+        self.overloads = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self._wait_stats: Dict[GatewayPriority, Dict[str, float]] = {
+            priority: {"count": 0, "total": 0.0} for priority in GatewayPriority
+        }
+
+    def _dispatch(self) -> None:
+        """按优先级唤醒排队的请求，直到窗口占满"""
+        while self._queue and self._inflight < self.limiter.capacity:
+            _, _, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self._inflight += 1
+            future.set_result(None)
+
+    async def _acquire(self, priority: GatewayPriority) -> None:
+        """获取一个并发名额"""
+        if self._inflight < self.limiter.capacity and not self._queue:
+            self._inflight += 1
+            self._record_wait(priority, 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (int(priority), next(self._sequence), future))
+        shared = shared_priority.get()
+        if shared is not None:
+            shared.track(self, future)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        # 队列中可能只剩已放弃的请求，立即尝试分配
+        self._dispatch()
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # 名额已分配但调用方放弃，归还名额
+                self._release()
+            else:
+                future.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise GatewayOverloadedError(
+                    f"蓝心网关繁忙，排队超过{self.queue_timeout:.0f}秒（优先级: {priority.name}）"
+                ) from None
+            raise
+
+        self._record_wait(priority, time.monotonic() - started)
+
+    def _requeue(self, future: asyncio.Future, priority: GatewayPriority) -> None:
+        """以更高的优先级重新排队；旧条目留在堆中，分配名额时跳过已完成的请求"""
+        if not future.done():
+            heapq.heappush(self._queue, (int(priority), next(self._sequence), future))
+
+    def _queued_priorities(self) -> Dict[int, GatewayPriority]:
+        """排队中的请求及其当前优先级（重新排队过的请求取最高优先级）"""
+        queued: Dict[int, GatewayPriority] = {}
+        for priority, _, future in self._queue:
+            if not future.done():
+                key = id(future)
+                queued[key] = min(queued.get(key, GatewayPriority(priority)), GatewayPriority(priority))
+        return queued
+
+    def _release(self) -> None:
+        """归还并发名额"""
+        self._inflight -= 1
+        self._dispatch()
+
+    def _record_wait(self, priority: GatewayPriority, waited: float) -> None:
+        stats = self._wait_stats[priority]
+        stats["count"] += 1
+        stats["total"] += waited
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[GatewayPriority] = None) -> AsyncIterator[None]:
+        """占用一个并发名额执行网关请求，并根据结果调整并发窗口
+
+        Args:
+            priority: 请求优先级，为空时使用当前上下文的优先级
+        """
+        priority = effective_priority(priority)
+        await self._acquire(priority)
+        try:
+            yield
+        except BaseException as e:
+            if is_overload_signal(e):
+                self.overloads += 1
+                self.limiter.on_overload()
+            raise
+        else:
+            self.completed += 1
+            self.limiter.on_success()
+        finally:
+            self._release()
+
+    @property
+    def inflight(self) -> int:
+        """进行中的请求数"""
+        return self._inflight
+
+    @property
+    def queue_depth(self) -> int:
+        """排队中的请求数"""
+        return len(self._queued_priorities())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度指标"""
+        depth_by_priority = {priority.name.lower(): 0 for priority in GatewayPriority}
+        for priority in self._queued_priorities().values():
+            depth_by_priority[priority.name.lower()] += 1
+
+        return {
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "inflight": self._inflight,
+            "queue_depth": sum(depth_by_priority.values()),
+            "queue_depth_by_priority": depth_by_priority,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "overloads": self.overloads,
+            "rejected": self.rejected,
+            "avg_wait_ms": {
+                priority.name.lower(): round(stats["total"] / stats["count"] * 1000, 2) if stats["count"] else 0.0
+                for priority, stats in self._wait_stats.items()
+            }
+        }
+
+
+# 全局调度器实例
+gateway_scheduler = GatewayScheduler(
+    limiter=AIMDLimiter(
+        initial_limit=settings.llm_gateway_initial_concurrency,
+        min_limit=settings.llm_gateway_min_concurrency,
+        max_limit=settings.llm_gateway_max_concurrency,
+        backoff_ratio=settings.llm_gateway_backoff_ratio
+    ),
+    queue_timeout=settings.llm_gateway_queue_timeout
+)
@@ -0,0 +1,133 @@
+"""
+图片分析结果缓存
+
+以图片字节的SHA-256做精确命中，以dHash感知哈希做近似重复命中，
+同一张照片重试、刷新或被裁剪/重新压缩后重复提交时直接复用结构化分析结果
+"""
+
+import asyncio
+import copy
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import app_logger
+from app.utils.cache import LRUCache, RedisCacheTier, TieredCache
+from app.utils.image_hash import compute_sha256, compute_dhash, hamming_distance
+
+
+class ImageAnalysisCache:
+    """图片分析结果缓存"""
+
+    def __init__(self):
+        self.enabled = settings.image_cache_enabled
+        self.dhash_threshold = settings.image_cache_dhash_threshold
+        self.max_entries = settings.image_cache_max_entries
+
+        remote = RedisCacheTier(settings.redis_url, key_prefix="llm:image") if settings.image_cache_redis_enabled else None
+        self._cache = TieredCache(
+            local=LRUCache(max_entries=self.max_entries, default_ttl=settings.image_cache_ttl),
+            remote=remote
+        )
+        # 感知哈希索引（仅进程内）: 缓存键 -> dHash
+        self._dhash_index: "OrderedDict[str, int]" = OrderedDict()
+
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _build_key(sha256: str, model: str, prompt: str) -> str:
+        """缓存键包含模型与提示词摘要，提示词变更后旧结果自动失效"""
+        prompt_digest = hashlib.sha256(f"{model}:{prompt}".encode("utf-8")).hexdigest()[:12]
+        return f"{prompt_digest}:{sha256}"
+
+    async def fingerprint(self, image_bytes: bytes) -> Tuple[str, Optional[int]]:
+        """计算图片的精确哈希与感知哈希（解码图片在线程中执行）"""
+        sha256 = compute_sha256(image_bytes)
+        dhash = await asyncio.to_thread(compute_dhash, image_bytes)
+        return sha256, dhash
+
+    def _find_near_duplicate(self, dhash: int, key_prefix: str) -> Optional[str]:
+        """在感知哈希索引中查找汉明距离最小且不超过阈值的条目"""
+        best_key = None
+        best_distance = self.dhash_threshold + 1
+        for key, indexed_hash in self._dhash_index.items():
+            if not key.startswith(key_prefix):
+                continue
+            distance = hamming_distance(dhash, indexed_hash)
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    async def get(
+        self,
+        sha256: str,
+        dhash: Optional[int],
+        model: str,
+        prompt: str
+    ) -> Optional[Dict[str, Any]]:
+        """查找缓存的分析结果，先精确匹配，再近似匹配"""
+        if not self.enabled:
+            return None
+
+        key = self._build_key(sha256, model, prompt)
+        value = await self._cache.get(key)
+        if value is not None:
+            self.exact_hits += 1
+            app_logger.info("图片分析缓存精确命中")
+            return copy.deepcopy(value)
+
+        if dhash is not None:
+            near_key = self._find_near_duplicate(dhash, key.split(":", 1)[0])
+            if near_key is not None:
+                value = await self._cache.get(near_key)
+                if value is not None:
+                    self.near_hits += 1
+                    app_logger.info("图片分析缓存近似命中（感知哈希）")
+                    return copy.deepcopy(value)
+                self._dhash_index.pop(near_key, None)
+
+        self.misses += 1
+        return None
+
+    async def set(
+        self,
+        sha256: str,
+        dhash: Optional[int],
+        model: str,
+        prompt: str,
+        analysis: Dict[str, Any]
+    ) -> None:
+        """写入分析结果"""
+        if not self.enabled:
+            return
+
+        key = self._build_key(sha256, model, prompt)
+        await self._cache.set(key, copy.deepcopy(analysis))
+
+        if dhash is not None:
+            self._dhash_index[key] = dhash
+            self._dhash_index.move_to_end(key)
+            while len(self._dhash_index) > self.max_entries:
+                self._dhash_index.popitem(last=False)
+
+    async def close(self) -> None:
+        """关闭缓存连接"""
+        await self._cache.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        return {
+            "enabled": self.enabled,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "indexed_fingerprints": len(self._dhash_index),
+            **self._cache.get_stats()
+        }
+
+
+# 全局缓存实例
+image_analysis_cache = ImageAnalysisCache()
@@ -4,100 +4,106 @@
 封装与VIVO BlueLM大模型API的交互
 """
 
-import json
-import httpx
-import uuid
-from typing import Dict, Any, Optional, List
-from urllib.parse import urlencode, urlparse
-from app.core.config import settings
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Optional
+
 from app.core.logger import app_logger
-from app.utils.vivo_auth import gen_sign_headers
+from app.services.llm.bluelm_client import bluelm_client, has_json_content
+from app.services.llm.gateway_scheduler import GatewayPriority
+from app.services.llm.image_analysis_cache import image_analysis_cache
+from app.utils.image_preprocess import image_preprocessor
 from app.prompts.llm_prompts import LLMPrompts
+from app.utils.json_stream import IncrementalJSONParser, extract_json
+
+
+# 分析字段闭合时的回调：(字段名, 字段值)
+FieldCallback = Callable[[str, Any], Awaitable[None]]
 
 
 class LanxinService:
     """VIVO BlueLM大模型服务类"""
     
     def __init__(self):
-        self.app_id = settings.lanxin_app_id
-        self.app_key = settings.lanxin_app_key
-        self.base_url = settings.lanxin_api_base_url
-        self.text_model = settings.lanxin_text_model
-        
-        self.client = httpx.AsyncClient(
-            timeout=30.0
-        )
+        self.app_id = bluelm_client.app_id
+        self.app_key = bluelm_client.app_key
+        self.base_url = bluelm_client.base_url
+        self.text_model = bluelm_client.text_model
     
     def _get_auth_headers(self, method: str, uri: str, query_params: Dict[str, str]) -> Dict[str, str]:
         """获取鉴权头部"""
-        # 使用正确的VIVO API签名算法
-        auth_headers = gen_sign_headers(
-            app_id=self.app_id,
-            app_key=self.app_key,
-            method=method,
-            uri=uri,
-            query=query_params
-        )
-        
-        # 添加Content-Type
-        auth_headers["Content-Type"] = "application/json"
-        
-        return auth_headers
+        return bluelm_client.get_auth_headers(method, uri, query_params)
     
-    async def analyze_text(self, text_description: str) -> Dict[str, Any]:
-        """分析文字描述"""
+    async def _consume_stream(self, chunks: AsyncIterator[str], on_field: FieldCallback) -> IncrementalJSONParser:
+        """消费流式输出，顶层字段闭合时立即回调，返回解析器（完整文本与逐字段解析的结果）"""
+        parser = IncrementalJSONParser()
+        async for chunk in chunks:
+            for name, value in parser.feed(chunk):
+                try:
+                    await on_field(name, value)
+                except Exception as e:
+                    app_logger.warning(f"分析字段回调失败: {name} - {e}")
+        return parser
+    
+    async def _replay_fields(self, item_info: Dict[str, Any], on_field: FieldCallback) -> None:
+        """对已有的完整结果依次回调各字段（如命中缓存时）"""
+        for name, value in item_info.items():
+            try:
+                await on_field(name, value)
+            except Exception as e:
+                app_logger.warning(f"分析字段回调失败: {name} - {e}")
+    
+    async def analyze_text(
+        self,
+        text_description: str,
+        on_field: Optional[FieldCallback] = None
+    ) -> Dict[str, Any]:
+        """分析文字描述
+        
+        Args:
+            text_description: 文字描述
+            on_field: 字段回调，提供时使用流式输出，category等字段一闭合就回调
+        """
         
         app_logger.info("开始分析文字描述")
         
         try:
-            # 生成请求ID和会话ID
-            request_id = str(uuid.uuid4())
-            session_id = str(uuid.uuid4())
-            
-            # 构造请求参数
-            url_params = {"requestId": request_id}
-            
-            # 构造请求体
-            request_body = {
-                "model": self.text_model,
-                "sessionId": session_id,
-                "systemPrompt": LLMPrompts.get_text_analysis_system_prompt(),
-                "prompt": LLMPrompts.get_text_analysis_prompt(text_description),
-                "extra": {
-                    "temperature": 0.1,
-                    "top_p": 0.7,
-                    "max_new_tokens": 800
-                }
+            system_prompt = LLMPrompts.get_text_analysis_system_prompt()
+            prompt = LLMPrompts.get_text_analysis_prompt(text_description)
+            extra = {
+                "temperature": 0.1,
+                "top_p": 0.7,
+                "max_new_tokens": 800
             }
             
-            # 获取鉴权头部
-            parsed_url = urlparse(self.base_url)
-            uri = parsed_url.path
-            headers = self._get_auth_headers("POST", uri, url_params)
-            
-            # 发送请求
-            url = f"{self.base_url}?{urlencode(url_params)}"
-            response = await self.client.post(
-                url,
-                headers=headers,
-                json=request_body
-            )
-            
-            response.raise_for_status()
-            result = response.json()
-            
-            # 检查响应状态
-            if result.get("code") != 0:
-                app_logger.error(f"API调用失败: {result.get('msg', '未知错误')}")
-                raise Exception(f"API调用失败: {result.get('msg', '未知错误')}")
-            
-            # 解析返回的JSON
-            content = result["data"]["content"]
+            # 调用共享网关客户端
+            if on_field is not None:
+                # 命中补全缓存时缓存内容整段喂入解析器，各字段照常回调
+                parser = await self._consume_stream(
+                    bluelm_client.stream_complete(
+                        system_prompt=system_prompt,
+                        prompt=prompt,
+                        extra=extra,
+                        timeout_profile="default",
+                        priority=GatewayPriority.INTERACTIVE,
+                        cache_namespace="text_analysis",
+                        cache_validator=has_json_content
+                    ),
+                    on_field
+                )
+                content = parser.text
+                item_info = parser.result()
+            else:
+                data = await bluelm_client.complete(
+                    system_prompt=system_prompt,
+                    prompt=prompt,
+                    extra=extra,
+                    cache_namespace="text_analysis",
+                    priority=GatewayPriority.INTERACTIVE,
+                    cache_validator=has_json_content
+                )
+                content = data["content"]
+                item_info = extract_json(content)
             
-            # 尝试解析JSON内容
-            try:
-                item_info = json.loads(content)
-            except json.JSONDecodeError:
+            if not isinstance(item_info, dict):
                 # 如果返回的不是标准JSON，尝试提取关键信息
                 app_logger.warning("返回内容不是标准JSON格式，使用默认解析")
                 item_info = {
@@ -125,155 +131,104 @@ class LanxinService:
     
 
     
-    async def analyze_image(self, image_input: str) -> Dict[str, Any]:
+    async def analyze_image(
+        self,
+        image_input: str,
+        on_field: Optional[FieldCallback] = None
+    ) -> Dict[str, Any]:
         """分析图片中的物品（使用蓝心视觉大模型）
         
         Args:
             image_input: 图片输入，可以是本地文件路径或data URI格式的base64数据
+            on_field: 字段回调，提供时使用流式输出，category等字段一闭合就回调
         """
         
         app_logger.info("开始分析图片内容")
         
         try:
-            import base64
-            from pathlib import Path
-            
-            # 判断输入类型并获取base64数据
-            if image_input.startswith("data:"):
-                # data URI格式 (data:image/jpeg;base64,...)
-                app_logger.info("检测到data URI格式图片")
-                if ',' not in image_input:
-                    raise ValueError("无效的data URI格式")
-                
-                header, image_data = image_input.split(',', 1)
-                
-                # 验证是否为base64格式
-                if ';base64' not in header:
-                    raise ValueError("data URI必须是base64编码格式")
-                
-                # image_data已经是base64编码的字符串
-                app_logger.info("从data URI提取base64数据成功")
-                
-            else:
-                # 本地文件路径
-                app_logger.info("检测到本地文件路径")
-                
-                # 检查图片文件是否存在
-                if not Path(image_input).exists():
-                    raise FileNotFoundError(f"图片文件不存在: {image_input}")
-                
-                # 读取并编码图片
-                with open(image_input, "rb") as image_file:
-                    image_data = base64.b64encode(image_file.read()).decode('utf-8')
-                
-                app_logger.info("从本地文件读取并编码图片成功")
-            
-            # 生成请求ID和会话ID
-            request_id = str(uuid.uuid4())
-            session_id = str(uuid.uuid4())
-            
-            # 构造请求参数
-            url_params = {"requestId": request_id}
+            # 读取、解码并预处理图片（缩放、自动旋转、重新编码），在线程池中执行
+            prepared = await image_preprocessor.prepare(image_input)
+            image_bytes = prepared.data
             
             # 获取图像分析提示词
             prompt = LLMPrompts.get_image_analysis_prompt()
             
-            # 构造请求体 - 按照参考代码的格式
-            request_body = {
-                "model": "BlueLM-Vision-prd",  # 使用视觉模型
-                "sessionId": session_id,
-                "requestId": request_id,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": f"data:image/JPEG;base64,{image_data}",
-                        "contentType": "image"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                        "contentType": "text"
-                    }
-                ],
-                "extra": {
-                    "temperature": 0.1,
-                    "top_p": 0.7,
-                    "max_tokens": 1000
-                }
-            }
-            
-            # 获取鉴权头部
-            parsed_url = urlparse(self.base_url)
-            uri = parsed_url.path
-            headers = self._get_auth_headers("POST", uri, url_params)
-            
-            # 发送请求
-            url = f"{self.base_url}?{urlencode(url_params)}"
-            response = await self.client.post(
-                url,
-                headers=headers,
-                json=request_body
+            # 按精确哈希与感知哈希查找已有的分析结果
+            image_sha256, image_dhash = await image_analysis_cache.fingerprint(image_bytes)
+            cached_info = await image_analysis_cache.get(
+                image_sha256, image_dhash, bluelm_client.vision_model, prompt
             )
+            if cached_info is not None:
+                app_logger.info("图片分析完成（命中缓存）")
+                if on_field is not None:
+                    await self._replay_fields(cached_info, on_field)
+                return cached_info
             
-            response.raise_for_status()
-            result = response.json()
+            # 构造消息 - 按照参考代码的格式
+            messages = [
+                {
+                    "role": "user",
+                    "content": prepared.data_uri,
+                    "contentType": "image"
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                    "contentType": "text"
+                }
+            ]
             
-            # 检查响应状态
-            if result.get("code") != 0:
-                app_logger.error(f"视觉API调用失败: {result.get('msg', '未知错误')}")
-                raise Exception(f"视觉API调用失败: {result.get('msg', '未知错误')}")
+            extra = {
+                "temperature": 0.1,
+                "top_p": 0.7,
+                "max_tokens": 1000
+            }
             
-            # 解析返回的JSON
-            content = result["data"]["content"]
+            # 调用共享网关客户端（视觉模型）
+            parser: Optional[IncrementalJSONParser] = None
+            if on_field is not None:
+                parser = await self._consume_stream(
+                    bluelm_client.stream_chat(
+                        messages=messages,
+                        extra=extra,
+                        model=bluelm_client.vision_model,
+                        timeout_profile="vision",
+                        priority=GatewayPriority.INTERACTIVE
+                    ),
+                    on_field
+                )
+                content = parser.text
+                item_info = parser.result()
+            else:
+                data = await bluelm_client.chat(
+                    messages=messages,
+                    extra=extra,
+                    model=bluelm_client.vision_model,
+                    timeout_profile="vision",
+                    priority=GatewayPriority.INTERACTIVE
+                )
+                content = data["content"]
+                item_info = extract_json(content)
             
-            # 尝试解析JSON内容
-            try:
-                # 首先尝试直接解析
-                item_info = json.loads(content)
-                app_logger.info("图片分析完成，直接解析JSON成功")
-            except json.JSONDecodeError:
-                # 如果失败，尝试从代码块中提取JSON
-                app_logger.info("尝试从代码块中提取JSON")
-                try:
-                    # 查找 ```json 代码块
-                    if "```json" in content:
-                        # 提取代码块中的JSON内容
-                        start_marker = "```json"
-                        end_marker = "```"
-                        start_index = content.find(start_marker)
-                        if start_index != -1:
-                            start_index += len(start_marker)
-                            end_index = content.find(end_marker, start_index)
-                            if end_index != -1:
-                                json_str = content[start_index:end_index].strip()
-                                item_info = json.loads(json_str)
-                                app_logger.info("图片分析完成，从代码块解析JSON成功")
-                            else:
-                                raise json.JSONDecodeError("找不到结束标记", content, 0)
-                        else:
-                            raise json.JSONDecodeError("找不到开始标记", content, 0)
-                    else:
-                        # 如果没有代码块，尝试查找第一个{和最后一个}之间的内容
-                        first_brace = content.find('{')
-                        last_brace = content.rfind('}')
-                        if first_brace != -1 and last_brace != -1 and first_brace < last_brace:
-                            json_str = content[first_brace:last_brace + 1]
-                            item_info = json.loads(json_str)
-                            app_logger.info("图片分析完成，提取花括号内容解析JSON成功")
-                        else:
-                            raise json.JSONDecodeError("找不到有效的JSON结构", content, 0)
-                    
-                except json.JSONDecodeError:
-                    # 如果所有解析都失败，使用默认解析
-                    app_logger.warning("视觉分析返回内容无法解析为JSON，使用默认解析")
-                    item_info = {
-                        "category": "未知",
-                        "sub_category": "未知",
-                        "condition": "未知", 
-                        "keywords": [],
-                        "description": content,
-                        "analysis_result": content  # 保存原始分析结果
-                    }
+            parsed = isinstance(item_info, dict)
+            if parsed:
+                app_logger.info("图片分析完成，解析JSON成功")
+            else:
+                app_logger.warning("视觉分析返回内容无法解析为JSON，使用默认解析")
+                item_info = {
+                    "category": "未知",
+                    "sub_category": "未知",
+                    "condition": "未知", 
+                    "keywords": [],
+                    "description": content,
+                    "analysis_result": content  # 保存原始分析结果
+                }
+            
+            # 仅缓存成功解析的完整结构化结果（流式输出被截断时只有部分字段）
+            if parsed and (parser is None or parser.done):
+                await image_analysis_cache.set(
+                    image_sha256, image_dhash, bluelm_client.vision_model, prompt, item_info
+                )
             
             app_logger.info("图片分析完成")
             return item_info
@@ -303,4 +258,5 @@ class LanxinService:
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose() 
\ No newline at end of file
+        # 共享连接池由应用生命周期统一管理，这里无需关闭
+        pass
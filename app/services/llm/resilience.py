@@ -0,0 +1,254 @@
+"""
+蓝心网关调用的弹性策略
+
+- 延迟统计：按超时档位记录成功请求的耗时，提供p95等分位数
+- 对冲请求：主请求超过p95仍未返回时再发一个相同请求，取先返回的结果
+- 熔断器：连续失败达到阈值后短时间内直接拒绝调用，避免请求堆积在故障网关上
+- 时间预算：由ProcessingMasterAgent按请求下发截止时间，网关调用据此收紧超时，
+  闲鱼、爱回收、高德等外部HTTP调用据此收紧超时并停止重试
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, TypeVar
+
+import httpx
+from tenacity import RetryCallState
+from tenacity.stop import stop_base
+
+from app.core.logger import app_logger
+from app.utils.singleflight import CallerContext, register_caller_context
+
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，调用被直接拒绝"""
+
+
+class TimeBudgetExceededError(Exception):
+    """请求的剩余时间预算已用完"""
+
+
+# 当前请求的截止时间（time.monotonic()），为None表示不限制
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def remaining_budget() -> Optional[float]:
+    """当前请求的剩余时间预算（秒），未设置预算时返回None"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    """在当前上下文中设置请求截止时间
+
+    已有更早的截止时间时保留更早的那个。只能在普通协程中使用，
+    不能跨越异步生成器的yield
+    """
+    current = request_deadline.get()
+    if deadline is not None and current is not None:
+        deadline = min(deadline, current)
+    token = request_deadline.set(deadline if deadline is not None else current)
+    try:
+        yield
+    finally:
+        request_deadline.reset(token)
+
+
+def budget_timeout(timeout: float) -> float:
+    """按剩余时间预算收紧超时（秒），预算已用完时抛出TimeBudgetExceededError"""
+    budget = remaining_budget()
+    if budget is None:
+        return timeout
+    if budget <= 0:
+        raise TimeBudgetExceededError("请求时间预算已用完，跳过外部调用")
+    return min(timeout, budget)
+
+
+async def wait_within_budget(awaitable: Awaitable[T]) -> T:
+    """在当前请求的剩余时间预算内等待，超出时抛出TimeBudgetExceededError（不取消被等待的共享执行）"""
+    budget = remaining_budget()
+    if budget is None:
+        return await awaitable
+    if budget <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise TimeBudgetExceededError("请求时间预算已用完")
+    try:
+        return await asyncio.wait_for(awaitable, timeout=budget)
+    except asyncio.TimeoutError:
+        raise TimeBudgetExceededError(f"等待合并请求的结果超出剩余时间预算({budget:.1f}秒)") from None
+
+
+class _DeadlineCallerContext(CallerContext):
+    """请求合并时共享执行不受首个调用方截止时间的限制，各调用方按自己的剩余预算等待结果"""
+
+    def enter_shared(self) -> None:
+        request_deadline.set(None)
+
+    async def wait(self, awaitable: Awaitable[T]) -> T:
+        return await wait_within_budget(awaitable)
+
+
+register_caller_context(_DeadlineCallerContext())
+
+
+class StopWhenBudgetExhausted(stop_base):
+    """tenacity停止条件：剩余时间预算不足以等待下一次重试时停止重试"""
+
+    def __init__(self, min_wait: float = 0.0):
+        """
+        Args:
+            min_wait: 重试前的最短等待时间（秒），剩余预算不超过它时不再重试
+        """
+        self.min_wait = min_wait
+
+    def __call__(self, retry_state: RetryCallState) -> bool:
+        budget = remaining_budget()
+        return budget is not None and budget <= self.min_wait
+
+
+class LatencyTracker:
+    """滑动窗口延迟统计"""
+
+    def __init__(self, window_size: int = 200):
+        self.window_size = window_size
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, latency: float) -> None:
+        """记录一次成功请求的耗时"""
+        self._samples.setdefault(key, deque(maxlen=self.window_size)).append(latency)
+
+    def percentile(self, key: str, percentile: float, min_samples: int = 1) -> Optional[float]:
+        """计算分位数，样本不足时返回None"""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各档位的样本数与p50/p95"""
+        return {
+            key: {
+                "samples": len(samples),
+                "p50_ms": round(self.percentile(key, 50) * 1000, 1),
+                "p95_ms": round(self.percentile(key, 95) * 1000, 1)
+            }
+            for key, samples in self._samples.items() if samples
+        }
+
+
+def is_gateway_failure(error: BaseException) -> bool:
+    """判断异常是否计入熔断器失败次数（网络错误、超时、429与5xx）"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """连续失败熔断器
+
+    closed -> 连续失败达到阈值 -> open -> 冷却结束 -> half_open（放行一个探测请求）
+    探测成功回到closed，失败重新open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_inflight = False
+
+    def before_call(self) -> None:
+        """调用前检查，熔断打开时抛出CircuitOpenError"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                self.rejected += 1
+                raise CircuitOpenError("蓝心网关熔断中，暂停调用")
+            self.state = self.HALF_OPEN
+            self._probe_inflight = False
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_inflight:
+                self.rejected += 1
+                raise CircuitOpenError("蓝心网关熔断探测中，暂停调用")
+            self._probe_inflight = True
+
+    def record_success(self) -> None:
+        """记录成功"""
+        if self.state != self.CLOSED:
+            app_logger.info("蓝心网关熔断恢复")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_inflight = False
+
+    def record_failure(self, error: BaseException) -> None:
+        """记录失败，只有网关故障类异常计入"""
+        if self.state == self.HALF_OPEN:
+            self._probe_inflight = False
+        if not is_gateway_failure(error):
+            return
+
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                app_logger.warning(f"蓝心网关连续失败{self.consecutive_failures}次，熔断{self.recovery_timeout:.0f}秒")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器状态"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected
+        }
+
+
+async def hedged_call(
+    fn: Callable[[], Awaitable[T]],
+    hedge_delay: float,
+    on_hedge: Optional[Callable[[], None]] = None
+) -> T:
+    """对冲调用：fn在hedge_delay内未完成时再发起一次，返回先成功的结果
+
+    两次都失败时抛出后失败的那次的异常；返回前取消仍在进行的请求
+    """
+    tasks = [asyncio.ensure_future(fn())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+        if not done:
+            if on_hedge is not None:
+                on_hedge()
+            tasks.append(asyncio.ensure_future(fn()))
+
+        pending = set(tasks)
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
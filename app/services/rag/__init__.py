@@ -4,8 +4,9 @@ RAG服务模块
 基于ChromaDB的检索增强生成服务
 """
 
-from .platform_recommendation_service import PlatformRecommendationRAGService
+from .platform_recommendation_service import PlatformRecommendationRAGService, platform_recommendation_rag_service
 
 __all__ = [
-    "PlatformRecommendationRAGService"
+    "PlatformRecommendationRAGService",
+    "platform_recommendation_rag_service"
 ]
\ No newline at end of file
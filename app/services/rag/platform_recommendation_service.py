@@ -264,4 +264,8 @@ class PlatformRecommendationRAGService:
             return platforms
         except Exception as e:
             app_logger.error(f"获取所有平台数据失败: {e}")
-            return [] 
\ No newline at end of file
+            return [] 
+
+
+# 全局平台推荐RAG服务，平台数据在进程内只加载一次
+platform_recommendation_rag_service = PlatformRecommendationRAGService()
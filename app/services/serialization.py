@@ -0,0 +1,112 @@
+"""
+消息序列化
+
+WebSocket消息和REST响应统一经过这里编码：
+- 安装了orjson时使用orjson（比标准库json快数倍，输出与json.dumps(ensure_ascii=False)等价），否则使用标准库json，
+  可通过MESSAGE_SERIALIZER强制指定
+- 客户端可以选择MessagePack二进制帧（需安装msgpack）。编码后的消息（EncodedMessage）在JSON文本之外保留消息结构，
+  进程内事件日志中的消息发送时直接由结构打包；从Redis读出的消息只有JSON文本，需先解码再打包（耗时约为前者的两倍以上）
+
+基准测试见 scripts/benchmark_serialization.py
+"""
+
+import json
+from datetime import date
+from enum import Enum
+from typing import Any, Dict, Optional, Type
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.core.config import settings
+from app.core.logger import app_logger
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 未安装时使用标准库json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 未安装时不提供MessagePack帧
+    msgpack = None
+
+
+def _default(value: Any) -> Any:
+    """无法直接序列化的值（datetime、Enum、pydantic模型等）"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+class EncodedMessage(str):
+    """已编码的JSON文本消息，同时保留编码前的消息结构（只读），转换为其他帧格式时不必再解码"""
+
+    __slots__ = ("data",)
+
+    def __new__(cls, text: str, data: Optional[Dict[str, Any]] = None) -> "EncodedMessage":
+        message = super().__new__(cls, text)
+        message.data = data
+        return message
+
+
+class MessageSerializer:
+    """消息序列化器（标准库json实现）"""
+
+    name = "json"
+
+    def dumps(self, message: Any) -> str:
+        """编码为JSON文本"""
+        return json.dumps(message, ensure_ascii=False, default=_default)
+
+    def loads(self, data: str) -> Any:
+        """解码JSON文本"""
+        return json.loads(data)
+
+
+class OrjsonSerializer(MessageSerializer):
+    """消息序列化器（orjson实现）"""
+
+    name = "orjson"
+
+    def dumps(self, message: Any) -> str:
+        return orjson.dumps(message, default=_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    def loads(self, data: str) -> Any:
+        return orjson.loads(data)
+
+
+def create_serializer(name: str = "auto") -> MessageSerializer:
+    """按名称创建序列化器，auto时优先orjson；指定orjson但未安装时回退标准库json"""
+    if name in ("auto", "orjson") and orjson is not None:
+        return OrjsonSerializer()
+    if name == "orjson":
+        app_logger.warning("未安装orjson，消息序列化使用标准库json")
+    return MessageSerializer()
+
+
+def msgpack_available() -> bool:
+    """是否可以使用MessagePack二进制帧"""
+    return msgpack is not None
+
+
+def to_msgpack(message: str) -> bytes:
+    """把消息转换为MessagePack二进制帧：带消息结构时直接打包，否则先解码JSON文本"""
+    data = getattr(message, "data", None)
+    if data is None:
+        data = message_serializer.loads(message)
+    return msgpack.packb(data, use_bin_type=True, default=_default)
+
+
+def json_response_class() -> Type[JSONResponse]:
+    """REST接口的默认响应类：可用orjson时使用ORJSONResponse"""
+    if message_serializer.name == "orjson":
+        return ORJSONResponse
+    return JSONResponse
+
+
+# 全局消息序列化器
+message_serializer = create_serializer(settings.message_serializer)
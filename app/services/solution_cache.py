@@ -0,0 +1,197 @@
+"""
+整体方案缓存
+
+大量提交是同一类物品（如"旧羊毛衫 轻微磨损"、"iPhone 11 九成新"），
+分析之后的处置推荐、创意改造、二手交易方案只取决于物品本身：
+- 物品方案按分析结果的规范化指纹（类别、细分类、成色、品牌、型号）缓存
+- 回收方案依赖用户位置（附近回收点），按指纹加粗粒度地理网格另行缓存
+
+命中时直接返回整套方案，不再调用蓝心大模型、B站和二手平台。
+同一批量提交中的同款物品，后到的先等待先到的方案写入缓存（最多剩余时间预算的一部分），只计算一次；
+不同请求之间不互相等待，避免无关会话因他人进行中的计算而停滞
+"""
+
+import asyncio
+import hashlib
+import math
+import re
+import unicodedata
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import app_logger
+from app.utils.cache import LRUCache, RedisCacheTier, TieredCache
+
+
+# 指纹版本，方案结构或提示词变更时递增使旧缓存失效
+FINGERPRINT_VERSION = "v1"
+
+# 参与指纹计算的分析字段
+FINGERPRINT_FIELDS = ("category", "sub_category", "condition", "brand", "model")
+
+# 表示"未知"的取值，归一化为空字符串
+_UNKNOWN_VALUES = {"未知", "无", "不详", "不确定", "无法识别", "无法判断", "unknown", "none", "null", "n/a"}
+
+
+# 当前请求所属的方案共享范围（如批量会话ID），同一范围内的同款物品才互相等待
+solution_scope: ContextVar[Optional[str]] = ContextVar("solution_scope", default=None)
+
+
+@contextmanager
+def solution_scope_context(scope: str) -> Iterator[None]:
+    """在当前上下文中设置方案共享范围"""
+    token = solution_scope.set(scope)
+    try:
+        yield
+    finally:
+        solution_scope.reset(token)
+
+
+def _normalize_field(value: Any) -> str:
+    """规范化字段：全角转半角、小写、去空白和括号内的补充说明，未知值视为空"""
+    if not isinstance(value, str):
+        return ""
+    text = unicodedata.normalize("NFKC", value).lower()
+    text = re.sub(r"\(.*?\)", "", text)
+    text = re.sub(r"\s+", "", text).strip("。.,;")
+    return "" if text in _UNKNOWN_VALUES else text
+
+
+def build_item_fingerprint(analysis_result: Dict[str, Any]) -> Optional[str]:
+    """根据分析结果计算物品指纹，缺少类别时返回None（不缓存）"""
+    fields = [_normalize_field(analysis_result.get(name)) for name in FINGERPRINT_FIELDS]
+    if not fields[0]:
+        return None
+    canonical = "|".join([FINGERPRINT_VERSION] + fields)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def build_geo_tile(user_location: Optional[Dict[str, float]], tile_size: float) -> Optional[str]:
+    """把用户位置映射到边长为tile_size度的地理网格，位置无效时返回None"""
+    if not user_location or tile_size <= 0:
+        return None
+    try:
+        lat = float(user_location["lat"])
+        lon = float(user_location["lon"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    # 先取整到微度级别，避免39.9 / 0.05得到797.999...这类浮点误差落入相邻网格
+    lat_index = math.floor(round(lat / tile_size, 6))
+    lon_index = math.floor(round(lon / tile_size, 6))
+    return f"{tile_size:g}:{lat_index}:{lon_index}"
+
+
+class SolutionCache:
+    """整体方案缓存"""
+
+    def __init__(self):
+        self.enabled = settings.solution_cache_enabled
+        self.tile_size = settings.solution_cache_geo_tile
+        self.item_ttl = settings.solution_cache_ttl
+        self.location_ttl = settings.solution_cache_location_ttl
+
+        remote = RedisCacheTier(settings.redis_url, key_prefix="solution") if settings.solution_cache_redis_enabled else None
+        self._cache = TieredCache(
+            local=LRUCache(max_entries=settings.solution_cache_max_entries, default_ttl=self.item_ttl),
+            remote=remote
+        )
+
+        self.item_hits = 0
+        self.item_misses = 0
+        self.location_hits = 0
+        self.location_misses = 0
+        self.inflight_waits = 0
+
+        # 正在计算方案的 (共享范围, 指纹) -> 事件，方案写入缓存（或计算失败）后置位；
+        # 按范围分别登记，其他范围（或不属于任何范围的请求）先开始计算同款物品时，本范围内仍由一个物品计算、其余等待
+        self._inflight: Dict[Tuple[Optional[str], str], asyncio.Event] = {}
+
+    def geo_tile(self, user_location: Optional[Dict[str, float]]) -> Optional[str]:
+        """用户位置所在的地理网格"""
+        return build_geo_tile(user_location, self.tile_size)
+
+    async def get_item(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """读取物品方案（处置推荐、创意改造、二手交易）"""
+        if not self.enabled:
+            return None
+        value = await self._cache.get(f"item:{fingerprint}")
+        if value is None:
+            self.item_misses += 1
+        else:
+            self.item_hits += 1
+        return value
+
+    async def set_item(self, fingerprint: str, sections: Dict[str, Any]) -> None:
+        """写入物品方案"""
+        if not self.enabled:
+            return
+        await self._cache.set(f"item:{fingerprint}", sections, ttl=self.item_ttl)
+
+    async def get_location(self, fingerprint: str, tile: str) -> Optional[Dict[str, Any]]:
+        """读取某地理网格内的回收方案"""
+        if not self.enabled:
+            return None
+        value = await self._cache.get(f"location:{fingerprint}:{tile}")
+        if value is None:
+            self.location_misses += 1
+        else:
+            self.location_hits += 1
+        return value
+
+    async def set_location(self, fingerprint: str, tile: str, section: Dict[str, Any]) -> None:
+        """写入某地理网格内的回收方案"""
+        if not self.enabled:
+            return
+        await self._cache.set(f"location:{fingerprint}:{tile}", section, ttl=self.location_ttl)
+
+    def begin(self, fingerprint: str) -> bool:
+        """登记某指纹的方案在当前共享范围内开始计算，本范围内已有同指纹计算进行中或缓存未启用时返回False"""
+        key = (solution_scope.get(), fingerprint)
+        if not self.enabled or key in self._inflight:
+            return False
+        self._inflight[key] = asyncio.Event()
+        return True
+
+    def finish(self, fingerprint: str) -> None:
+        """某指纹的方案计算结束，唤醒等待的请求（在begin的同一上下文中调用）"""
+        event = self._inflight.pop((solution_scope.get(), fingerprint), None)
+        if event is not None:
+            event.set()
+
+    def should_wait(self, fingerprint: str) -> bool:
+        """同指纹方案正在同一共享范围内计算（不在任何范围内的请求不等待）"""
+        scope = solution_scope.get()
+        return scope is not None and (scope, fingerprint) in self._inflight
+
+    async def wait_inflight(self, fingerprint: str, timeout: float) -> None:
+        """同一共享范围内的同指纹方案正在计算时等待其结束（最多timeout秒），之后由调用方再查缓存"""
+        if not self.should_wait(fingerprint) or timeout <= 0:
+            return
+        event = self._inflight[(solution_scope.get(), fingerprint)]
+        self.inflight_waits += 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            app_logger.warning("等待同款物品方案超时，单独计算")
+
+    async def close(self) -> None:
+        """关闭缓存连接"""
+        await self._cache.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        return {
+            "enabled": self.enabled,
+            "item_hits": self.item_hits,
+            "item_misses": self.item_misses,
+            "location_hits": self.location_hits,
+            "location_misses": self.location_misses,
+            "inflight_waits": self.inflight_waits,
+            **self._cache.get_stats()
+        }
+
+
+# 全局整体方案缓存
+solution_cache = SolutionCache()
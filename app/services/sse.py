@@ -0,0 +1,133 @@
+"""
+Server-Sent Events 输出
+
+为无法使用WebSocket的客户端（只允许HTTP/1.1的代理、CDN、企业网关）提供处理进度推送：
+- 事件日志中的每条消息作为一个SSE事件，id为消息序号seq，客户端断线重连时通过Last-Event-ID续传
+- 长时间没有事件时发送注释行作为心跳，避免代理因连接空闲而断开
+- 客户端支持gzip时整条响应流式压缩：共用一个压缩上下文（重复的JSON键和结构压缩率高），
+  每个事件后做同步刷新，保证事件不会滞留在压缩缓冲区里
+"""
+
+import asyncio
+import zlib
+from typing import AsyncIterator, Optional
+
+# 客户端断线后的重连间隔（毫秒），随第一个事件下发
+RETRY_MS = 3000
+
+# 心跳注释
+HEARTBEAT = ": keep-alive\n\n"
+
+
+def format_event(data: str, event_id: Optional[int] = None, event: Optional[str] = None) -> str:
+    """按SSE格式编码一个事件，多行数据拆为多个data行"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+def format_retry(retry_ms: int = RETRY_MS) -> str:
+    """编码重连间隔字段"""
+    return f"retry: {retry_ms}\n\n"
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    """解析Last-Event-ID，无效值视为从头开始"""
+    try:
+        return max(int((value or "").strip()), 0)
+    except ValueError:
+        return 0
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """根据Accept-Encoding判断客户端是否接受gzip（忽略q=0）"""
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip().replace(" ", "")
+        if quality.startswith("q=") and quality[2:] in ("0", "0.0", "0.00", "0.000"):
+            continue
+        return True
+    return False
+
+
+class GzipEventEncoder:
+    """流式gzip编码：每段数据压缩后立即同步刷新，可被客户端逐段解压"""
+
+    def __init__(self, level: int = 6):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    def encode(self, chunk: str) -> bytes:
+        data = chunk.encode("utf-8")
+        output = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.raw_bytes += len(data)
+        self.compressed_bytes += len(output)
+        return output
+
+    def finish(self) -> bytes:
+        """结束压缩流（写入gzip尾部）"""
+        output = self._compressor.flush()
+        self.compressed_bytes += len(output)
+        return output
+
+
+async def with_heartbeat(chunks: AsyncIterator[str], interval: float) -> AsyncIterator[str]:
+    """在chunks之间插入心跳：超过interval秒没有新数据时输出一条注释
+
+    不能用wait_for等待下一条数据，超时会取消并结束底层生成器；这里保留同一个等待任务直到它完成。
+    结束时（包括客户端断开）立即关闭底层生成器，不等垃圾回收时才执行其清理
+    """
+    iterator = chunks.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield HEARTBEAT
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                pending = None
+                return
+            pending = None
+            yield chunk
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+        await _aclose(iterator)
+
+
+async def _aclose(iterator: AsyncIterator) -> None:
+    """关闭异步生成器（普通异步迭代器没有aclose时忽略）"""
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+async def encode_stream(chunks: AsyncIterator[str], compress: bool) -> AsyncIterator[bytes]:
+    """把SSE文本流编码为响应体，compress为True时输出gzip流"""
+    try:
+        if not compress:
+            async for chunk in chunks:
+                yield chunk.encode("utf-8")
+            return
+        encoder = GzipEventEncoder()
+        async for chunk in chunks:
+            yield encoder.encode(chunk)
+        yield encoder.finish()
+    finally:
+        await _aclose(chunks)
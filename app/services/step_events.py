@@ -0,0 +1,392 @@
+"""
+步骤事件
+
+处理流程产出的步骤更新、增量输出和完成信号统一编码为WebSocket消息，按顺序写入会话的事件日志，
+WebSocket连接只负责从日志读取并发送：
+- 处理在API进程内后台执行，或由Celery worker执行并写入Redis Streams，API进程原样转发
+- 客户端断开后处理继续进行，重连时带上session_id和resume_from即可补发错过的消息
+
+这样AI处理能力可以通过增加worker独立扩展，API进程只承担连接处理
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import app_logger
+from app.services.compact_wire import CompactEncoder
+from app.services.serialization import EncodedMessage, message_serializer
+from app.models.processing_master_models import ProcessingMasterRequest, ProcessingStep
+
+
+# 流结束标记，处理结束后写入，读取方读到后停止
+STREAM_END = ""
+
+
+def encode_message(message: Dict[str, Any]) -> str:
+    """把消息编码为JSON文本（同时保留消息结构，见EncodedMessage）"""
+    return EncodedMessage(message_serializer.dumps(message), message)
+
+
+def prepend_field(message: str, name: str, value: Any) -> str:
+    """在已编码的JSON对象消息开头加入一个字段，避免解码再编码"""
+    text = f'{{{json.dumps(name)}: {json.dumps(value, ensure_ascii=False)}, {message[1:]}'
+    data = getattr(message, "data", None)
+    return EncodedMessage(text, {name: value, **data} if data is not None else None)
+
+
+def build_step_message(step: ProcessingStep) -> Dict[str, Any]:
+    """构造步骤更新消息"""
+    message = {
+        "type": "step_update",
+        "step": step.step_name,
+        "title": step.step_title,
+        "status": step.status.value,
+        "description": step.description,
+        "timestamp": datetime.fromtimestamp(step.timestamp).isoformat() if step.timestamp else datetime.now().isoformat()
+    }
+
+    # 添加结果数据（如果有）
+    if step.result is not None:
+        message["result"] = step.result
+    elif step.step_name == "result_integration":
+        # 记录空结果的情况
+        app_logger.warning(f"最终结果步骤结果为空: 状态={step.status.value}, 错误={step.error}")
+
+    # 添加错误信息（如果有）
+    if step.error:
+        message["error"] = step.error
+
+    # 添加元数据（如果有）
+    if step.metadata:
+        message["metadata"] = step.metadata
+
+    return message
+
+
+def build_partial_messages(step: ProcessingStep) -> List[Dict[str, Any]]:
+    """构造进度回调中的增量输出消息（partial_output/partial_field）"""
+    messages = []
+    metadata = step.metadata or {}
+
+    partial_output = metadata.get("partial_output")
+    if partial_output:
+        messages.append({
+            "type": "partial_output",
+            "step": step.step_name,
+            "delta": partial_output,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    partial_field = metadata.get("partial_field")
+    if partial_field:
+        messages.append({
+            "type": "partial_field",
+            "step": step.step_name,
+            "field": partial_field["name"],
+            "value": partial_field["value"],
+            "timestamp": datetime.now().isoformat()
+        })
+
+    return messages
+
+
+async def stream_pipeline(
+    agent: Any,
+    request: ProcessingMasterRequest,
+    send: Callable[[str], Awaitable[None]]
+) -> int:
+    """运行完整处理流程，把消息按产生顺序交给send发送
+
+    增量输出由Agent回调产生，与步骤更新共用一个发送队列以保证顺序。
+    处理失败时发送error消息；send失败（如连接断开）时停止处理。
+    请求指定wire_format=compact时步骤更新按紧凑格式编码（见compact_wire）
+
+    Args:
+        agent: 总处理协调器Agent
+        request: 处理请求
+        send: 发送一条已编码消息的协程函数
+
+    Returns:
+        int: 产出的步骤数
+    """
+    outbound: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+    async def _sender():
+        while True:
+            message = await outbound.get()
+            if message is None:
+                break
+            await send(message)
+
+    def _on_progress(step):
+        for message in build_partial_messages(step):
+            outbound.put_nowait(encode_message(message))
+
+    sender_task = asyncio.create_task(_sender())
+    encoder = CompactEncoder() if request.wire_format == "compact" else None
+    step_count = 0
+    try:
+        async for step in agent.process_complete_solution(request, progress_callback=_on_progress):
+            step_count += 1
+            app_logger.debug(f"收到第{step_count}个步骤: {step.step_name} - {step.status.value}")
+
+            # 发送任务异常（如连接断开）时立即停止处理
+            if sender_task.done():
+                sender_task.result()
+            step_message = build_step_message(step)
+            if encoder is not None:
+                step_message = encoder.encode_step(step_message)
+            message = encode_message(step_message)
+            # 特别记录最终结果，大小直接取已序列化的消息长度
+            if step.step_name == "result_integration" and step.result is not None:
+                app_logger.info(f"最终结果步骤: 状态={step.status.value}, 消息大小={len(message)}")
+            outbound.put_nowait(message)
+            app_logger.debug(f"发送步骤更新: {step.step_name} - {step.status.value}")
+
+        app_logger.info(f"处理完成，总共处理了{step_count}个步骤")
+        if encoder is not None:
+            app_logger.info(f"紧凑格式省去重复内容约{encoder.saved_chars}字符")
+
+        # 发送完成信号
+        outbound.put_nowait(encode_message({
+            "type": "process_complete",
+            "message": "处理完成",
+            "timestamp": datetime.now().isoformat()
+        }))
+        outbound.put_nowait(None)
+        await sender_task
+
+    except Exception as e:
+        app_logger.error(f"处理过程中发生错误: {e}")
+        sender_task.cancel()
+        await send(encode_message({
+            "type": "error",
+            "error": f"处理失败: {str(e)}",
+            "timestamp": datetime.now().isoformat()
+        }))
+    finally:
+        if not sender_task.done():
+            sender_task.cancel()
+
+    return step_count
+
+
+class _MemorySession:
+    """进程内会话的事件记录"""
+
+    def __init__(self):
+        self.events: List[str] = []
+        self.done = False
+        self.changed = asyncio.Event()
+        self.expires_at: Optional[float] = None
+
+    def notify(self) -> None:
+        """唤醒等待中的读取方"""
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class StepEventLog:
+    """步骤事件日志（进程内实现）
+
+    每次处理分配一个会话（频道），消息按顺序追加并编号（seq从1开始），处理与连接解耦：
+    客户端断开后处理继续写入日志，重连时从resume_from之后补发错过的消息并继续推送后续消息。
+    会话结束ttl秒后清理。进程内实现只能在同一进程内续传，多实例或Celery部署使用Redis实现
+    """
+
+    def __init__(self, ttl: float = 600.0, idle_timeout: float = 180.0):
+        """
+        Args:
+            ttl: 会话结束后日志的保留时间（秒）
+            idle_timeout: 读取方连续多久收不到消息视为处理方失联（秒）
+        """
+        self.ttl = ttl
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[str, _MemorySession] = {}
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        expired = [
+            channel for channel, session in self._sessions.items()
+            if session.expires_at is not None and session.expires_at <= now
+        ]
+        for channel in expired:
+            del self._sessions[channel]
+
+    def new_channel(self) -> str:
+        """为一次处理分配会话"""
+        self._evict_expired()
+        channel = uuid.uuid4().hex
+        self._sessions[channel] = _MemorySession()
+        return channel
+
+    async def exists(self, channel: str) -> bool:
+        """会话是否存在（未过期）"""
+        self._evict_expired()
+        return channel in self._sessions
+
+    async def append(self, channel: str, message: str) -> int:
+        """追加一条消息，返回其序号"""
+        session = self._sessions.setdefault(channel, _MemorySession())
+        seq = len(session.events) + 1
+        session.events.append(prepend_field(message, "seq", seq))
+        session.notify()
+        return seq
+
+    async def end(self, channel: str) -> None:
+        """标记会话结束"""
+        session = self._sessions.get(channel)
+        if session is None:
+            return
+        session.done = True
+        session.expires_at = time.monotonic() + self.ttl
+        session.notify()
+
+    async def record(self, channel: str, agent: Any, request: ProcessingMasterRequest) -> int:
+        """运行完整处理流程并把消息写入会话日志，结束（含失败）后写入结束标记
+
+        Returns:
+            int: 产出的步骤数
+        """
+        try:
+            return await stream_pipeline(agent, request, lambda message: self.append(channel, message))
+        finally:
+            try:
+                await self.end(channel)
+            except Exception as e:
+                app_logger.error(f"写入会话结束标记失败 {channel}: {e}")
+
+    async def read(self, channel: str, after: int = 0) -> AsyncIterator[str]:
+        """按顺序读取seq大于after的消息，会话结束时停止
+
+        Raises:
+            TimeoutError: 超过idle_timeout没有新消息
+        """
+        async for _, message in self.read_events(channel, after):
+            yield message
+
+    async def read_events(self, channel: str, after: int = 0) -> AsyncIterator[Tuple[int, str]]:
+        """与read相同，同时给出每条消息的序号 (seq, 消息)"""
+        session = self._sessions.get(channel)
+        if session is None:
+            return
+        index = max(after, 0)
+        while True:
+            changed = session.changed
+            while index < len(session.events):
+                yield index + 1, session.events[index]
+                index += 1
+            if session.done:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{self.idle_timeout:.0f}秒内未收到处理进度")
+
+    async def close(self) -> None:
+        """释放日志"""
+        self._sessions.clear()
+
+
+class RedisStepEventLog(StepEventLog):
+    """步骤事件日志（Redis Streams实现）
+
+    每个会话一个Stream，条目ID取 0-{seq}，续传时直接从 0-{resume_from} 之后读取；
+    读取方用XREAD阻塞等待新消息，worker与API进程、不同API实例之间都能续传
+    """
+
+    def __init__(self, redis_url: str, key_prefix: str = "steps", ttl: float = 600.0, idle_timeout: float = 180.0):
+        super().__init__(ttl=ttl, idle_timeout=idle_timeout)
+        self.redis_url = redis_url
+        self.key_prefix = key_prefix
+        self._redis = None
+        # 本进程写入的会话的下一个序号（每个会话只有一个写入方）
+        self._next_seq: Dict[str, int] = {}
+
+    def _get_redis(self):
+        """延迟创建Redis客户端"""
+        if self._redis is None:
+            import redis.asyncio as redis_asyncio
+            self._redis = redis_asyncio.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    def _key(self, channel: str) -> str:
+        return f"{self.key_prefix}:{channel}"
+
+    def new_channel(self) -> str:
+        """为一次处理分配会话"""
+        return uuid.uuid4().hex
+
+    async def exists(self, channel: str) -> bool:
+        """会话是否存在（未过期）"""
+        return bool(await self._get_redis().exists(self._key(channel)))
+
+    async def _add(self, channel: str, seq: int, data: str) -> None:
+        """写入一个条目并刷新有效期（一次往返）"""
+        key = self._key(channel)
+        pipe = self._get_redis().pipeline(transaction=False)
+        pipe.xadd(key, {"data": data}, id=f"0-{seq}")
+        pipe.expire(key, int(self.ttl))
+        await pipe.execute()
+
+    async def append(self, channel: str, message: str) -> int:
+        """追加一条消息，返回其序号"""
+        seq = self._next_seq.get(channel, 1)
+        self._next_seq[channel] = seq + 1
+        await self._add(channel, seq, prepend_field(message, "seq", seq))
+        return seq
+
+    async def end(self, channel: str) -> None:
+        """写入结束标记"""
+        seq = self._next_seq.pop(channel, 1)
+        await self._add(channel, seq, STREAM_END)
+
+    async def read_events(self, channel: str, after: int = 0) -> AsyncIterator[Tuple[int, str]]:
+        """按顺序读取seq大于after的消息及其序号，读到结束标记时停止
+
+        Raises:
+            TimeoutError: 超过idle_timeout没有新消息
+        """
+        key = self._key(channel)
+        last_id = f"0-{max(after, 0)}"
+        last_message = time.monotonic()
+        while True:
+            response = await self._get_redis().xread({key: last_id}, count=100, block=1000)
+            if not response:
+                if time.monotonic() - last_message > self.idle_timeout:
+                    raise TimeoutError(f"{self.idle_timeout:.0f}秒内未收到处理进度")
+                continue
+            last_message = time.monotonic()
+            for _, entries in response:
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    data = fields.get("data", STREAM_END)
+                    if data == STREAM_END:
+                        return
+                    yield int(entry_id.split("-")[1]), data
+
+    async def close(self) -> None:
+        """关闭Redis连接"""
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+def _create_step_event_log() -> StepEventLog:
+    """Celery模式或启用Redis时使用Redis实现，否则使用进程内实现"""
+    if settings.processing_execution_mode == "celery" or settings.step_event_redis_enabled:
+        return RedisStepEventLog(
+            redis_url=settings.redis_url,
+            ttl=settings.step_event_ttl,
+            idle_timeout=settings.processing_relay_idle_timeout
+        )
+    return StepEventLog(ttl=settings.step_event_ttl, idle_timeout=settings.processing_relay_idle_timeout)
+
+
+# 全局步骤事件日志
+step_event_log = _create_step_event_log()
@@ -0,0 +1,157 @@
+"""
+任务进度存储
+
+轮询模式下客户端会频繁查询任务状态，进度和最终结果写入Redis哈希（task:{id}），
+查询直接读Redis，不必每次访问PostgreSQL；Redis不可用或记录过期时由调用方回退到数据库。
+
+进入新步骤或步骤状态变化时立即写入进度；同一步骤的重复更新按flush_interval合并写入，
+任务状态变化（开始、成功、失败）立即写入
+"""
+
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import app_logger
+
+
+class TaskProgressStore:
+    """基于Redis哈希的任务进度存储（连接失败时自动降级）"""
+
+    # 连接失败后暂停访问Redis的时间（秒）
+    FAILURE_COOLDOWN = 30.0
+
+    def __init__(self, redis_url: str, key_prefix: str = "task", ttl: int = 3600, flush_interval: float = 1.0):
+        """
+        Args:
+            redis_url: Redis连接地址
+            key_prefix: 键前缀
+            ttl: 记录有效期（秒）
+            flush_interval: 同一步骤重复更新的最短写入间隔（秒）
+        """
+        self.redis_url = redis_url
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._redis = None
+        self._disabled_until = 0.0
+
+        self.writes = 0
+        self.coalesced = 0
+        self.errors = 0
+
+        # 尚未写入的步骤进度、上次写入时间与上次写入的 (步骤名, 步骤状态)，按任务ID记录
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._last_flush: Dict[str, float] = {}
+        self._last_step: Dict[str, Tuple[Any, Any]] = {}
+
+    def _get_redis(self):
+        """延迟创建Redis客户端"""
+        if self._redis is None:
+            import redis.asyncio as redis_asyncio
+            self._redis = redis_asyncio.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    def _is_available(self) -> bool:
+        return time.monotonic() >= self._disabled_until
+
+    def _mark_failure(self, error: Exception) -> None:
+        self.errors += 1
+        self._disabled_until = time.monotonic() + self.FAILURE_COOLDOWN
+        app_logger.warning(f"任务进度Redis不可用，{self.FAILURE_COOLDOWN:.0f}秒内跳过: {error}")
+
+    async def _write(self, task_id: str, mapping: Dict[str, str]) -> None:
+        """写入哈希字段并刷新有效期（一次往返）"""
+        if not self._is_available():
+            return
+        key = f"{self.key_prefix}:{task_id}"
+        try:
+            pipe = self._get_redis().pipeline(transaction=False)
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+            self.writes += 1
+        except Exception as e:
+            self._mark_failure(e)
+
+    async def set_status(
+        self,
+        task_id: str,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """立即写入任务状态，附带尚未写入的步骤进度"""
+        mapping = {"status": status}
+        progress = self._pending.pop(task_id, None)
+        if progress is not None:
+            mapping["progress"] = json.dumps(progress, ensure_ascii=False)
+        if result is not None:
+            mapping["result"] = json.dumps(result, ensure_ascii=False)
+        if error is not None:
+            mapping["error"] = error
+        if status in ("SUCCESS", "FAILED"):
+            self._last_flush.pop(task_id, None)
+            self._last_step.pop(task_id, None)
+        await self._write(task_id, mapping)
+
+    async def set_progress(self, task_id: str, progress: Dict[str, Any]) -> None:
+        """记录步骤进度
+
+        进入新步骤或步骤状态变化时立即写入；同一步骤的重复更新距上次写入不足flush_interval时只保留最新进度，
+        随下一次写入合并
+        """
+        now = time.monotonic()
+        step = (progress.get("step_name"), progress.get("status"))
+        if step == self._last_step.get(task_id) and now - self._last_flush.get(task_id, 0.0) < self.flush_interval:
+            if task_id in self._pending:
+                self.coalesced += 1
+            self._pending[task_id] = progress
+            return
+
+        self._pending.pop(task_id, None)
+        self._last_flush[task_id] = now
+        self._last_step[task_id] = step
+        await self._write(task_id, {"progress": json.dumps(progress, ensure_ascii=False)})
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """读取任务状态，记录不存在或Redis不可用时返回None"""
+        if not self._is_available():
+            return None
+        try:
+            raw = await self._get_redis().hgetall(f"{self.key_prefix}:{task_id}")
+        except Exception as e:
+            self._mark_failure(e)
+            return None
+
+        if not raw or "status" not in raw:
+            return None
+        return {
+            "status": raw["status"],
+            "progress": json.loads(raw["progress"]) if raw.get("progress") else None,
+            "data": json.loads(raw["result"]) if raw.get("result") else None,
+            "error": raw.get("error")
+        }
+
+    async def close(self) -> None:
+        """关闭Redis连接"""
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入统计"""
+        return {
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "errors": self.errors
+        }
+
+
+# 全局任务进度存储
+task_progress_store = TaskProgressStore(
+    redis_url=settings.redis_url,
+    ttl=settings.task_progress_ttl,
+    flush_interval=settings.task_progress_flush_interval
+)
@@ -4,15 +4,26 @@
 处理物品处置任务的业务逻辑
 """
 
+import asyncio
 import uuid
-from typing import Optional
+from typing import Any, Dict, Optional, Set
 
 from geoalchemy2 import WKTElement
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from celery_app import celery_app
+from app.core.config import settings
 from app.core.logger import app_logger
+from app.database.connection import async_session_maker
 from app.models.task import ProcessingTask, TaskCreate, TaskStatus
+from app.models.processing_master_models import ProcessingMasterRequest, ProcessingStepStatus
+from app.agents.processing_master.agent import processing_master_agent
+from app.services.task_progress import task_progress_store
+
+
+# 进程内执行的后台任务，保留引用避免被垃圾回收
+_background_tasks: Set[asyncio.Task] = set()
 
 
 class TaskService:
@@ -43,11 +54,18 @@ class TaskService:
         await self.db.commit()
         await self.db.refresh(task)
         
+        await task_progress_store.set_status(str(task.id), 'PENDING')
         app_logger.info(f"任务已创建: {task.id}")
         return task.id
     
     async def get_task_status(self, task_id: uuid.UUID) -> Optional[TaskStatus]:
-        """获取任务状态"""
+        """获取任务状态
+        
+        优先读取Redis进度哈希，记录不存在（已过期或Redis不可用）时回退到数据库
+        """
+        cached = await task_progress_store.get(str(task_id))
+        if cached is not None:
+            return TaskStatus(**cached)
         
         # 查询数据库中的任务
         stmt = select(ProcessingTask).where(ProcessingTask.id == task_id)
@@ -69,91 +87,99 @@ class TaskService:
                 error=task.error_message
             )
         elif task.status == 'PROGRESS':
-            # 这里可以从Redis中获取实时进度信息
             return TaskStatus(
                 status=task.status,
-                progress={"step": 1, "message": "任务处理中..."}
+                progress={"message": "任务处理中..."}
             )
         else:  # PENDING
             return TaskStatus(status=task.status)
     
-    async def process_task_async(self, task_id: uuid.UUID):
-        """异步处理任务（后台任务）"""
+    async def _update_task(self, task_id: uuid.UUID, **values: Any) -> None:
+        """直接更新任务记录（单条UPDATE，不先查询）"""
+        await self.db.execute(
+            update(ProcessingTask).where(ProcessingTask.id == task_id).values(**values)
+        )
+        await self.db.commit()
+    
+    async def process_task_async(self, task_id: uuid.UUID, task_data: TaskCreate):
+        """执行完整处理流程（后台任务）
+        
+        数据库只在开始和结束时各写一次，步骤进度写入Redis进度哈希
+        """
+        key = str(task_id)
         try:
             app_logger.info(f"开始处理任务: {task_id}")
             
-            # 获取任务详情
-            stmt = select(ProcessingTask).where(ProcessingTask.id == task_id)
-            result = await self.db.execute(stmt)
-            task = result.scalars().first()
+            # 更新状态为处理中
+            await self._update_task(task_id, status='PROGRESS')
+            await task_progress_store.set_status(key, 'PROGRESS')
             
-            if not task:
-                app_logger.error(f"任务不存在: {task_id}")
-                return
+            request = ProcessingMasterRequest(
+                image_url=task_data.image_url,
+                text_description=task_data.text_description,
+                user_location=task_data.user_location
+            )
+            await processing_master_agent.initialize()
             
-            # 更新状态为处理中
-            task.status = 'PROGRESS'
-            await self.db.commit()
+            final_result: Optional[Dict[str, Any]] = None
+            final_error: Optional[str] = None
+            integration_failed = False
+            step_count = 0
+            async for step in processing_master_agent.process_complete_solution(request):
+                step_count += 1
+                await task_progress_store.set_progress(key, {
+                    "step": step_count,
+                    "step_name": step.step_name,
+                    "status": step.status.value,
+                    "message": step.description
+                })
+                if step.step_name == "result_integration" and step.status == ProcessingStepStatus.COMPLETED:
+                    final_result = step.result
+                elif step.status == ProcessingStepStatus.FAILED and step.error and not integration_failed:
+                    # 记录最后一个失败步骤的错误，结果整合的错误优先
+                    final_error = step.error
+                    integration_failed = step.step_name == "result_integration"
             
-            # TODO: 等待ProcessingAgent实现后再集成
-            # 临时处理逻辑 - 模拟任务处理
-            await self._mock_process_item(task)
+            if final_result is None:
+                raise RuntimeError(final_error or "处理流程未产生结果")
             
-            app_logger.info(f"任务处理完成: {task_id}")
+            # 结果一次写入
+            await self._update_task(task_id, status='SUCCESS', result=final_result, error_message=None)
+            await task_progress_store.set_status(key, 'SUCCESS', result=final_result)
+            app_logger.info(f"任务处理完成: {task_id}，共{step_count}个步骤")
             
         except Exception as e:
             app_logger.error(f"任务处理失败 {task_id}: {e}")
             
             # 更新失败状态
+            await task_progress_store.set_status(key, 'FAILED', error=str(e))
             try:
-                stmt = select(ProcessingTask).where(ProcessingTask.id == task_id)
-                result = await self.db.execute(stmt)
-                task = result.scalars().first()
-                
-                if task:
-                    task.status = 'FAILED'
-                    task.error_message = str(e)
-                    await self.db.commit()
+                await self.db.rollback()
+                await self._update_task(task_id, status='FAILED', error_message=str(e))
             except Exception as update_error:
                 app_logger.error(f"更新任务失败状态时出错: {update_error}")
+
+
+async def run_processing_task(task_id: uuid.UUID, task_data: TaskCreate) -> None:
+    """使用独立数据库会话执行任务（请求会话在响应后即关闭）"""
+    async with async_session_maker() as session:
+        await TaskService(session).process_task_async(task_id, task_data)
+
+
+async def enqueue_processing_task(task_id: uuid.UUID, task_data: TaskCreate) -> None:
+    """提交任务执行
     
-    async def _mock_process_item(self, task: ProcessingTask):
-        """临时的模拟处理逻辑"""
-        try:
-            # 模拟处理延时
-            import asyncio
-            await asyncio.sleep(1)
-            
-            # 构造模拟结果
-            mock_result = {
-                "overview": {
-                    "creative_makeover": {
-                        "recommendation_score": 75,
-                        "reason_tags": ["旧物新生", "个性化定制", "实用小物"]
-                    },
-                    "recycling_donation": {
-                        "recommendation_score": 50,
-                        "reason_tags": ["环保处理", "支持公益"]
-                    },
-                    "second_hand_trade": {
-                        "recommendation_score": 85,
-                        "reason_tags": ["快速变现", "高需求品类"]
-                    }
-                },
-                "details": {
-                    "note": "这是临时的模拟数据，等待ProcessingAgent完成后将提供真实处理结果"
-                }
-            }
-            
-            # 更新结果
-            task.status = 'SUCCESS'
-            task.result = mock_result
-            await self.db.commit()
-            
-            app_logger.info(f"任务 {task.id} 模拟处理完成")
-            
-        except Exception as e:
-            app_logger.error(f"模拟处理失败: {e}")
-            task.status = 'FAILED'
-            task.error_message = f"模拟处理失败: {str(e)}"
-            await self.db.commit() 
\ No newline at end of file
+    PROCESSING_EXECUTION_MODE=celery时分发到worker，否则在当前进程的事件循环中后台执行
+    """
+    if settings.processing_execution_mode == "celery":
+        await asyncio.to_thread(
+            celery_app.send_task,
+            "app.tasks.process_task",
+            args=[str(task_id), task_data.dict()]
+        )
+        app_logger.info(f"任务已分发到worker: {task_id}")
+        return
+    
+    background = asyncio.create_task(run_processing_task(task_id, task_data), name=f"task:{task_id}")
+    _background_tasks.add(background)
+    background.add_done_callback(_background_tasks.discard)
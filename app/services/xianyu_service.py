@@ -15,6 +15,8 @@ import aiohttp
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from app.core.logger import app_logger
+from app.services.llm.resilience import StopWhenBudgetExhausted, budget_timeout
+from app.utils.singleflight import SingleFlight
 from app.models.xianyu_models import (
     XianyuSearchRequest,
     XianyuSearchResponse,
@@ -24,6 +26,10 @@ from app.models.xianyu_models import (
 )
 
 
+# 闲鱼搜索请求合并组（进程内共享）
+xianyu_search_flight = SingleFlight("xianyu_search")
+
+
 class XianyuService:
     """闲鱼搜索服务类"""
     
@@ -149,7 +155,8 @@ class XianyuService:
         return f"https://2.taobao.com/search?word={encoded_keyword}&spm=a2170.xianyu_tbpc_search.0.0"
     
     @retry(
-        stop=stop_after_attempt(3),
+        # 剩余时间预算不足以等待下一次重试时提前停止
+        stop=stop_after_attempt(3) | StopWhenBudgetExhausted(min_wait=2),
         wait=wait_exponential(multiplier=1, min=2, max=8),
         reraise=True
     )
@@ -177,7 +184,7 @@ class XianyuService:
         headers["referer"] = self._build_referer(search_request.keyword)
         
         async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=self.timeout)
+            timeout=aiohttp.ClientTimeout(total=budget_timeout(self.timeout))
         ) as session:
             try:
                 app_logger.info(f"发起闲鱼API请求: {search_request.keyword}")
@@ -255,6 +262,19 @@ class XianyuService:
         if rows_per_page < 1 or rows_per_page > 50:
             raise ValueError("rows_per_page参数范围应为1-50")
         
+        # 相同参数的并发搜索合并为一次请求
+        return await xianyu_search_flight.do(
+            (keyword.strip(), page_number, rows_per_page),
+            lambda: self._search_products(keyword, page_number, rows_per_page)
+        )
+    
+    async def _search_products(
+        self,
+        keyword: str,
+        page_number: int,
+        rows_per_page: int
+    ) -> XianyuSearchResponse:
+        """执行闲鱼产品搜索（参数已校验）"""
         # 构建搜索请求
         search_request = XianyuSearchRequest(
             keyword=keyword.strip(),
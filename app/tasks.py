@@ -0,0 +1,137 @@
+"""
+Celery异步任务
+
+在worker节点上执行完整处理流程和市场数据抓取：
+- process_item_task：运行ProcessingMasterAgent完整流程，消息写入Redis事件日志由API进程转发
+- process_task：轮询模式的处理任务，进度和结果写入Redis进度哈希与processing_tasks表
+- crawl_market_data：按关键词抓取闲鱼、爱回收的商品和价格数据
+
+每个worker进程复用同一个事件循环，蓝心网关连接池、共享Agent和Redis连接都绑定在该循环上，
+不会在每个任务中重复创建
+"""
+
+import asyncio
+import uuid
+from typing import Any, Dict, List, Optional
+
+from celery.signals import worker_process_shutdown
+
+from celery_app import celery_app
+from app.core.logger import app_logger
+from app.models.processing_master_models import ProcessingMasterRequest
+from app.models.task import TaskCreate
+from app.agents.processing_master.agent import processing_master_agent
+from app.services.llm.bluelm_client import bluelm_client
+from app.services.step_events import step_event_log
+from app.services.task_progress import task_progress_store
+from app.services.task_service import run_processing_task
+from app.services.xianyu_service import xianyu_service
+from app.services.aihuishou_service import aihuishou_service
+
+
+# worker进程内复用的事件循环
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _run(coro) -> Any:
+    """在worker进程的事件循环中执行协程"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coro)
+
+
+async def _process_item(channel: str, request_data: Dict[str, Any]) -> Dict[str, Any]:
+    """执行完整处理流程并写入事件日志"""
+    try:
+        request = ProcessingMasterRequest(**request_data)
+        await processing_master_agent.initialize()
+    except Exception:
+        await step_event_log.end(channel)
+        raise
+    step_count = await step_event_log.record(channel, processing_master_agent, request)
+    return {"channel": channel, "step_count": step_count}
+
+
+async def _crawl_market_data(keyword: str, platforms: List[str]) -> Dict[str, Any]:
+    """并发抓取各平台的商品和价格数据，单个平台失败不影响其他平台"""
+    crawlers = {
+        "xianyu": xianyu_service.search_with_price_analysis,
+        "aihuishou": aihuishou_service.search_with_price_analysis
+    }
+    selected = [platform for platform in platforms if platform in crawlers]
+    results = await asyncio.gather(
+        *(crawlers[platform](keyword) for platform in selected), return_exceptions=True
+    )
+
+    data: Dict[str, Any] = {}
+    for platform, result in zip(selected, results):
+        if isinstance(result, Exception):
+            app_logger.error(f"{platform}市场数据抓取失败: {result}")
+            data[platform] = {"success": False, "error": str(result)}
+        else:
+            data[platform] = result
+    return data
+
+
+@celery_app.task(name="app.tasks.process_item_task")
+def process_item_task(channel: str, request_data: Dict[str, Any]) -> Dict[str, Any]:
+    """在worker上执行完整处理流程
+
+    Args:
+        channel: 会话ID，由API进程分配
+        request_data: ProcessingMasterRequest的字典形式
+
+    Returns:
+        Dict[str, Any]: 频道和步骤数（结果本身经步骤事件发送）
+    """
+    app_logger.info(f"worker开始处理任务: {channel}")
+    return _run(_process_item(channel, request_data))
+
+
+@celery_app.task(name="app.tasks.process_task")
+def process_task(task_id: str, task_data: Dict[str, Any]) -> None:
+    """在worker上执行轮询模式的处理任务
+
+    Args:
+        task_id: processing_tasks表中的任务ID
+        task_data: TaskCreate的字典形式
+    """
+    app_logger.info(f"worker开始处理任务: {task_id}")
+    _run(run_processing_task(uuid.UUID(task_id), TaskCreate(**task_data)))
+
+
+@celery_app.task(name="app.tasks.crawl_market_data")
+def crawl_market_data(keyword: str, platforms: Optional[List[str]] = None) -> Dict[str, Any]:
+    """在worker上抓取市场数据
+
+    Args:
+        keyword: 搜索关键词
+        platforms: 平台列表，默认闲鱼和爱回收
+
+    Returns:
+        Dict[str, Any]: 按平台名称组织的搜索和价格分析结果
+    """
+    app_logger.info(f"worker开始抓取市场数据: {keyword}")
+    return _run(_crawl_market_data(keyword, platforms or ["xianyu", "aihuishou"]))
+
+
+@worker_process_shutdown.connect
+def _close_worker_resources(**kwargs) -> None:
+    """worker进程退出时关闭共享资源"""
+    if _loop is None or _loop.is_closed():
+        return
+
+    async def _close():
+        await processing_master_agent.close()
+        await bluelm_client.close()
+        await step_event_log.close()
+        await task_progress_store.close()
+
+    try:
+        _loop.run_until_complete(_close())
+    except Exception as e:
+        app_logger.warning(f"关闭worker资源时出现警告: {e}")
+    finally:
+        _loop.close()
@@ -26,6 +26,21 @@ from .analysis_merger import AnalysisMerger
 # 新增：图片代理服务
 from .image_proxy import ImageProxyService, image_proxy
 
+# 新增：通用缓存
+from .cache import LRUCache, RedisCacheTier, TieredCache
+
+# 新增：请求合并
+from .singleflight import SingleFlight, get_singleflight_stats
+
+# 新增：LLM输出JSON解析
+from .json_stream import IncrementalJSONParser, extract_json
+
+# 新增：阶段依赖图调度器
+from .stage_graph import Stage, StageGraph, StageOutcome, StageStatus
+
+# 新增：消息体大小估算
+from .payload_size import estimate_json_size
+
 __all__ = [
     # 距离工具
     "haversine_distance",
@@ -47,5 +62,27 @@ __all__ = [
     
     # 图片代理服务
     "ImageProxyService",
-    "image_proxy"
+    "image_proxy",
+    
+    # 通用缓存
+    "LRUCache",
+    "RedisCacheTier",
+    "TieredCache",
+    
+    # 请求合并
+    "SingleFlight",
+    "get_singleflight_stats",
+    
+    # LLM输出JSON解析
+    "IncrementalJSONParser",
+    "extract_json",
+    
+    # 阶段依赖图调度器
+    "Stage",
+    "StageGraph",
+    "StageOutcome",
+    "StageStatus",
+    
+    # 消息体大小估算
+    "estimate_json_size"
 ] 
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+通用缓存工具
+
+提供进程内LRU缓存与可选的Redis二级缓存，供LLM补全、图片分析等结果缓存复用
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.logger import app_logger
+
+
+class LRUCache:
+    """进程内LRU缓存（按条目数限制大小，支持逐条TTL）"""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，过期条目视为未命中"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """删除缓存条目"""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class RedisCacheTier:
+    """Redis二级缓存（JSON序列化，连接失败时自动降级）"""
+
+    # 连接失败后暂停访问Redis的时间（秒）
+    FAILURE_COOLDOWN = 30.0
+
+    def __init__(self, redis_url: str, key_prefix: str):
+        self.redis_url = redis_url
+        self.key_prefix = key_prefix
+        self._redis = None
+        self._disabled_until = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _get_redis(self):
+        """延迟创建Redis客户端"""
+        if self._redis is None:
+            import redis.asyncio as redis_asyncio
+            self._redis = redis_asyncio.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    def _is_available(self) -> bool:
+        return time.monotonic() >= self._disabled_until
+
+    def _mark_failure(self, error: Exception) -> None:
+        self.errors += 1
+        self._disabled_until = time.monotonic() + self.FAILURE_COOLDOWN
+        app_logger.warning(f"Redis缓存不可用，{self.FAILURE_COOLDOWN:.0f}秒内跳过: {error}")
+
+    async def get(self, key: str) -> Optional[Any]:
+        """读取缓存"""
+        if not self._is_available():
+            return None
+        try:
+            raw = await self._get_redis().get(f"{self.key_prefix}:{key}")
+        except Exception as e:
+            self._mark_failure(e)
+            return None
+
+        if raw is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存"""
+        if not self._is_available():
+            return
+        try:
+            await self._get_redis().set(
+                f"{self.key_prefix}:{key}",
+                json.dumps(value, ensure_ascii=False),
+                ex=int(ttl) if ttl else None
+            )
+        except Exception as e:
+            self._mark_failure(e)
+
+    async def close(self) -> None:
+        """关闭Redis连接"""
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors
+        }
+
+
+class TieredCache:
+    """两级缓存：进程内LRU + 可选Redis"""
+
+    def __init__(self, local: LRUCache, remote: Optional[RedisCacheTier] = None):
+        self.local = local
+        self.remote = remote
+
+    async def get(self, key: str) -> Optional[Any]:
+        """先查本地LRU，未命中再查Redis并回填本地"""
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        if self.remote is None:
+            return None
+
+        value = await self.remote.get(key)
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """同时写入本地LRU与Redis"""
+        self.local.set(key, value, ttl=ttl)
+        if self.remote is not None:
+            await self.remote.set(key, value, ttl=ttl)
+
+    async def close(self) -> None:
+        """关闭远程缓存连接"""
+        if self.remote is not None:
+            await self.remote.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取两级缓存统计信息"""
+        return {
+            "local": self.local.get_stats(),
+            "redis": self.remote.get_stats() if self.remote is not None else None
+        }
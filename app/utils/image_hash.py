@@ -0,0 +1,56 @@
+"""
+图片哈希工具
+
+提供精确哈希（SHA-256）与感知哈希（dHash），用于识别重复或近似重复的图片。
+感知哈希依赖Pillow，未安装时返回None
+"""
+
+import hashlib
+import io
+from typing import Optional
+
+from app.core.logger import app_logger
+
+
+def compute_sha256(image_bytes: bytes) -> str:
+    """计算图片原始字节的SHA-256"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def compute_dhash(image_bytes: bytes, hash_size: int = 8) -> Optional[int]:
+    """计算图片的差值哈希（dHash）
+
+    将图片缩放为 (hash_size + 1) x hash_size 的灰度图，比较相邻像素亮度得到
+    hash_size * hash_size 位的指纹。裁剪、重新压缩后的同一张图片指纹差异很小。
+
+    Args:
+        image_bytes: 图片原始字节
+        hash_size: 指纹边长
+
+    Returns:
+        整数形式的指纹，Pillow不可用或图片无法解码时返回None
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            grayscale = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+            pixels = list(grayscale.getdata())
+    except Exception as e:
+        app_logger.debug(f"计算图片dHash失败: {e}")
+        return None
+
+    fingerprint = 0
+    for row in range(hash_size):
+        row_start = row * (hash_size + 1)
+        for col in range(hash_size):
+            fingerprint = (fingerprint << 1) | int(pixels[row_start + col] > pixels[row_start + col + 1])
+    return fingerprint
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """计算两个指纹的汉明距离"""
+    return bin(hash_a ^ hash_b).count("1")
@@ -0,0 +1,208 @@
+"""
+图片预处理工具
+
+视觉模型上传前的预处理：解码、按EXIF自动旋转、缩放到最长边上限、重新编码为JPEG/WebP。
+手机照片常有5-10MB，预处理后通常只有几百KB，上传字节数和视觉模型延迟都大幅下降。
+
+文件读取、base64编解码和图片编码都在线程池中执行（Pillow在解码/缩放/编码时会释放GIL），
+不阻塞事件循环。Pillow未安装或图片无法解码时原样返回
+"""
+
+import asyncio
+import base64
+import io
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import app_logger
+
+
+@dataclass
+class PreparedImage:
+    """预处理后的图片"""
+    data: bytes          # 上传给视觉模型的图片字节
+    base64: str          # data的base64编码
+    format: str          # 图片格式，如JPEG、WEBP、PNG
+    original_size: int   # 原始字节数
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+    @property
+    def data_uri(self) -> str:
+        """视觉模型消息使用的data URI"""
+        return f"data:image/{self.format};base64,{self.base64}"
+
+
+def _decode_data_uri(image_input: str) -> bytes:
+    """解析data URI格式 (data:image/jpeg;base64,...)"""
+    if "," not in image_input:
+        raise ValueError("无效的data URI格式")
+
+    header, image_data = image_input.split(",", 1)
+    if ";base64" not in header:
+        raise ValueError("data URI必须是base64编码格式")
+    return base64.b64decode(image_data)
+
+
+def preprocess_image_bytes(
+    image_bytes: bytes,
+    max_edge: int,
+    quality: int,
+    output_format: str = "JPEG"
+) -> Tuple[bytes, str, Optional[Tuple[int, int]]]:
+    """解码、自动旋转、缩放并重新编码图片
+
+    图片无需旋转和缩放、且本身已是目标格式时原样返回，避免重复有损压缩
+
+    Args:
+        image_bytes: 原始图片字节
+        max_edge: 最长边上限（像素）
+        quality: 编码质量（1-100）
+        output_format: 输出格式，JPEG或WEBP
+
+    Returns:
+        (图片字节, 图片格式, (宽, 高))，Pillow不可用或解码失败时返回原始字节、JPEG与None
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return image_bytes, "JPEG", None
+
+    output_format = output_format.upper()
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            source_format = (image.format or "").upper()
+            orientation = image.getexif().get(0x0112, 1)
+            needs_resize = max(image.size) > max_edge
+
+            if not needs_resize and orientation == 1 and source_format == output_format:
+                return image_bytes, source_format, image.size
+
+            processed = ImageOps.exif_transpose(image)
+            if needs_resize:
+                processed.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            # JPEG不支持透明通道，铺白底
+            if processed.mode in ("RGBA", "LA", "P"):
+                processed = processed.convert("RGBA")
+                background = Image.new("RGB", processed.size, (255, 255, 255))
+                background.paste(processed, mask=processed.getchannel("A"))
+                processed = background
+            elif processed.mode != "RGB":
+                processed = processed.convert("RGB")
+
+            buffer = io.BytesIO()
+            processed.save(buffer, format=output_format, quality=quality, optimize=True)
+            return buffer.getvalue(), output_format, processed.size
+    except Exception as e:
+        app_logger.warning(f"图片预处理失败，使用原图: {e}")
+        return image_bytes, "JPEG", None
+
+
+class ImagePreprocessor:
+    """视觉上传前的图片预处理器"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_edge: int = 1280,
+        quality: int = 85,
+        output_format: str = "JPEG",
+        max_workers: int = 2
+    ):
+        self.enabled = enabled
+        self.max_edge = max_edge
+        self.quality = quality
+        self.output_format = output_format
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.processed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """图片处理线程池（延迟创建）"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="image-preprocess"
+            )
+        return self._executor
+
+    def _prepare_sync(self, image_input: str) -> PreparedImage:
+        """读取/解码图片并预处理（在线程池中执行）"""
+        if image_input.startswith("data:"):
+            raw = _decode_data_uri(image_input)
+        else:
+            path = Path(image_input)
+            if not path.exists():
+                raise FileNotFoundError(f"图片文件不存在: {image_input}")
+            raw = path.read_bytes()
+
+        if self.enabled:
+            data, image_format, size = preprocess_image_bytes(
+                raw, self.max_edge, self.quality, self.output_format
+            )
+        else:
+            data, image_format, size = raw, "JPEG", None
+
+        return PreparedImage(
+            data=data,
+            base64=base64.b64encode(data).decode("utf-8"),
+            format=image_format,
+            original_size=len(raw),
+            width=size[0] if size else None,
+            height=size[1] if size else None
+        )
+
+    async def prepare(self, image_input: str) -> PreparedImage:
+        """读取并预处理图片
+
+        Args:
+            image_input: 本地文件路径或data URI格式的base64数据
+
+        Raises:
+            FileNotFoundError: 图片文件不存在
+            ValueError: data URI格式无效
+        """
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(self.executor, self._prepare_sync, image_input)
+
+        self.processed += 1
+        self.bytes_in += prepared.original_size
+        self.bytes_out += len(prepared.data)
+        app_logger.info(
+            f"图片预处理完成: {prepared.original_size / 1024:.0f}KB -> {len(prepared.data) / 1024:.0f}KB"
+            f"（{prepared.format}, {prepared.width}x{prepared.height}）"
+        )
+        return prepared
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取预处理统计"""
+        return {
+            "enabled": self.enabled,
+            "processed": self.processed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "compression_ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None
+        }
+
+    def close(self) -> None:
+        """关闭线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# 全局图片预处理器
+image_preprocessor = ImagePreprocessor(
+    enabled=settings.image_preprocess_enabled,
+    max_edge=settings.image_max_edge,
+    quality=settings.image_quality,
+    output_format=settings.image_output_format,
+    max_workers=settings.image_preprocess_workers
+)
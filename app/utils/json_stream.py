@@ -0,0 +1,190 @@
+"""
+LLM输出的JSON解析工具
+
+- extract_json：从完整的模型输出中提取JSON（直接解析、```json代码块、首尾花括号）
+- IncrementalJSONParser：增量解析流式输出，顶层对象的某个字段一闭合就立即产出，
+  下游无需等待整段补全结束即可使用category、condition、keywords等字段
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.logger import app_logger
+
+
+def extract_json(content: str) -> Optional[Any]:
+    """从模型输出中提取JSON，依次尝试直接解析、代码块和花括号内容，失败返回None"""
+    if not content:
+        return None
+
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+
+    # 尝试从代码块中提取JSON
+    start_index = content.find("```json")
+    if start_index != -1:
+        start_index += len("```json")
+        end_index = content.find("```", start_index)
+        if end_index != -1:
+            try:
+                return json.loads(content[start_index:end_index].strip())
+            except json.JSONDecodeError:
+                pass
+
+    # 尝试查找花括号内容
+    first_brace = content.find("{")
+    last_brace = content.rfind("}")
+    if first_brace != -1 and first_brace < last_brace:
+        try:
+            return json.loads(content[first_brace:last_brace + 1])
+        except json.JSONDecodeError:
+            pass
+
+    return None
+
+
+class IncrementalJSONParser:
+    """流式输出的增量JSON解析器
+
+    逐块喂入模型输出，跳过第一个"{"之前的说明文字或代码块标记，
+    跟踪顶层对象的键值边界，每个字段的值完整后立即解析产出。
+    只解析顶层字段，嵌套对象和数组作为整体在闭合时产出
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+        # 顶层对象中的状态：key / colon / value / after_value
+        self._expect = "key"
+        self._key: Optional[str] = None
+        self._token_start = -1
+        self._value_kind: Optional[str] = None
+
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        # 是否有字段值解析失败（此时fields不完整）
+        self._skipped = False
+
+    @property
+    def text(self) -> str:
+        """已接收的完整文本"""
+        return self._buffer
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """喂入一块文本，返回本次新闭合的顶层字段列表[(字段名, 值)]"""
+        self._buffer += chunk
+        completed: List[Tuple[str, Any]] = []
+        buffer = self._buffer
+
+        while self._pos < len(buffer) and not self.done:
+            i = self._pos
+            char = buffer[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._on_top_level_string_end(i, completed)
+                continue
+
+            if self._depth == 0:
+                # 顶层对象开始之前的内容全部跳过
+                if char == "{":
+                    self._depth = 1
+                    self._expect = "key"
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    if self._expect == "key":
+                        self._token_start = i
+                    elif self._expect == "value":
+                        self._token_start = i
+                        self._value_kind = "string"
+                        self._expect = "after_value"
+                continue
+
+            if char in "{[":
+                if self._depth == 1 and self._expect == "value":
+                    self._token_start = i
+                    self._value_kind = "container"
+                    self._expect = "after_value"
+                self._depth += 1
+                continue
+
+            if char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._value_kind == "container":
+                    self._emit(buffer[self._token_start:i + 1], completed)
+                elif self._depth == 0:
+                    if self._value_kind == "scalar":
+                        self._emit(buffer[self._token_start:i], completed)
+                    self.done = True
+                continue
+
+            if self._depth != 1:
+                continue
+
+            if char == ":" and self._expect == "colon":
+                self._expect = "value"
+            elif char == ",":
+                if self._value_kind == "scalar":
+                    self._emit(buffer[self._token_start:i], completed)
+                self._expect = "key"
+                self._value_kind = None
+            elif not char.isspace() and self._expect == "value":
+                # 数字、true/false/null
+                self._token_start = i
+                self._value_kind = "scalar"
+                self._expect = "after_value"
+
+        return completed
+
+    def _on_top_level_string_end(self, end: int, completed: List[Tuple[str, Any]]) -> None:
+        """顶层字符串闭合：可能是字段名，也可能是字符串值"""
+        token = self._buffer[self._token_start:end + 1]
+        if self._expect == "key":
+            try:
+                self._key = json.loads(token)
+            except json.JSONDecodeError:
+                self._key = None
+            self._expect = "colon"
+        elif self._value_kind == "string":
+            self._emit(token, completed)
+
+    def _emit(self, raw_value: str, completed: List[Tuple[str, Any]]) -> None:
+        """解析一个完整的字段值并记录"""
+        self._value_kind = None
+        if self._key is None:
+            return
+        try:
+            value = json.loads(raw_value.strip())
+        except json.JSONDecodeError:
+            app_logger.debug(f"增量JSON字段解析失败，忽略: {self._key}")
+            self._skipped = True
+            return
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+
+    def result(self) -> Optional[Any]:
+        """完整结果：顶层对象已闭合且各字段都解析成功时直接返回逐字段解析的结果，不再整体解析一遍；
+        否则解析完整文本，失败时退回已闭合的字段（没有任何字段时返回None）
+        """
+        if self.done and not self._skipped:
+            return dict(self.fields)
+        parsed = extract_json(self._buffer)
+        if parsed is not None:
+            return parsed
+        return dict(self.fields) if self.fields else None
@@ -0,0 +1,39 @@
+"""
+消息体大小估算
+
+遍历字典/列表结构估算JSON序列化后的字符数，不生成中间字符串，
+用于日志和步骤元数据中的结果大小统计（大结果上比len(str(...))或json.dumps省内存和CPU）
+"""
+
+from typing import Any
+
+
+def estimate_json_size(value: Any) -> int:
+    """估算值按json.dumps(ensure_ascii=False)序列化后的字符数
+
+    按默认分隔符(", "与": ")计算，不计字符串中的转义字符，结果为近似值
+    """
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            size += len(item) + 2
+        elif isinstance(item, dict):
+            # 花括号、逗号分隔，每个键带引号和": "
+            size += 2 + max(len(item) - 1, 0) * 2
+            for key, child in item.items():
+                size += (len(key) if isinstance(key, str) else len(str(key))) + 4
+                stack.append(child)
+        elif isinstance(item, (list, tuple)):
+            size += 2 + max(len(item) - 1, 0) * 2
+            stack.extend(item)
+        elif item is None:
+            size += 4
+        elif isinstance(item, bool):
+            size += 4 if item else 5
+        elif isinstance(item, (int, float)):
+            size += len(repr(item))
+        else:
+            size += len(str(item)) + 2
+    return size
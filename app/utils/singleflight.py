@@ -0,0 +1,149 @@
+"""
+请求合并（singleflight）
+
+同一时刻以相同键发起的多个调用只执行一次，其余调用方共享同一个结果，
+用于合并热门物品并发提交时重复的大模型调用和外部搜索请求。
+
+共享执行不继承首个调用方的请求截止时间、网关优先级等上下文，这些由注册的CallerContext处理，
+避免其他调用方受首个调用方的预算或优先级影响
+"""
+
+import asyncio
+import contextvars
+import copy
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+from app.core.logger import app_logger
+
+
+T = TypeVar("T")
+
+
+class CallerContext:
+    """随调用方变化的上下文（请求截止时间、网关优先级等）
+
+    - enter_shared: 在共享执行的上下文中调用，重置该上下文并返回共享状态
+    - join: 每个调用方（包括首个调用方）加入共享执行时在自己的上下文中调用
+    - wait: 包装调用方对共享结果的等待，如按调用方自己的剩余预算限时
+    """
+
+    def enter_shared(self) -> Any:
+        return None
+
+    def join(self, state: Any) -> None:
+        pass
+
+    async def wait(self, awaitable: Awaitable[T]) -> T:
+        return await awaitable
+
+
+_caller_contexts: List[CallerContext] = []
+
+
+def register_caller_context(context: CallerContext) -> None:
+    """注册随调用方变化的上下文，对之后的所有请求合并生效"""
+    _caller_contexts.append(context)
+
+
+class _Call:
+    """一次进行中的执行"""
+
+    __slots__ = ("future", "followers", "snapshot", "states")
+
+    def __init__(self, future: asyncio.Future, states: List[Any]):
+        self.future = future
+        self.followers = 0
+        self.snapshot: Any = None
+        self.states = states
+
+
+class SingleFlight:
+    """请求合并组
+
+    调用方被取消不会取消共享的执行任务，其余等待者仍能拿到结果；
+    执行结束后键立即释放，之后的调用重新执行（结果缓存由各自的缓存层负责）
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, _Call] = {}
+
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+        _registry[name] = self
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """以key合并执行fn
+
+        Args:
+            key: 合并键，键相同的并发调用共享一次执行
+            fn: 无参异步函数，仅在没有进行中的同键调用时执行
+
+        Returns:
+            执行结果；共享结果的调用方拿到独立的深拷贝，避免互相修改
+        """
+        self.calls += 1
+
+        call = self._inflight.get(key)
+        leader = call is None
+        if leader:
+            self.executions += 1
+            call = self._start(fn)
+            self._inflight[key] = call
+            call.future.add_done_callback(lambda _: self._complete(key, call))
+        else:
+            self.collapsed += 1
+            call.followers += 1
+            app_logger.debug(f"请求合并命中: {self.name}")
+
+        for context, state in zip(_caller_contexts, call.states):
+            context.join(state)
+        waiter: Awaitable[Any] = asyncio.shield(call.future)
+        for context in _caller_contexts:
+            waiter = context.wait(waiter)
+        result = await waiter
+        return result if leader else copy.deepcopy(call.snapshot)
+
+    @staticmethod
+    def _start(fn: Callable[[], Awaitable[T]]) -> _Call:
+        """在独立的上下文中启动共享执行，由各CallerContext重置调用方相关的上下文"""
+        shared_context = contextvars.copy_context()
+        states = [shared_context.run(context.enter_shared) for context in _caller_contexts]
+        return _Call(shared_context.run(asyncio.ensure_future, fn()), states)
+
+    def _complete(self, key: Hashable, call: _Call) -> None:
+        """执行结束时释放键
+
+        完成回调先于所有等待方恢复执行，在此为共享方保存结果快照，
+        避免首个调用方修改结果后影响其他调用方；同时消费异常避免未取回异常的警告
+        """
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        if call.future.cancelled() or call.future.exception() is not None:
+            return
+        if call.followers:
+            call.snapshot = copy.deepcopy(call.future.result())
+
+    @property
+    def inflight(self) -> int:
+        """进行中的执行数"""
+        return len(self._inflight)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "inflight": self.inflight
+        }
+
+
+_registry: Dict[str, SingleFlight] = {}
+
+
+def get_singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有请求合并组的统计"""
+    return {name: group.get_stats() for name, group in _registry.items()}
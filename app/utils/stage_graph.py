@@ -0,0 +1,240 @@
+"""
+阶段依赖图调度器
+
+把处理流程声明为带显式数据依赖的阶段图：
+- depends_on：输入依赖，全部成功后才启动，依赖结果作为输入传入
+- cancel_on_failure：投机启动的守护阶段，不等待它们，但任一失败时取消本阶段
+
+所有阶段在start()时一次性创建为任务，各自等待依赖，独立阶段在输入就绪的瞬间启动，
+端到端耗时等于最长的单条依赖链，而不是各阶段耗时之和。
+指定截止时间时，到期仍未结束的阶段被取消并记为超时
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.logger import app_logger
+
+
+class StageStatus:
+    """阶段结束状态"""
+    COMPLETED = "completed"
+    FAILED = "failed"
+    SKIPPED = "skipped"      # 依赖阶段未成功，未启动
+    CANCELLED = "cancelled"  # 守护阶段失败或调度器被取消
+    TIMED_OUT = "timed_out"  # 超过截止时间被取消
+
+
+@dataclass
+class Stage:
+    """处理阶段"""
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    depends_on: Tuple[str, ...] = ()
+    cancel_on_failure: Tuple[str, ...] = ()
+    # 判断结果是否成功，用于返回success=False而不抛异常的Agent
+    succeeded: Optional[Callable[[Any], bool]] = None
+
+
+@dataclass
+class StageOutcome:
+    """阶段执行结果"""
+    name: str
+    status: str
+    result: Any = None
+    error: Optional[str] = None
+    exception: Optional[BaseException] = field(default=None, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        """阶段是否成功完成"""
+        return self.status == StageStatus.COMPLETED
+
+
+class StageGraph:
+    """阶段依赖图调度器"""
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        inputs: Optional[Dict[str, Any]] = None,
+        deadline: Optional[float] = None
+    ):
+        """
+        Args:
+            stages: 阶段列表
+            inputs: 已就绪的输入（视为已成功完成的阶段），如 {"analysis": analysis_result}
+            deadline: 截止时间（time.monotonic()），为None表示不限制
+        """
+        self.inputs = dict(inputs or {})
+        self.deadline = deadline
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages or stage.name in self.inputs:
+                raise ValueError(f"阶段名称重复: {stage.name}")
+            self.stages[stage.name] = stage
+
+        known = set(self.stages) | set(self.inputs)
+        for stage in stages:
+            for upstream in stage.depends_on + stage.cancel_on_failure:
+                if upstream not in known:
+                    raise ValueError(f"阶段 {stage.name} 依赖未知阶段: {upstream}")
+        self._check_acyclic()
+
+        self.outcomes: Dict[str, StageOutcome] = {}
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cancel_reasons: Dict[str, str] = {}
+        self._timed_out: set = set()
+        self._deadline_handle: Optional[asyncio.TimerHandle] = None
+        self._started = False
+
+    def _check_acyclic(self) -> None:
+        """检查依赖图无环"""
+        visiting, visited = set(), set()
+
+        def visit(name: str) -> None:
+            if name in visited or name in self.inputs:
+                return
+            if name in visiting:
+                raise ValueError(f"阶段依赖存在环: {name}")
+            visiting.add(name)
+            stage = self.stages[name]
+            for upstream in stage.depends_on + stage.cancel_on_failure:
+                visit(upstream)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def start(self) -> None:
+        """创建所有阶段任务
+
+        任务在此处创建，会继承调用方当前的上下文（如请求截止时间）
+        """
+        if self._started:
+            return
+        self._started = True
+
+        loop = asyncio.get_running_loop()
+        for name, value in self.inputs.items():
+            future = loop.create_future()
+            future.set_result(StageOutcome(name, StageStatus.COMPLETED, result=value))
+            self._futures[name] = future
+        for name in self.stages:
+            self._futures[name] = loop.create_future()
+        for name, stage in self.stages.items():
+            task = asyncio.create_task(self._execute(stage), name=f"stage:{name}")
+            task.add_done_callback(lambda _, stage_name=name: self._on_task_done(stage_name))
+            self._tasks[name] = task
+        if self.deadline is not None:
+            delay = max(0.0, self.deadline - time.monotonic())
+            self._deadline_handle = loop.call_later(delay, self._on_deadline)
+
+    def _on_deadline(self) -> None:
+        """截止时间到期，取消所有未结束的阶段"""
+        pending = [name for name in self.stages if name not in self.outcomes]
+        if pending:
+            app_logger.warning(f"阶段超出截止时间，已取消: {pending}")
+        for name in pending:
+            self._timed_out.add(name)
+            self._cancel_stage(name, "超出请求时间预算")
+
+    def _cancelled_outcome(self, name: str) -> StageOutcome:
+        """被取消阶段的结果，因截止时间取消的记为超时"""
+        status = StageStatus.TIMED_OUT if name in self._timed_out else StageStatus.CANCELLED
+        return StageOutcome(name, status, error=self._cancel_reasons.get(name, "阶段已取消"))
+
+    def _on_task_done(self, name: str) -> None:
+        """任务在开始执行前就被取消时补记结果，避免等待方永远挂起"""
+        if name not in self.outcomes:
+            self._finish(self._cancelled_outcome(name))
+
+    async def _execute(self, stage: Stage) -> None:
+        """等待依赖后执行阶段"""
+        try:
+            inputs: Dict[str, Any] = {}
+            for upstream in stage.depends_on:
+                outcome = await self.wait(upstream)
+                if not outcome.ok:
+                    self._finish(StageOutcome(
+                        stage.name, StageStatus.SKIPPED, error=f"依赖阶段 {upstream} 未成功"
+                    ))
+                    return
+                inputs[upstream] = outcome.result
+
+            result = await stage.run(inputs)
+        except asyncio.CancelledError:
+            self._finish(self._cancelled_outcome(stage.name))
+        except Exception as e:
+            app_logger.error(f"阶段 {stage.name} 执行失败: {e}")
+            self._finish(StageOutcome(stage.name, StageStatus.FAILED, error=str(e), exception=e))
+        else:
+            if stage.succeeded is not None and not stage.succeeded(result):
+                self._finish(StageOutcome(stage.name, StageStatus.FAILED, result=result, error="阶段结果未成功"))
+            else:
+                self._finish(StageOutcome(stage.name, StageStatus.COMPLETED, result=result))
+
+    def _finish(self, outcome: StageOutcome) -> None:
+        """记录阶段结果，失败时取消下游的投机阶段"""
+        if outcome.name in self.outcomes:
+            return
+        self.outcomes[outcome.name] = outcome
+        self._futures[outcome.name].set_result(outcome)
+
+        if outcome.ok:
+            return
+        for name, stage in self.stages.items():
+            if outcome.name in stage.cancel_on_failure and name not in self.outcomes:
+                self._cancel_stage(name, f"上游阶段 {outcome.name} 未成功，已取消")
+
+    def _cancel_stage(self, name: str, reason: str) -> None:
+        """取消一个阶段"""
+        self._cancel_reasons.setdefault(name, reason)
+        task = self._tasks.get(name)
+        if task is not None and not task.done():
+            task.cancel()
+
+    async def wait(self, name: str) -> StageOutcome:
+        """等待某个阶段结束并返回结果"""
+        return await asyncio.shield(self._futures[name])
+
+    async def as_completed(self, names: List[str]) -> AsyncIterator[StageOutcome]:
+        """按完成顺序逐个产出若干阶段的结果，快阶段不必等待慢阶段
+
+        同时已结束的阶段按names中的顺序产出，保证顺序确定
+        """
+        remaining = list(names)
+        while remaining:
+            finished = [name for name in remaining if name in self.outcomes]
+            if not finished:
+                await asyncio.wait(
+                    [self._futures[name] for name in remaining], return_when=asyncio.FIRST_COMPLETED
+                )
+                continue
+            for name in finished:
+                remaining.remove(name)
+                yield self.outcomes[name]
+
+    @property
+    def timed_out_stages(self) -> List[str]:
+        """因超出截止时间被取消的阶段"""
+        return [name for name, outcome in self.outcomes.items() if outcome.status == StageStatus.TIMED_OUT]
+
+    def cancel(self, reason: str = "处理已取消") -> None:
+        """取消所有未结束的阶段"""
+        for name in self.stages:
+            if name not in self.outcomes:
+                self._cancel_stage(name, reason)
+
+    async def aclose(self) -> None:
+        """取消未结束的阶段并等待其退出"""
+        if self._deadline_handle is not None:
+            self._deadline_handle.cancel()
+            self._deadline_handle = None
+        self.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
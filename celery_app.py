@@ -30,6 +30,7 @@ celery_app.conf.update(
     # 任务路由
     task_routes={
         "app.tasks.process_item_task": {"queue": "item_processing"},
+        "app.tasks.process_task": {"queue": "item_processing"},
         "app.tasks.crawl_market_data": {"queue": "data_crawling"},
     },
     
@@ -13,6 +13,18 @@ import time
 from app.core.config import settings
 from app.core.logger import app_logger
 from app.database.connection import create_tables, close_db
+from app.services.llm.bluelm_client import bluelm_client
+from app.services.llm.image_analysis_cache import image_analysis_cache
+from app.services.llm.completion_cache import completion_cache
+from app.services.llm.gateway_scheduler import gateway_scheduler
+from app.services.solution_cache import solution_cache
+from app.services.step_events import step_event_log
+from app.services.task_progress import task_progress_store
+from app.services.serialization import json_response_class
+from app.services.admission import admission_controller
+from app.utils.singleflight import get_singleflight_stats
+from app.utils.image_preprocess import image_preprocessor
+from app.agents.processing_master.agent import processing_master_agent
 from app.api.v1.tasks import router as tasks_router
 from app.api.v1.image_proxy import router as image_proxy_router
 
@@ -29,11 +41,25 @@ async def lifespan(app: FastAPI):
         await create_tables()
         app_logger.info("数据库初始化完成")
         
+        # 预热蓝心网关共享连接池
+        await bluelm_client.warm_up()
+        
+        # 创建共享的总处理协调器Agent，各WebSocket连接复用
+        await processing_master_agent.initialize()
+        
         yield
         
     finally:
         # 关闭时执行
         app_logger.info("正在关闭闲置物语后端服务...")
+        await processing_master_agent.close()
+        await bluelm_client.close()
+        await image_analysis_cache.close()
+        await solution_cache.close()
+        await step_event_log.close()
+        await task_progress_store.close()
+        image_preprocessor.close()
+        app_logger.info("蓝心网关连接池已关闭")
         await close_db()
         app_logger.info("数据库连接已关闭")
 
@@ -45,6 +71,7 @@ app = FastAPI(
     description="基于AI的智能物品处置建议系统",
     docs_url="/docs" if settings.debug else None,
     redoc_url="/redoc" if settings.debug else None,
+    default_response_class=json_response_class(),
     lifespan=lifespan
 )
 
@@ -95,6 +122,22 @@ async def health_check():
     }
 
 
+# 运行指标接口
+@app.get("/health/metrics")
+async def health_metrics():
+    """网关调度、熔断对冲、缓存命中、请求合并与处理准入等运行指标"""
+    return {
+        "llm_gateway": gateway_scheduler.get_stats(),
+        "llm_resilience": bluelm_client.get_stats(),
+        "completion_cache": completion_cache.get_stats(),
+        "image_analysis_cache": image_analysis_cache.get_stats(),
+        "solution_cache": solution_cache.get_stats(),
+        "image_preprocess": image_preprocessor.get_stats(),
+        "singleflight": get_singleflight_stats(),
+        "admission": admission_controller.get_stats()
+    }
+
+
 # 注册API路由
 app.include_router(tasks_router, prefix=settings.api_prefix)
 app.include_router(image_proxy_router, prefix=f"{settings.api_prefix}/proxy", tags=["图片代理"])
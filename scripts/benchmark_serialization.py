@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+消息序列化基准测试
+
+构造与线上结构一致的结果整合步骤消息（分析结果、处置推荐、改造方案、B站视频、回收点、
+二手商品和交易文案），比较各序列化路径的耗时和消息大小：
+- 现有路径：ProcessingMasterResponse.to_dict() + 手工构造消息 + json.dumps(ensure_ascii=False)
+- pydantic model_dump_json
+- orjson
+- MessagePack：由消息结构直接打包（进程内事件日志），以及由JSON文本解码后打包（Redis事件日志）
+
+用法：python scripts/benchmark_serialization.py [--rounds 200]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Tuple
+
+# 项目根目录
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+# 基准测试不访问外部服务，缺少必需配置时使用占位值
+for name in ("LANXIN_APP_ID", "LANXIN_APP_KEY", "AMAP_API_KEY"):
+    os.environ.setdefault(name, "benchmark")
+
+from app.models.processing_master_models import (  # noqa: E402
+    CreativeSolution, DisposalSolution, ProcessingMasterDataConverter, ProcessingMasterResponse, ProcessingStep,
+    ProcessingStepStatus, RecyclingSolution, SecondhandSolution
+)
+from app.services.serialization import MessageSerializer, OrjsonSerializer, msgpack_available, orjson, to_msgpack  # noqa: E402
+from app.services.step_events import build_step_message, encode_message  # noqa: E402
+
+
+def build_final_step() -> Tuple[ProcessingStep, ProcessingMasterResponse]:
+    """构造一次完整处理的结果整合步骤（约18KB）及其响应对象"""
+    analysis = {
+        "category": "家具",
+        "sub_category": "实木餐椅",
+        "brand": "无品牌",
+        "condition": "八成新，椅面有轻微划痕",
+        "description": "胡桃木实木餐椅，榫卯结构稳固，坐垫为可拆卸布艺，椅背有雕花，使用约三年。" * 2,
+        "material": "胡桃木",
+        "keywords": ["实木餐椅", "胡桃木", "榫卯", "二手家具", "餐厅家具"],
+        "estimated_age": "3年",
+        "special_features": "椅背雕花，坐垫可拆洗",
+        "_merge_metadata": {"source": "merged", "has_conflicts": False}
+    }
+    disposal = DisposalSolution(
+        success=True,
+        recommendation_source="ai_model",
+        recommendations={
+            "creative_renovation": {"recommendation_score": 82, "reasons": ["结构完好，适合改造为花架或边几"] * 3},
+            "recycling_donation": {"recommendation_score": 65, "reasons": ["实木材质可回收再利用"] * 3},
+            "secondhand_trading": {"recommendation_score": 78, "reasons": ["胡桃木餐椅二手需求稳定，价格可观"] * 3},
+            "overall_recommendation": {"primary_choice": "creative_renovation", "reason": "改造成本低、价值提升明显"}
+        }
+    )
+    creative = CreativeSolution(
+        success=True,
+        keywords=["餐椅改造", "旧椅子翻新", "实木家具DIY"],
+        search_intent="旧实木餐椅的翻新与改造教程",
+        renovation_plan={
+            "summary": {"title": "复古胡桃木花架", "difficulty": "中等", "estimated_time": "半天", "cost": "约80元"},
+            "materials": [{"name": f"材料{index}", "quantity": "1份", "note": "五金店或网购可得"} for index in range(8)],
+            "steps": [
+                {"step": index, "title": f"第{index}步", "detail": "拆下坐垫，用砂纸打磨椅面划痕后刷木蜡油，晾干后安装层板。" * 2}
+                for index in range(1, 9)
+            ]
+        },
+        videos=[
+            {
+                "bvid": f"BV1xx41157{index:02d}",
+                "title": f"旧椅子改造花架教程第{index}期",
+                "author": "木作小屋",
+                "play": 120000 + index * 1000,
+                "duration": "08:32",
+                "url": f"https://www.bilibili.com/video/BV1xx41157{index:02d}",
+                "cover": f"https://i0.hdslb.com/bfs/archive/cover{index}.jpg",
+                "description": "一步步教你把闲置餐椅改造成实用又好看的花架。" * 2
+            }
+            for index in range(10)
+        ]
+    )
+    recycling = RecyclingSolution(
+        success=True,
+        processing_summary={"recycling_type": "家具回收", "location_count": 10},
+        location_recommendation={
+            "locations": [
+                {
+                    "name": f"城市再生资源回收站{index}号",
+                    "address": f"朝阳区建国路{index * 10}号",
+                    "distance": 500 + index * 320,
+                    "tel": "010-8888888",
+                    "location": "116.447303,39.906823",
+                    "business_hours": "09:00-18:00"
+                }
+                for index in range(10)
+            ]
+        },
+        platform_recommendation={
+            "platforms": [{"name": f"回收平台{index}", "reason": "支持上门回收大件家具", "score": 0.9 - index * 0.1} for index in range(5)]
+        }
+    )
+    secondhand = SecondhandSolution(
+        success=True,
+        search_result={
+            "products": [
+                {
+                    "title": f"胡桃木实木餐椅 九成新 {index}",
+                    "price": 150 + index * 12,
+                    "location": "北京",
+                    "seller": f"卖家{index}",
+                    "url": f"https://www.goofish.com/item?id={7000000 + index}",
+                    "image": f"https://img.alicdn.com/item{index}.jpg",
+                    "want_count": index * 3
+                }
+                for index in range(30)
+            ],
+            "price_analysis": {"min": 150, "max": 498, "median": 320, "suggested_price": 280}
+        },
+        content_result={
+            "title": "自用胡桃木实木餐椅转让，榫卯结构，九成新",
+            "description": "家里换了餐桌所以出这把餐椅，胡桃木材质，坐感舒适，没有松动。" * 4,
+            "tags": ["实木", "餐椅", "胡桃木", "自提"]
+        },
+        processing_metadata={"platforms": ["xianyu", "aihuishou"], "total_products": 30}
+    )
+    response = ProcessingMasterDataConverter.assemble_response(
+        success=True,
+        analysis_result=analysis,
+        disposal_solution=disposal,
+        creative_solution=creative,
+        recycling_solution=recycling,
+        secondhand_solution=secondhand,
+        processing_time_seconds=23.4
+    )
+    return ProcessingStep(
+        step_name="result_integration",
+        step_title="结果整合",
+        description="整合所有Agent的处理结果",
+        status=ProcessingStepStatus.COMPLETED,
+        result=response.to_dict(),
+        metadata={"total_processing_time": 23.4, "successful_agents": 4},
+        timestamp=time.time()
+    ), response
+
+
+def measure(name: str, rounds: int, encode: Callable[[], object]) -> None:
+    """执行encode rounds次，输出平均耗时和结果大小"""
+    encode()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        output = encode()
+    elapsed = (time.perf_counter() - start) / rounds
+    size = len(output.encode("utf-8")) if isinstance(output, str) else len(output)
+    print(f"{name:<32}{elapsed * 1e6:>10.1f} µs{size:>10} 字节")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="消息序列化基准测试")
+    parser.add_argument("--rounds", type=int, default=200, help="每种路径的执行次数")
+    args = parser.parse_args()
+
+    step, response = build_final_step()
+    standard = MessageSerializer()
+    print(f"{'路径':<30}{'平均耗时':>12}{'大小':>12}")
+
+    measure(
+        "现有路径（to_dict+json.dumps）", args.rounds,
+        lambda: json.dumps(build_step_message(step.model_copy(update={"result": response.to_dict()})), ensure_ascii=False)
+    )
+    measure("标准库json（消息）", args.rounds, lambda: standard.dumps(build_step_message(step)))
+    measure("pydantic model_dump_json（结果）", args.rounds, lambda: response.model_dump_json(exclude_none=True))
+    if orjson is not None:
+        fast = OrjsonSerializer()
+        measure("orjson（消息）", args.rounds, lambda: fast.dumps(build_step_message(step)))
+    else:
+        print("未安装orjson，跳过")
+    if msgpack_available():
+        encoded = encode_message(build_step_message(step))
+        text = str(encoded)
+        measure("MessagePack帧（由消息结构打包）", args.rounds, lambda: to_msgpack(encoded))
+        measure("MessagePack帧（由JSON文本转换）", args.rounds, lambda: to_msgpack(text))
+    else:
+        print("未安装msgpack，跳过MessagePack")
+
+
+if __name__ == "__main__":
+    main()
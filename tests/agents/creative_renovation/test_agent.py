@@ -6,6 +6,7 @@
 
 import asyncio
 
+import httpx
 import pytest
 
 from app.agents.creative_renovation.agent import CreativeRenovationAgent
@@ -34,6 +35,33 @@ class TestCreativeRenovationAgent:
             "special_features": "有些许磨损"
         }
     
+    @pytest.mark.asyncio
+    async def test_retry_after_partial_stream_not_forwarded(self, agent, monkeypatch):
+        """测试流式输出中途失败后重试改用阻塞调用，已转发的内容不会重复发送"""
+        from app.agents.creative_renovation import agent as agent_module
+
+        class _Client:
+            async def stream_complete(self, **kwargs):
+                yield '{"summary": '
+                raise httpx.ReadError("连接中断")
+
+            async def complete(self, **kwargs):
+                return {"content": '{"summary": {}}'}
+
+        async def _no_wait(_):
+            pass
+
+        monkeypatch.setattr(agent_module, "bluelm_client", _Client())
+        monkeypatch.setattr(agent_module.asyncio, "sleep", _no_wait)
+        forwarded = []
+
+        async def _on_chunk(chunk):
+            forwarded.append(chunk)
+
+        data = await agent._call_lanxin_api("系统提示", "用户提示", on_chunk=_on_chunk)
+        assert data == {"content": '{"summary": {}}'}
+        assert forwarded == ['{"summary": ']
+
     def test_prompts_initialization(self):
         """测试提示词初始化"""
         print(f"\n==== 测试提示词初始化 ====")
@@ -0,0 +1,3 @@
+"""
+合并调用Agent测试模块
+"""
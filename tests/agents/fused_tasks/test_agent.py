@@ -0,0 +1,116 @@
+"""
+合并调用Agent测试
+
+模拟蓝心大模型响应，验证合并结果的拆分以及子Agent对合并结果的使用
+"""
+
+import json
+
+import pytest
+
+from app.agents.fused_tasks.agent import (
+    FusedTasksAgent,
+    fused_results_scope,
+    get_fused_result,
+    RECYCLING_TYPE_TASK,
+    BILIBILI_KEYWORDS_TASK,
+    SECONDHAND_KEYWORDS_TASK
+)
+from app.agents.bilibili_search.agent import BilibiliSearchAgent
+from app.agents.recycling_location.agent import RecyclingLocationAgent
+
+
+ANALYSIS_RESULT = {
+    "category": "电子产品",
+    "sub_category": "笔记本电脑",
+    "brand": "联想",
+    "model": "ThinkPad E14",
+    "condition": "八成新",
+    "_merge_metadata": {"source": "image_only"}
+}
+
+FUSED_RESPONSE = {
+    "recycling_type": "电脑回收",
+    "bilibili_search": {"keywords": ["笔记本改造", "DIY", " "], "search_intent": "旧笔记本改造教程"},
+    "secondhand_search": {
+        "keywords": ["ThinkPad"],
+        "search_intent": "查询ThinkPad二手价格",
+        "platform_suggestions": {"xianyu": ["ThinkPad E14"]}
+    }
+}
+
+
+def _mock_response(monkeypatch, agent: FusedTasksAgent, content: str, calls: list):
+    async def fake_call(system_prompt, user_prompt):
+        calls.append(user_prompt)
+        return {"content": content}
+
+    monkeypatch.setattr(agent, "_call_lanxin_api", fake_call)
+
+
+class TestFusedTasksAgent:
+    """合并调用Agent测试类"""
+
+    @pytest.mark.asyncio
+    async def test_split_results(self, monkeypatch):
+        """测试一次调用的结果按任务拆分为各Agent的中间结果格式"""
+        agent = FusedTasksAgent()
+        calls = []
+        _mock_response(monkeypatch, agent, f"```json\n{json.dumps(FUSED_RESPONSE, ensure_ascii=False)}\n```", calls)
+
+        results = await agent.run(ANALYSIS_RESULT)
+
+        assert len(calls) == 1
+        assert "_merge_metadata" not in calls[0]
+        assert results[RECYCLING_TYPE_TASK] == "电脑回收"
+        assert results[BILIBILI_KEYWORDS_TASK]["keywords"] == ["笔记本改造", "DIY"]
+        assert results[BILIBILI_KEYWORDS_TASK]["source"] == "fused_call"
+        secondhand = results[SECONDHAND_KEYWORDS_TASK]
+        assert secondhand["success"] is True
+        assert secondhand["platform_suggestions"] == {"xianyu": ["ThinkPad E14"], "aihuishou": ["ThinkPad"]}
+
+    @pytest.mark.asyncio
+    async def test_invalid_sections_dropped(self, monkeypatch):
+        """测试不合法的任务段被丢弃，无法解析时返回空结果"""
+        agent = FusedTasksAgent()
+        response = {"recycling_type": "其他回收", "bilibili_search": {"keywords": []}, "secondhand_search": FUSED_RESPONSE["secondhand_search"]}
+        _mock_response(monkeypatch, agent, json.dumps(response, ensure_ascii=False), [])
+        assert list((await agent.run(ANALYSIS_RESULT)).keys()) == [SECONDHAND_KEYWORDS_TASK]
+
+        _mock_response(monkeypatch, agent, "无法判断", [])
+        assert await agent.run(ANALYSIS_RESULT) == {}
+
+    def test_results_scope(self):
+        """测试合并结果只在作用域内可见，且返回副本"""
+        results = {BILIBILI_KEYWORDS_TASK: {"keywords": ["DIY"]}}
+        assert get_fused_result(BILIBILI_KEYWORDS_TASK) is None
+
+        with fused_results_scope(results):
+            fused = get_fused_result(BILIBILI_KEYWORDS_TASK)
+            fused["keywords"].append("改造")
+            assert get_fused_result(BILIBILI_KEYWORDS_TASK) == {"keywords": ["DIY"]}
+            assert get_fused_result(RECYCLING_TYPE_TASK) is None
+
+        assert get_fused_result(BILIBILI_KEYWORDS_TASK) is None
+
+    @pytest.mark.asyncio
+    async def test_agents_use_fused_results(self, monkeypatch):
+        """测试子Agent取到合并结果时不再单独调用模型"""
+        async def fail_call(*args, **kwargs):
+            raise AssertionError("不应单独调用模型")
+
+        recycling_agent = RecyclingLocationAgent()
+        bilibili_agent = BilibiliSearchAgent()
+        monkeypatch.setattr(recycling_agent, "_call_lanxin_api", fail_call)
+        monkeypatch.setattr(bilibili_agent, "_call_function_calling_api", fail_call)
+
+        results = {
+            RECYCLING_TYPE_TASK: "电脑回收",
+            BILIBILI_KEYWORDS_TASK: {"success": True, "keywords": ["DIY"], "search_intent": "", "source": "fused_call"}
+        }
+        with fused_results_scope(results):
+            assert await recycling_agent._analyze_recycling_type(ANALYSIS_RESULT) == ("电脑回收", "ai")
+            extraction = await bilibili_agent._extract_keywords_with_function_calling(ANALYSIS_RESULT)
+
+        assert extraction["keywords"] == ["DIY"]
+        await bilibili_agent.close()
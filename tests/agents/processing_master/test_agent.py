@@ -438,3 +438,89 @@ class TestProcessingMasterPerformance:
 if __name__ == "__main__":
     # 使用pytest运行测试
     pytest.main([__file__, "-v", "-s"])
+
+
+class TestProcessingMasterTimeBudget:
+    """请求时间预算测试"""
+
+    def test_request_budget_capped_by_settings(self):
+        """测试请求指定的时间预算不超过服务端上限"""
+        from app.core.config import settings
+
+        assert ProcessingMasterAgent._time_budget(ProcessingMasterRequest(text_description="旧台灯")) == settings.processing_time_budget
+        request = ProcessingMasterRequest(text_description="旧台灯", time_budget_seconds=5)
+        assert ProcessingMasterAgent._time_budget(request) == 5
+        request = ProcessingMasterRequest(text_description="旧台灯", time_budget_seconds=settings.processing_time_budget * 10)
+        assert ProcessingMasterAgent._time_budget(request) == settings.processing_time_budget
+
+    def test_partial_response_marks_timed_out_sections(self):
+        """测试超时环节在响应中被标记为部分结果"""
+        from app.models.processing_master_models import ProcessingMasterDataConverter
+
+        response = ProcessingMasterDataConverter.create_response(
+            success=True,
+            analysis_result={"category": "家具"},
+            timed_out_sections=["creative_coordination", "secondhand_coordination"]
+        )
+        result = response.to_dict()
+
+        assert result["partial"] is True
+        assert result["timed_out_sections"] == ["creative_coordination", "secondhand_coordination"]
+        assert result["creative_solution"]["success"] is False
+        assert "超出请求时间预算" in result["secondhand_solution"]["error"]
+        assert "recycling_solution" not in result
+        assert response.processing_metadata.agents_executed.total_successful == 0
+
+        complete = ProcessingMasterDataConverter.create_response(success=True, analysis_result={}).to_dict()
+        assert complete["partial"] is False
+        assert "timed_out_sections" not in complete
+
+
+class TestProcessingStepSnapshot:
+    """步骤快照测试"""
+
+    def test_snapshot_is_frozen_and_shares_payload(self):
+        """测试快照不可修改、共享结果引用且不受后续更新影响"""
+        from app.models.processing_master_models import ProcessingStep, ProcessingStepEvent
+
+        step = ProcessingStep(
+            step_name="content_analysis",
+            step_title="内容分析",
+            description="分析图片和/或文字内容",
+            status=ProcessingStepStatus.COMPLETED,
+            result={"category": "家具", "keywords": ["椅子"]},
+            timestamp=time.time()
+        )
+        result = step.result
+        event = step.snapshot()
+
+        assert isinstance(event, ProcessingStepEvent)
+        assert event.result is result
+        assert event.dict() == step.dict()
+        with pytest.raises(Exception):
+            event.status = ProcessingStepStatus.FAILED
+
+        step.status = ProcessingStepStatus.FAILED
+        step.result = None
+        assert event.status == ProcessingStepStatus.COMPLETED
+        assert event.result is result
+
+
+class TestSharedProcessingMasterAgent:
+    """共享Agent测试"""
+
+    @pytest.mark.asyncio
+    async def test_initialize_reuses_sub_agents(self):
+        """测试重复初始化复用同一组子Agent，且平台推荐共享RAG服务"""
+        from app.agents.platform_recommendation.agent import PlatformRecommendationAgent
+        from app.services.rag.platform_recommendation_service import platform_recommendation_rag_service
+
+        agent = ProcessingMasterAgent()
+        await agent.initialize()
+        sub_agents = (agent._disposal_agent, agent._creative_agent, agent._recycling_agent, agent._secondhand_agent)
+        await agent.initialize()
+        assert (agent._disposal_agent, agent._creative_agent, agent._recycling_agent, agent._secondhand_agent) == sub_agents
+
+        assert PlatformRecommendationAgent().rag_service is platform_recommendation_rag_service
+        assert PlatformRecommendationAgent().rag_service is PlatformRecommendationAgent().rag_service
+        await agent.close()
@@ -303,7 +303,8 @@ class TestSecondhandSearchAgentReal:
         
         async with SecondhandSearchAgent() as agent:
             assert agent is not None
-            assert hasattr(agent, 'client')
+            # Agent使用进程共享的蓝心网关客户端，不再持有自己的HTTP客户端
+            assert not hasattr(agent, 'client')
             print("✅ Agent上下文管理器工作正常")
             
             # 简单的备用关键词测试
@@ -0,0 +1,106 @@
+"""
+v2多路复用WebSocket测试
+
+验证一条连接上多个请求并发处理、消息按request_id区分、取消与同时进行请求数上限
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.api.v1 import tasks as tasks_api
+from app.models.processing_master_models import ProcessingStep, ProcessingStepStatus
+from app.services.step_events import StepEventLog
+
+
+class _FakeWebSocket:
+    """记录服务端发出的消息"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, message):
+        self.sent.append(json.loads(message))
+
+
+class _SlowAgent:
+    """产出一个步骤后等待release再结束，便于观察进行中的请求"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def process_complete_solution(self, request, progress_callback=None):
+        yield ProcessingStep(
+            step_name="content_analysis",
+            step_title="内容分析",
+            description=request.text_description,
+            status=ProcessingStepStatus.RUNNING,
+            timestamp=time.time()
+        )
+        await self.release.wait()
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = _SlowAgent()
+    monkeypatch.setattr(tasks_api, "processing_master_agent", agent)
+    monkeypatch.setattr(tasks_api, "step_event_log", StepEventLog(ttl=60, idle_timeout=5))
+    monkeypatch.setattr(tasks_api.settings, "processing_execution_mode", "local")
+    return agent
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class TestMultiplexConnection:
+    """多路复用连接测试类"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_tagged_by_request_id(self, agent):
+        """测试两个请求在同一连接上并发处理，每条消息带各自的request_id"""
+        websocket = _FakeWebSocket()
+        connection = tasks_api._MultiplexConnection(websocket, max_inflight=4)
+        await connection.handle({"action": "process", "request_id": "a", "text_description": "旧椅子"})
+        await connection.handle({"action": "process", "request_id": "b", "text_description": "旧台灯"})
+        await _settle()
+        agent.release.set()
+        await asyncio.gather(*(task for _, task in list(connection._inflight.values())))
+
+        for request_id in ("a", "b"):
+            messages = [message for message in websocket.sent if message.get("request_id") == request_id]
+            assert [message["type"] for message in messages] == ["accepted", "step_update", "process_complete"]
+        assert connection._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_inflight_cap_and_cancel(self, agent):
+        """测试超过上限的请求被拒绝，取消后释放名额"""
+        websocket = _FakeWebSocket()
+        connection = tasks_api._MultiplexConnection(websocket, max_inflight=1)
+        await connection.handle({"request_id": "a", "text_description": "旧椅子"})
+        await connection.handle({"request_id": "b", "text_description": "旧台灯"})
+        assert websocket.sent[-1]["type"] == "error" and websocket.sent[-1]["request_id"] == "b"
+        await _settle()
+
+        await connection.handle({"action": "cancel", "request_id": "a"})
+        await _settle()
+        assert websocket.sent[-1]["type"] == "cancelled"
+        assert connection._inflight == {}
+
+        await connection.handle({"request_id": "b", "text_description": "旧台灯"})
+        await _settle()
+        assert [message["type"] for message in websocket.sent if message.get("request_id") == "b"][-2:] == ["accepted", "step_update"]
+        await connection.close()
+
+    @pytest.mark.asyncio
+    async def test_invalid_messages(self, agent):
+        """测试缺少request_id和参数验证失败时返回错误"""
+        websocket = _FakeWebSocket()
+        connection = tasks_api._MultiplexConnection(websocket, max_inflight=2)
+        await connection.handle({"text_description": "旧椅子"})
+        await connection.handle({"request_id": "a"})
+        assert "request_id" not in websocket.sent[0]
+        assert websocket.sent[1]["request_id"] == "a" and "验证失败" in websocket.sent[1]["error"]
@@ -0,0 +1,118 @@
+"""
+SSE处理端点测试
+
+验证处理进度以text/event-stream推送、gzip压缩、按Last-Event-ID续传，以及名额已满时返回503
+"""
+
+import asyncio
+import time
+import zlib
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1 import tasks as tasks_api
+from app.models.processing_master_models import ProcessingMasterRequest, ProcessingStep, ProcessingStepStatus
+from app.services.admission import AdmissionController
+from app.services.serialization import message_serializer
+from app.services.step_events import StepEventLog
+
+
+class _Agent:
+    """产出两个步骤后结束"""
+
+    async def process_complete_solution(self, request, progress_callback=None):
+        for name in ("content_analysis", "disposal_recommendation"):
+            yield ProcessingStep(
+                step_name=name,
+                step_title=name,
+                description=request.text_description,
+                status=ProcessingStepStatus.COMPLETED,
+                timestamp=time.time()
+            )
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = AdmissionController(initial_limit=1, min_limit=1, max_limit=1, max_queue=0, max_wait=10)
+    monkeypatch.setattr(tasks_api, "processing_master_agent", _Agent())
+    monkeypatch.setattr(tasks_api, "step_event_log", StepEventLog(ttl=60, idle_timeout=5))
+    monkeypatch.setattr(tasks_api, "admission_controller", controller)
+    monkeypatch.setattr(tasks_api.settings, "processing_execution_mode", "local")
+    monkeypatch.setattr(tasks_api.settings, "admission_enabled", True)
+    return controller
+
+
+async def _read(response) -> str:
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    if response.headers.get("content-encoding") == "gzip":
+        body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    return body.decode("utf-8")
+
+
+def _events(text: str):
+    """解析为 (id, 消息) 列表，忽略retry和心跳"""
+    events = []
+    for block in text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if ": " in line and not line.startswith(":"))
+        if "data" in fields:
+            events.append((fields.get("id"), message_serializer.loads(fields["data"])))
+    return events
+
+
+class TestSseStream:
+    """SSE处理端点测试类"""
+
+    @pytest.mark.asyncio
+    async def test_stream_and_resume(self, controller):
+        """测试gzip压缩推送全部进度，随后按Last-Event-ID只补发之后的消息"""
+        response = await tasks_api.stream_process({"text_description": "旧椅子"}, accept_encoding="gzip, deflate")
+        assert response.media_type == "text/event-stream"
+        assert response.headers["content-encoding"] == "gzip"
+        events = _events(await _read(response))
+
+        assert events[0][1]["type"] == "session"
+        session_id = events[0][1]["session_id"]
+        assert [message["type"] for _, message in events[1:]] == ["step_update", "step_update", "process_complete"]
+        assert [event_id for event_id, _ in events[1:]] == [str(message["seq"]) for _, message in events[1:]]
+
+        resumed = await tasks_api.stream_session(session_id, resume_from=None, last_event_id="1", accept_encoding=None)
+        assert "content-encoding" not in resumed.headers
+        assert [event_id for event_id, _ in _events(await _read(resumed))] == ["2", "3"]
+        assert controller.inflight == 0
+
+    @pytest.mark.asyncio
+    async def test_rejected_when_full(self, controller):
+        """测试名额已满且不能排队时返回503和Retry-After"""
+        ticket = controller.try_acquire()
+        with pytest.raises(HTTPException) as rejected:
+            await tasks_api.stream_process({"text_description": "旧椅子"}, accept_encoding=None)
+        assert rejected.value.status_code == 503
+        assert int(rejected.value.headers["Retry-After"]) >= 1
+        ticket.release()
+
+    @pytest.mark.asyncio
+    async def test_unknown_session(self, controller):
+        """测试续传不存在的会话返回404"""
+        with pytest.raises(HTTPException) as missing:
+            await tasks_api.stream_session("missing", resume_from=None, last_event_id=None, accept_encoding=None)
+        assert missing.value.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_ticket_released_when_closed_after_admission(self, controller, monkeypatch):
+        """测试排队位置与名额同时到达时客户端断开，已分配的名额被归还"""
+        queued = AdmissionController(initial_limit=1, min_limit=1, max_limit=1, max_queue=1, max_wait=60)
+        monkeypatch.setattr(tasks_api, "admission_controller", queued)
+        holder = queued.try_acquire()
+
+        events = tasks_api._queued_session_events(ProcessingMasterRequest(text_description="旧椅子"))
+        await events.__anext__()
+        position = _events(await events.__anext__())
+        assert position[0][1]["type"] == "queued"
+
+        holder.release()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert queued.inflight == 1
+        await events.aclose()
+        assert queued.inflight == 0
@@ -10,6 +10,7 @@ from fastapi import HTTPException
 from app.api.dependencies.validation import (
     validate_task_create_data,
     validate_task_id,
+    validate_batch_request,
     _is_valid_url,
     _is_valid_location
 )
@@ -131,4 +132,24 @@ class TestHelperFunctions:
         assert _is_valid_location({"lat": 39.9042}) is False  # 缺少lon
         assert _is_valid_location({"lon": 116.4074}) is False  # 缺少lat
         assert _is_valid_location({}) is False
-        assert _is_valid_location("not a dict") is False 
\ No newline at end of file
+        assert _is_valid_location("not a dict") is False 
+
+
+class TestValidateBatchRequest:
+    """测试批量处理请求验证"""
+    
+    def test_valid_batch(self):
+        """测试有效批量请求"""
+        requests = validate_batch_request({"items": [{"text_description": "旧椅子"}, {"text_description": "旧台灯"}]}, max_items=5)
+        assert [request.text_description for request in requests] == ["旧椅子", "旧台灯"]
+    
+    def test_invalid_batch(self):
+        """测试空列表、超出上限和单件无效"""
+        with pytest.raises(HTTPException):
+            validate_batch_request({"items": []}, max_items=5)
+        with pytest.raises(HTTPException):
+            validate_batch_request({"items": [{"text_description": "旧椅子"}] * 3}, max_items=2)
+        with pytest.raises(HTTPException) as exc_info:
+            validate_batch_request({"items": [{"text_description": "旧椅子"}, {}]}, max_items=5)
+        assert "第2件物品" in exc_info.value.detail
+
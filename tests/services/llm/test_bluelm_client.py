@@ -0,0 +1,221 @@
+"""
+蓝心网关共享客户端测试
+
+使用httpx.MockTransport验证请求构造、鉴权头部和错误处理，不访问真实网关
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.llm.bluelm_client import BlueLMClient, BlueLMAPIError, TIMEOUT_PROFILES, has_json_content, parse_stream_event
+from app.services.llm.completion_cache import build_completion_cache_key
+
+
+def _make_client(handler) -> BlueLMClient:
+    """创建使用模拟传输层的客户端"""
+    client = BlueLMClient()
+    client._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+class TestBlueLMClient:
+    """蓝心网关客户端测试类"""
+
+    @pytest.mark.asyncio
+    async def test_complete_builds_request(self):
+        """测试文本补全请求构造"""
+        captured = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            captured["params"] = dict(request.url.params)
+            captured["headers"] = request.headers
+            captured["body"] = json.loads(request.content)
+            return httpx.Response(200, json={"code": 0, "data": {"content": "ok"}})
+
+        client = _make_client(handler)
+        data = await client.complete(
+            system_prompt="系统提示",
+            prompt="用户提示",
+            extra={"temperature": 0.1}
+        )
+
+        assert data == {"content": "ok"}
+        assert "requestId" in captured["params"]
+        assert captured["headers"]["X-AI-GATEWAY-SIGNED-HEADERS"] == "x-ai-gateway-app-id;x-ai-gateway-timestamp;x-ai-gateway-nonce"
+        assert captured["body"]["systemPrompt"] == "系统提示"
+        assert captured["body"]["prompt"] == "用户提示"
+        assert captured["body"]["model"] == client.text_model
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_chat_uses_given_model(self):
+        """测试messages格式请求使用指定模型"""
+        captured = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            captured["body"] = json.loads(request.content)
+            return httpx.Response(200, json={"code": 0, "data": {"content": "图片"}})
+
+        client = _make_client(handler)
+        await client.chat(
+            messages=[{"role": "user", "content": "你好"}],
+            extra={"max_tokens": 10},
+            model=client.vision_model,
+            timeout_profile="vision"
+        )
+
+        assert captured["body"]["model"] == client.vision_model
+        assert captured["body"]["requestId"]
+        assert captured["body"]["messages"][0]["content"] == "你好"
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_api_error_raises(self):
+        """测试网关业务错误"""
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"code": 1007, "msg": "限流"})
+
+        client = _make_client(handler)
+        with pytest.raises(BlueLMAPIError):
+            await client.complete("s", "p", extra={})
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_http_client_recreated_after_close(self):
+        """测试共享连接池关闭后自动重建"""
+        client = BlueLMClient()
+        first = client.http_client
+        await client.close()
+        second = client.http_client
+
+        assert first.is_closed
+        assert not second.is_closed
+        assert first is not second
+        await client.close()
+
+    def test_timeout_profiles(self):
+        """测试超时档位配置"""
+        assert {"default", "classification", "generation", "vision"} <= set(TIMEOUT_PROFILES)
+        assert TIMEOUT_PROFILES["generation"].read >= TIMEOUT_PROFILES["default"].read
+
+    @pytest.mark.asyncio
+    async def test_completion_cache_skips_gateway(self):
+        """测试相同输入命中补全缓存，不再请求网关"""
+        call_count = {"value": 0}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            call_count["value"] += 1
+            return httpx.Response(200, json={"code": 0, "data": {"content": "缓存内容"}})
+
+        client = _make_client(handler)
+        for _ in range(3):
+            data = await client.complete(
+                system_prompt="缓存测试系统提示",
+                prompt="缓存测试用户提示",
+                extra={"temperature": 0.1},
+                cache_namespace="unit_test"
+            )
+            assert data["content"] == "缓存内容"
+
+        assert call_count["value"] == 1
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_invalid_response_not_cached(self):
+        """测试未通过校验的响应（如截断的JSON）不写入补全缓存，下次仍请求网关"""
+        replies = iter(['{"category": "家具", "condition": "八成', '{"category": "家具", "condition": "八成新"}'])
+        call_count = {"value": 0}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            call_count["value"] += 1
+            return httpx.Response(200, json={"code": 0, "data": {"content": next(replies)}})
+
+        client = _make_client(handler)
+        contents = []
+        for _ in range(3):
+            data = await client.complete(
+                system_prompt="校验测试系统提示",
+                prompt="校验测试用户提示",
+                extra={"temperature": 0.1},
+                cache_namespace="unit_test",
+                cache_validator=has_json_content
+            )
+            contents.append(data["content"])
+
+        assert call_count["value"] == 2
+        assert contents[1] == contents[2] == '{"category": "家具", "condition": "八成新"}'
+        await client.close()
+
+    def test_cache_key_ignores_session_fields(self):
+        """测试缓存键不受sessionId/requestId影响"""
+        body_a = {"model": "m", "sessionId": "1", "requestId": "1", "prompt": "p", "extra": {"t": 0.1}}
+        body_b = {"model": "m", "sessionId": "2", "requestId": "2", "prompt": "p", "extra": {"t": 0.1}}
+        body_c = {"model": "m", "sessionId": "1", "prompt": "q", "extra": {"t": 0.1}}
+
+        assert build_completion_cache_key(body_a) == build_completion_cache_key(body_b)
+        assert build_completion_cache_key(body_a) != build_completion_cache_key(body_c)
+
+    @pytest.mark.asyncio
+    async def test_stream_complete_yields_chunks(self):
+        """测试流式补全逐块产出增量文本"""
+        sse_body = (
+            'data:{"message":"第一","type":"text"}\n\n'
+            'data:{"message":"第二","type":"text"}\n\n'
+            'event:close\n'
+            'data:{"reply":"第一第二"}\n\n'
+        )
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.url.path.endswith("/stream")
+            return httpx.Response(200, text=sse_body, headers={"Content-Type": "text/event-stream"})
+
+        client = _make_client(handler)
+        chunks = [chunk async for chunk in client.stream_complete("s", "p", extra={})]
+
+        assert chunks == ["第一", "第二"]
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_stream_falls_back_to_blocking(self):
+        """测试流式接口失败时回退到阻塞调用"""
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/stream"):
+                return httpx.Response(404)
+            return httpx.Response(200, json={"code": 0, "data": {"content": "完整内容"}})
+
+        client = _make_client(handler)
+        chunks = [chunk async for chunk in client.stream_complete("s", "p", extra={})]
+
+        assert chunks == ["完整内容"]
+        await client.close()
+
+    def test_parse_stream_event(self):
+        """测试SSE事件解析"""
+        assert parse_stream_event(None, '{"message":"你好"}') == "你好"
+        assert parse_stream_event(None, '{"data":{"content":"内容"}}') == "内容"
+        assert parse_stream_event("close", "{}") is None
+        with pytest.raises(BlueLMAPIError):
+            parse_stream_event("antispam", '{"message":"拦截"}')
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_requests_collapse(self):
+        """测试内容相同的并发请求只发送一次"""
+        call_count = {"value": 0}
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            call_count["value"] += 1
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={"code": 0, "data": {"content": "合并"}})
+
+        client = _make_client(handler)
+        results = await asyncio.gather(*[
+            client.complete("合并测试系统提示", "合并测试用户提示", extra={"temperature": 0.3})
+            for _ in range(4)
+        ])
+
+        assert call_count["value"] == 1
+        assert all(result["content"] == "合并" for result in results)
+        await client.close()
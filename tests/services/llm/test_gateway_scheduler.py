@@ -0,0 +1,182 @@
+"""
+蓝心网关调度器测试
+
+验证AIMD并发窗口调整、优先级排队、排队超时和队列指标
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.llm.gateway_scheduler import (
+    AIMDLimiter,
+    GatewayScheduler,
+    GatewayPriority,
+    GatewayOverloadedError,
+    current_priority,
+    is_overload_signal
+)
+from app.utils.singleflight import SingleFlight
+
+
+def _make_scheduler(limit: int = 1, queue_timeout: float = 5.0) -> GatewayScheduler:
+    """创建固定初始窗口的调度器"""
+    return GatewayScheduler(
+        limiter=AIMDLimiter(initial_limit=limit, min_limit=1, max_limit=4, decrease_cooldown=0.0),
+        queue_timeout=queue_timeout
+    )
+
+
+class TestAIMDLimiter:
+    """AIMD并发窗口测试类"""
+
+    def test_additive_increase(self):
+        """测试成功请求使窗口缓慢增大且不超过上限"""
+        limiter = AIMDLimiter(initial_limit=2, min_limit=1, max_limit=3)
+        limiter.on_success()
+        limiter.on_success()
+        assert limiter.capacity == 2
+
+        limiter.on_success()
+        assert limiter.capacity == 3
+
+        for _ in range(20):
+            limiter.on_success()
+        assert limiter.limit == 3
+
+    def test_multiplicative_decrease(self):
+        """测试过载时窗口减半且不低于下限，冷却期内只减一次"""
+        limiter = AIMDLimiter(initial_limit=8, min_limit=2, max_limit=16, decrease_cooldown=60.0)
+        limiter.on_overload()
+        limiter.on_overload()
+        assert limiter.limit == 4
+
+        limiter = AIMDLimiter(initial_limit=3, min_limit=2, max_limit=16, decrease_cooldown=0.0)
+        limiter.on_overload()
+        assert limiter.limit == 2
+
+    def test_overload_signals(self):
+        """测试过载信号识别"""
+        request = httpx.Request("POST", "https://example.com")
+        assert is_overload_signal(httpx.ReadTimeout("timeout", request=request))
+        assert is_overload_signal(httpx.HTTPStatusError(
+            "限流", request=request, response=httpx.Response(429, request=request)
+        ))
+        assert not is_overload_signal(httpx.HTTPStatusError(
+            "参数错误", request=request, response=httpx.Response(400, request=request)
+        ))
+        assert not is_overload_signal(ValueError("业务错误"))
+
+
+class TestGatewayScheduler:
+    """网关调度器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_priority_order(self):
+        """测试窗口占满时交互式请求优先于后台请求"""
+        scheduler = _make_scheduler(limit=1)
+        order = []
+        release = asyncio.Event()
+
+        async def worker(name: str, priority: GatewayPriority, hold: bool = False):
+            async with scheduler.slot(priority):
+                order.append(name)
+                if hold:
+                    await release.wait()
+
+        holder = asyncio.create_task(worker("holder", GatewayPriority.NORMAL, hold=True))
+        await asyncio.sleep(0)
+        background = asyncio.create_task(worker("background", GatewayPriority.BACKGROUND))
+        interactive = asyncio.create_task(worker("interactive", GatewayPriority.INTERACTIVE))
+        await asyncio.sleep(0)
+
+        stats = scheduler.get_stats()
+        assert stats["queue_depth"] == 2
+        assert stats["queue_depth_by_priority"]["interactive"] == 1
+
+        release.set()
+        await asyncio.gather(holder, background, interactive)
+
+        assert order == ["holder", "interactive", "background"]
+        assert scheduler.inflight == 0
+        assert scheduler.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout_rejects(self):
+        """测试排队超时抛出网关繁忙错误"""
+        scheduler = _make_scheduler(limit=1, queue_timeout=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(GatewayPriority.NORMAL):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+
+        with pytest.raises(GatewayOverloadedError):
+            async with scheduler.slot(GatewayPriority.BACKGROUND):
+                pass
+
+        release.set()
+        await holder
+        assert scheduler.rejected == 1
+        assert scheduler.inflight == 0
+
+    @pytest.mark.asyncio
+    async def test_overload_shrinks_window(self):
+        """测试过载异常缩小并发窗口"""
+        scheduler = _make_scheduler(limit=4)
+        request = httpx.Request("POST", "https://example.com")
+
+        with pytest.raises(httpx.ReadTimeout):
+            async with scheduler.slot(GatewayPriority.NORMAL):
+                raise httpx.ReadTimeout("timeout", request=request)
+
+        assert scheduler.limiter.capacity == 2
+        assert scheduler.overloads == 1
+        assert scheduler.inflight == 0
+
+    @pytest.mark.asyncio
+    async def test_merged_call_raised_to_highest_priority(self):
+        """测试合并请求按调用方中的最高优先级排队，高优先级调用方加入时已排队的请求随之提升"""
+        scheduler = _make_scheduler(limit=1)
+        flight = SingleFlight("test_priority")
+        order = []
+        release = asyncio.Event()
+
+        async def worker(name: str, priority: GatewayPriority, hold: bool = False):
+            async with scheduler.slot(priority):
+                order.append(name)
+                if hold:
+                    await release.wait()
+
+        async def shared():
+            async with scheduler.slot():
+                order.append("shared")
+            return "结果"
+
+        async def caller(priority: GatewayPriority):
+            current_priority.set(priority)
+            return await flight.do("key", shared)
+
+        holder = asyncio.create_task(worker("holder", GatewayPriority.NORMAL, hold=True))
+        await asyncio.sleep(0)
+        background = asyncio.create_task(caller(GatewayPriority.BACKGROUND))
+        await asyncio.sleep(0)
+        normal = asyncio.create_task(worker("normal", GatewayPriority.NORMAL))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(caller(GatewayPriority.INTERACTIVE))
+        await asyncio.sleep(0)
+
+        stats = scheduler.get_stats()
+        assert stats["queue_depth"] == 2
+        assert stats["queue_depth_by_priority"]["interactive"] == 1
+
+        release.set()
+        results = await asyncio.gather(holder, background, normal, interactive)
+
+        assert order == ["holder", "shared", "normal"]
+        assert results[1] == results[3] == "结果"
+        assert scheduler.queue_depth == 0
@@ -0,0 +1,100 @@
+"""
+图片分析结果缓存测试
+
+使用Pillow生成的图片验证精确命中、近似重复命中和不同图片不误命中
+"""
+
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+from app.services.llm.image_analysis_cache import ImageAnalysisCache
+from app.utils.image_hash import compute_dhash, hamming_distance
+
+
+def _make_image_bytes(size=(320, 240), fmt="PNG", quality=95, variant=0) -> bytes:
+    """生成带渐变和色块的测试图片"""
+    image = Image.new("RGB", size)
+    draw = ImageDraw.Draw(image)
+    for x in range(size[0]):
+        shade = int(255 * x / size[0])
+        draw.line([(x, 0), (x, size[1])], fill=(shade, 120, 255 - shade))
+    if variant == 0:
+        draw.rectangle([size[0] // 4, size[1] // 4, size[0] // 2, size[1] // 2], fill=(255, 255, 255))
+    else:
+        draw.ellipse([size[0] // 2, 0, size[0], size[1] // 2], fill=(0, 0, 0))
+        draw.rectangle([0, size[1] // 2, size[0] // 3, size[1]], fill=(255, 255, 0))
+
+    buffer = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(buffer, format=fmt, quality=quality)
+    else:
+        image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+ANALYSIS = {"category": "电子产品", "sub_category": "耳机", "condition": "九成新", "keywords": ["耳机"]}
+
+
+class TestImageHash:
+    """图片哈希工具测试类"""
+
+    def test_recompressed_image_is_near(self):
+        """测试重新压缩的同一张图片感知哈希接近"""
+        original = compute_dhash(_make_image_bytes())
+        recompressed = compute_dhash(_make_image_bytes(size=(640, 480), fmt="JPEG", quality=40))
+
+        assert original is not None and recompressed is not None
+        assert hamming_distance(original, recompressed) <= 6
+
+    def test_invalid_bytes_return_none(self):
+        """测试无法解码的数据返回None"""
+        assert compute_dhash(b"not an image") is None
+
+
+class TestImageAnalysisCache:
+    """图片分析结果缓存测试类"""
+
+    @pytest.mark.asyncio
+    async def test_exact_hit(self):
+        """测试相同图片精确命中"""
+        cache = ImageAnalysisCache()
+        sha256, dhash = await cache.fingerprint(_make_image_bytes())
+        await cache.set(sha256, dhash, "vision", "prompt", ANALYSIS)
+
+        result = await cache.get(sha256, dhash, "vision", "prompt")
+        assert result == ANALYSIS
+        assert cache.exact_hits == 1
+
+        # 返回副本，调用方修改不影响缓存
+        result["category"] = "已修改"
+        assert (await cache.get(sha256, dhash, "vision", "prompt"))["category"] == "电子产品"
+
+    @pytest.mark.asyncio
+    async def test_near_duplicate_hit(self):
+        """测试重新压缩、缩放后的图片通过感知哈希命中"""
+        cache = ImageAnalysisCache()
+        sha256, dhash = await cache.fingerprint(_make_image_bytes())
+        await cache.set(sha256, dhash, "vision", "prompt", ANALYSIS)
+
+        other_sha256, other_dhash = await cache.fingerprint(
+            _make_image_bytes(size=(640, 480), fmt="JPEG", quality=40)
+        )
+        assert other_sha256 != sha256
+
+        result = await cache.get(other_sha256, other_dhash, "vision", "prompt")
+        assert result == ANALYSIS
+        assert cache.near_hits == 1
+
+    @pytest.mark.asyncio
+    async def test_different_image_or_prompt_misses(self):
+        """测试不同图片或不同提示词不命中"""
+        cache = ImageAnalysisCache()
+        sha256, dhash = await cache.fingerprint(_make_image_bytes())
+        await cache.set(sha256, dhash, "vision", "prompt", ANALYSIS)
+
+        other_sha256, other_dhash = await cache.fingerprint(_make_image_bytes(variant=1))
+        assert await cache.get(other_sha256, other_dhash, "vision", "prompt") is None
+        assert await cache.get(sha256, dhash, "vision", "new prompt") is None
+        assert cache.misses == 2
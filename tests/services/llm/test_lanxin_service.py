@@ -14,6 +14,7 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+from app.services.llm.bluelm_client import bluelm_client
 from app.services.llm.lanxin_service import LanxinService
 
 
@@ -200,8 +201,8 @@ class TestLanxinServiceReal:
             raise
         
         finally:
-            # 确保关闭客户端
-            await service.client.aclose()
+            # 确保关闭共享的网关连接池
+            await bluelm_client.close()
 
 
 # 单独运行的函数
@@ -239,9 +240,72 @@ async def run_quick_test():
         traceback.print_exc()
     
     finally:
-        await service.client.aclose()
+        await bluelm_client.close()
 
 
 if __name__ == "__main__":
     # 如果直接运行此文件，执行快速测试
-    asyncio.run(run_quick_test()) 
\ No newline at end of file
+    asyncio.run(run_quick_test()) 
+
+class TestLanxinServiceStreaming:
+    """蓝心服务流式字段回调测试类"""
+    
+    @pytest.mark.asyncio
+    async def test_analyze_text_emits_fields(self, monkeypatch):
+        """测试流式分析时字段闭合即回调，并返回完整结果"""
+        import app.services.llm.lanxin_service as lanxin_module
+        
+        chunks = ['```json\n{"category": "家具", ', '"condition": "八成新", "keywords": ["椅', '子"], ', '"description": "木质椅子"}\n```']
+        events = []
+        
+        async def fake_stream(**kwargs):
+            for chunk in chunks:
+                events.append(("chunk", chunk))
+                yield chunk
+        
+        async def on_field(name, value):
+            events.append(("field", name))
+        
+        monkeypatch.setattr(lanxin_module.bluelm_client, "stream_complete", fake_stream)
+        result = await LanxinService().analyze_text("一把木质椅子", on_field=on_field)
+        
+        assert result == {"category": "家具", "condition": "八成新", "keywords": ["椅子"], "description": "木质椅子"}
+        # category在第二块到达之前已回调
+        assert events[:2] == [("chunk", chunks[0]), ("field", "category")]
+        assert [name for kind, name in events if kind == "field"] == ["category", "condition", "keywords", "description"]
+    
+    @pytest.mark.asyncio
+    async def test_streamed_analysis_uses_completion_cache(self, monkeypatch):
+        """测试流式分析结束后写入补全缓存，再次分析时不请求网关，字段照常回调"""
+        import httpx
+        import app.services.llm.bluelm_client as bluelm_client_module
+        from app.services.llm.bluelm_client import bluelm_client
+        from app.services.llm.resilience import CircuitBreaker
+        
+        sse_body = (
+            'data:{"message":"{\\"category\\": \\"家具\\", ","type":"text"}\n\n'
+            'data:{"message":"\\"condition\\": \\"八成新\\"}","type":"text"}\n\n'
+            'event:close\n'
+            'data:{}\n\n'
+        )
+        requests = []
+        
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request.url.path)
+            return httpx.Response(200, text=sse_body, headers={"Content-Type": "text/event-stream"})
+        
+        monkeypatch.setattr(bluelm_client_module, "circuit_breaker", CircuitBreaker(5, 30))
+        monkeypatch.setattr(bluelm_client, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        results = []
+        for _ in range(2):
+            fields = []
+            
+            async def on_field(name, value):
+                fields.append(name)
+            
+            results.append(await LanxinService().analyze_text("流式缓存测试用的旧木椅", on_field=on_field))
+            assert fields == ["category", "condition"]
+        
+        assert len(requests) == 1 and requests[0].endswith("/stream")
+        assert results[0] == results[1] == {"category": "家具", "condition": "八成新"}
+        await bluelm_client.http_client.aclose()
@@ -15,6 +15,7 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+from app.services.llm.bluelm_client import bluelm_client
 from app.services.llm.lanxin_service import LanxinService
 
 
@@ -170,8 +171,8 @@ class TestLanxinVisionService:
             raise
         
         finally:
-            # 确保关闭客户端
-            await service.client.aclose()
+            # 确保关闭共享的网关连接池
+            await bluelm_client.close()
 
 
 # 单独运行的函数
@@ -206,7 +207,7 @@ async def run_vision_quick_test():
         traceback.print_exc()
     
     finally:
-        await service.client.aclose()
+        await bluelm_client.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,215 @@
+"""
+蓝心网关弹性策略测试
+
+验证对冲请求、熔断器状态转换和请求时间预算
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from tenacity import retry, stop_after_attempt, wait_fixed
+
+import app.services.llm.bluelm_client as bluelm_client_module
+from app.services.llm.bluelm_client import BlueLMClient
+from app.services.llm.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    StopWhenBudgetExhausted,
+    TimeBudgetExceededError,
+    budget_timeout,
+    deadline_scope,
+    hedged_call,
+    remaining_budget,
+    request_deadline
+)
+from app.utils.singleflight import SingleFlight
+
+
+def _gateway_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://example.com")
+    return httpx.HTTPStatusError("网关错误", request=request, response=httpx.Response(status_code, request=request))
+
+
+class TestHedgedCall:
+    """对冲调用测试类"""
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_not_hedged(self):
+        """测试主请求在延迟内返回时不发对冲请求"""
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return "primary"
+
+        assert await hedged_call(fetch, hedge_delay=0.1) == "primary"
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_hedged(self):
+        """测试主请求过慢时对冲请求先返回"""
+        delays = [0.5, 0.01]
+        hedges = []
+
+        async def fetch():
+            delay = delays.pop(0)
+            await asyncio.sleep(delay)
+            return delay
+
+        started = time.monotonic()
+        result = await hedged_call(fetch, hedge_delay=0.02, on_hedge=lambda: hedges.append(1))
+
+        assert result == 0.01
+        assert hedges == [1]
+        assert time.monotonic() - started < 0.3
+
+    @pytest.mark.asyncio
+    async def test_failed_primary_uses_hedge(self):
+        """测试一个请求失败时使用另一个请求的结果"""
+        outcomes = [ValueError("失败"), "ok"]
+
+        async def fetch():
+            outcome = outcomes.pop(0)
+            await asyncio.sleep(0.05)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        assert await hedged_call(fetch, hedge_delay=0.01) == "ok"
+
+
+class TestCircuitBreaker:
+    """熔断器测试类"""
+
+    def test_opens_after_consecutive_failures(self):
+        """测试连续网关故障达到阈值后熔断"""
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure(_gateway_error(503))
+
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_business_errors_do_not_trip(self):
+        """测试业务错误和4xx不计入失败"""
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60)
+        breaker.record_failure(ValueError("解析失败"))
+        breaker.record_failure(_gateway_error(400))
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_probe(self):
+        """测试冷却结束后只放行一个探测请求，探测成功后恢复"""
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        breaker.record_failure(_gateway_error(502))
+        assert breaker.state == CircuitBreaker.OPEN
+
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+class TestTimeBudget:
+    """时间预算测试类"""
+
+    def test_deadline_scope_keeps_earlier_deadline(self):
+        """测试嵌套设置时保留更早的截止时间"""
+        assert remaining_budget() is None
+        now = time.monotonic()
+        with deadline_scope(now + 10):
+            with deadline_scope(now + 100):
+                assert remaining_budget() <= 10
+        assert remaining_budget() is None
+
+    @pytest.mark.asyncio
+    async def test_post_respects_budget(self, monkeypatch):
+        """测试预算用完时不再请求网关，预算不足时请求被截断"""
+        monkeypatch.setattr(bluelm_client_module, "circuit_breaker", CircuitBreaker(5, 30))
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.5)
+            return httpx.Response(200, json={"code": 0, "data": {"content": "慢"}})
+
+        client = BlueLMClient()
+        client._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        with deadline_scope(time.monotonic() - 1):
+            with pytest.raises(TimeBudgetExceededError):
+                await client.post({"prompt": "预算"})
+
+        with deadline_scope(time.monotonic() + 0.05):
+            with pytest.raises(TimeBudgetExceededError):
+                await client.post({"prompt": "预算"})
+
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_merged_call_uses_each_callers_budget(self):
+        """测试合并请求的共享执行不继承首个调用方的截止时间，各调用方按自己的预算等待"""
+        flight = SingleFlight("test_budget")
+        seen = []
+
+        async def fn():
+            seen.append(request_deadline.get())
+            await asyncio.sleep(0.2)
+            return "结果"
+
+        async def leader():
+            with deadline_scope(time.monotonic() + 0.05):
+                return await flight.do("key", fn)
+
+        leader_task = asyncio.create_task(leader())
+        await asyncio.sleep(0)
+        follower_result = await flight.do("key", fn)
+
+        with pytest.raises(TimeBudgetExceededError):
+            await leader_task
+        assert follower_result == "结果"
+        assert seen == [None]
+
+    def test_budget_timeout(self):
+        """测试外部调用超时按剩余预算收紧"""
+        assert budget_timeout(30) == 30
+        with deadline_scope(time.monotonic() + 5):
+            assert budget_timeout(30) <= 5
+            assert budget_timeout(1) == 1
+        with deadline_scope(time.monotonic() - 1):
+            with pytest.raises(TimeBudgetExceededError):
+                budget_timeout(30)
+
+    @pytest.mark.asyncio
+    async def test_retry_stops_when_budget_exhausted(self):
+        """测试剩余预算不足以等待下一次重试时停止重试"""
+        attempts = []
+
+        @retry(stop=stop_after_attempt(3) | StopWhenBudgetExhausted(min_wait=0.5), wait=wait_fixed(0.5), reraise=True)
+        async def flaky():
+            attempts.append(1)
+            raise ValueError("失败")
+
+        with deadline_scope(time.monotonic() + 0.3):
+            with pytest.raises(ValueError):
+                await flaky()
+        assert len(attempts) == 1
+
+
+class TestLatencyTracker:
+    """延迟统计测试类"""
+
+    def test_percentile(self):
+        """测试分位数计算与最少样本数"""
+        tracker = LatencyTracker(window_size=100)
+        for value in range(1, 101):
+            tracker.record("default", value / 100)
+
+        assert tracker.percentile("default", 95) == pytest.approx(0.95, abs=0.011)
+        assert tracker.percentile("default", 95, min_samples=200) is None
+        assert tracker.percentile("vision", 95) is None
@@ -0,0 +1,172 @@
+"""
+处理准入控制测试
+
+验证并发上限与排队、排队位置通知、快速拒绝，以及按阶段耗时调整并发上限
+"""
+
+import asyncio
+
+import pytest
+
+from app.agents.processing_master.agent import ProcessingMasterAgent
+from app.models.processing_master_models import ProcessingMasterRequest, ProcessingStep, ProcessingStepStatus
+from app.services.admission import AdmissionController, AdmissionRejectedError, AdmissionTicket, StageLatency
+
+
+def _controller(**kwargs) -> AdmissionController:
+    options = dict(initial_limit=1, min_limit=1, max_limit=4, max_queue=2, max_wait=10, decrease_cooldown=0, default_service_time=1)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def _step(name: str, status: ProcessingStepStatus, timestamp: float, metadata=None) -> ProcessingStep:
+    return ProcessingStep(step_name=name, step_title=name, description=name, status=status, timestamp=timestamp, metadata=metadata)
+
+
+class TestAdmissionQueue:
+    """排队与拒绝测试类"""
+
+    @pytest.mark.asyncio
+    async def test_queue_positions_and_rejection(self):
+        """测试超出上限的请求排队并收到位置，队列满时立即拒绝，名额归还后按顺序接纳"""
+        controller = _controller(default_service_time=2)
+        first = await controller.acquire()
+        positions = {"second": [], "third": []}
+
+        def _recorder(name):
+            async def _on_position(position, wait):
+                positions[name].append((position, wait))
+            return _on_position
+
+        second = asyncio.create_task(controller.acquire(_recorder("second")))
+        third = asyncio.create_task(controller.acquire(_recorder("third")))
+        await asyncio.sleep(0)
+        assert positions == {"second": [(1, 2.0)], "third": [(2, 4.0)]}
+
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            await controller.acquire()
+        assert rejected.value.retry_after >= 1
+
+        first.release()
+        second_ticket = await second
+        await asyncio.sleep(0)
+        assert positions["third"][-1][0] == 1
+        second_ticket.release()
+        (await third).release()
+        assert controller.inflight == 0
+        assert controller.get_stats()["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_reject_when_estimated_wait_too_long(self):
+        """测试预计等待超过上限时不排队直接拒绝"""
+        controller = _controller(max_wait=5, default_service_time=30)
+        ticket = await controller.acquire()
+        with pytest.raises(AdmissionRejectedError):
+            await controller.acquire()
+        assert controller.queue_depth == 0
+        ticket.release()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """测试排队中的请求取消后离开队列，后面的请求前移"""
+        controller = _controller()
+        ticket = await controller.acquire()
+        positions = []
+
+        async def _on_position(position, wait):
+            positions.append(position)
+
+        waiting = asyncio.create_task(controller.acquire())
+        behind = asyncio.create_task(controller.acquire(_on_position))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.sleep(0.01)
+        assert positions == [2, 1]
+
+        ticket.release()
+        (await behind).release()
+        assert controller.inflight == 0
+
+
+class TestAdaptiveLimit:
+    """并发上限调整测试类"""
+
+    def test_ticket_records_stage_latency(self):
+        """测试按步骤的开始和结束时间记录阶段耗时"""
+        ticket = AdmissionTicket(_controller())
+        ticket.observe(_step("content_analysis", ProcessingStepStatus.RUNNING, 100.0))
+        ticket.observe(_step("content_analysis", ProcessingStepStatus.COMPLETED, 103.5))
+        ticket.observe(_step("result_integration", ProcessingStepStatus.COMPLETED, 104.0))
+        assert ticket.stage_seconds == {"content_analysis": 3.5}
+
+    def test_limit_follows_stage_latency(self):
+        """测试阶段耗时接近基线时上限缓慢增大，明显超过基线时成倍缩小"""
+        controller = _controller(initial_limit=4, max_limit=8, latency_tolerance=2.0)
+        controller._adjust_limit({"content_analysis": 2.0, "creative_coordination": 8.0})
+        controller._adjust_limit({"content_analysis": 2.2, "creative_coordination": 8.5})
+        assert controller.limit == pytest.approx(4.25)
+
+        controller._adjust_limit({"content_analysis": 6.0, "creative_coordination": 25.0})
+        assert controller.limit == pytest.approx(2.125)
+        assert controller.overloads == 1
+        assert controller.get_stats()["stage_latency_seconds"]["content_analysis"]["baseline"] == pytest.approx(2.0, abs=0.1)
+
+    def test_skips_failed_and_cached_stages(self):
+        """测试失败和命中缓存的阶段不记录耗时"""
+        ticket = AdmissionTicket(_controller())
+        for name in ("content_analysis", "disposal_recommendation", "recycling_coordination"):
+            ticket.observe(_step(name, ProcessingStepStatus.RUNNING, 100.0))
+        ticket.observe(_step("content_analysis", ProcessingStepStatus.COMPLETED, 102.0))
+        ticket.observe(_step("disposal_recommendation", ProcessingStepStatus.COMPLETED, 100.01, {"cache_hit": True}))
+        ticket.observe(_step("recycling_coordination", ProcessingStepStatus.FAILED, 100.5))
+        assert ticket.stage_seconds == {"content_analysis": 2.0}
+
+    def test_cache_hits_do_not_collapse_limit(self):
+        """测试命中缓存的会话、失败的会话与正常会话交替时基线不被拉低，并发上限不会塌缩"""
+        controller = _controller(initial_limit=4, max_limit=8, latency_tolerance=2.0)
+        now = 0.0
+        for index in range(30):
+            ticket = controller.try_acquire()
+            ticket.observe(_step("content_analysis", ProcessingStepStatus.RUNNING, now))
+            ticket.observe(_step("content_analysis", ProcessingStepStatus.COMPLETED, now + 2.0))
+            ticket.observe(_step("disposal_recommendation", ProcessingStepStatus.RUNNING, now + 2.0))
+            if index % 3 == 0:
+                ticket.observe(_step("disposal_recommendation", ProcessingStepStatus.COMPLETED, now + 2.01, {"cache_hit": True}))
+            elif index % 3 == 1:
+                ticket.observe(_step("disposal_recommendation", ProcessingStepStatus.FAILED, now + 2.1))
+            else:
+                ticket.observe(_step("disposal_recommendation", ProcessingStepStatus.COMPLETED, now + 10.0 + index % 2))
+            ticket.release()
+            now += 20.0
+
+        assert controller.overloads == 0
+        assert controller.limit > 4
+        assert controller.get_stats()["stage_latency_seconds"]["disposal_recommendation"]["baseline"] >= 8.0
+
+    def test_baseline_ignores_occasional_fast_samples(self):
+        """测试少数异常快的样本不会把基线拉到接近0"""
+        stats = StageLatency()
+        for index in range(20):
+            stats.observe(0.01 if index % 10 == 0 else 8.0 + index % 3)
+        assert stats.baseline >= 8.0
+
+    @pytest.mark.asyncio
+    async def test_records_agent_stage_latency(self, monkeypatch):
+        """测试经由总处理协调器Agent的实际步骤输出记录到分析阶段的耗时"""
+        agent = ProcessingMasterAgent()
+        agent._is_initialized = True
+
+        async def _analyze_content(request, on_field=None):
+            await asyncio.sleep(0.05)
+            return {"success": True, "category": "家具", "condition": "八成新"}
+
+        monkeypatch.setattr(agent, "_analyze_content", _analyze_content)
+        ticket = AdmissionTicket(_controller())
+        steps = ticket.measure(agent).process_complete_solution(ProcessingMasterRequest(text_description="旧椅子"))
+        async for step in steps:
+            if step.step_name == "content_analysis" and step.status == ProcessingStepStatus.COMPLETED:
+                break
+        await steps.aclose()
+
+        assert ticket.stage_seconds["content_analysis"] >= 0.04
+        assert "input_validation" in ticket.stage_seconds
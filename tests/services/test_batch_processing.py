@@ -0,0 +1,79 @@
+"""
+批量物品处理测试
+
+验证重复物品合并、并发上限以及批量消息的顺序与物品序号
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.models.processing_master_models import ProcessingMasterRequest, ProcessingStep, ProcessingStepStatus
+from app.services.batch_processing import group_requests, record_batch
+from app.services.step_events import StepEventLog
+
+
+class _CountingAgent:
+    """记录调用次数与最大并发数"""
+
+    def __init__(self):
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def process_complete_solution(self, request, progress_callback=None):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            yield ProcessingStep(
+                step_name="result_integration",
+                step_title="结果整合",
+                description=request.text_description,
+                status=ProcessingStepStatus.COMPLETED,
+                timestamp=time.time()
+            )
+        finally:
+            self.running -= 1
+
+
+class TestGroupRequests:
+    """重复物品合并测试类"""
+
+    def test_identical_requests_grouped(self):
+        """测试内容相同的物品合并，保持首次出现的顺序"""
+        requests = [
+            ProcessingMasterRequest(text_description="旧椅子"),
+            ProcessingMasterRequest(text_description="旧台灯"),
+            ProcessingMasterRequest(text_description="旧椅子")
+        ]
+        groups = group_requests(requests)
+        assert [(request.text_description, indexes) for request, indexes in groups] == [("旧椅子", [0, 2]), ("旧台灯", [1])]
+
+
+class TestRecordBatch:
+    """批量处理测试类"""
+
+    @pytest.mark.asyncio
+    async def test_batch_dedup_and_concurrency(self):
+        """测试重复物品只处理一次、并发不超过上限、消息带物品序号"""
+        agent = _CountingAgent()
+        log = StepEventLog(ttl=60)
+        channel = log.new_channel()
+        requests = [ProcessingMasterRequest(text_description=f"旧物品{i % 4}") for i in range(8)]
+
+        summary = await record_batch(log, channel, agent, requests, max_concurrency=2)
+
+        assert summary == {"total_items": 8, "unique_items": 4}
+        assert agent.calls == 4
+        assert agent.max_running <= 2
+
+        messages = [json.loads(message) async for message in log.read(channel)]
+        assert messages[0]["type"] == "batch_start"
+        assert messages[-1]["type"] == "batch_complete"
+        assert [message["seq"] for message in messages] == list(range(1, len(messages) + 1))
+        steps = [message for message in messages if message["type"] == "step_update"]
+        assert sorted(index for message in steps for index in message["items"]) == list(range(8))
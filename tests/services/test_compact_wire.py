@@ -0,0 +1,79 @@
+"""
+紧凑消息格式测试
+
+验证重复的标题描述被省略、已发送的结果内容替换为引用，且引用可还原为完整结果
+"""
+
+import json
+
+from app.services.compact_wire import CompactEncoder, resolve_refs
+
+
+ANALYSIS = {
+    "category": "家具",
+    "sub_category": "椅子",
+    "condition": "八成新",
+    "description": "实木餐椅，椅面有轻微划痕，结构稳固，适合二次利用或转卖" * 3,
+    "keywords": ["实木", "餐椅", "二手家具"],
+    "success": True,
+    "_merge_metadata": {"source": "text_only"}
+}
+PRODUCTS = [{"title": f"实木餐椅{index}", "price": 80 + index, "url": f"https://example.com/{index}"} for index in range(5)]
+
+
+def _step_message(step, result=None, status="completed"):
+    message = {"type": "step_update", "step": step, "title": f"{step}标题", "status": status, "description": f"{step}描述"}
+    if result is not None:
+        message["result"] = result
+    return message
+
+
+class TestCompactEncoder:
+    """紧凑编码测试类"""
+
+    def test_unchanged_header_omitted(self):
+        """测试同一步骤的标题和描述未变化时省略"""
+        encoder = CompactEncoder()
+        first = encoder.encode_step(_step_message("content_analysis", status="running"))
+        second = encoder.encode_step(_step_message("content_analysis"))
+        assert first["title"] == "content_analysis标题"
+        assert "title" not in second and "description" not in second
+
+    def test_shared_entities_sent_once_and_resolvable(self):
+        """测试分析结果和商品列表只发送一次，最终结果引用之前的步骤结果并可完整还原"""
+        final_analysis = {key: value for key, value in ANALYSIS.items() if key != "_merge_metadata"}
+        originals = [
+            _step_message("content_analysis", ANALYSIS),
+            _step_message("secondhand_coordination", {
+                "success": True,
+                "search_result": {"analysis_result": ANALYSIS, "products": PRODUCTS},
+                "content_result": {"analysis_result": ANALYSIS, "title": "九成新实木餐椅转让"}
+            }),
+            _step_message("result_integration", {
+                "success": True,
+                "analysis_result": final_analysis,
+                "secondhand_solution": {"success": True, "search_result": {"products": PRODUCTS}}
+            })
+        ]
+        encoder = CompactEncoder(min_size=100)
+        encoded = [json.loads(json.dumps(encoder.encode_step(message), ensure_ascii=False)) for message in originals]
+
+        secondhand, final = encoded[1]["result"], encoded[2]["result"]
+        assert secondhand["search_result"]["analysis_result"] == {"$ref": "content_analysis#"}
+        assert secondhand["content_result"]["analysis_result"] == {"$ref": "content_analysis#"}
+        assert final["analysis_result"] == {"$ref": "content_analysis#", "$omit": ["_merge_metadata"]}
+        assert final["secondhand_solution"]["search_result"]["products"] == {
+            "$ref": "secondhand_coordination#/search_result/products"
+        }
+        assert encoder.saved_chars > 0
+
+        results = {message["result_id"]: message["result"] for message in encoded}
+        for original, message in zip(originals, encoded):
+            assert resolve_refs(results, message["result"]) == original["result"]
+
+    def test_small_objects_inline(self):
+        """测试小对象不替换为引用"""
+        encoder = CompactEncoder()
+        encoder.encode_step(_step_message("input_validation", {"validation": "passed"}))
+        message = encoder.encode_step(_step_message("other", {"validation": "passed"}))
+        assert message["result"] == {"validation": "passed"}
@@ -0,0 +1,59 @@
+"""
+消息序列化测试
+
+验证orjson与标准库json输出等价、特殊类型的处理以及MessagePack帧转换
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from app.models.processing_master_models import ProcessingStepStatus
+from app.services import serialization
+from app.services.serialization import MessageSerializer, OrjsonSerializer, create_serializer, orjson, to_msgpack
+from app.services.step_events import encode_message, prepend_field
+
+
+MESSAGE = {
+    "type": "step_update",
+    "step": "secondhand_coordination",
+    "status": ProcessingStepStatus.COMPLETED,
+    "result": {"products": [{"title": "实木餐椅", "price": 150.5}], "count": 1, 2: "非字符串键"},
+    "timestamp": datetime(2024, 1, 15, 10, 30)
+}
+
+
+class TestMessageSerializer:
+    """消息序列化测试类"""
+
+    def test_standard_json(self):
+        """测试标准库实现输出中文原文，枚举和时间转换为字符串"""
+        data = MessageSerializer().dumps(MESSAGE)
+        assert "实木餐椅" in data
+        decoded = json.loads(data)
+        assert decoded["status"] == "completed"
+        assert decoded["timestamp"] == "2024-01-15T10:30:00"
+
+    @pytest.mark.skipif(orjson is None, reason="未安装orjson")
+    def test_orjson_equivalent_to_standard(self):
+        """测试orjson实现与标准库实现解码后一致"""
+        assert json.loads(OrjsonSerializer().dumps(MESSAGE)) == json.loads(MessageSerializer().dumps(MESSAGE))
+        assert create_serializer("auto").name == "orjson"
+        assert create_serializer("json").name == "json"
+
+    def test_msgpack_frame(self):
+        """测试JSON文本消息转换为MessagePack帧后内容不变"""
+        msgpack = pytest.importorskip("msgpack")
+        text = '{"seq": 3, "type": "partial_field", "value": "家具"}'
+        assert msgpack.unpackb(to_msgpack(text)) == json.loads(text)
+
+    def test_msgpack_packs_structure_without_decoding(self, monkeypatch):
+        """测试带消息结构的编码结果直接打包，不再解码JSON文本，帧内容与文本转换一致"""
+        msgpack = pytest.importorskip("msgpack")
+        message = prepend_field(encode_message({**MESSAGE, "result": {"count": 1}}), "seq", 3)
+        expected = to_msgpack(str(message))
+
+        monkeypatch.setattr(serialization.message_serializer, "loads", lambda data: pytest.fail("不应解码JSON文本"))
+        assert to_msgpack(message) == expected
+        assert msgpack.unpackb(expected)["seq"] == 3
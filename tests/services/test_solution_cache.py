@@ -0,0 +1,137 @@
+"""
+整体方案缓存测试
+
+验证物品指纹规范化、地理网格划分与缓存读写
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.solution_cache import SolutionCache, build_geo_tile, build_item_fingerprint, solution_scope_context
+
+
+class TestItemFingerprint:
+    """物品指纹测试类"""
+
+    def test_normalized_fields_share_fingerprint(self):
+        """测试大小写、全角、空白和补充说明不影响指纹"""
+        first = {"category": "电子产品", "sub_category": "手机", "condition": "九成新", "brand": "Apple", "model": "iPhone 11"}
+        second = {"category": "电子产品 ", "sub_category": "手机", "condition": "九成新（轻微划痕）", "brand": "ＡＰＰＬＥ", "model": "iphone11"}
+        assert build_item_fingerprint(first) == build_item_fingerprint(second)
+
+    def test_model_and_unknown_brand(self):
+        """测试型号不同则指纹不同，未知品牌等同于无品牌"""
+        base = {"category": "电子产品", "sub_category": "手机", "condition": "九成新", "brand": "Apple"}
+        assert build_item_fingerprint({**base, "model": "iPhone 11"}) != build_item_fingerprint({**base, "model": "iPhone 13"})
+
+        sweater = {"category": "服装", "sub_category": "羊毛衫", "condition": "轻微磨损"}
+        assert build_item_fingerprint({**sweater, "brand": "未知"}) == build_item_fingerprint(sweater)
+
+    def test_missing_category_not_cached(self):
+        """测试缺少类别时不生成指纹"""
+        assert build_item_fingerprint({"sub_category": "手机"}) is None
+        assert build_item_fingerprint({"category": "未知"}) is None
+
+
+class TestGeoTile:
+    """地理网格测试类"""
+
+    def test_nearby_locations_share_tile(self):
+        """测试同一网格内的位置得到相同网格，相距较远的位置不同"""
+        tile = build_geo_tile({"lat": 39.90, "lon": 116.40}, 0.05)
+        assert tile == build_geo_tile({"lat": 39.93, "lon": 116.44}, 0.05)
+        assert tile != build_geo_tile({"lat": 31.23, "lon": 121.47}, 0.05)
+
+    def test_invalid_location(self):
+        """测试无效位置返回None"""
+        assert build_geo_tile(None, 0.05) is None
+        assert build_geo_tile({"lat": "abc", "lon": 116.4}, 0.05) is None
+        assert build_geo_tile({"lat": 39.9}, 0.05) is None
+
+
+class TestSolutionCache:
+    """整体方案缓存读写测试类"""
+
+    @pytest.mark.asyncio
+    async def test_item_and_location_entries(self):
+        """测试物品方案与回收方案分别缓存"""
+        cache = SolutionCache()
+        cache.enabled = True
+        fingerprint = build_item_fingerprint({"category": "家具", "sub_category": "椅子"})
+        tile = cache.geo_tile({"lat": 39.9, "lon": 116.4})
+
+        assert await cache.get_item(fingerprint) is None
+        await cache.set_item(fingerprint, {"disposal_recommendation": {"result": {"success": True}}})
+        await cache.set_location(fingerprint, tile, {"result": {"success": True}})
+
+        assert (await cache.get_item(fingerprint))["disposal_recommendation"]["result"]["success"] is True
+        assert await cache.get_location(fingerprint, tile) == {"result": {"success": True}}
+        assert await cache.get_location(fingerprint, cache.geo_tile({"lat": 31.2, "lon": 121.4})) is None
+
+        stats = cache.get_stats()
+        assert (stats["item_hits"], stats["item_misses"]) == (1, 1)
+        assert (stats["location_hits"], stats["location_misses"]) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_inflight_fingerprint_waits_for_leader(self):
+        """测试同一批量中同指纹方案计算中时后到的请求等待其结束后命中缓存"""
+        cache = SolutionCache()
+        cache.enabled = True
+        fingerprint = build_item_fingerprint({"category": "服装", "sub_category": "羊毛衫"})
+
+        with solution_scope_context("batch-1"):
+            assert cache.begin(fingerprint) is True
+            assert cache.begin(fingerprint) is False
+            assert cache.should_wait(fingerprint)
+
+            async def _leader():
+                await asyncio.sleep(0.01)
+                await cache.set_item(fingerprint, {"secondhand_coordination": {"result": {"success": True}}})
+                cache.finish(fingerprint)
+
+            leader = asyncio.create_task(_leader())
+            await cache.wait_inflight(fingerprint, timeout=1)
+            await leader
+
+        assert await cache.get_item(fingerprint) is not None
+        assert cache.get_stats()["inflight_waits"] == 1
+        assert cache.begin(fingerprint) is True
+
+    @pytest.mark.asyncio
+    async def test_other_scope_does_not_wait(self):
+        """测试其他批量或单个请求不等待他人进行中的同款计算"""
+        cache = SolutionCache()
+        cache.enabled = True
+        fingerprint = build_item_fingerprint({"category": "服装", "sub_category": "羊毛衫"})
+
+        with solution_scope_context("batch-1"):
+            assert cache.begin(fingerprint) is True
+
+        assert not cache.should_wait(fingerprint)
+        with solution_scope_context("batch-2"):
+            assert not cache.should_wait(fingerprint)
+            await asyncio.wait_for(cache.wait_inflight(fingerprint, timeout=10), timeout=0.1)
+
+        assert cache.get_stats()["inflight_waits"] == 0
+        cache.finish(fingerprint)
+
+    @pytest.mark.asyncio
+    async def test_batch_dedup_when_unscoped_owner_started_first(self):
+        """测试不属于任何批量的请求先开始计算同款物品时，批量内仍由一个物品计算、其余等待"""
+        cache = SolutionCache()
+        cache.enabled = True
+        fingerprint = build_item_fingerprint({"category": "服装", "sub_category": "羊毛衫"})
+
+        assert cache.begin(fingerprint) is True
+        with solution_scope_context("batch-1"):
+            assert not cache.should_wait(fingerprint)
+            assert cache.begin(fingerprint) is True
+            assert cache.should_wait(fingerprint)
+            assert cache.begin(fingerprint) is False
+            cache.finish(fingerprint)
+            assert not cache.should_wait(fingerprint)
+
+        assert cache.begin(fingerprint) is False
+        cache.finish(fingerprint)
+        assert cache.begin(fingerprint) is True
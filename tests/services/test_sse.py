@@ -0,0 +1,85 @@
+"""
+SSE输出测试
+
+验证事件格式、Last-Event-ID解析、gzip流式压缩可逐段解压以及空闲心跳
+"""
+
+import asyncio
+import zlib
+
+import pytest
+
+from app.services.sse import HEARTBEAT, GzipEventEncoder, accepts_gzip, encode_stream, format_event, parse_last_event_id, with_heartbeat
+
+
+class TestEventFormat:
+    """事件格式测试类"""
+
+    def test_format_event(self):
+        """测试带id的事件和多行数据的编码"""
+        assert format_event('{"seq": 3}', event_id=3) == 'id: 3\ndata: {"seq": 3}\n\n'
+        assert format_event("a\nb", event="error") == "event: error\ndata: a\ndata: b\n\n"
+
+    def test_parse_headers(self):
+        """测试Last-Event-ID与Accept-Encoding的解析"""
+        assert parse_last_event_id(" 12 ") == 12
+        assert parse_last_event_id("abc") == 0
+        assert parse_last_event_id(None) == 0
+        assert accepts_gzip("br, gzip;q=0.8")
+        assert not accepts_gzip("gzip;q=0, identity")
+        assert not accepts_gzip(None)
+
+
+class TestGzipStream:
+    """gzip流式压缩测试类"""
+
+    def test_each_event_decodable_immediately(self):
+        """测试每个事件压缩输出后客户端即可解压出完整事件，重复结构压缩率高"""
+        encoder = GzipEventEncoder()
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        events = [format_event(f'{{"seq": {seq}, "type": "step_update", "step": "content_analysis"}}', seq) for seq in range(1, 21)]
+        for event in events:
+            assert decoder.decompress(encoder.encode(event)).decode("utf-8") == event
+        decoder.decompress(encoder.finish())
+        assert decoder.eof
+        assert encoder.compressed_bytes < encoder.raw_bytes / 2
+
+
+class TestHeartbeat:
+    """空闲心跳测试类"""
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_while_idle(self):
+        """测试等待下一条数据期间输出心跳，且不打断底层生成器"""
+        release = asyncio.Event()
+
+        async def _events():
+            yield "first"
+            await release.wait()
+            yield "second"
+
+        output = []
+        async for chunk in with_heartbeat(_events(), interval=0.01):
+            output.append(chunk)
+            if output.count(HEARTBEAT) == 2:
+                release.set()
+        assert output[0] == "first"
+        assert output[-1] == "second"
+        assert output.count(HEARTBEAT) >= 2
+
+    @pytest.mark.asyncio
+    async def test_inner_stream_closed_on_disconnect(self):
+        """测试响应流被关闭（客户端断开）时底层生成器立即执行清理"""
+        closed = []
+
+        async def _events():
+            try:
+                yield "first"
+                await asyncio.Event().wait()
+            finally:
+                closed.append(True)
+
+        body = encode_stream(with_heartbeat(_events(), interval=10), compress=True)
+        await body.__anext__()
+        await body.aclose()
+        assert closed == [True]
@@ -0,0 +1,170 @@
+"""
+步骤事件测试
+
+验证消息编码、流程消息顺序与错误处理，以及事件日志的续传、结束标记和空闲超时
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.models.processing_master_models import ProcessingMasterRequest, ProcessingStep, ProcessingStepStatus
+from app.services.step_events import (
+    STREAM_END, RedisStepEventLog, StepEventLog, build_partial_messages, stream_pipeline
+)
+
+
+def _step(name: str, status: ProcessingStepStatus, **kwargs) -> ProcessingStep:
+    return ProcessingStep(
+        step_name=name,
+        step_title=name,
+        description=name,
+        status=status,
+        timestamp=time.time(),
+        **kwargs
+    )
+
+
+class _FakeAgent:
+    """按顺序产出步骤，并在中途触发增量输出回调"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+
+    async def process_complete_solution(self, request, progress_callback=None):
+        yield _step("content_analysis", ProcessingStepStatus.RUNNING)
+        progress_callback(_step(
+            "content_analysis", ProcessingStepStatus.RUNNING,
+            metadata={"partial_field": {"name": "category", "value": "家具"}}
+        ))
+        if self.fail:
+            raise RuntimeError("分析失败")
+        yield _step("content_analysis", ProcessingStepStatus.COMPLETED, result={"category": "家具"})
+
+
+class _FakeRedis:
+    """只实现XREAD，按预设条目返回ID大于起点的消息"""
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    async def xread(self, streams, count=None, block=None):
+        (key, last_id), = streams.items()
+        after = int(last_id.split("-")[1])
+        entries = [(f"0-{seq}", {"data": data}) for seq, data in self.entries if seq > after]
+        return [(key, entries)] if entries else []
+
+
+class TestStepMessages:
+    """消息编码测试类"""
+
+    def test_partial_messages(self):
+        """测试增量输出与字段消息"""
+        step = _step(
+            "creative_renovation", ProcessingStepStatus.RUNNING,
+            metadata={"partial_output": "第一步", "partial_field": {"name": "title", "value": "收纳盒"}}
+        )
+        messages = build_partial_messages(step)
+        assert [message["type"] for message in messages] == ["partial_output", "partial_field"]
+        assert messages[1]["field"] == "title"
+        assert build_partial_messages(_step("x", ProcessingStepStatus.RUNNING)) == []
+
+
+class TestStreamPipeline:
+    """流程消息测试类"""
+
+    @pytest.mark.asyncio
+    async def test_messages_in_order(self):
+        """测试步骤更新、增量字段和完成信号按产生顺序发送"""
+        sent = []
+
+        async def send(message):
+            sent.append(json.loads(message))
+
+        step_count = await stream_pipeline(_FakeAgent(), ProcessingMasterRequest(text_description="旧椅子"), send)
+
+        assert step_count == 2
+        assert [message["type"] for message in sent] == ["step_update", "partial_field", "step_update", "process_complete"]
+        assert sent[2]["result"] == {"category": "家具"}
+
+    @pytest.mark.asyncio
+    async def test_compact_wire_format(self):
+        """测试紧凑格式：同一步骤的重复标题省略，带结果的步骤附带result_id"""
+        sent = []
+
+        async def send(message):
+            sent.append(json.loads(message))
+
+        request = ProcessingMasterRequest(text_description="旧椅子", wire_format="compact")
+        await stream_pipeline(_FakeAgent(), request, send)
+
+        assert "title" in sent[0] and "title" not in sent[2]
+        assert sent[2]["result_id"] == "content_analysis"
+
+    @pytest.mark.asyncio
+    async def test_error_message_on_failure(self):
+        """测试处理失败时发送error消息"""
+        sent = []
+
+        async def send(message):
+            sent.append(json.loads(message))
+
+        await stream_pipeline(_FakeAgent(fail=True), ProcessingMasterRequest(text_description="旧椅子"), send)
+
+        assert sent[-1]["type"] == "error"
+        assert "分析失败" in sent[-1]["error"]
+
+
+class TestStepEventLog:
+    """事件日志测试类"""
+
+    @pytest.mark.asyncio
+    async def test_resume_replays_missed_events_and_live_tail(self):
+        """测试续传时补发resume_from之后的消息，并继续接收后续消息直到会话结束"""
+        log = StepEventLog(ttl=60)
+        channel = log.new_channel()
+        await log.append(channel, '{"type": "step_update"}')
+        await log.append(channel, '{"type": "partial_field"}')
+
+        async def _finish():
+            await asyncio.sleep(0.01)
+            await log.append(channel, '{"type": "process_complete"}')
+            await log.end(channel)
+
+        finisher = asyncio.create_task(_finish())
+        messages = [json.loads(message) async for message in log.read(channel, after=1)]
+        await finisher
+
+        assert [(message["seq"], message["type"]) for message in messages] == [(2, "partial_field"), (3, "process_complete")]
+        assert await log.exists(channel)
+        assert not await log.exists("unknown")
+
+    @pytest.mark.asyncio
+    async def test_record_keeps_running_without_reader(self):
+        """测试处理写入日志与读取方无关，结束后仍可完整读取"""
+        log = StepEventLog(ttl=60)
+        channel = log.new_channel()
+        await log.record(channel, _FakeAgent(), ProcessingMasterRequest(text_description="旧椅子"))
+
+        messages = [json.loads(message) async for message in log.read(channel)]
+        assert [message["seq"] for message in messages] == [1, 2, 3, 4]
+        assert messages[-1]["type"] == "process_complete"
+
+    @pytest.mark.asyncio
+    async def test_read_idle_timeout(self):
+        """测试长时间没有新消息时抛出超时"""
+        log = StepEventLog(idle_timeout=0.01)
+        channel = log.new_channel()
+        with pytest.raises(TimeoutError):
+            async for _ in log.read(channel):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_redis_read_from_resume_point(self):
+        """测试Redis实现从0-{resume_from}之后读取，读到结束标记时停止"""
+        log = RedisStepEventLog("redis://localhost:6379/0")
+        log._redis = _FakeRedis([(1, '{"seq": 1}'), (2, '{"seq": 2}'), (3, STREAM_END)])
+        messages = [message async for message in log.read("c1", after=1)]
+        assert messages == ['{"seq": 2}']
@@ -0,0 +1,97 @@
+"""
+任务进度存储测试
+
+验证步骤进度的合并写入、步骤变化与状态立即写入以及读取解析
+"""
+
+import json
+
+import pytest
+
+from app.services.task_progress import TaskProgressStore
+
+
+class _RecordingStore(TaskProgressStore):
+    """记录写入内容而不访问Redis"""
+
+    def __init__(self, **kwargs):
+        super().__init__("redis://localhost:6379/0", **kwargs)
+        self.written = []
+
+    async def _write(self, task_id, mapping):
+        self.written.append((task_id, mapping))
+        self.writes += 1
+
+
+class _FakeRedis:
+    def __init__(self, data):
+        self.data = data
+
+    async def hgetall(self, key):
+        return self.data.get(key, {})
+
+
+class _MemoryStore(TaskProgressStore):
+    """写入内存哈希，读取走正常的解析流程"""
+
+    def __init__(self, **kwargs):
+        super().__init__("redis://localhost:6379/0", **kwargs)
+        self._redis = _FakeRedis({})
+
+    async def _write(self, task_id, mapping):
+        self._redis.data.setdefault(f"{self.key_prefix}:{task_id}", {}).update(mapping)
+        self.writes += 1
+
+
+class TestTaskProgressStore:
+    """任务进度存储测试类"""
+
+    @pytest.mark.asyncio
+    async def test_progress_coalesced_within_interval(self):
+        """测试间隔内的步骤进度只保留最新一条，并随状态一起写入"""
+        store = _RecordingStore(flush_interval=60)
+        await store.set_progress("t1", {"step": 1})
+        await store.set_progress("t1", {"step": 2})
+        await store.set_progress("t1", {"step": 3})
+        assert len(store.written) == 1
+        assert store.coalesced == 1
+
+        await store.set_status("t1", "SUCCESS", result={"ok": True})
+        mapping = store.written[-1][1]
+        assert mapping["status"] == "SUCCESS"
+        assert json.loads(mapping["progress"]) == {"step": 3}
+        assert json.loads(mapping["result"]) == {"ok": True}
+
+    @pytest.mark.asyncio
+    async def test_progress_written_after_interval(self):
+        """测试间隔为0时每条进度都写入"""
+        store = _RecordingStore(flush_interval=0)
+        await store.set_progress("t1", {"step": 1})
+        await store.set_progress("t1", {"step": 2})
+        assert len(store.written) == 2
+
+    @pytest.mark.asyncio
+    async def test_get_parses_hash(self):
+        """测试读取哈希并解析进度和结果，记录不存在时返回None"""
+        store = TaskProgressStore("redis://localhost:6379/0")
+        store._redis = _FakeRedis({
+            "task:t1": {"status": "PROGRESS", "progress": json.dumps({"step": 2, "message": "分析中"})}
+        })
+        status = await store.get("t1")
+        assert status == {"status": "PROGRESS", "progress": {"step": 2, "message": "分析中"}, "data": None, "error": None}
+        assert await store.get("t2") is None
+
+    @pytest.mark.asyncio
+    async def test_new_step_visible_during_long_stage(self):
+        """测试进入新步骤立即写入：上一步骤刚完成就开始的长耗时阶段期间，轮询看到的是当前步骤"""
+        store = _MemoryStore(flush_interval=60)
+        await store.set_status("t1", "PROGRESS")
+        await store.set_progress("t1", {"step": 1, "step_name": "input_validation", "status": "running"})
+        await store.set_progress("t1", {"step": 2, "step_name": "input_validation", "status": "completed"})
+        await store.set_progress("t1", {"step": 3, "step_name": "content_analysis", "status": "running"})
+        await store.set_progress("t1", {"step": 4, "step_name": "content_analysis", "status": "running", "message": "等待"})
+
+        status = await store.get("t1")
+        assert status["progress"]["step_name"] == "content_analysis"
+        assert status["progress"]["step"] == 3
+        assert store.coalesced == 0
@@ -0,0 +1,86 @@
+"""
+任务服务测试
+
+验证后台处理任务失败时记录实际的失败原因
+"""
+
+import time
+import uuid
+
+import pytest
+
+from app.models.processing_master_models import ProcessingStep, ProcessingStepStatus
+from app.models.task import TaskCreate
+from app.services import task_service as task_service_module
+from app.services.task_progress import TaskProgressStore
+from app.services.task_service import TaskService
+
+
+class _Agent:
+    """按给定的 (步骤名, 状态, 错误) 依次产出步骤"""
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    async def initialize(self):
+        pass
+
+    async def process_complete_solution(self, request, progress_callback=None):
+        for name, status, error in self.steps:
+            yield ProcessingStep(
+                step_name=name, step_title=name, description=name, status=status, error=error, timestamp=time.time()
+            )
+
+
+class _Session:
+    """只支持回滚的数据库会话"""
+
+    async def rollback(self):
+        pass
+
+
+class _Store(TaskProgressStore):
+    """不访问Redis的进度存储"""
+
+    def __init__(self):
+        super().__init__("redis://localhost:6379/0")
+
+    async def _write(self, task_id, mapping):
+        pass
+
+
+async def _run(monkeypatch, steps) -> dict:
+    """执行后台任务，返回最后一次写入数据库的字段"""
+    updates = []
+    service = TaskService(db_session=_Session())
+
+    async def _update_task(task_id, **values):
+        updates.append(values)
+
+    monkeypatch.setattr(service, "_update_task", _update_task)
+    monkeypatch.setattr(task_service_module, "processing_master_agent", _Agent(steps))
+    monkeypatch.setattr(task_service_module, "task_progress_store", _Store())
+    await service.process_task_async(uuid.uuid4(), TaskCreate(text_description="旧椅子"))
+    return updates[-1]
+
+
+class TestProcessTask:
+    """后台处理任务测试类"""
+
+    @pytest.mark.asyncio
+    async def test_failed_step_error_recorded(self, monkeypatch):
+        """测试处置推荐等任意步骤失败时记录其错误，而不是笼统的未产生结果"""
+        final = await _run(monkeypatch, [
+            ("content_analysis", ProcessingStepStatus.COMPLETED, None),
+            ("disposal_recommendation", ProcessingStepStatus.FAILED, "处置推荐失败"),
+        ])
+        assert final == {"status": "FAILED", "error_message": "处置推荐失败"}
+
+    @pytest.mark.asyncio
+    async def test_integration_error_takes_priority(self, monkeypatch):
+        """测试结果整合的错误优先于之后的系统错误"""
+        final = await _run(monkeypatch, [
+            ("result_integration", ProcessingStepStatus.FAILED, "整合失败"),
+            ("system_error", ProcessingStepStatus.FAILED, "系统错误"),
+        ])
+        assert final["error_message"] == "整合失败"
@@ -0,0 +1,91 @@
+"""
+通用缓存工具测试
+
+测试LRU淘汰、TTL过期、命中统计以及两级缓存回填
+"""
+
+import time
+
+import pytest
+
+from app.utils.cache import LRUCache, TieredCache
+
+
+class TestLRUCache:
+    """LRU缓存测试类"""
+
+    def test_get_and_set(self):
+        """测试基本读写与命中统计"""
+        cache = LRUCache(max_entries=4)
+        assert cache.get("a") is None
+        cache.set("a", {"content": "1"})
+        assert cache.get("a") == {"content": "1"}
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+
+    def test_evicts_least_recently_used(self):
+        """测试超出容量时淘汰最久未使用条目"""
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_ttl_expiry(self):
+        """测试条目过期"""
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1, ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+
+class _FakeRemote:
+    """模拟的远程缓存层"""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.store[key] = value
+
+    async def close(self):
+        pass
+
+    def get_stats(self):
+        return {}
+
+
+class TestTieredCache:
+    """两级缓存测试类"""
+
+    @pytest.mark.asyncio
+    async def test_remote_hit_backfills_local(self):
+        """测试远程命中后回填本地"""
+        remote = _FakeRemote()
+        remote.store["k"] = {"content": "远程"}
+        cache = TieredCache(local=LRUCache(max_entries=4), remote=remote)
+
+        assert await cache.get("k") == {"content": "远程"}
+        assert cache.local.get("k") == {"content": "远程"}
+
+    @pytest.mark.asyncio
+    async def test_set_writes_both_tiers(self):
+        """测试写入同时到达两级缓存"""
+        remote = _FakeRemote()
+        cache = TieredCache(local=LRUCache(max_entries=4), remote=remote)
+
+        await cache.set("k", 1, ttl=10)
+        assert remote.store["k"] == 1
+        assert cache.local.get("k") == 1
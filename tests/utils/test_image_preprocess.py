@@ -0,0 +1,101 @@
+"""
+图片预处理测试
+"""
+
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from app.utils.image_preprocess import ImagePreprocessor, preprocess_image_bytes
+
+
+def _make_image(size=(4000, 3000), image_format="JPEG", mode="RGB", orientation=None) -> bytes:
+    image = Image.new(mode, size, (200, 100, 50) if mode == "RGB" else (200, 100, 50, 128))
+    buffer = io.BytesIO()
+    kwargs = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        kwargs["exif"] = exif
+    image.save(buffer, format=image_format, **kwargs)
+    return buffer.getvalue()
+
+
+def _open(data: bytes) -> Image.Image:
+    return Image.open(io.BytesIO(data))
+
+
+class TestPreprocessImageBytes:
+    """图片预处理函数测试类"""
+
+    def test_downscale_large_image(self):
+        """测试大图按最长边缩放并重新编码"""
+        data, image_format, size = preprocess_image_bytes(_make_image(), max_edge=1280, quality=80)
+        assert image_format == "JPEG"
+        assert size == (1280, 960)
+        assert _open(data).size == (1280, 960)
+
+    def test_auto_orient(self):
+        """测试按EXIF方向旋转（方向6需顺时针旋转90度）"""
+        data, _, size = preprocess_image_bytes(
+            _make_image(size=(800, 600), orientation=6), max_edge=1280, quality=80
+        )
+        assert size == (600, 800)
+        assert _open(data).getexif().get(0x0112, 1) == 1
+
+    def test_small_jpeg_untouched(self):
+        """测试无需处理的小JPEG原样返回"""
+        original = _make_image(size=(640, 480))
+        data, image_format, size = preprocess_image_bytes(original, max_edge=1280, quality=80)
+        assert data == original
+        assert (image_format, size) == ("JPEG", (640, 480))
+
+    def test_transparent_png_to_webp(self):
+        """测试透明PNG转换为WebP"""
+        data, image_format, _ = preprocess_image_bytes(
+            _make_image(size=(300, 200), image_format="PNG", mode="RGBA"),
+            max_edge=1280, quality=80, output_format="webp"
+        )
+        assert image_format == "WEBP"
+        assert _open(data).format == "WEBP"
+
+    def test_undecodable_returns_original(self):
+        """测试无法解码时返回原始字节"""
+        assert preprocess_image_bytes(b"not an image", max_edge=1280, quality=80) == (b"not an image", "JPEG", None)
+
+
+class TestImagePreprocessor:
+    """图片预处理器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_prepare_data_uri_and_file(self, tmp_path):
+        """测试data URI与本地文件两种输入"""
+        preprocessor = ImagePreprocessor(max_edge=1024, quality=80)
+        raw = _make_image()
+        data_uri = "data:image/jpeg;base64," + base64.b64encode(raw).decode()
+
+        prepared = await preprocessor.prepare(data_uri)
+        assert prepared.original_size == len(raw)
+        assert len(prepared.data) < len(raw)
+        assert prepared.data_uri.startswith("data:image/JPEG;base64,")
+        assert base64.b64decode(prepared.base64) == prepared.data
+
+        image_path = tmp_path / "photo.jpg"
+        image_path.write_bytes(raw)
+        from_file = await preprocessor.prepare(str(image_path))
+        assert from_file.data == prepared.data
+        assert preprocessor.get_stats()["processed"] == 2
+
+        preprocessor.close()
+
+    @pytest.mark.asyncio
+    async def test_prepare_errors(self, tmp_path):
+        """测试文件不存在与无效data URI"""
+        preprocessor = ImagePreprocessor()
+        with pytest.raises(FileNotFoundError):
+            await preprocessor.prepare(str(tmp_path / "missing.jpg"))
+        with pytest.raises(ValueError):
+            await preprocessor.prepare("data:image/jpeg,abc")
+        preprocessor.close()
@@ -0,0 +1,94 @@
+"""
+LLM输出JSON解析工具测试
+"""
+
+import json
+
+import pytest
+
+from app.utils.json_stream import IncrementalJSONParser, extract_json
+
+
+ANALYSIS = {
+    "category": "电子产品",
+    "sub_category": "笔记本电脑",
+    "condition": "八成新",
+    "estimated_value": 2800,
+    "is_working": True,
+    "keywords": ["笔记本", "联想", "{括号}"],
+    "specs": {"memory": "8GB", "ports": ["USB", "HDMI"]},
+    "description": "屏幕有一道\"划痕\"，其余正常",
+    "extra": None
+}
+
+
+def _feed_in_chunks(parser: IncrementalJSONParser, text: str, size: int) -> list:
+    completed = []
+    for index in range(0, len(text), size):
+        completed.extend(parser.feed(text[index:index + size]))
+    return completed
+
+
+class TestExtractJson:
+    """完整输出解析测试类"""
+
+    def test_plain_and_wrapped(self):
+        """测试直接JSON、代码块和带说明文字的输出"""
+        text = json.dumps(ANALYSIS, ensure_ascii=False)
+        assert extract_json(text) == ANALYSIS
+        assert extract_json(f"分析结果如下：\n```json\n{text}\n```\n以上") == ANALYSIS
+        assert extract_json(f"结果：{text}。") == ANALYSIS
+
+    def test_invalid(self):
+        """测试无法解析时返回None"""
+        assert extract_json("") is None
+        assert extract_json("无法识别图片中的物品") is None
+        assert extract_json("{category: 未知}") is None
+
+
+class TestIncrementalJSONParser:
+    """增量解析测试类"""
+
+    def test_fields_emitted_in_order(self):
+        """测试各种类型的顶层字段按闭合顺序产出，与整体解析结果一致"""
+        text = "```json\n" + json.dumps(ANALYSIS, ensure_ascii=False, indent=2) + "\n```"
+        for size in (1, 3, 17, len(text)):
+            parser = IncrementalJSONParser()
+            completed = _feed_in_chunks(parser, text, size)
+
+            assert [name for name, _ in completed] == list(ANALYSIS.keys())
+            assert dict(completed) == ANALYSIS
+            assert parser.done
+            assert parser.result() == ANALYSIS
+
+    def test_field_emitted_before_completion(self):
+        """测试字段闭合时立即产出，不等待后续内容"""
+        parser = IncrementalJSONParser()
+        assert parser.feed('{"category": "家具", "keywords": ["椅') == [("category", "家具")]
+        assert parser.feed('子"], "description": "木质') == [("keywords", ["椅子"])]
+        assert parser.fields == {"category": "家具", "keywords": ["椅子"]}
+        assert not parser.done
+
+    def test_scalar_needs_delimiter(self):
+        """测试数字等标量要等到分隔符才产出，避免截断"""
+        parser = IncrementalJSONParser()
+        assert parser.feed('{"estimated_value": 12') == []
+        assert parser.feed('00, "condition"') == [("estimated_value", 1200)]
+        assert parser.feed(': "九成新"}') == [("condition", "九成新")]
+        assert parser.done
+
+    def test_truncated_output_falls_back_to_fields(self):
+        """测试输出被截断时返回已闭合的字段"""
+        parser = IncrementalJSONParser()
+        parser.feed('{"category": "服装", "condition": "七成新", "description": "一件')
+        assert parser.result() == {"category": "服装", "condition": "七成新"}
+        assert IncrementalJSONParser().result() is None
+
+    def test_complete_object_not_parsed_again(self, monkeypatch):
+        """测试对象完整闭合时直接返回逐字段解析的结果，不再整体解析完整文本"""
+        import app.utils.json_stream as json_stream_module
+
+        parser = IncrementalJSONParser()
+        parser.feed(json.dumps(ANALYSIS, ensure_ascii=False))
+        monkeypatch.setattr(json_stream_module, "extract_json", lambda content: pytest.fail("不应整体解析"))
+        assert parser.result() == ANALYSIS
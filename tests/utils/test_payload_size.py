@@ -0,0 +1,29 @@
+"""
+消息体大小估算测试
+"""
+
+import json
+
+from app.utils.payload_size import estimate_json_size
+
+
+class TestEstimateJsonSize:
+    """消息体大小估算测试类"""
+
+    def test_matches_json_length(self):
+        """测试无转义字符时与json.dumps长度一致"""
+        payload = {
+            "success": True,
+            "analysis_result": {"category": "家具", "keywords": ["椅子", "木质"], "score": 0.85},
+            "videos": [{"title": "旧椅子改造", "views": 12345}, {"title": "DIY", "views": 0}],
+            "error": None,
+            "empty": {},
+            "items": [],
+            "flag": False
+        }
+        assert estimate_json_size(payload) == len(json.dumps(payload, ensure_ascii=False))
+
+    def test_scalars(self):
+        """测试标量值"""
+        for value in ["", "文字", 0, -12, 3.5, True, False, None]:
+            assert estimate_json_size(value) == len(json.dumps(value, ensure_ascii=False))
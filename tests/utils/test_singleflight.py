@@ -0,0 +1,96 @@
+"""
+请求合并（singleflight）测试
+"""
+
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight, get_singleflight_stats
+
+
+class TestSingleFlight:
+    """请求合并测试类"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_collapse(self):
+        """测试相同键的并发调用只执行一次"""
+        group = SingleFlight("test_collapse")
+        call_count = {"value": 0}
+
+        async def fetch():
+            call_count["value"] += 1
+            await asyncio.sleep(0.05)
+            return {"items": [1, 2, 3]}
+
+        results = await asyncio.gather(*[group.do("key", fetch) for _ in range(5)])
+
+        assert call_count["value"] == 1
+        assert all(result == {"items": [1, 2, 3]} for result in results)
+        assert group.get_stats() == {"calls": 5, "executions": 1, "collapsed": 4, "inflight": 0}
+        assert "test_collapse" in get_singleflight_stats()
+
+    @pytest.mark.asyncio
+    async def test_results_are_independent(self):
+        """测试调用方修改结果不影响其他调用方"""
+        group = SingleFlight("test_independent")
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return {"items": [1]}
+
+        async def mutate():
+            result = await group.do("key", fetch)
+            result["items"].append(2)
+            return result
+
+        first, second = await asyncio.gather(mutate(), group.do("key", fetch))
+
+        assert first["items"] == [1, 2]
+        assert second["items"] == [1]
+
+    @pytest.mark.asyncio
+    async def test_different_keys_and_sequential_calls(self):
+        """测试不同键或先后发起的调用分别执行"""
+        group = SingleFlight("test_keys")
+        call_count = {"value": 0}
+
+        async def fetch():
+            call_count["value"] += 1
+            return call_count["value"]
+
+        await asyncio.gather(group.do("a", fetch), group.do("b", fetch))
+        await group.do("a", fetch)
+
+        assert call_count["value"] == 3
+        assert group.collapsed == 0
+
+    @pytest.mark.asyncio
+    async def test_exception_shared(self):
+        """测试执行异常传递给所有调用方"""
+        group = SingleFlight("test_error")
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError("失败")
+
+        results = await asyncio.gather(group.do("key", fetch), group.do("key", fetch), return_exceptions=True)
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert group.inflight == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        """测试单个调用方取消不影响其他调用方"""
+        group = SingleFlight("test_cancel")
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        first = asyncio.create_task(group.do("key", fetch))
+        second = asyncio.create_task(group.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == "ok"
@@ -0,0 +1,155 @@
+"""
+阶段依赖图调度器测试
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.utils.stage_graph import Stage, StageGraph, StageStatus
+
+
+def _sleep_stage(name, delay, result=None, depends_on=(), cancel_on_failure=(), error=None, log=None):
+    async def run(inputs):
+        if log is not None:
+            log.append(("start", name, dict(inputs)))
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result if result is not None else name
+
+    return Stage(name=name, run=run, depends_on=depends_on, cancel_on_failure=cancel_on_failure)
+
+
+class TestStageGraph:
+    """阶段依赖图测试类"""
+
+    def test_invalid_graph(self):
+        """测试未知依赖、重复名称与环"""
+        with pytest.raises(ValueError):
+            StageGraph([_sleep_stage("a", 0, depends_on=("missing",))])
+        with pytest.raises(ValueError):
+            StageGraph([_sleep_stage("a", 0), _sleep_stage("a", 0)])
+        with pytest.raises(ValueError):
+            StageGraph([_sleep_stage("a", 0, depends_on=("b",)), _sleep_stage("b", 0, depends_on=("a",))])
+
+    @pytest.mark.asyncio
+    async def test_independent_stages_run_concurrently(self):
+        """测试独立阶段并行执行，依赖结果作为输入传入，耗时等于最长链"""
+        log = []
+        graph = StageGraph([
+            _sleep_stage("slow", 0.1, depends_on=("analysis",), log=log),
+            _sleep_stage("fast", 0.05, depends_on=("analysis",), log=log),
+            _sleep_stage("after_fast", 0.05, depends_on=("fast",), log=log)
+        ], inputs={"analysis": {"category": "家具"}})
+
+        started = time.monotonic()
+        graph.start()
+        outcomes = [await graph.wait(name) for name in ("slow", "fast", "after_fast")]
+
+        assert time.monotonic() - started < 0.18
+        assert all(outcome.ok for outcome in outcomes)
+        assert ("start", "after_fast", {"fast": "fast"}) in log
+        assert ("start", "slow", {"analysis": {"category": "家具"}}) in log
+
+    @pytest.mark.asyncio
+    async def test_failed_dependency_skips_downstream(self):
+        """测试依赖失败时下游阶段不启动"""
+        log = []
+        graph = StageGraph([
+            _sleep_stage("upstream", 0.01, error=ValueError("失败")),
+            _sleep_stage("downstream", 0, depends_on=("upstream",), log=log)
+        ])
+        graph.start()
+
+        upstream = await graph.wait("upstream")
+        downstream = await graph.wait("downstream")
+        assert upstream.status == StageStatus.FAILED
+        assert isinstance(upstream.exception, ValueError)
+        assert downstream.status == StageStatus.SKIPPED
+        assert log == []
+
+    @pytest.mark.asyncio
+    async def test_speculative_stage_cancelled_on_guard_failure(self):
+        """测试投机阶段与守护阶段同时启动，守护阶段结果未成功时被取消"""
+        guard = Stage(name="guard", run=lambda inputs: asyncio.sleep(0.02, result=False), succeeded=bool)
+        speculative = _sleep_stage("speculative", 1.0, cancel_on_failure=("guard",))
+        graph = StageGraph([guard, speculative])
+
+        started = time.monotonic()
+        graph.start()
+        outcome = await graph.wait("speculative")
+
+        assert outcome.status == StageStatus.CANCELLED
+        assert "guard" in outcome.error
+        assert time.monotonic() - started < 0.5
+        assert (await graph.wait("guard")).result is False
+
+    @pytest.mark.asyncio
+    async def test_speculative_stage_kept_on_guard_success(self):
+        """测试守护阶段成功时投机阶段正常完成"""
+        graph = StageGraph([
+            _sleep_stage("guard", 0.01),
+            _sleep_stage("speculative", 0.03, cancel_on_failure=("guard",))
+        ])
+        graph.start()
+        assert (await graph.wait("speculative")).ok
+
+    @pytest.mark.asyncio
+    async def test_aclose_cancels_pending(self):
+        """测试关闭时取消未结束的阶段"""
+        graph = StageGraph([_sleep_stage("long", 10), _sleep_stage("next", 0, depends_on=("long",))])
+        graph.start()
+        await graph.aclose()
+
+        assert graph.outcomes["long"].status == StageStatus.CANCELLED
+        assert graph.outcomes["next"].status in (StageStatus.CANCELLED, StageStatus.SKIPPED)
+
+    @pytest.mark.asyncio
+    async def test_as_completed_yields_in_completion_order(self):
+        """测试按完成顺序产出结果，快阶段不等待慢阶段"""
+        graph = StageGraph([
+            _sleep_stage("slow", 0.2),
+            _sleep_stage("fast", 0.01),
+            _sleep_stage("failing", 0.05, error=RuntimeError("boom"))
+        ])
+        graph.start()
+
+        started = time.monotonic()
+        arrivals = []
+        async for outcome in graph.as_completed(["slow", "fast", "failing"]):
+            arrivals.append((outcome.name, outcome.status, time.monotonic() - started))
+
+        assert [name for name, _, _ in arrivals] == ["fast", "failing", "slow"]
+        assert arrivals[0][2] < 0.1
+        assert arrivals[1][1] == StageStatus.FAILED
+
+    @pytest.mark.asyncio
+    async def test_as_completed_keeps_order_for_finished_stages(self):
+        """测试已结束的阶段按给定顺序产出"""
+        graph = StageGraph([_sleep_stage(name, 0) for name in ("a", "b", "c")])
+        graph.start()
+        await graph.aclose()
+
+        names = [outcome.name async for outcome in graph.as_completed(["c", "a", "b"])]
+        assert names == ["c", "a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_deadline_times_out_pending_stages(self):
+        """测试截止时间到期时未结束的阶段被取消并记为超时"""
+        graph = StageGraph(
+            [_sleep_stage("fast", 0.01), _sleep_stage("slow", 10), _sleep_stage("after", 0, depends_on=("slow",))],
+            deadline=time.monotonic() + 0.1
+        )
+
+        started = time.monotonic()
+        graph.start()
+        slow = await graph.wait("slow")
+
+        assert time.monotonic() - started < 1
+        assert slow.status == StageStatus.TIMED_OUT
+        assert (await graph.wait("fast")).ok
+        assert (await graph.wait("after")).status == StageStatus.TIMED_OUT
+        assert sorted(graph.timed_out_stages) == ["after", "slow"]
+        await graph.aclose()